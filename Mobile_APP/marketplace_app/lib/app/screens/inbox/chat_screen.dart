@@ -15,16 +15,24 @@ class ChatScreen extends StatefulWidget {
 
 class _ChatScreenState extends State<ChatScreen> {
   bool loading = true;
+  bool loadingOlder = false;
+  bool hasOlder = false;
   String? error;
   List<dynamic> messages = [];
   final ctrl = TextEditingController();
+  final scroll = ScrollController();
+
+  int get _conversationId => widget.conversation['id'] as int;
+
+  MessageService _service() =>
+      MessageService(ApiService(token: context.read<UserProvider>().token));
 
   Future<void> _load() async {
     setState(() => loading = true);
     try {
-      final api = ApiService(token: context.read<UserProvider>().token);
-      messages = await MessageService(api)
-          .messages(conversationId: widget.conversation['id'] as int);
+      final data = await _service().sync(_conversationId);
+      messages = List<dynamic>.from(data['messages'] as List? ?? []);
+      hasOlder = data['has_more'] == true;
       setState(() {});
     } catch (e) {
       setState(() => error = e.toString());
@@ -33,15 +41,41 @@ class _ChatScreenState extends State<ChatScreen> {
     }
   }
 
+  /// Fetch only what arrived after the newest message we already have.
+  Future<void> _catchUp() async {
+    if (messages.isEmpty) return _load();
+    final data = await _service()
+        .sync(_conversationId, afterId: messages.last['id'] as int);
+    final fresh = (data['messages'] as List?) ?? [];
+    if (fresh.isNotEmpty && mounted) setState(() => messages.addAll(fresh));
+  }
+
+  /// Lazy-load history when the user scrolls to the top.
+  Future<void> _loadOlder() async {
+    if (loadingOlder || !hasOlder || messages.isEmpty) return;
+    loadingOlder = true;
+    try {
+      final data = await _service()
+          .sync(_conversationId, beforeId: messages.first['id'] as int);
+      final older = (data['messages'] as List?) ?? [];
+      if (mounted) {
+        setState(() {
+          messages.insertAll(0, older);
+          hasOlder = data['has_more'] == true;
+        });
+      }
+    } finally {
+      loadingOlder = false;
+    }
+  }
+
   Future<void> _send() async {
     final text = ctrl.text.trim();
     if (text.isEmpty) return;
     try {
-      final api = ApiService(token: context.read<UserProvider>().token);
-      final svc = MessageService(api);
-      final msg = await svc.send(widget.conversation['id'] as int, text);
+      await _service().send(_conversationId, text);
       ctrl.clear();
-      setState(() => messages.add(msg));
+      await _catchUp();
     } catch (e) {
       if (mounted) {
         ScaffoldMessenger.of(context).showSnackBar(
@@ -54,9 +88,21 @@ class _ChatScreenState extends State<ChatScreen> {
   @override
   void initState() {
     super.initState();
+    scroll.addListener(() {
+      if (scroll.position.pixels <= scroll.position.minScrollExtent + 40) {
+        _loadOlder();
+      }
+    });
     _load();
   }
 
+  @override
+  void dispose() {
+    scroll.dispose();
+    ctrl.dispose();
+    super.dispose();
+  }
+
   @override
   Widget build(BuildContext context) {
     return Scaffold(
@@ -69,12 +115,13 @@ class _ChatScreenState extends State<ChatScreen> {
             child: loading
                 ? const Center(child: CircularProgressIndicator())
                 : ListView.builder(
+                    controller: scroll,
                     padding: const EdgeInsets.all(8),
                     itemCount: messages.length,
                     itemBuilder: (_, i) {
                       final m = messages[i] as Map<String, dynamic>;
                       final me = context.read<UserProvider>().user?['user_id'] ==
-                          m['sender']?['user_id'];
+                          m['sender_id'];
                       return Align(
                         alignment: me
                             ? Alignment.centerRight
@@ -88,7 +135,7 @@ class _ChatScreenState extends State<ChatScreen> {
                             borderRadius: BorderRadius.circular(12),
                           ),
                           child: Text(
-                            m['text'] ?? '',
+                            m['body'] ?? '',
                             style: TextStyle(
                               color:
                                   me ? Colors.white : Colors.black87,
@@ -22,6 +22,22 @@ class MessageService {
         .toList();
   }
 
+  /// Incremental sync: [afterId] fetches only newer messages, [beforeId] pages
+  /// back through history, neither returns the latest page.
+  /// Returns {messages (oldest first), has_more, read_up_to}.
+  Future<Map<String, dynamic>> sync(
+    int conversationId, {
+    int? afterId,
+    int? beforeId,
+    int limit = 50,
+  }) async =>
+      await api.getJson('/messages/sync/', query: {
+        'conversation': conversationId,
+        if (afterId != null) 'after_id': afterId,
+        if (beforeId != null) 'before_id': beforeId,
+        'limit': limit,
+      });
+
   Future<Map<String, dynamic>> send(int conversationId, String text) async =>
       await api.postJson('/messages/', {
         'conversation_id': conversationId,
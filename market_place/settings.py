@@ -42,25 +42,38 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django_elasticsearch_dsl',
-    'django.contrib.humanize'
+    'django.contrib.humanize',
+    'django.contrib.postgres',
 ]
 
 if USE_CLOUDINARY:
     INSTALLED_APPS += ['cloudinary', 'cloudinary_storage']
 
 
-ASGI_APPLICATION = 'Market_Place.asgi.application'
+ASGI_APPLICATION = 'market_place.asgi.application'
+
+REDIS_URL = os.getenv("REDIS_URL", "")
 
 # Redis backend for WebSocket communication
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)],  # change if your Redis runs elsewhere
+            "hosts": [REDIS_URL or ("127.0.0.1", 6379)],
         },
     },
 }
 
+# Shared cache tier (taxonomy cache, counters, ...). Without REDIS_URL each
+# process falls back to its own local-memory cache.
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+
 # ---------------------------------------------------
 # Middleware
 # ---------------------------------------------------
@@ -170,6 +183,11 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# On-the-fly resizes of avatars/logos/covers (services/image_resize.py): local
+# LRU disk cache, trimmed once it grows past RESIZED_IMAGE_CACHE_MAX_BYTES.
+RESIZED_IMAGE_CACHE_DIR = os.getenv("RESIZED_IMAGE_CACHE_DIR", str(BASE_DIR / "cache" / "img"))
+RESIZED_IMAGE_CACHE_MAX_BYTES = int(os.getenv("RESIZED_IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
 # Django 5.x: use STORAGES (DEFAULT_FILE_STORAGE/STATICFILES_STORAGE are ignored)
 STORAGES = {
     "staticfiles": {
@@ -214,9 +232,14 @@ LOCALE_PATHS = [BASE_DIR / 'locale']
 # ---------------------------------------------------
 if IS_RENDER:
     ELASTICSEARCH_DSL = {'default': {'hosts': ''}}
-    ELASTICSEARCH_DSL_AUTOSYNC = False
 else:
     ELASTICSEARCH_DSL = {'default': {'hosts': 'http://localhost:9200'}}
+# No per-save indexing: signals queue listing ids and `manage.py search_index_worker`
+# flushes them with the bulk API (services/search_index.py).
+ELASTICSEARCH_DSL_AUTOSYNC = False
+# "elasticsearch" or "postgres" (services/listing_search.py); without ES the
+# grids and suggestions search the ListingCard tsvector / trigram indexes
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "postgres" if IS_RENDER else "elasticsearch")
 
 
 
@@ -335,3 +358,13 @@ if DEBUG:
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID", "")
 OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID", "")
+# Empty = api.openai.com; point at a compatible/stub server for local testing.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+
+# moderation_worker: items per multi-input moderation call, per-call timeout (s)
+MODERATION_BATCH_SIZE = int(os.getenv("MODERATION_BATCH_SIZE", "32"))
+MODERATION_TIMEOUT = float(os.getenv("MODERATION_TIMEOUT", "15"))
+# Verdict cache (moderation.py): bump the policy version to drop every cached verdict.
+MODERATION_POLICY_VERSION = os.getenv("MODERATION_POLICY_VERSION", "1")
+MODERATION_CACHE_TTL = int(os.getenv("MODERATION_CACHE_TTL", str(30 * 24 * 3600)))
+MODERATION_OVERRIDE_TTL = int(os.getenv("MODERATION_OVERRIDE_TTL", str(365 * 24 * 3600)))
@@ -2,7 +2,7 @@ from django.contrib import admin, messages
 from django.urls import path
 from django.shortcuts import redirect, render
 from django.contrib.admin.views.main import IS_POPUP_VAR
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.db import models
 from django.db.models import F
 from django.core.files.base import ContentFile
@@ -25,8 +25,11 @@ from .models import (
     City, Favorite, IssuesReport, Message, Listing, Request, Store, StoreReview, ContactMessage, FAQCategory,
     FAQQuestion, PrivacyPolicyPage, PrivacyPolicySection, CategoryPhoto, PointsTransaction,
     TermsPage, TermsSection, SiteSettings,
-    Report, ReportPhoto, ReportMatch, LostReport, FoundReport,
+    Report, ReportPhoto, ReportMatch, LostReport, FoundReport, ModerationJob,
 )
+from . import moderation
+from .services import category_closure, photo_duplicates, saved_searches, search_cache, search_index
+from .services.listing_cards import refresh_listing_cards
 from .services.wallet import apply_points_transaction
 from .services.notifications import notify, K_WALLET, S_CHARGED
 
@@ -376,18 +379,10 @@ class CategoryAdmin(nested_admin.NestedModelAdmin):
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
         if db_field.name == "parent" and formfield is not None:
-            categories = Category.objects.all().select_related("parent")
-
-            def build_path(cat):
-                path = [cat.name]
-                p = cat.parent
-                while p:
-                    path.insert(0, p.name)
-                    p = p.parent
-                return " › ".join(path)
+            paths = category_closure.paths_for()
 
             formfield.choices = [(None, "---------")] + [
-                (c.id, build_path(c)) for c in categories
+                (cid, " › ".join(name for _id, name in path)) for cid, path in paths.items()
             ]
         return formfield
 
@@ -396,10 +391,7 @@ class CategoryAdmin(nested_admin.NestedModelAdmin):
     # ------------------------------------------------------------------ #
     def _collect_ids(self, category):
         """Return the category id plus all descendant ids."""
-        ids = [category.pk]
-        for sub in category.subcategories.all():
-            ids.extend(self._collect_ids(sub))
-        return ids
+        return category_closure.descendant_ids(category)
 
     @staticmethod
     def _nullify_orphaned_listings(ids):
@@ -515,7 +507,7 @@ class ItemAdmin(admin.ModelAdmin):
 
     ordering = ("-listing__updated_at",)
 
-    actions = ["feature_7_days", "unfeature"]
+    actions = ["feature_7_days", "unfeature", "forget_moderation_verdict"]
 
     # ============================
     # LIST DISPLAY
@@ -552,6 +544,7 @@ class ItemAdmin(admin.ModelAdmin):
         "listing_is_active",
         "colored_status",
         "photo_gallery",
+        "possible_duplicates",
         "listing_approved_by",
         "listing_rejected_by",
         "listing_approved_at",
@@ -585,6 +578,7 @@ class ItemAdmin(admin.ModelAdmin):
         "condition",
         "listing_description",
         "photo_gallery",
+        "possible_duplicates",
         "listing_user",
         "colored_status",
         "external_id",
@@ -739,6 +733,8 @@ class ItemAdmin(admin.ModelAdmin):
             "approved_by", "rejected_by",
             "approved_at", "rejected_at"
         ])
+        # identical text submitted later is approved without another API call
+        moderation.override_verdict(moderation.listing_text(listing), "approve")
 
         from marketplace.services.notifications import notify, K_AD, S_APPROVED
 
@@ -777,6 +773,7 @@ class ItemAdmin(admin.ModelAdmin):
                 "rejected_by", "approved_by",
                 "rejected_at", "approved_at"
             ])
+            moderation.override_verdict(moderation.listing_text(listing), "reject", reason)
 
             from marketplace.services.notifications import notify, K_AD, S_REJECTED
 
@@ -841,6 +838,35 @@ class ItemAdmin(admin.ModelAdmin):
         return format_html("".join(html_parts))
     photo_gallery.short_description = "Item Photos"
 
+    def possible_duplicates(self, obj):
+        """Other listings re-using one of these photos (perceptual hash match)."""
+        if not obj or not obj.pk:
+            return "-"
+        duplicates = photo_duplicates.listing_duplicates(obj.listing)
+        if not duplicates:
+            pending = obj.photos.filter(phash=None).exists()
+            return "Photos not hashed yet." if pending else "None found."
+
+        rows = []
+        for dup in duplicates:
+            other = dup["listing"]
+            item_id = getattr(getattr(other, "item", None), "pk", None)
+            url = reverse("admin:marketplace_item_change", args=[item_id]) if item_id else "#"
+            _own_id, match, _distance = dup["matches"][0]
+            rows.append((
+                url, match.display_image.url, other.pk, other.title[:40], dup["distance"],
+                "active" if other.is_active else "inactive",
+            ))
+        return format_html_join(
+            "",
+            '<div style="display:inline-block;margin:6px;text-align:center;width:140px;">'
+            '<a href="{}"><img src="{}" style="width:140px;border-radius:8px;display:block;"></a>'
+            '<div style="font-size:12px;">#{} {} &middot; {} bit(s) &middot; {}</div>'
+            '</div>',
+            rows,
+        )
+    possible_duplicates.short_description = "Possible duplicates"
+
     def delete_photo_view(self, request, photo_id):
         photo = get_object_or_404(ItemPhoto, id=photo_id)
         item = photo.item
@@ -871,6 +897,13 @@ class ItemAdmin(admin.ModelAdmin):
 
     make_inactive.short_description = "Deactivate selected items"
 
+    def forget_moderation_verdict(self, request, queryset):
+        for item in queryset.select_related("listing"):
+            moderation.forget_verdict(moderation.listing_text(item.listing))
+        self.message_user(request, f"🧹 Cached moderation verdict cleared for {queryset.count()} item(s).")
+
+    forget_moderation_verdict.short_description = "Forget cached moderation verdict"
+
     # -----------------------------
     # Import Items (Excel + ZIP) — stores external_id ✅
     # -----------------------------
@@ -1248,6 +1281,10 @@ class ItemAdmin(admin.ModelAdmin):
                 # ✅ ZIP-only activation: any listing that got at least one new photo becomes active+approved
                 if activated_listing_ids:
                     Listing.objects.filter(id__in=activated_listing_ids).update(is_active=True, is_approved=True)
+                    refresh_listing_cards(activated_listing_ids)
+                    search_index.mark_dirty(activated_listing_ids)
+                    search_cache.bump_generation()
+                    saved_searches.enqueue(activated_listing_ids)
 
             # -----------------------
             # Cleanup
@@ -2023,6 +2060,15 @@ class ReportMatchAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+@admin.register(ModerationJob)
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'listing', 'status', 'decision', 'attempts', 'latency_ms', 'batch_size', 'created_at', 'finished_at')
+    list_filter = ('status', 'decision')
+    search_fields = ('listing__title',)
+    raw_id_fields = ('listing',)
+    readonly_fields = ('created_at', 'finished_at', 'latency_ms', 'batch_size', 'last_error')
+
+
 # ======================================================
 # ✅ Admin Branding
 # ======================================================
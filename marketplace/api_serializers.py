@@ -8,6 +8,7 @@ from .models import (
     IssueReport, Subscriber, PhoneVerificationCode,
     Report, ReportPhoto, ReportMatch,
 )
+from .utils import photo_urls
 from .validators import validate_no_links_or_html
 
 User = get_user_model()
@@ -89,10 +90,25 @@ class CitySerializer(serializers.ModelSerializer):
 # -------------------------
 # Item & dynamic attributes
 # -------------------------
+def _absolute(serializer):
+    request = serializer.context.get("request")
+    return request.build_absolute_uri if request else None
+
+
 class ItemPhotoSerializer(serializers.ModelSerializer):
+    # {"thumb"|"card"|"full": {"width", "height", "webp", "jpg"}}; empty until the photo worker ran
+    renditions = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ItemPhoto
-        fields = ["id", "image", "created_at"]
+        fields = ["id", "image", "renditions", "srcset", "created_at"]
+
+    def get_renditions(self, obj):
+        return photo_urls.rendition_urls(obj.renditions, absolute=_absolute(self))
+
+    def get_srcset(self, obj):
+        return photo_urls.srcset(obj.renditions, "webp", absolute=_absolute(self))
 
 class ItemAttributeValueSerializer(serializers.ModelSerializer):
     attribute_id = serializers.IntegerField()
@@ -112,11 +128,27 @@ class ItemListSerializer(serializers.ModelSerializer):
     category = CategoryBriefSerializer(read_only=True)
     user = UserPublicSerializer(read_only=True)
     photos = ItemPhotoSerializer(many=True, read_only=True)
+    # smallest adequate rendition of the main photo for list rows / grid cards
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Item
         fields = ["id", "title", "condition", "price", "description", "city_id",
-                  "category", "user", "photos", "is_approved", "is_active", "created_at"]
+                  "category", "user", "photos", "thumbnail", "is_approved", "is_active", "created_at"]
+
+    def get_thumbnail(self, obj):
+        photo = obj.main_photo
+        if photo is None:
+            return None
+        absolute = _absolute(self)
+        fallback = photo.display_image.url
+        if absolute:
+            fallback = absolute(fallback)
+        return {
+            "thumb": photo_urls.rendition_url(photo.renditions, "thumb", "jpg", fallback, absolute),
+            "card": photo_urls.rendition_url(photo.renditions, "card", "jpg", fallback, absolute),
+            "srcset": photo_urls.srcset(photo.renditions, "webp", absolute),
+        }
 
 class ItemDetailSerializer(serializers.ModelSerializer):
     category = CategoryBriefSerializer(read_only=True)
@@ -17,6 +17,7 @@ from .models import (
     Report, ReportPhoto, ReportMatch,
 )
 from .documents import ListingDocument
+from .services import chat as chat_service, conversations, taxonomy_cache
 from .utils.sms import send_sms_code
 from .utils.verification import send_code, verify_session_code
 
@@ -189,10 +190,23 @@ class ResetPasswordAPI(generics.GenericAPIView):
 # Taxonomy
 # -------------------------
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Category.objects.all().select_related("parent").prefetch_related("subcategories","attributes")
+    queryset = Category.objects.all().select_related("parent").prefetch_related(
+        "subcategories", "attributes__options"
+    ).order_by("id")
     serializer_class = CategoryTreeSerializer
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        # the whole serialized tree lives in the taxonomy cache; pages are cut from it
+        data = taxonomy_cache.get_or_build(
+            "api:categories",
+            lambda: [dict(row) for row in self.get_serializer(self.get_queryset(), many=True).data],
+        )
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
+
     @action(detail=True, methods=["get"])
     def attributes(self, request, pk=None):
         cat = self.get_object()
@@ -359,7 +373,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         u = self.request.user
-        return Conversation.objects.filter(Q(buyer=u) | Q(seller=u)).select_related("item","buyer","seller").order_by("-updated_at")
+        return conversations.summaries_qs(u).order_by(*conversations.ORDERING)
 
     def create(self, request, *args, **kwargs):
         item_id = request.data.get("item_id")
@@ -380,7 +394,36 @@ class MessageViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         u = self.request.user
-        return Message.objects.filter(Q(conversation__buyer=u)|Q(conversation__seller=u)).select_related("sender","conversation").order_by("created_at")
+        qs = Message.objects.filter(Q(conversation__buyer=u)|Q(conversation__seller=u)).select_related("sender","conversation").order_by("created_at")
+        conversation_id = self.request.query_params.get("conversation")
+        if conversation_id:
+            qs = qs.filter(conversation_id=conversation_id)
+        return qs
+
+    @action(detail=False, methods=["get"])
+    def sync(self, request):
+        """?conversation=<id>&after_id=|before_id=&limit= — only the messages the client is missing."""
+        conversation_id = chat_service._as_id(request.query_params.get("conversation"))
+        c = Conversation.objects.filter(id=conversation_id).first() if conversation_id is not None else None
+        if c is None:
+            return Response({"detail":"Conversation not found."}, status=404)
+        if not chat_service.is_participant(c, request.user):
+            return Response(status=403)
+
+        before_id = request.query_params.get("before_id")
+        if not before_id:
+            chat_service.mark_read(c, request.user)
+        result = chat_service.sync_messages(
+            c, request.user,
+            after_id=request.query_params.get("after_id"),
+            before_id=before_id,
+            limit=request.query_params.get("limit") or chat_service.SYNC_PAGE_SIZE,
+        )
+        return Response({
+            "messages": [chat_service.serialize_message(m) for m in result["messages"]],
+            "has_more": result["has_more"],
+            "read_up_to": result["read_up_to"],
+        })
 
     def create(self, request, *args, **kwargs):
         conv_id = request.data.get("conversation_id")
@@ -0,0 +1,82 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.core.exceptions import ValidationError
+
+from marketplace.models import Conversation
+from marketplace.services import chat
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/chat/<conversation_id>/ — one socket per open conversation.
+
+    Client → server:  {"type": "message", "body": "..."}
+                      {"type": "read"}
+                      {"type": "typing", "is_typing": true}
+    Server → client:  {"type": "message", "message": {...}, "mine": bool}
+                      {"type": "read", "reader_id": id}
+                      {"type": "typing", "user_id": id, "is_typing": bool}
+                      {"type": "error", "error": "empty" | "invalid"}
+    """
+
+    group = None
+
+    async def connect(self):
+        self.user = self.scope.get("user")
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
+        self.conversation = await self._load_conversation(conversation_id)
+        if self.conversation is None:
+            await self.close(code=4403)
+            return
+
+        self.group = chat.group_name(self.conversation.id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        kind = content.get("type") if isinstance(content, dict) else None
+
+        if kind == "message":
+            try:
+                await database_sync_to_async(chat.post_message)(self.conversation, self.user, content.get("body"))
+            except ValidationError as e:
+                await self.send_json({"type": "error", "error": "empty" if e.code == "empty" else "invalid"})
+
+        elif kind == "read":
+            await database_sync_to_async(chat.mark_read)(self.conversation, self.user)
+
+        elif kind == "typing":
+            await self.channel_layer.group_send(self.group, {
+                "type": "chat.typing",
+                "user_id": self.user.pk,
+                "is_typing": bool(content.get("is_typing", True)),
+            })
+
+    # -------------------------
+    # Group events
+    # -------------------------
+    async def chat_message(self, event):
+        message = event["message"]
+        await self.send_json({"type": "message", "message": message, "mine": message["sender_id"] == self.user.pk})
+
+    async def chat_read(self, event):
+        await self.send_json({"type": "read", "reader_id": event["reader_id"]})
+
+    async def chat_typing(self, event):
+        if event["user_id"] != self.user.pk:
+            await self.send_json({"type": "typing", "user_id": event["user_id"], "is_typing": event["is_typing"]})
+
+    @database_sync_to_async
+    def _load_conversation(self, conversation_id):
+        conversation = Conversation.objects.filter(pk=conversation_id).first()
+        if conversation is None or not chat.is_participant(conversation, self.user):
+            return None
+        return conversation
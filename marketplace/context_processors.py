@@ -1,10 +1,6 @@
-from collections import defaultdict
-
-from django.db.models import Q, Max
-from .models import Notification, Message, Favorite, Conversation
-from django.core.cache import cache
-from django.utils import translation
-from .models import Category
+from django.db.models import F
+from .models import Notification
+from .services import conversations, counters, taxonomy_cache
 
 
 def navbar_counters(request):
@@ -16,32 +12,16 @@ def navbar_counters(request):
     - recent_conversations  (replaces recent_messages)
     - recent_notifications
     - recent_favorites
+
+    Counts come from the per-user cache (services/counters.py); the three
+    recent lists are one query each.
     """
     if not request.user.is_authenticated:
         return {}
 
     user = request.user
-
-    # -------------------------
-    # Unread notifications
-    # -------------------------
-    unread_notifications = Notification.objects.filter(
-        user=user,
-        is_read=False,
-    ).count()
-
-    # -------------------------
-    # Unread messages
-    # (buyer or seller, but not own sent)
-    # -------------------------
-    unread_messages = (
-        Message.objects.filter(
-            Q(conversation__buyer=user) | Q(conversation__seller=user),
-            is_read=False,
-        )
-        .exclude(sender=user)
-        .count()
-    )
+    uid = user.pk
+    counts = counters.get_counters(uid)
 
     # -------------------------
     # Recent notifications
@@ -54,145 +34,46 @@ def navbar_counters(request):
 
     # -------------------------
     # Recent CONVERSATIONS (not individual messages)
-    # One row per conversation, sorted by latest message date
+    # The 10 with the newest Conversation.last_message_at (indexed per
+    # participant, see services/conversations.py); their latest message and
+    # unread count are annotated on those rows only.
     # -------------------------
     recent_conversations_qs = (
-        Conversation.objects.filter(
-            Q(buyer=user) | Q(seller=user)
-        )
-        .select_related(
-            "listing",
-            "report",
-            "buyer",
-            "buyer__store",
-            "seller",
-            "seller__store",
-        )
-        .annotate(latest_msg_date=Max("messages__created_at"))
-        .filter(latest_msg_date__isnull=False)  # skip conversations with no messages
-        .order_by("-latest_msg_date")[:10]
+        conversations.summaries_qs(user)
+        # last_message_at starts out as the creation time: later means a message was posted
+        .filter(last_message_at__gt=F("created_at"))
+        .order_by(*conversations.ORDERING)[:10]
     )
 
-    # Enrich each conversation with other_user, latest message, and unread flag
-    recent_conversations = []
-    for conv in recent_conversations_qs:
-        other_user = conv.seller if conv.buyer == user else conv.buyer
-
-        latest_msg = conv.messages.order_by("-created_at").first()
-
-        has_unread = (
-            conv.messages
-            .filter(is_read=False)
-            .exclude(sender=user)
-            .exists()
-        )
-
-        recent_conversations.append({
+    recent_conversations = [
+        {
             "conversation": conv,
-            "other_user": other_user,
-            "latest_msg": latest_msg,
-            "has_unread": has_unread,
-        })
+            "other_user": conv.seller if conv.buyer_id == uid else conv.buyer,
+            "latest_msg": {"body": conv.last_body, "created_at": conv.last_time},
+            "has_unread": conv.unread_count > 0,
+        }
+        for conv in recent_conversations_qs
+    ]
 
     # -------------------------
-    # Favorites
-    # Favorite → Listing → (Item/Request)
+    # Favorites (cards carry title/price/photo/seller already joined)
     # -------------------------
-    fav_qs = (
-        Favorite.objects.filter(user=user, listing__is_deleted=False, listing__is_active=True)
-        .select_related("listing", "listing__user__store")
-        .prefetch_related("listing__item__photos")
-        .order_by("-created_at")
+    recent_favorites = (
+        counters.favorites_qs(uid)
+        .filter(listing__card__isnull=False)
+        .select_related("listing__card")
+        .order_by("-created_at")[:5]
     )
 
-    favorite_count = fav_qs.count()
-    recent_favorites = fav_qs[:5]
-
     return {
-        "unread_notifications": unread_notifications,
-        "unread_messages": unread_messages,
+        "unread_notifications": counts[counters.UNREAD_NOTIFICATIONS],
+        "unread_messages": counts[counters.UNREAD_MESSAGES],
         "recent_notifications": recent_notifications,
         "recent_conversations": recent_conversations,  # ✅ renamed from recent_messages
-        "favorite_count": favorite_count,
+        "favorite_count": counts[counters.FAVORITE_COUNT],
         "recent_favorites": recent_favorites,
     }
 
 
-CACHE_VER = "v4"
-CACHE_TTL_SECONDS = 60 * 60  # 1 hour
-
-
-def _pick_url(cat: Category) -> str:
-    fn = getattr(cat, "get_absolute_url", None)
-    if callable(fn):
-        try:
-            return fn()
-        except Exception:
-            pass
-    return f"/category/{cat.id}/"
-
-
 def navbar_categories(request):
-    lang = (translation.get_language() or "en").lower()
-    key = f"navbar_cats:{CACHE_VER}:{'ar' if lang.startswith('ar') else 'en'}"
-
-    cached = cache.get(key)
-    if cached is not None:
-        return {"navbar_categories": cached}
-
-    # Load ALL categories. Sort each sibling group so that categories with
-    # header_order set come first (in their assigned order), followed by the
-    # rest ordered by id. The header then takes the first 6 (level-1) or
-    # first 3 (level-2/3) from each sorted group.
-    all_cats = list(
-        Category.objects
-        .only("id", "name", "parent_id", "header_order", "header_icon", "header_question", "header_action")
-        .order_by("id")
-    )
-
-    by_parent = defaultdict(list)
-    for cat in all_cats:
-        by_parent[cat.parent_id].append(cat)
-
-    # Sort key: pinned (header_order set) → by header_order ASC;
-    #           unpinned (header_order None) → by id ASC, after all pinned.
-    def _sort_key(c):
-        if c.header_order is not None:
-            return (0, c.header_order)
-        return (1, c.id)
-
-    for group in by_parent.values():
-        group.sort(key=_sort_key)
-
-    tree = []
-    for top in by_parent[None][:6]:          # level-1: up to 6
-        children = []
-        for ch in by_parent.get(top.id, [])[:3]:    # level-2: up to 3
-            grandchildren = [
-                {
-                    "id": gc.id,
-                    "name": gc.name,
-                    "url": _pick_url(gc),
-                }
-                for gc in by_parent.get(ch.id, [])[:3]  # level-3: up to 3
-            ]
-            children.append({
-                "id": ch.id,
-                "name": ch.name,
-                "url": _pick_url(ch),
-                "children": grandchildren,
-            })
-
-        tree.append({
-            "id": top.id,
-            "name": top.name,
-            "url": _pick_url(top),
-            "children": children,
-            "header_icon": top.header_icon or "megaphone",
-            "header_question": top.header_question or "هل تريد نشر إعلان؟",
-            "header_action": top.header_action or "انشر إعلانك الآن مجاناً",
-        })
-
-    cache.set(key, tree, CACHE_TTL_SECONDS)
-
-    return {"navbar_categories": tree}
\ No newline at end of file
+    return {"navbar_categories": taxonomy_cache.nav_tree()}
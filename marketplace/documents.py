@@ -1,11 +1,15 @@
 # marketplace/documents.py
 import os
 
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef, Prefetch
 from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
-from elasticsearch_dsl import analyzer, token_filter
+from elasticsearch_dsl import analyzer, char_filter, token_filter
 
-from .models import Listing, Item, Request, Category, City
+from .models import Listing, Item, Request, Category, City, CategoryClosure, ItemPhoto
+from .services import listing_cards
+from .utils import arabic
 
 
 # ============================================================
@@ -22,9 +26,21 @@ if IS_RENDER:
 
 else:
     # ============================================================
-    # Custom analyzers
+    # Custom analyzers (mirror utils/arabic.py)
     # ============================================================
 
+    arabic_fold = char_filter(
+        "arabic_fold",
+        type="mapping",
+        mappings=arabic.ES_CHAR_MAPPINGS,
+    )
+
+    arabic_stop = token_filter(
+        "arabic_stop",
+        type="stop",
+        stopwords=sorted(arabic.STOP_WORDS),
+    )
+
     edge_ngram_filter = token_filter(
         "edge_ngram_filter",
         type="edge_ngram",
@@ -32,10 +48,20 @@ else:
         max_gram=20,
     )
 
+    # folded, not stemmed: prefixes of what was typed
     edge_ngram_analyzer = analyzer(
         "edge_ngram_analyzer",
+        char_filter=[arabic_fold],
+        tokenizer="standard",
+        filter=["lowercase", "decimal_digit", "arabic_normalization", edge_ngram_filter],
+    )
+
+    # utils.arabic.analyze(): folded, stop words dropped, light-stemmed
+    arabic_text_analyzer = analyzer(
+        "arabic_text",
+        char_filter=[arabic_fold],
         tokenizer="standard",
-        filter=["lowercase", edge_ngram_filter],
+        filter=["lowercase", "decimal_digit", "arabic_normalization", arabic_stop, "arabic_stem"],
     )
 
     # ============================================================
@@ -46,7 +72,7 @@ else:
     class ListingDocument(Document):
 
         title = fields.TextField(
-            analyzer=edge_ngram_analyzer,
+            analyzer=arabic_text_analyzer,
             fields={
                 "keyword": fields.KeywordField(),
                 "edge_ngram": fields.TextField(analyzer=edge_ngram_analyzer),
@@ -73,40 +99,53 @@ else:
             multi=True
         )
 
+        # typed values for the attribute filters (services/attribute_filters.py);
+        # nested so a condition matches one attribute's own value
+        attribute_values = fields.NestedField(properties={
+            "attribute_id": fields.IntegerField(),
+            "option_ids": fields.IntegerField(multi=True),
+            "number": fields.DoubleField(),
+            "text": fields.KeywordField(),
+        })
+
+        description = fields.TextField(analyzer=arabic_text_analyzer)
+
         price = fields.FloatField()
-        condition = fields.TextField()
+        condition = fields.KeywordField()
         budget = fields.FloatField()
-        condition_preference = fields.TextField()
+        condition_preference = fields.KeywordField()
+
+        # Filtering, sorting and card rendering straight from hits
+        # (services/listing_search.py); same values as the ListingCard row.
+        listing_id = fields.IntegerField()
+        object_id = fields.IntegerField()  # Item.id / Request.id, what detail URLs use
+        city_id = fields.IntegerField()
+        category_id = fields.IntegerField()
+        category_path_ids = fields.IntegerField(multi=True)  # root-first, includes category_id
+        seller_type = fields.KeywordField()
+        main_photo_url = fields.KeywordField(index=False)
 
         class Index:
+            # an alias over listings_vN once `manage.py reindex_listings` has run
+            # (services/search_reindex.py); reads and the worker's writes go through it
             name = "listings"
+            # the analysis section is generated from the analyzers above
             settings = {
                 "number_of_shards": 1,
                 "number_of_replicas": 0,
-                "analysis": {
-                    "filter": {
-                        "edge_ngram_filter": {
-                            "type": "edge_ngram",
-                            "min_gram": 2,
-                            "max_gram": 20,
-                        }
-                    },
-                    "analyzer": {
-                        "edge_ngram_analyzer": {
-                            "tokenizer": "standard",
-                            "filter": ["lowercase", "edge_ngram_filter"],
-                        }
-                    },
-                },
             }
 
         class Django:
             model = Listing
             queryset_pagination = 2000
             fields = [
-                "description",
                 "type",
                 "created_at",
+                "published_at",
+                "featured_until",
+                "is_approved",
+                "is_active",
+                "is_deleted",
             ]
 
         def get_queryset(self):
@@ -119,13 +158,49 @@ else:
                     "city",
                     "item",
                     "request",
+                    "user",
+                    "user__store",
                 )
                 .prefetch_related(
-                    "item__attribute_values",
-                    "request__attribute_values",
+                    "item__attribute_values__attribute",
+                    "request__attribute_values__attribute",
+                    Prefetch("item__photos", queryset=ItemPhoto.objects.order_by("id")),
                 )
+                .annotate(category_path=ArraySubquery(
+                    CategoryClosure.objects
+                    .filter(descendant_id=OuterRef("category_id"))
+                    .order_by("-depth")
+                    .values("ancestor_id")
+                ))
             )
 
+        def _child(self, instance):
+            return getattr(instance, "item" if instance.type == "item" else "request", None)
+
+        def prepare_listing_id(self, instance):
+            return instance.pk
+
+        def prepare_object_id(self, instance):
+            child = self._child(instance)
+            return child.pk if child else None
+
+        def prepare_city_id(self, instance):
+            return instance.city_id
+
+        def prepare_category_id(self, instance):
+            return instance.category_id
+
+        def prepare_category_path_ids(self, instance):
+            return list(getattr(instance, "category_path", None) or [])
+
+        def prepare_seller_type(self, instance):
+            return listing_cards.seller_type(instance.user)
+
+        def prepare_main_photo_url(self, instance):
+            if instance.type != "item" or not getattr(instance, "item", None):
+                return ""
+            return listing_cards.main_photo(instance.item)[0]
+
         def prepare_category(self, instance):
             if not instance.category:
                 return None
@@ -144,22 +219,37 @@ else:
         def prepare_attributes(self, instance):
             attrs = []
 
+            # value_text: option labels instead of the ids the forms store
             if hasattr(instance, "item") and instance.item:
                 for av in instance.item.attribute_values.all():
                     attrs.append({
                         "name": av.attribute.name,
-                        "value": av.value,
+                        "value": av.value_text or av.value,
                     })
 
             if hasattr(instance, "request") and instance.request:
                 for av in instance.request.attribute_values.all():
                     attrs.append({
                         "name": av.attribute.name,
-                        "value": av.value or "",
+                        "value": av.value_text or av.value or "",
                     })
 
             return attrs
 
+        def prepare_attribute_values(self, instance):
+            child = self._child(instance)
+            if child is None:
+                return []
+            return [
+                {
+                    "attribute_id": av.attribute_id,
+                    "option_ids": list(av.option_ids),
+                    "number": av.value_number,
+                    "text": av.value_text,
+                }
+                for av in child.attribute_values.all()
+            ]
+
         def prepare_price(self, instance):
             if hasattr(instance, "item") and instance.item:
                 return float(instance.item.price)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.models import ItemPhoto, ReportPhoto
+from marketplace.services import photo_duplicates
+
+
+class Command(BaseCommand):
+    help = "Compute the perceptual hash (duplicate detection) for item and report photos that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        for model in (ItemPhoto, ReportPhoto):
+            hashed, failed = photo_duplicates.backfill_hashes(model, options["batch_size"])
+            self.stdout.write(f"  → {model.__name__}: hashed {hashed}, failed {failed}.")
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
@@ -0,0 +1,94 @@
+import json
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.utils import arabic
+
+# listing-title-ish vocabulary, with the spelling variants people actually type
+VOCABULARY = [
+    "سيّارة", "سيارات", "تويوتا", "كورولا", "للبيع", "بحالةٍ", "ممتازة", "إضاءة", "أثاث", "مكتب",
+    "آيفون", "برو", "ماكس", "ثلاجة", "سامسونج", "مستعمل", "جديد", "الأردن", "عمّان", "إربد",
+    "الزرقاء", "غرفة", "نوم", "كنبايات", "مكيّف", "شاشة", "بوصة", "لابتوب", "ألعاب", "دراجة",
+    "على", "في", "من", "إلى", "مع", "الى", "مؤسسة", "رئيسية", "ـــ", "٢٠٢٣", "iPhone", "Galaxy",
+]
+
+_LEGACY_DIACRITICS_RE = re.compile(r"[ً-ٰٟ]")
+_LEGACY_NON_WORD_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_LEGACY_FOLDS = [("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"), ("ة", "ه"), ("ى", "ي"), ("ؤ", "و"), ("ئ", "ي"), ("ـ", "")]
+
+
+def _legacy_normalize(text):
+    """The regex + str.replace chain utils.arabic.normalize replaced."""
+    text = text.strip().lower()
+    text = _LEGACY_DIACRITICS_RE.sub("", text)
+    for src, dst in _LEGACY_FOLDS:
+        text = text.replace(src, dst)
+    text = _LEGACY_NON_WORD_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+IMPLEMENTATIONS = {
+    "legacy": _legacy_normalize,
+    "normalize": arabic.normalize,
+    "analyze": arabic.analyze,
+}
+
+
+def _corpus(count, seed):
+    rnd = random.Random(seed)
+    punctuation = ["", "", "", "،", "!", "؟", " -", "..."]
+    return [
+        " ".join(rnd.choice(VOCABULARY) + rnd.choice(punctuation) for _ in range(rnd.randint(3, 40)))
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Time utils.arabic normalize/analyze against the legacy regex chain."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--texts", type=int, default=20000, help="Synthetic texts to generate.")
+        parser.add_argument("--file", help="Use the lines of this UTF-8 file instead.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            with open(options["file"], encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()]
+        else:
+            texts = _corpus(options["texts"], options["seed"])
+        chars = sum(len(t) for t in texts)
+
+        # the legacy chain never folded Arabic-Indic digits
+        mismatches = sum(_legacy_normalize(t).translate(arabic.DIGITS_TABLE) != arabic.normalize(t) for t in texts)
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f"normalize differs from legacy on {mismatches} text(s)"))
+
+        results = []
+        self.stdout.write(f"{len(texts)} texts, {chars} chars")
+        self.stdout.write(f"{'impl':<10} {'µs/text':>10} {'MB/s':>8}")
+        for name, fn in IMPLEMENTATIONS.items():
+            best = None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                for text in texts:
+                    fn(text)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            row = {
+                "impl": name,
+                "us_per_text": best / len(texts) * 1e6,
+                "mb_per_s": chars * 2 / best / 1e6,  # Arabic is 2 bytes/char in UTF-8
+            }
+            results.append(row)
+            self.stdout.write(f"{name:<10} {row['us_per_text']:>10.2f} {row['mb_per_s']:>8.1f}")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['json_path']}."))
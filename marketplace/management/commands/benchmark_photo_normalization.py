@@ -0,0 +1,120 @@
+import json
+import multiprocessing
+import resource
+import time
+from io import BytesIO
+
+import PIL.Image as PILImage
+from PIL import ImageFilter, ImageOps
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.utils import images
+
+DEFAULT_SIZES = ["1600x1200", "4032x3024", "8000x6000", "12000x9000"]
+
+
+def _legacy_render(data):
+    """The pre-streaming path: full native-resolution decode, then resize."""
+    im = PILImage.open(BytesIO(data))
+    im = ImageOps.exif_transpose(im)
+    im = im.convert("RGB")
+    bg = ImageOps.fit(im, (images.NORMAL_W, images.NORMAL_H), method=images.LANCZOS)
+    bg = bg.filter(ImageFilter.GaussianBlur(28))
+    fg = ImageOps.contain(im, (images.NORMAL_W, images.NORMAL_H), method=images.LANCZOS)
+    bg.paste(fg, ((images.NORMAL_W - fg.width) // 2, (images.NORMAL_H - fg.height) // 2))
+    buf = BytesIO()
+    bg.save(buf, format="JPEG", quality=85, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+IMPLEMENTATIONS = {
+    "legacy": _legacy_render,
+    "streaming": images.render_normalized,
+}
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _measure(impl, data, repeat):
+    # runs in a forked child so every measurement starts from the same baseline
+    baseline = _max_rss_mb()
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            IMPLEMENTATIONS[impl](data)
+        elapsed = (time.perf_counter() - started) / repeat
+    except Exception as exc:
+        return {"error": f"{type(exc).__name__}: {exc}"}
+    return {"ms": elapsed * 1000, "peak_rss_mb": _max_rss_mb(), "delta_rss_mb": _max_rss_mb() - baseline}
+
+
+def _synthetic_jpeg(width, height):
+    # smooth gradients + a little noise: compresses like a photo, not like a flat fill
+    gradient = PILImage.linear_gradient("L").resize((width, height))
+    noise = PILImage.effect_noise((max(width // 8, 1), max(height // 8, 1)), 40).resize((width, height))
+    im = PILImage.merge("RGB", (gradient, noise, gradient.transpose(PILImage.Transpose.FLIP_LEFT_RIGHT)))
+    buf = BytesIO()
+    im.save(buf, format="JPEG", quality=88)
+    return buf.getvalue()
+
+
+def _in_child(ctx, fn, *args):
+    """Run fn in a forked child and return its result, so its memory never counts against us."""
+    parent, child = ctx.Pipe(duplex=False)
+
+    def target():
+        child.send(fn(*args))
+        child.close()
+
+    proc = ctx.Process(target=target)
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+class Command(BaseCommand):
+    help = "Time and peak RSS per image for the legacy vs. streaming photo normalization path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", action="append", dest="sizes",
+                            help=f"Synthetic JPEG WIDTHxHEIGHT (repeatable). Default: {' '.join(DEFAULT_SIZES)}")
+        parser.add_argument("--file", action="append", dest="files", default=[],
+                            help="Real image file to include (repeatable).")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        ctx = multiprocessing.get_context("fork")
+        cases = []
+        for spec in options["sizes"] or ([] if options["files"] else DEFAULT_SIZES):
+            try:
+                width, height = (int(v) for v in spec.lower().split("x"))
+            except ValueError:
+                raise CommandError(f"Bad --size {spec!r}; expected WIDTHxHEIGHT.")
+            cases.append((f"synthetic {width}x{height}", _in_child(ctx, _synthetic_jpeg, width, height)))
+        for path in options["files"]:
+            with open(path, "rb") as f:
+                cases.append((path, f.read()))
+
+        results = []
+        self.stdout.write(f"{'image':<28} {'impl':<10} {'ms/image':>10} {'peak RSS MB':>12} {'+RSS MB':>9}")
+        for label, data in cases:
+            for impl in IMPLEMENTATIONS:
+                row = _in_child(ctx, _measure, impl, data, options["repeat"])
+                row.update({"image": label, "impl": impl, "bytes": len(data)})
+                results.append(row)
+                if "error" in row:
+                    self.stdout.write(f"{label:<28} {impl:<10} {row['error']}")
+                else:
+                    self.stdout.write(
+                        f"{label:<28} {impl:<10} {row['ms']:>10.0f} {row['peak_rss_mb']:>12.0f} {row['delta_rss_mb']:>9.0f}"
+                    )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['json_path']}."))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from marketplace.services import image_resize
+
+
+class Command(BaseCommand):
+    help = (
+        "Trim the resized image cache to RESIZED_IMAGE_CACHE_MAX_BYTES, least recently used first. "
+        "Run it from a timer; renders only scan the cache after writing EVICT_CHECK_FRACTION of the limit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-bytes", type=int, default=settings.RESIZED_IMAGE_CACHE_MAX_BYTES)
+
+    def handle(self, *args, **options):
+        removed = image_resize.evict(options["max_bytes"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. Removed {removed} cached rendition(s)."))
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from marketplace.services import moderation_queue
+
+
+class Command(BaseCommand):
+    help = "Drain the AI moderation job queue in batches. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.MODERATION_BATCH_SIZE)
+        parser.add_argument("--idle-sleep", type=float, default=2.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Process everything that is due now, then exit.")
+        parser.add_argument("--stats", action="store_true",
+                            help="Print queue depth and API latency, then exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self._print_stats()
+            return
+
+        total = 0
+        try:
+            while True:
+                handled = moderation_queue.process_batch(options["batch_size"])
+                total += handled
+                if handled:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["idle_sleep"])
+                # drop connections the DB side closed while we were idle
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. Handled {total} moderation job(s)."))
+
+    def _print_stats(self):
+        data = moderation_queue.stats()
+        for status, n in data["by_status"].items():
+            self.stdout.write(f"  {status:<10} {n}")
+        if data["avg_latency_ms"] is not None:
+            self.stdout.write(
+                f"  latency    avg {data['avg_latency_ms']:.0f}ms, max {data['max_latency_ms']}ms, "
+                f"avg batch {data['avg_batch_size']:.1f}"
+            )
@@ -0,0 +1,51 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from marketplace.services import photo_normalization
+
+
+class Command(BaseCommand):
+    help = "Normalize queued item photos in a process pool. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                            help="Render processes (0 = render in this process).")
+        parser.add_argument("--batch-size", type=int, default=photo_normalization.BATCH_SIZE)
+        parser.add_argument("--idle-sleep", type=float, default=2.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Process everything that is due now, then exit.")
+        parser.add_argument("--backfill", action="store_true",
+                            help="First re-queue every photo whose normalized file is missing.")
+
+    def handle(self, *args, **options):
+        if options["backfill"]:
+            queued = photo_normalization.requeue_missing()
+            self.stdout.write(f"  → Queued {queued} photo(s) without a normalized image.")
+
+        pool = ProcessPoolExecutor(max_workers=options["workers"]) if options["workers"] > 0 else None
+        total = 0
+        started = time.monotonic()
+        try:
+            while True:
+                handled = photo_normalization.process_batch(pool, options["batch_size"])
+                total += handled
+                if handled:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["idle_sleep"])
+                # drop connections the DB side closed while we were idle
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. Handled {total} photo(s) in {elapsed:.1f}s."))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.services.listing_cards import rebuild_listing_cards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ListingCard read model from scratch. Run once after migrating, then as needed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_listing_cards(batch_size=options["batch_size"])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. Wrote {written} listing card(s) in {elapsed:.1f}s."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from marketplace.services import similar_listings
+
+
+class Command(BaseCommand):
+    help = "Recompute SimilarListing rows for new or changed listing cards (all of them with --full)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Recompute every card, not just stale ones (after tuning the weights).")
+        parser.add_argument("--every", type=float, default=0,
+                            help="Keep running, refreshing every N seconds.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                started = time.monotonic()
+                written = similar_listings.refresh(full=options["full"])
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"  → Recomputed {written} card(s) in {elapsed:.1f}s.")
+                if not options["every"]:
+                    break
+                options["full"] = False
+                time.sleep(options["every"])
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.services import search_index, search_reindex
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a new listings_vN index in parallel, catch up on changes made meanwhile "
+        "and swap the listings alias to it without downtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Loader processes.")
+        parser.add_argument("--keep", type=int, default=1,
+                            help="Previous index versions to keep for rollback.")
+
+    def handle(self, *args, **options):
+        if not search_index.search_enabled():
+            raise CommandError("Elasticsearch is disabled in this environment (RENDER=true).")
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        stats = search_reindex.reindex(
+            workers=options["workers"], keep=options["keep"], log=self.stdout.write,
+        )
+
+        self.stdout.write(
+            f"  → {stats['indexed']} docs in {stats['load_seconds']}s "
+            f"({stats['docs_per_second']} docs/s, {stats['workers']} workers), "
+            f"{stats['failed']} failed, {stats['replayed']} replayed from the change log"
+        )
+        if stats["previous"]:
+            self.stdout.write(f"  → alias moved from {', '.join(stats['previous'])}")
+        if stats["dropped"]:
+            self.stdout.write(f"  → deleted {', '.join(stats['dropped'])}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. listings now points at {stats['index']}."))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from marketplace.services import saved_searches
+
+DIGEST_CHECK_EVERY = 5 * 60  # seconds between looks for due daily digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Match newly visible listings against saved searches in batches and send the alerts. "
+        "Runs until stopped unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=saved_searches.BATCH_SIZE)
+        parser.add_argument("--idle-sleep", type=float, default=2.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Match everything queued and send due digests, then exit.")
+
+    def handle(self, *args, **options):
+        matched = digests = 0
+        last_digest_check = 0.0
+        try:
+            while True:
+                handled = saved_searches.process_batch(options["batch_size"])
+                matched += handled
+                if handled:
+                    continue
+                if time.monotonic() - last_digest_check > DIGEST_CHECK_EVERY or options["once"]:
+                    digests += saved_searches.send_digests()
+                    last_digest_check = time.monotonic()
+                if options["once"]:
+                    break
+                time.sleep(options["idle_sleep"])
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Done. Matched {matched} listing(s), sent {digests} daily digest(s)."
+        ))
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from marketplace.models import Listing
+from marketplace.services import search_index
+
+PRUNE_EVERY = 60 * 60  # seconds between change log prunes
+
+
+class Command(BaseCommand):
+    help = "Drain the search index queue into Elasticsearch in bulk batches. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=search_index.BATCH_SIZE)
+        parser.add_argument("--idle-sleep", type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Index everything that is due now, then exit.")
+        parser.add_argument("--all", action="store_true",
+                            help="First queue every listing (backfill / mapping change).")
+        parser.add_argument("--stats", action="store_true",
+                            help="Print queue depth and indexing lag, then exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self._print_stats()
+            return
+        if not search_index.indexing_enabled():
+            # nothing is queued without ES; clear out what an earlier ES setup left behind
+            pruned = search_index.prune_changes()
+            self.stdout.write(
+                f"Search indexing is off here (SEARCH_BACKEND / RENDER); pruned {pruned} change log row(s)."
+            )
+            if not options["once"]:
+                # stay up: exiting would have the Procfile process manager restart us in a loop
+                try:
+                    while True:
+                        time.sleep(PRUNE_EVERY)
+                except KeyboardInterrupt:
+                    pass
+            return
+
+        if options["all"]:
+            queued = search_index.mark_queryset_dirty(Listing.objects.all())
+            self.stdout.write(f"  → Queued {queued} listing(s).")
+
+        total = 0
+        last_prune = 0.0
+        try:
+            while True:
+                handled = search_index.flush(options["batch_size"])
+                total += handled
+                if handled:
+                    continue
+                if time.monotonic() - last_prune > PRUNE_EVERY:
+                    search_index.prune_changes()
+                    last_prune = time.monotonic()
+                if options["once"]:
+                    break
+                time.sleep(options["idle_sleep"])
+                # drop connections the DB side closed while we were idle
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Done. Indexed {total} listing(s)."))
+
+    def _print_stats(self):
+        data = search_index.stats()
+        self.stdout.write(f"  queued     {data['queued']} ({data['due']} due, {data['retrying']} retrying)")
+        self.stdout.write(f"  lag        {data['lag_s']:.1f}s")
+        last = data["last_flush"]
+        if last:
+            self.stdout.write(
+                f"  last flush {last['at']}: {last['batch']} doc(s) in {last['bulk_ms']}ms, "
+                f"{last['failed']} failed, max lag {last['max_lag_s']}s"
+            )
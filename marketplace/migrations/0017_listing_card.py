@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0016_category_header_icon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingCard',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='marketplace.listing')),
+                ('type', models.CharField(choices=[('item', 'Item'), ('request', 'Request')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('price', models.FloatField(blank=True, null=True)),
+                ('budget', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('condition', models.CharField(blank=True, max_length=20)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('category_path', models.CharField(blank=True, max_length=500)),
+                ('root_category_id', models.IntegerField(blank=True, null=True)),
+                ('city_name', models.CharField(blank=True, max_length=100)),
+                ('seller_type', models.CharField(choices=[('store', 'Store'), ('individual', 'Individual')], default='individual', max_length=20)),
+                ('seller_name', models.CharField(blank=True, max_length=255)),
+                ('seller_avatar_url', models.CharField(blank=True, max_length=500)),
+                ('seller_initial', models.CharField(blank=True, max_length=1)),
+                ('main_photo_url', models.CharField(blank=True, max_length=500)),
+                ('featured_until', models.DateTimeField(blank=True, null=True)),
+                ('favorite_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('published_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.category')),
+                ('city', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.city')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['type', '-created_at', '-listing'], name='card_type_created_idx'), models.Index(fields=['type', '-published_at'], name='card_type_published_idx'), models.Index(fields=['type', 'price'], name='card_type_price_idx'), models.Index(fields=['type', 'category'], name='card_type_category_idx'), models.Index(fields=['type', 'city'], name='card_type_city_idx'), models.Index(fields=['user', '-published_at'], name='card_user_published_idx'), models.Index(fields=['featured_until'], name='card_featured_idx')],
+            },
+        ),
+    ]
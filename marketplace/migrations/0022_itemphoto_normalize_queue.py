@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_done(apps, schema_editor):
+    """Photos normalized by the old inline path are done; the rest stay queued."""
+    ItemPhoto = apps.get_model("marketplace", "ItemPhoto")
+    ItemPhoto.objects.exclude(normalized="").exclude(normalized__isnull=True).update(normalize_status="done")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0021_moderation_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemphoto',
+            name='normalize_after',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='itemphoto',
+            name='normalize_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='itemphoto',
+            name='normalize_locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='itemphoto',
+            name='normalize_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='itemphoto',
+            index=models.Index(fields=['normalize_status', 'normalize_after'], name='itemphoto_normalize_due_idx'),
+        ),
+        migrations.RunPython(mark_existing_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0022_itemphoto_normalize_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemphoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='listingcard',
+            name='main_photo_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:03
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0023_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemphoto',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportphoto',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='itemphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(models.F('phash'), '&', models.Value(65535)), name='itemphoto_phash_b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('phash'), '>>', models.Value(16)), '&', models.Value(65535)), name='itemphoto_phash_b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('phash'), '>>', models.Value(32)), '&', models.Value(65535)), name='itemphoto_phash_b2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('phash'), '>>', models.Value(48)), '&', models.Value(65535)), name='itemphoto_phash_b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(models.F('phash'), '&', models.Value(65535)), name='reportphoto_phash_b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('phash'), '>>', models.Value(16)), '&', models.Value(65535)), name='reportphoto_phash_b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('phash'), '>>', models.Value(32)), '&', models.Value(65535)), name='reportphoto_phash_b2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportphoto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('phash'), '>>', models.Value(48)), '&', models.Value(65535)), name='reportphoto_phash_b3_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0024_photo_phash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexQueue',
+            fields=[
+                ('listing_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('first_dirtied_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_dirtied_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['run_after', 'first_dirtied_at'], name='search_queue_due_idx')],
+            },
+        ),
+    ]
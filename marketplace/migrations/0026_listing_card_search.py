@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0025_search_index_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingcard',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='listingcard',
+            name='search_title',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='listingcard',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('search_title', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('search_text', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='listingcard',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='card_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingcard',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_title'], name='card_search_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
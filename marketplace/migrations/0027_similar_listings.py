@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0026_listing_card_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='listingcard',
+            name='similar_computed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listingcard',
+            index=models.Index(condition=models.Q(('similar_computed_at__isnull', True)), fields=['type'], name='card_similar_stale_idx'),
+        ),
+        migrations.AddField(
+            model_name='similarlisting',
+            name='listing',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='marketplace.listingcard'),
+        ),
+        migrations.AddField(
+            model_name='similarlisting',
+            name='similar',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_of', to='marketplace.listingcard'),
+        ),
+        migrations.AddIndex(
+            model_name='similarlisting',
+            index=models.Index(fields=['listing', 'rank'], name='similar_listing_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='similarlisting',
+            constraint=models.UniqueConstraint(fields=('listing', 'similar'), name='uniq_similar_listing_pair'),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:59
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+from marketplace.utils.arabic import analyzed
+from marketplace.utils.attribute_values import typed
+
+
+def backfill_typed_values(apps, schema_editor):
+    Attribute = apps.get_model("marketplace", "Attribute")
+    AttributeOption = apps.get_model("marketplace", "AttributeOption")
+
+    attributes = {a.id: a for a in Attribute.objects.all()}
+    options = {}
+    for option_id, attribute_id, label in AttributeOption.objects.values_list("id", "attribute_id", "value"):
+        options.setdefault(attribute_id, {})[option_id] = label
+
+    for model_name in ("ItemAttributeValue", "RequestAttributeValue"):
+        model = apps.get_model("marketplace", model_name)
+        batch = []
+        for row in model.objects.only("id", "attribute_id", "value").iterator(chunk_size=2000):
+            attribute = attributes[row.attribute_id]
+            values = typed(attribute.input_type, attribute.ui_type, row.value, options.get(attribute.id, {}))
+            row.value_number = values["value_number"]
+            row.option_id = values["option_id"]
+            row.option_ids = values["option_ids"]
+            row.value_text = values["value_text"][:255]
+            batch.append(row)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ["value_number", "option", "option_ids", "value_text"])
+                batch = []
+        model.objects.bulk_update(batch, ["value_number", "option", "option_ids", "value_text"])
+
+    refresh_card_search_text(apps)
+
+
+def refresh_card_search_text(apps, batch_size=500):
+    """
+    ListingCard.search_text now carries option labels instead of ids
+    (services.listing_cards.build_card); redo it, the same way, for the cards
+    of listings with select values.
+    """
+    Listing = apps.get_model("marketplace", "Listing")
+    ListingCard = apps.get_model("marketplace", "ListingCard")
+    value_models = [
+        (apps.get_model("marketplace", "ItemAttributeValue"), "item__listing_id"),
+        (apps.get_model("marketplace", "RequestAttributeValue"), "request__listing_id"),
+    ]
+    listing_ids = set()
+    for model, listing_path in value_models:
+        listing_ids.update(
+            model.objects.filter(attribute__input_type="select").values_list(listing_path, flat=True)
+        )
+
+    listing_ids = sorted(listing_ids)
+    for start in range(0, len(listing_ids), batch_size):
+        ids = listing_ids[start:start + batch_size]
+        cards = list(ListingCard.objects.filter(listing_id__in=ids))
+        if not cards:
+            continue
+        descriptions = dict(Listing.objects.filter(id__in=ids).values_list("id", "description"))
+        values = {}
+        for model, listing_path in value_models:
+            rows = model.objects.filter(**{f"{listing_path}__in": ids}).exclude(value="").exclude(value=None)
+            for listing_id, value_text, value in rows.order_by("id").values_list(listing_path, "value_text", "value"):
+                values.setdefault(listing_id, []).append(value_text or value)
+        for card in cards:
+            card.search_text = analyzed(" ".join([
+                card.category_path, card.city_name, *values.get(card.listing_id, []),
+                descriptions.get(card.listing_id) or "",
+            ]))
+        ListingCard.objects.bulk_update(cards, ["search_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0029_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemattributevalue',
+            name='option',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.attributeoption'),
+        ),
+        migrations.AddField(
+            model_name='itemattributevalue',
+            name='option_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='itemattributevalue',
+            name='value_number',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='itemattributevalue',
+            name='value_text',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='requestattributevalue',
+            name='option',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.attributeoption'),
+        ),
+        migrations.AddField(
+            model_name='requestattributevalue',
+            name='option_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='requestattributevalue',
+            name='value_number',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='requestattributevalue',
+            name='value_text',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='itemattributevalue',
+            index=models.Index(fields=['attribute', 'value_number'], name='itemattributevalue_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemattributevalue',
+            index=models.Index(fields=['attribute', 'value_text'], name='itemattributevalue_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemattributevalue',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['option_ids'], name='itemattributevalue_opts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestattributevalue',
+            index=models.Index(fields=['attribute', 'value_number'], name='requestattributevalue_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestattributevalue',
+            index=models.Index(fields=['attribute', 'value_text'], name='requestattributevalue_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestattributevalue',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['option_ids'], name='requestattributevalue_opts_idx'),
+        ),
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:13
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_message_at(apps, schema_editor):
+    Conversation = apps.get_model("marketplace", "Conversation")
+    Message = apps.get_model("marketplace", "Message")
+    newest = (
+        Message.objects.filter(conversation_id=OuterRef("pk"))
+        .order_by().values("conversation_id").annotate(at=Max("created_at")).values("at")
+    )
+    Conversation.objects.update(last_message_at=Coalesce(Subquery(newest), "created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0030_typed_attribute_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_last_message_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['buyer', '-last_message_at', '-id'], name='convo_buyer_last_msg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['seller', '-last_message_at', '-id'], name='convo_seller_last_msg_idx'),
+        ),
+    ]
@@ -1,12 +1,16 @@
 from .city import City
 from .users import User, UserManager, normalize_jo_mobile_to_07
 from .stores import Store, StoreFollow, StoreReview
-from .categories import Category, CategoryPhoto, Attribute, AttributeOption
+from .categories import Category, CategoryClosure, CategoryPhoto, Attribute, AttributeOption
 from .listings import Listing, ListingPromotion, PromotionEvent, PointsTransaction
 from .items import Item, ItemPhoto, ItemAttributeValue
 from .requests import Request, RequestAttributeValue
 from .chat import Conversation, Message
 from .notifications import Notification
 from .favorite import Favorite
+from .listing_cards import ListingCard, SimilarListing
+from .moderation import ModerationJob
+from .search import SearchIndexQueue, SearchIndexChange
+from .saved_searches import SavedSearch, SavedSearchMatch, SavedSearchQueue
 from .misc import Subscriber, IssuesReport, PhoneVerificationCode, PhoneVerification, MobileVerification, ContactMessage, FAQCategory, FAQQuestion, PrivacyPolicyPage, PrivacyPolicySection, TermsPage, TermsSection, SiteSettings
 from .lost_found import Report, ReportPhoto, ReportMatch, LostReport, FoundReport
\ No newline at end of file
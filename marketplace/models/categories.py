@@ -1,5 +1,9 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
+from marketplace.utils import attribute_values
+
 
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -67,6 +71,28 @@ class Category(models.Model):
         ]
 
 
+class CategoryClosure(models.Model):
+    """
+    Transitive closure of the Category tree: one row per (ancestor, descendant)
+    pair, including the (c, c, 0) self row. Maintained by the Category signals;
+    read through services/category_closure.py.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["ancestor", "descendant"], name="unique_category_closure_pair"),
+        ]
+        indexes = [
+            models.Index(fields=["descendant", "depth"], name="category_closure_desc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} → {self.descendant_id} ({self.depth})"
+
+
 class CategoryPhoto(models.Model):
     category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name="photo", null=True, blank=True,)
     image = models.ImageField(upload_to="categories/", blank=True, null=True)
@@ -102,4 +128,48 @@ class AttributeOption(models.Model):
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, related_name="options")
 
     def __str__(self):
-        return self.value
\ No newline at end of file
+        return self.value
+
+
+class TypedAttributeValue(models.Model):
+    """
+    Base of ItemAttributeValue / RequestAttributeValue: the `value` string the
+    forms write plus typed copies of it, kept in step on every save
+    (utils/attribute_values.py), that item_list / request_list filter on.
+    """
+    value_number = models.FloatField(null=True, blank=True)
+    option = models.ForeignKey(AttributeOption, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    option_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+    value_text = models.CharField(max_length=255, blank=True, default="")
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=["attribute", "value_number"], name="%(class)s_num_idx"),
+            models.Index(fields=["attribute", "value_text"], name="%(class)s_text_idx"),
+            GinIndex(fields=["option_ids"], name="%(class)s_opts_idx"),
+        ]
+
+    def refresh_typed(self, options=None):
+        """Recompute the typed columns from `value`; `options` ({id: label}) saves a query."""
+        attribute = self.attribute
+        if options is None:
+            options = dict(attribute.options.values_list("id", "value")) if attribute.input_type == "select" else {}
+        typed = attribute_values.typed(attribute.input_type, attribute.ui_type, self.value, options)
+        self.value_number = typed["value_number"]
+        self.option_id = typed["option_id"]
+        self.option_ids = typed["option_ids"]
+        self.value_text = typed["value_text"][:255]
+
+    def save(self, *args, **kwargs):
+        self.refresh_typed()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "value_number", "option", "option_ids", "value_text"}
+        super().save(*args, **kwargs)
+
+    @property
+    def display_value(self):
+        """What to show for the value: the option label for a single choice, else the stored text."""
+        return self.option.value if self.option_id else self.value
+
@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models import Q
+from django.utils import timezone
 
 from marketplace.models import Listing, User
 
@@ -30,8 +31,15 @@ class Conversation(models.Model):
     buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="buyer_conversations")
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name="seller_conversations")
     created_at = models.DateTimeField(auto_now_add=True)
+    # newest message (creation time until there is one); set by services.chat.post_message
+    last_message_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
+        indexes = [
+            # "my conversations", newest activity first, for either side
+            models.Index(fields=["buyer", "-last_message_at", "-id"], name="convo_buyer_last_msg_idx"),
+            models.Index(fields=["seller", "-last_message_at", "-id"], name="convo_seller_last_msg_idx"),
+        ]
         constraints = [
             # exactly one target
             models.CheckConstraint(
@@ -77,5 +85,13 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # latest-message lookups in the conversation summaries
+            models.Index(fields=["conversation", "-created_at"], name="message_conv_created_idx"),
+            # id-cursor sync (after_id / before_id)
+            models.Index(fields=["conversation", "id"], name="message_conv_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.sender}: {self.body[:20]}"
\ No newline at end of file
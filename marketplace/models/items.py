@@ -1,24 +1,17 @@
 import logging
-from io import BytesIO
 
-import PIL.Image as PILImage
-from PIL import ImageOps, ImageFilter
-from PIL.Image import Image
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
 
 from marketplace.models import Attribute
+from marketplace.models.categories import TypedAttributeValue
+from marketplace.utils.phash import band_indexes
+from marketplace.utils.images import RENDITION_FORMATS, render_photo_set
 
 logger = logging.getLogger(__name__)
 
-# Pillow >= 10 moved LANCZOS into Image.Resampling; keep backwards compat.
-_LANCZOS = getattr(PILImage, "Resampling", PILImage).LANCZOS
-
-# Maximum pixel dimensions accepted before normalization.
-# Images exceeding either limit are rejected to prevent CPU/memory DoS.
-MAX_IMAGE_WIDTH = 20_000
-MAX_IMAGE_HEIGHT = 20_000
-
 
 class Item(models.Model):
     CONDITION_CHOICES = [('new', 'New'), ('used', 'Used')]
@@ -45,82 +38,103 @@ class Item(models.Model):
         return self.listing.title
 
 
-# Single normalized target (16:10)
-NORMAL_W = 1600
-NORMAL_H = 1000
-
-
 class ItemPhoto(models.Model):
+    class NormalizeStatus(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSING = "processing", "Processing"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to='items/')  # original
     normalized = models.ImageField(upload_to='items/normalized/', blank=True, null=True)  # ✅ single normalized
     created_at = models.DateTimeField(auto_now_add=True)
     is_main = models.BooleanField(default=False)
 
+    # Normalization runs off-request (manage.py normalize_photos); these rows are its queue.
+    normalize_status = models.CharField(
+        max_length=12, choices=NormalizeStatus.choices, default=NormalizeStatus.PENDING
+    )
+    normalize_attempts = models.PositiveSmallIntegerField(default=0)
+    normalize_after = models.DateTimeField(default=timezone.now)
+    normalize_locked_at = models.DateTimeField(null=True, blank=True)
+
+    # {"card": {"width": 640, "height": 400, "webp": <storage name>, "jpg": <storage name>}, ...}
+    # written together with `normalized`; see utils.images.RENDITIONS
+    renditions = models.JSONField(default=dict, blank=True)
+
+    # dHash of the original (utils.images.dhash), set with the renditions;
+    # services/photo_duplicates.py finds re-posted photos by Hamming distance
+    phash = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["normalize_status", "normalize_after"], name="itemphoto_normalize_due_idx"),
+            *band_indexes("itemphoto_phash"),
+        ]
+
     def __str__(self):
         return f"Photo for {self.item.listing.title}"
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
-        # generate once (or regenerate if original changed and normalized missing)
-        if self.image and not self.normalized:
-            self.generate_normalized()
+    @property
+    def display_image(self):
+        """Normalized file once the worker has produced it, the original until then."""
+        return self.normalized if self.normalized else self.image
 
     def generate_normalized(self):
         """
-        Create a single normalized image:
-        - exact size NORMAL_W x NORMAL_H
-        - FULL image visible (no crop)
-        - no empty space (filled with blurred background)
+        Synchronously create the normalized image and renditions (see
+        utils.images.render_photo_set). Uploads are normalized by the photo
+        worker; this is for one-off use.
         """
         try:
-            # open from storage
             self.image.open("rb")
-            im = PILImage.open(self.image)
-
-            # Guard against excessively large images (decompression-bomb / DoS)
-            if im.width > MAX_IMAGE_WIDTH or im.height > MAX_IMAGE_HEIGHT:
-                raise ValueError(
-                    f"Image dimensions {im.width}x{im.height} exceed the "
-                    f"allowed maximum of {MAX_IMAGE_WIDTH}x{MAX_IMAGE_HEIGHT}."
-                )
-
-            im = ImageOps.exif_transpose(im)  # fix rotation from phone photos
-            im = im.convert("RGB")
+            data = self.image.read()
+        finally:
+            try:
+                self.image.close()
+            except OSError:
+                pass
 
-            # background: cover then blur (fills full canvas)
-            bg = ImageOps.fit(im, (NORMAL_W, NORMAL_H), method=_LANCZOS)
-            bg = bg.filter(ImageFilter.GaussianBlur(28))
+        try:
+            photo_set = render_photo_set(data)
+        except Exception as e:
+            logger.warning("Normalized image generation failed for photo %s: %s", self.pk, e)
+            return False
 
-            # foreground: contain (no crop)
-            fg = ImageOps.contain(im, (NORMAL_W, NORMAL_H), method=_LANCZOS)
+        self.save_photo_set(photo_set)
+        return True
 
-            # paste centered
-            x = (NORMAL_W - fg.width) // 2
-            y = (NORMAL_H - fg.height) // 2
-            bg.paste(fg, (x, y))
+    def normalized_name(self):
+        base = self.image.name.split("/")[-1]
+        return f"norm_{base.rsplit('.', 1)[0]}.jpg"
 
-            # write to buffer
-            buf = BytesIO()
-            bg.save(buf, format="JPEG", quality=85, optimize=True, progressive=True)
+    def rendition_name(self, name, width, fmt):
+        # deterministic: regenerating overwrites instead of piling up suffixed copies
+        return f"items/renditions/{self.pk}/{name}-{width}.{fmt}"
 
-            base = self.image.name.split("/")[-1]
-            name = f"norm_{base.rsplit('.', 1)[0]}.jpg"
+    def save_photo_set(self, photo_set: dict):
+        """Store the output of utils.images.render_photo_set and mark the photo done."""
+        self.normalized.save(self.normalized_name(), ContentFile(photo_set["normalized"]), save=False)
 
-            self.normalized.save(name, ContentFile(buf.getvalue()), save=False)
-            super().save(update_fields=["normalized"])
+        renditions = {}
+        for name, rendition in photo_set["renditions"].items():
+            entry = {"width": rendition["width"], "height": rendition["height"]}
+            for fmt in RENDITION_FORMATS:
+                path = self.rendition_name(name, rendition["width"], fmt)
+                if default_storage.exists(path):
+                    default_storage.delete(path)
+                entry[fmt] = default_storage.save(path, ContentFile(rendition[fmt]))
+            renditions[name] = entry
 
-        except Exception as e:
-            logger.warning("Normalized image generation failed for photo %s: %s", self.pk, e)
-        finally:
-            try:
-                self.image.close()
-            except OSError:
-                pass
+        self.renditions = renditions
+        self.phash = photo_set.get("dhash")
+        self.normalize_status = self.NormalizeStatus.DONE
+        self.normalize_locked_at = None
+        self.save(update_fields=["normalized", "renditions", "phash", "normalize_status", "normalize_locked_at"])
 
 
-class ItemAttributeValue(models.Model):
+class ItemAttributeValue(TypedAttributeValue):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='attribute_values')
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE)
     value = models.CharField(max_length=255)
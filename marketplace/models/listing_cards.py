@@ -0,0 +1,120 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models
+from django.utils import timezone
+
+from marketplace.models import User, Category, City, Listing
+
+
+class ListingCard(models.Model):
+    """
+    Flat read model behind the listing grids: one row per publicly visible listing
+    (approved, active, not deleted) with everything a card needs already joined in.
+    Written only by services/listing_cards.py (signals + rebuild_listing_cards).
+    """
+    SELLER_STORE = "store"
+    SELLER_INDIVIDUAL = "individual"
+    SELLER_TYPE_CHOICES = [
+        (SELLER_STORE, "Store"),
+        (SELLER_INDIVIDUAL, "Individual"),
+    ]
+
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, primary_key=True, related_name="card")
+    type = models.CharField(max_length=20, choices=Listing.TYPE_CHOICES)
+    # Item.id or Request.id – what the detail URLs are keyed on
+    object_id = models.PositiveIntegerField()
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    title = models.CharField(max_length=255)
+
+    price = models.FloatField(null=True, blank=True)
+    budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    condition = models.CharField(max_length=20, blank=True)
+
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    category_name = models.CharField(max_length=100, blank=True)
+    category_path = models.CharField(max_length=500, blank=True)
+    root_category_id = models.IntegerField(null=True, blank=True)
+
+    city = models.ForeignKey(City, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    city_name = models.CharField(max_length=100, blank=True)
+
+    seller_type = models.CharField(max_length=20, choices=SELLER_TYPE_CHOICES, default=SELLER_INDIVIDUAL)
+    seller_name = models.CharField(max_length=255, blank=True)
+    seller_avatar_url = models.CharField(max_length=500, blank=True)
+    seller_initial = models.CharField(max_length=1, blank=True)
+
+    main_photo_url = models.CharField(max_length=500, blank=True)
+    # ItemPhoto.renditions of the main photo, for srcset (templatetags/photos.py)
+    main_photo_renditions = models.JSONField(default=dict, blank=True)
+
+    featured_until = models.DateTimeField(null=True, blank=True)
+    favorite_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    published_at = models.DateTimeField()
+
+    # DB search (services/listing_search.PostgresBackend): utils.arabic.analyze()
+    # terms of the title, and of category path / city / attribute values / description
+    search_title = models.CharField(max_length=255, blank=True, default="")
+    search_text = models.TextField(blank=True, default="")
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("search_title", weight="A", config="simple")
+            + SearchVector("search_text", weight="B", config="simple")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    # when services/similar_listings last computed this card's SimilarListing
+    # rows; every re-projection writes it back to NULL, which queues the card
+    similar_computed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["type", "-created_at", "-listing"], name="card_type_created_idx"),
+            models.Index(fields=["type", "-published_at"], name="card_type_published_idx"),
+            models.Index(fields=["type", "price"], name="card_type_price_idx"),
+            models.Index(fields=["type", "category"], name="card_type_category_idx"),
+            models.Index(fields=["type", "city"], name="card_type_city_idx"),
+            models.Index(fields=["user", "-published_at"], name="card_user_published_idx"),
+            models.Index(fields=["featured_until"], name="card_featured_idx"),
+            GinIndex(fields=["search_vector"], name="card_search_vector_idx"),
+            GinIndex(fields=["search_title"], opclasses=["gin_trgm_ops"], name="card_search_title_trgm_idx"),
+            models.Index(
+                fields=["type"], condition=models.Q(similar_computed_at__isnull=True), name="card_similar_stale_idx",
+            ),
+        ]
+
+    @property
+    def is_featured(self):
+        until = self.featured_until
+        return bool(until and until > timezone.now())
+
+    def __str__(self):
+        return f"Card<{self.type}:{self.listing_id}> {self.title}"
+
+
+class SimilarListing(models.Model):
+    """
+    Precomputed nearest neighbours: the top-K cards most like `listing`, best
+    first. Written only by services/similar_listings.py; the detail pages read
+    one listing's rows ordered by rank. Rows go with either card.
+    """
+    listing = models.ForeignKey(ListingCard, on_delete=models.CASCADE, related_name="similar")
+    similar = models.ForeignKey(ListingCard, on_delete=models.CASCADE, related_name="similar_of")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "similar"], name="uniq_similar_listing_pair"),
+        ]
+        indexes = [
+            models.Index(fields=["listing", "rank"], name="similar_listing_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} ~ {self.similar_id} ({self.score:.3f})"
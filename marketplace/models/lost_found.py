@@ -3,6 +3,7 @@ from django.utils import timezone
 
 from marketplace.models.users import User
 from marketplace.models.city import City
+from marketplace.utils.phash import band_indexes
 
 
 class Report(models.Model):
@@ -94,6 +95,11 @@ class ReportPhoto(models.Model):
     image = models.ImageField(upload_to='lost_found/')
     is_main = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # dHash of the image (utils.images.image_dhash), see services/photo_duplicates.py
+    phash = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = band_indexes("reportphoto_phash")
 
     def __str__(self):
         return f"Photo for report {self.report_id}"
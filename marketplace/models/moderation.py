@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+from marketplace.models import Listing
+
+
+class ModerationJob(models.Model):
+    """
+    One pending AI moderation check for a listing. Rows are written by the
+    auto_moderate_item signal and drained in batches by `manage.py moderation_worker`
+    (services/moderation_queue.py), so item_create never waits on the API.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSING = "processing", "Processing"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="moderation_jobs")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    # outcome: approve / reject / manual (same values moderation.moderate_item returns)
+    decision = models.CharField(max_length=10, blank=True)
+    reason = models.TextField(blank=True)
+    last_error = models.TextField(blank=True)
+
+    # wall time of the API call that decided this job, shared by the whole batch
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    batch_size = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="moderation_job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"ModerationJob #{self.pk} listing={self.listing_id} {self.status}"
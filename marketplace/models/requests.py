@@ -1,6 +1,7 @@
 from django.db import models
 
 from marketplace.models import Listing, Attribute
+from marketplace.models.categories import TypedAttributeValue
 
 
 class Request(models.Model):
@@ -19,7 +20,7 @@ class Request(models.Model):
         return self.listing.title
 
 
-class RequestAttributeValue(models.Model):
+class RequestAttributeValue(TypedAttributeValue):
     request = models.ForeignKey(Request, on_delete=models.CASCADE, related_name="attribute_values")
     attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE)
     value = models.CharField(max_length=255, null=True, blank=True)
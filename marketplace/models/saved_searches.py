@@ -0,0 +1,99 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+from django.utils import timezone
+
+from marketplace.models import User, City, Listing
+
+
+class SavedSearch(models.Model):
+    """
+    An item_list filter set a user wants alerts for, stored normalized
+    (services/saved_searches.py builds it from the page's query string).
+    New listings are matched against it in batches by `manage.py
+    saved_search_worker`; `keys` is what the matcher looks it up by.
+    """
+    NOTIFY_INSTANT = "instant"
+    NOTIFY_DAILY = "daily"
+    NOTIFY_OFF = "off"
+    NOTIFY_CHOICES = [
+        (NOTIFY_INSTANT, "Instant"),
+        (NOTIFY_DAILY, "Daily digest"),
+        (NOTIFY_OFF, "Off"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="saved_searches")
+    name = models.CharField(max_length=200, blank=True)
+
+    # what the user typed, and its utils.arabic.analyze() terms (space separated)
+    query = models.CharField(max_length=200, blank=True)
+    terms = models.CharField(max_length=500, blank=True)
+
+    # category subtrees (any of them), as item_list's ?category= / ?categories=
+    category_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    min_price = models.FloatField(null=True, blank=True)
+    max_price = models.FloatField(null=True, blank=True)
+    condition = models.CharField(max_length=20, blank=True)
+    seller_type = models.CharField(max_length=20, blank=True)
+
+    notify = models.CharField(max_length=10, choices=NOTIFY_CHOICES, default=NOTIFY_INSTANT)
+    # one row per distinct filter set and user
+    signature = models.CharField(max_length=64)
+    # inverted index entries: the filter set's most selective dimension
+    keys = ArrayField(models.CharField(max_length=64), default=list, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "signature"], name="uniq_saved_search_per_user"),
+        ]
+        indexes = [
+            GinIndex(fields=["keys"], name="saved_search_keys_idx"),
+        ]
+
+    def __str__(self):
+        return f"SavedSearch #{self.pk} {self.user_id}: {self.name or self.query}"
+
+
+class SavedSearchMatch(models.Model):
+    """A listing a saved search matched; notified_at is set once the user was told about it."""
+
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="matches")
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="+")
+    matched_at = models.DateTimeField(default=timezone.now)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["saved_search", "listing"], name="uniq_saved_search_match"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["saved_search"], condition=models.Q(notified_at__isnull=True),
+                name="saved_match_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"SavedSearchMatch search={self.saved_search_id} listing={self.listing_id}"
+
+
+class SavedSearchQueue(models.Model):
+    """
+    Listings that just became visible and still have to be matched against
+    the saved searches. Written by the Listing signals, drained in batches.
+    """
+
+    listing_id = models.BigIntegerField(primary_key=True)
+    queued_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["queued_at"], name="saved_search_queue_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"SavedSearchQueue listing={self.listing_id}"
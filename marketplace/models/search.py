@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SearchIndexQueue(models.Model):
+    """
+    Listings whose Elasticsearch document is out of date. One row per listing,
+    so any number of saves between two flushes cost one re-index; rows are
+    written by signals and drained in bulk by `manage.py search_index_worker`
+    (services/search_index.py).
+
+    listing_id is not a foreign key: a deleted listing keeps its row until the
+    worker has removed the document.
+    """
+
+    listing_id = models.BigIntegerField(primary_key=True)
+    # first_dirtied_at survives re-dirtying and is what indexing lag is measured from;
+    # last_dirtied_at tells the worker whether a row changed again while it was flushing
+    first_dirtied_at = models.DateTimeField(default=timezone.now)
+    last_dirtied_at = models.DateTimeField(default=timezone.now)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["run_after", "first_dirtied_at"], name="search_queue_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"SearchIndexQueue listing={self.listing_id}"
+
+
+class SearchIndexChange(models.Model):
+    """
+    Append-only log of the listings mark_dirty() queued. `manage.py
+    reindex_listings` notes the newest id before it starts loading a fresh
+    index and replays everything after it onto that index, so writes made
+    during a rebuild aren't lost. Old rows are pruned by the worker.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    listing_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["changed_at"], name="search_change_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"SearchIndexChange #{self.id} listing={self.listing_id}"
@@ -2,57 +2,173 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import re
+import threading
 import traceback
-from typing import Optional, Tuple
+import unicodedata
+from typing import List, Optional, Sequence, Tuple
 
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
+MODEL = "omni-moderation-latest"
 
-def moderate_item(item) -> Tuple[str, Optional[str]]:
-    """
-    Moderate a newly created Item using the OpenAI Moderation API.
+Decision = Tuple[str, Optional[str]]
 
-    Returns a (decision, reason) tuple where decision is one of:
-    - "approve": content is clean — set is_approved=True
-    - "reject":  content flagged — auto-reject the listing
-    - "manual":  API unavailable or inconclusive — queue for human review
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Optional[OpenAI]:
     """
-    listing = getattr(item, "listing", None)
-    title = listing.title if listing else ""
-    description = listing.description if listing else ""
-    text = f"{title}\n{description}".strip()
+    Process-wide OpenAI client so the worker reuses one HTTP connection pool
+    instead of opening a new one per item. Rebuilt only if the settings change.
+    Returns None when no API key is configured.
+    """
+    global _client, _client_key
 
     if not settings.OPENAI_API_KEY:
-        logger.info(
-            "OPENAI_API_KEY is not configured. Item %s queued for manual review.", item.id
-        )
-        return "manual", None
+        return None
 
-    client = OpenAI(
-        api_key=settings.OPENAI_API_KEY,
-        organization=settings.OPENAI_ORG_ID,
-        project=settings.OPENAI_PROJECT_ID,
+    key = (
+        settings.OPENAI_API_KEY,
+        settings.OPENAI_ORG_ID,
+        settings.OPENAI_PROJECT_ID,
+        settings.OPENAI_BASE_URL,
+        settings.MODERATION_TIMEOUT,
     )
+    with _client_lock:
+        if _client is None or _client_key != key:
+            _client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                organization=settings.OPENAI_ORG_ID or None,
+                project=settings.OPENAI_PROJECT_ID or None,
+                base_url=settings.OPENAI_BASE_URL or None,
+                timeout=settings.MODERATION_TIMEOUT,
+                # retries/backoff are handled by the job queue, not inside the call
+                max_retries=0,
+            )
+            _client_key = key
+        return _client
 
-    try:
-        response = client.moderations.create(
-            model="omni-moderation-latest",
-            input=text,
-        )
 
-        result = response.results[0]
-        if result.flagged:
-            reason_list = [name for name, value in result.categories if value]
-            reason = "Inappropriate content detected: " + ", ".join(reason_list)
-            logger.info("Item %s auto-rejected: %s", item.id, reason)
-            return "reject", reason
+def listing_text(listing) -> str:
+    if listing is None:
+        return ""
+    return f"{listing.title or ''}\n{listing.description or ''}".strip()
+
+
+# -------------------------
+# Verdict cache
+# -------------------------
+# Republished / edited / bulk-imported listings resubmit the same text, so verdicts
+# are cached under a hash of the normalized text. The key carries the model and
+# MODERATION_POLICY_VERSION: changing either orphans every old verdict.
+# Only real verdicts (approve/reject) are cached, never the "manual" fallback.
+
+SOURCE_API = "api"
+SOURCE_ADMIN = "admin"
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WS_RE.sub(" ", text).strip()
+
+
+def verdict_key(text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"moderation:{settings.MODERATION_POLICY_VERSION}:{MODEL}:{digest}"
+
+
+def cached_verdict(text: str) -> Optional[dict]:
+    """{"decision", "reason", "source"} or None."""
+    return cache.get(verdict_key(text))
+
+
+def override_verdict(text: str, decision: str, reason: Optional[str] = None) -> None:
+    """Pin a human verdict for this text; identical text then skips the API."""
+    cache.set(
+        verdict_key(text),
+        {"decision": decision, "reason": reason, "source": SOURCE_ADMIN},
+        settings.MODERATION_OVERRIDE_TTL,
+    )
+
+
+def forget_verdict(text: str) -> None:
+    cache.delete(verdict_key(text))
+
 
-        return "approve", None
+def _decide(result) -> Decision:
+    if result.flagged:
+        reason_list = [name for name, value in result.categories if value]
+        return "reject", "Inappropriate content detected: " + ", ".join(reason_list)
+    return "approve", None
 
+
+def moderate_texts(texts: Sequence[str]) -> List[Decision]:
+    """
+    Moderate several texts: cached verdicts first, then one multi-input API
+    call for the distinct texts that are left.
+
+    Returns one (decision, reason) per input, in order. Raises on API/network
+    errors so the caller can retry; uncached texts come back "manual" when no
+    API key is configured.
+    """
+    if not texts:
+        return []
+
+    keys = [verdict_key(text) for text in texts]
+    verdicts = cache.get_many(set(keys))
+    misses = list(dict.fromkeys(k for k in keys if k not in verdicts))
+
+    client = get_client() if misses else None
+    if client is not None:
+        text_for = dict(zip(keys, texts))
+        response = client.moderations.create(model=MODEL, input=[text_for[k] for k in misses])
+        if len(response.results) != len(misses):
+            raise ValueError(
+                f"Moderation API returned {len(response.results)} results for {len(misses)} inputs"
+            )
+        fresh = {
+            key: dict(zip(("decision", "reason"), _decide(result)), source=SOURCE_API)
+            for key, result in zip(misses, response.results)
+        }
+        cache.set_many(fresh, settings.MODERATION_CACHE_TTL)
+        verdicts.update(fresh)
+
+    if len(misses) < len(texts):
+        logger.info("Moderation cache: %s of %s text(s) served from cache",
+                    len(texts) - sum(k in misses for k in keys), len(texts))
+
+    return [
+        (verdicts[k]["decision"], verdicts[k]["reason"]) if k in verdicts else ("manual", None)
+        for k in keys
+    ]
+
+
+def moderate_item(item) -> Decision:
+    """
+    Moderate a single Item using the OpenAI Moderation API.
+
+    Returns a (decision, reason) tuple where decision is one of:
+    - "approve": content is clean — set is_approved=True
+    - "reject":  content flagged — auto-reject the listing
+    - "manual":  API unavailable or inconclusive — queue for human review
+
+    New items go through the moderation job queue (services/moderation_queue.py);
+    this stays for one-off checks.
+    """
+    try:
+        decision, reason = moderate_texts([listing_text(getattr(item, "listing", None))])[0]
     except Exception:
         logger.error(
             "Moderation API error for item %s — falling back to manual review:\n%s",
@@ -60,3 +176,38 @@ def moderate_item(item) -> Tuple[str, Optional[str]]:
             traceback.format_exc(),
         )
         return "manual", None
+
+    if decision == "reject":
+        logger.info("Item %s auto-rejected: %s", item.id, reason)
+    return decision, reason
+
+
+def apply_decision(listing, decision: str, reason: Optional[str]) -> None:
+    """
+    Outcomes:
+    - "approve": set is_approved=True so the listing becomes visible.
+    - "reject":  keep is_approved=False (default), flag as auto-rejected.
+    - "manual":  keep is_approved=False; an admin must review.
+    """
+    if decision == "approve":
+        listing.is_approved = True
+        listing.save(update_fields=["is_approved"])
+
+    elif decision == "reject":
+        # is_approved is already False (model default); mark as auto-rejected
+        listing.is_active = False
+        listing.auto_rejected = True
+        listing.moderation_reason = reason or "Automatically rejected by AI."
+        listing.rejected_at = timezone.now()
+        listing.rejected_by = None
+        listing.save(
+            update_fields=[
+                "is_active",
+                "auto_rejected",
+                "moderation_reason",
+                "rejected_at",
+                "rejected_by",
+            ]
+        )
+
+    # "manual": is_approved stays False — admin queue will pick it up
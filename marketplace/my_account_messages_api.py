@@ -1,78 +1,41 @@
 import json
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST
 from django.core.exceptions import ValidationError
 
-from marketplace.models import Conversation, Message
-from marketplace.validators import validate_no_links_or_html  # adjust if path differs
-
-
-def _conv_type_and_title(convo):
-    # store conversation
-    if convo.store_id and convo.listing_id is None:
-        return "store", "تواصل عام مع المتجر"
-
-    # listing conversation: could be item or request via reverse relations
-    if convo.listing_id:
-        listing = convo.listing
-        # if your Listing has a related request (listing.request)
-        if hasattr(listing, "request") and getattr(listing, "request", None):
-            return "request", getattr(listing, "title", "") or ""
-        return "ad", getattr(listing, "title", "") or ""
-
-    return "ad", ""
+from marketplace.models import Conversation
+from marketplace.services import chat as chat_service, conversations
 
 
 @login_required
 @require_GET
 def my_account_conversations_api(request):
-    convos = (
-        Conversation.objects
-        .filter(Q(buyer=request.user) | Q(seller=request.user))
-        .select_related("listing", "store", "buyer", "seller")
-        .order_by("-created_at")
+    page = conversations.summaries_page(
+        request.user,
+        request.GET.get("cursor"),
+        request.GET.get("limit") or conversations.PAGE_SIZE,
     )
 
     out = []
-    for c in convos:
-        me_pk = request.user.pk
-        other = c.seller if c.buyer_id == me_pk else c.buyer
-
-        last = (
-            Message.objects
-            .filter(conversation=c)
-            .order_by("-created_at")
-            .only("body", "created_at")
-            .first()
-        )
-
-        unread = (
-            Message.objects
-            .filter(conversation=c, is_read=False)
-            .exclude(sender=request.user)
-            .count()
-        )
-
-        ctype, title = _conv_type_and_title(c)
-
+    for c in page:
+        row = conversations.summarize(c, request.user)
         out.append({
-            "id": c.id,
-            "name": getattr(other, "username", "مستخدم"),
-            "img": "",  # put avatar URL if you have one
-            "type": ctype,
-            "title": title,
+            "id": row["id"],
+            "name": row["name"],
+            "img": row["img"],
+            "type": row["type"],
+            "title": row["title"],
             "last": {
-                "text": last.body if last else "لا توجد رسائل بعد",
-                "time": timezone.localtime(last.created_at).strftime("%H:%M") if last else "",
+                "text": row["last_text"],
+                "time": conversations.format_time(row["last_time"], "%H:%M"),
             },
-            "unreadCount": unread,
+            "unreadCount": row["unread_count"],
         })
 
-    return JsonResponse({"ok": True, "conversations": out})
+    return JsonResponse({"ok": True, "conversations": out, "next_cursor": page.next_cursor})
 
 
 @login_required
@@ -87,15 +50,12 @@ def my_account_conversation_messages_api(request, conversation_id):
         return JsonResponse({"ok": False, "error": "forbidden"}, status=403)
 
     # mark read (same as your chat_room)
-    Message.objects.filter(
-        conversation=conversation,
-        is_read=False
-    ).exclude(sender=request.user).update(is_read=True)
+    chat_service.mark_read(conversation, request.user)
 
     me_pk = request.user.pk
     other = conversation.seller if conversation.buyer_id == me_pk else conversation.buyer
 
-    ctype, title = _conv_type_and_title(conversation)
+    ctype, title = conversations.type_and_title(conversation)
 
     type_text = (
         f"بخصوص إعلان: {title}" if ctype == "ad" else
@@ -143,12 +103,10 @@ def my_account_send_message_api(request, conversation_id):
         return JsonResponse({"ok": False, "error": "empty"}, status=400)
 
     try:
-        validate_no_links_or_html(body)
+        m = chat_service.post_message(conversation, request.user, body)
     except ValidationError:
         return JsonResponse({"ok": False, "error": "invalid"}, status=400)
 
-    m = Message.objects.create(conversation=conversation, sender=request.user, body=body)
-
     return JsonResponse({
         "ok": True,
         "message": {
@@ -0,0 +1,148 @@
+"""
+Attribute filters for item_list / request_list, on the typed attribute value
+columns (models.categories.TypedAttributeValue).
+
+Query parameters, per Attribute id:
+
+    attr_<id>=<option id>     select attributes; repeatable, any of them
+    attr_<id>_min / _max      number attributes, inclusive range
+    attr_<id>=<text>          text attributes, exact after arabic.normalize()
+
+parse() turns them into AttributeFilter tuples (unknown attributes and values
+that don't fit the attribute's type are dropped). apply() is the Postgres side:
+one semi-join per filter on the (attribute, value) indexes of
+ItemAttributeValue / RequestAttributeValue. es_filter() is the Elasticsearch
+side, on ListingDocument.attribute_values (nested, so the attribute and its
+value are matched on the same entry).
+"""
+import re
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.db.models import Q
+
+from marketplace.models import Attribute, ItemAttributeValue, RequestAttributeValue
+from marketplace.utils import arabic
+from marketplace.utils.attribute_values import parse_number
+
+PARAM = re.compile(r"^attr_([0-9]+)(?:_(min|max))?$")
+MAX_FILTERS = 10
+MAX_ID = 2**31 - 1  # ids are integer columns: a larger one matches nothing and would fail the lookup
+
+
+class AttributeFilter(NamedTuple):
+    attribute_id: int
+    option_ids: tuple = ()
+    min: float | None = None
+    max: float | None = None
+    text: str = ""
+
+
+def parse(params):
+    """AttributeFilters from a QueryDict, ordered by attribute id. One query, none without attr_ params."""
+    wanted = defaultdict(dict)
+    for name in params:
+        match = PARAM.match(name)
+        if not match:
+            continue
+        attribute_id, bound = int(match.group(1)), match.group(2)
+        if attribute_id > MAX_ID:
+            continue
+        if bound:
+            wanted[attribute_id][bound] = params.get(name)
+        else:
+            wanted[attribute_id]["values"] = [v.strip() for v in params.getlist(name) if v.strip()]
+    if not wanted:
+        return []
+
+    input_types = dict(
+        Attribute.objects.filter(pk__in=sorted(wanted)[:MAX_FILTERS]).values_list("id", "input_type")
+    )
+    filters = []
+    for attribute_id in sorted(input_types):
+        spec, input_type = wanted[attribute_id], input_types[attribute_id]
+        values = spec.get("values", [])
+        if input_type == "select":
+            option_ids = tuple(sorted({int(v) for v in values if v.isdecimal() and int(v) <= MAX_ID}))
+            if option_ids:
+                filters.append(AttributeFilter(attribute_id, option_ids=option_ids))
+        elif input_type == "number":
+            low, high = parse_number(spec.get("min")), parse_number(spec.get("max"))
+            if low is not None and high is not None and low > high:
+                low, high = high, low
+            if low is not None or high is not None:
+                filters.append(AttributeFilter(attribute_id, min=low, max=high))
+        elif values:
+            text = arabic.normalize(values[0])
+            if text:
+                filters.append(AttributeFilter(attribute_id, text=text[:255]))
+    return filters
+
+
+def value_q(attribute_filter):
+    """Q on an attribute value model for the values one filter accepts."""
+    q = Q(attribute_id=attribute_filter.attribute_id)
+    if attribute_filter.option_ids:
+        return q & Q(option_ids__overlap=list(attribute_filter.option_ids))
+    if attribute_filter.text:
+        return q & Q(value_text=attribute_filter.text)
+    if attribute_filter.min is not None:
+        q &= Q(value_number__gte=attribute_filter.min)
+    if attribute_filter.max is not None:
+        q &= Q(value_number__lte=attribute_filter.max)
+    return q
+
+
+def apply(queryset, filters, listing_type, field="listing_id"):
+    """
+    `queryset` narrowed to listings whose values pass every filter; `field`
+    is its path to the Listing id.
+    """
+    if listing_type == "item":
+        model, listing_path = ItemAttributeValue, "item__listing_id"
+    else:
+        model, listing_path = RequestAttributeValue, "request__listing_id"
+    for attribute_filter in filters:
+        matching = model.objects.filter(value_q(attribute_filter)).values(listing_path)
+        queryset = queryset.filter(**{f"{field}__in": matching})
+    return queryset
+
+
+def es_filter(search, filters):
+    """The same filters on an elasticsearch_dsl Search over ListingDocument."""
+    for attribute_filter in filters:
+        must = [{"term": {"attribute_values.attribute_id": attribute_filter.attribute_id}}]
+        if attribute_filter.option_ids:
+            must.append({"terms": {"attribute_values.option_ids": list(attribute_filter.option_ids)}})
+        elif attribute_filter.text:
+            must.append({"term": {"attribute_values.text": attribute_filter.text}})
+        else:
+            bounds = {}
+            if attribute_filter.min is not None:
+                bounds["gte"] = attribute_filter.min
+            if attribute_filter.max is not None:
+                bounds["lte"] = attribute_filter.max
+            must.append({"range": {"attribute_values.number": bounds}})
+        search = search.filter("nested", path="attribute_values", query={"bool": {"filter": must}})
+    return search
+
+
+def sidebar(category, filters):
+    """
+    The selected category's filterable attributes for partials/attribute_filters.html,
+    each with the current selection. [] without a category.
+    """
+    if category is None:
+        return []
+    current = {f.attribute_id: f for f in filters}
+    fields = []
+    for attribute in category.attributes.prefetch_related("options").order_by("id"):
+        selected = current.get(attribute.id) or AttributeFilter(attribute.id)
+        fields.append({
+            "attribute": attribute,
+            "options": [(option, option.id in selected.option_ids) for option in attribute.options.all()],
+            "min": "" if selected.min is None else f"{selected.min:g}",
+            "max": "" if selected.max is None else f"{selected.max:g}",
+            "text": selected.text,
+        })
+    return fields
@@ -0,0 +1,175 @@
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+
+from marketplace.models import Category, CategoryClosure
+
+logger = logging.getLogger(__name__)
+
+
+def _as_ids(categories):
+    """
+    Accept a Category, an id, or an iterable of either (ids may be strings from GET).
+    """
+    if categories is None:
+        return []
+    if isinstance(categories, (Category, int, str)):
+        categories = [categories]
+
+    ids = []
+    for c in categories:
+        if isinstance(c, Category):
+            ids.append(c.id)
+        else:
+            try:
+                ids.append(int(c))
+            except (TypeError, ValueError):
+                continue
+    return ids
+
+
+# ------------------------------------------------------------------ #
+# Reads
+# ------------------------------------------------------------------ #
+def descendants_qs(categories, include_self=True):
+    """
+    Lazy queryset of descendant ids, meant for `category_id__in=` so the tree
+    walk runs as a subquery of the listing query itself.
+    """
+    qs = CategoryClosure.objects.filter(ancestor_id__in=_as_ids(categories))
+    if not include_self:
+        qs = qs.filter(depth__gt=0)
+    return qs.values("descendant_id")
+
+
+def descendant_ids(categories, include_self=True):
+    return list(
+        descendants_qs(categories, include_self)
+        .values_list("descendant_id", flat=True)
+        .distinct()
+    )
+
+
+def ancestor_path(category):
+    """Root-first list of Category objects ending with `category` itself."""
+    ids = _as_ids(category)
+    if not ids:
+        return []
+    rows = (
+        CategoryClosure.objects
+        .filter(descendant_id=ids[0])
+        .select_related("ancestor")
+        .order_by("-depth")
+    )
+    return [row.ancestor for row in rows]
+
+
+def ancestor_path_ids(category):
+    ids = _as_ids(category)
+    if not ids:
+        return []
+    return list(
+        CategoryClosure.objects
+        .filter(descendant_id=ids[0])
+        .order_by("-depth")
+        .values_list("ancestor_id", flat=True)
+    )
+
+
+def root_id(category):
+    path = ancestor_path_ids(category)
+    return path[0] if path else None
+
+
+def root_ids(categories):
+    """{category_id: root_id} for many categories in one query."""
+    return dict(
+        CategoryClosure.objects
+        .filter(descendant_id__in=_as_ids(categories), ancestor__parent__isnull=True)
+        .values_list("descendant_id", "ancestor_id")
+    )
+
+
+def paths_for(categories=None):
+    """
+    {category_id: [(ancestor_id, ancestor_name), ...]} root-first, in one query.
+    Pass None to get every category's path.
+    """
+    qs = CategoryClosure.objects.all()
+    if categories is not None:
+        qs = qs.filter(descendant_id__in=_as_ids(categories))
+
+    paths = defaultdict(list)
+    rows = qs.order_by("descendant_id", "-depth").values_list("descendant_id", "ancestor_id", "ancestor__name")
+    for descendant_id, ancestor_id, name in rows:
+        paths[descendant_id].append((ancestor_id, name))
+    return dict(paths)
+
+
+# ------------------------------------------------------------------ #
+# Writes (called from signals)
+# ------------------------------------------------------------------ #
+def link_category(category):
+    """Insert closure rows for a freshly created category."""
+    rows = [CategoryClosure(ancestor_id=category.id, descendant_id=category.id, depth=0)]
+    if category.parent_id:
+        for ancestor_id, depth in CategoryClosure.objects.filter(
+            descendant_id=category.parent_id
+        ).values_list("ancestor_id", "depth"):
+            rows.append(CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.id, depth=depth + 1))
+    CategoryClosure.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+@transaction.atomic
+def move_category(category):
+    """
+    Re-hang the subtree rooted at `category` under its current parent:
+    drop the links from old outside ancestors, add the cross product with the new ones.
+    """
+    subtree = dict(
+        CategoryClosure.objects.filter(ancestor_id=category.id).values_list("descendant_id", "depth")
+    )
+    if not subtree:
+        link_category(category)
+        return
+
+    if category.parent_id in subtree:
+        logger.warning("Category %s moved under its own descendant %s; closure left as-is",
+                       category.id, category.parent_id)
+        return
+
+    CategoryClosure.objects.filter(
+        descendant_id__in=subtree.keys()
+    ).exclude(ancestor_id__in=subtree.keys()).delete()
+
+    if not category.parent_id:
+        return
+
+    new_ancestors = CategoryClosure.objects.filter(
+        descendant_id=category.parent_id
+    ).values_list("ancestor_id", "depth")
+
+    CategoryClosure.objects.bulk_create([
+        CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=a_depth + d_depth + 1)
+        for ancestor_id, a_depth in new_ancestors
+        for descendant_id, d_depth in subtree.items()
+    ])
+
+
+@transaction.atomic
+def rebuild_closure():
+    """Recompute the whole table from Category.parent. Returns the row count."""
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    rows = []
+    for cid in parents:
+        node, depth, seen = cid, 0, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            rows.append(CategoryClosure(ancestor_id=node, descendant_id=cid, depth=depth))
+            node = parents.get(node)
+            depth += 1
+
+    CategoryClosure.objects.all().delete()
+    CategoryClosure.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
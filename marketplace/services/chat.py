@@ -0,0 +1,139 @@
+"""
+Single write path for chat messages, shared by the HTTP views and the
+WebSocket consumer: validate, persist, then fan out to the conversation's
+channel-layer group once the transaction commits.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from marketplace.models import Conversation, Message
+from marketplace.services import counters
+from marketplace.validators import validate_no_links_or_html
+
+logger = logging.getLogger(__name__)
+
+SYNC_PAGE_SIZE = 50
+SYNC_MAX_PAGE_SIZE = 200
+
+
+def group_name(conversation_id):
+    return f"chat.{conversation_id}"
+
+
+def is_participant(conversation, user):
+    return bool(user and user.is_authenticated and user.pk in (conversation.buyer_id, conversation.seller_id))
+
+
+def serialize_message(message):
+    return {
+        "id": message.id,
+        "conversation_id": message.conversation_id,
+        "sender_id": message.sender_id,
+        "sender_name": getattr(message.sender, "username", "") or "",
+        "body": message.body,
+        "created_at": message.created_at.isoformat(),
+        "time": timezone.localtime(message.created_at).strftime("%H:%M"),
+        "is_read": message.is_read,
+    }
+
+
+def broadcast(conversation_id, event):
+    """group_send after commit; a missing/unreachable layer never breaks the write."""
+    layer = get_channel_layer()
+    if layer is None:
+        return
+
+    def _send():
+        try:
+            async_to_sync(layer.group_send)(group_name(conversation_id), event)
+        except Exception:
+            logger.warning("Chat broadcast failed for conversation %s", conversation_id, exc_info=True)
+
+    transaction.on_commit(_send)
+
+
+def post_message(conversation, sender, body):
+    """
+    Validate and store a message, then push it to everyone in the conversation.
+    Raises ValidationError (code "empty" for blank bodies) on bad input.
+    """
+    body = (body or "").strip()
+    if not body:
+        raise ValidationError("Message is empty.", code="empty")
+    validate_no_links_or_html(body)
+
+    message = Message.objects.create(conversation=conversation, sender=sender, body=body)
+    Conversation.objects.filter(pk=conversation.pk).update(last_message_at=message.created_at)
+    conversation.last_message_at = message.created_at
+    broadcast(conversation.id, {"type": "chat.message", "message": serialize_message(message)})
+    return message
+
+
+def mark_read(conversation, user):
+    """Mark the other party's messages as read for `user` and send a read receipt."""
+    marked = (
+        Message.objects
+        .filter(conversation=conversation, is_read=False)
+        .exclude(sender=user)
+        .update(is_read=True)
+    )
+    if marked:
+        counters.adjust(user.pk, counters.UNREAD_MESSAGES, -marked)
+        broadcast(conversation.id, {"type": "chat.read", "reader_id": user.pk})
+    return marked
+
+
+def _as_id(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def sync_messages(conversation, user, after_id=None, before_id=None, limit=SYNC_PAGE_SIZE):
+    """
+    Incremental fetch keyed on Message.id (served by the (conversation, id) index).
+
+    - after_id:  messages newer than after_id (catch-up after a reconnect)
+    - before_id: the page just older than before_id (history on scroll-up)
+    - neither:   the latest page
+
+    Messages come back oldest-first; `has_more` refers to the requested direction.
+    `read_up_to` is the newest of the user's own messages the other side has read,
+    so clients can tick everything up to it without re-fetching.
+    """
+    after_id, before_id = _as_id(after_id), _as_id(before_id)
+    try:
+        limit = min(max(int(limit), 1), SYNC_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        limit = SYNC_PAGE_SIZE
+
+    qs = Message.objects.filter(conversation=conversation).select_related("sender")
+    if after_id is not None:
+        rows = list(qs.filter(id__gt=after_id).order_by("id")[: limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        if before_id is not None:
+            qs = qs.filter(id__lt=before_id)
+        rows = list(qs.order_by("-id")[: limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+
+    read_up_to = (
+        Message.objects
+        .filter(conversation=conversation, sender=user, is_read=True)
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return {
+        "messages": rows,
+        "has_more": has_more,
+        "read_up_to": read_up_to,
+    }
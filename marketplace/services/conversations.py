@@ -0,0 +1,109 @@
+"""
+One query for "my conversations": every row comes back with its last message,
+unread count, other party (+ store) and listing/report target already joined,
+ordered by last activity and paged with a keyset cursor on the denormalized
+Conversation.last_message_at (indexed with each participant column).
+"""
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from marketplace.models import Conversation, Message
+from marketplace.utils.pagination import KeysetPaginator
+
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+ORDERING = ("-last_message_at", "-id")
+
+STORE_TITLE = "تواصل عام مع المتجر"
+NO_MESSAGES_TEXT = "لا توجد رسائل بعد"
+
+
+def summaries_qs(user):
+    last = Message.objects.filter(conversation_id=OuterRef("pk")).order_by("-created_at", "-id")
+    unread = (
+        Message.objects
+        .filter(conversation_id=OuterRef("pk"), is_read=False)
+        .exclude(sender_id=user.pk)
+        .order_by()
+        .values("conversation_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    return (
+        Conversation.objects
+        .filter(Q(buyer=user) | Q(seller=user))
+        .select_related(
+            "buyer", "buyer__store", "seller", "seller__store",
+            "store", "report", "listing", "listing__item", "listing__request",
+        )
+        .annotate(
+            last_body=Subquery(last.values("body")[:1]),
+            last_time=Subquery(last.values("created_at")[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        )
+    )
+
+
+def summaries_page(user, cursor=None, per_page=PAGE_SIZE):
+    """KeysetPage of annotated conversations, newest activity first."""
+    try:
+        per_page = min(max(int(per_page), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        per_page = PAGE_SIZE
+    return KeysetPaginator(summaries_qs(user), ORDERING, per_page).get_page(cursor)
+
+
+def _file_url(f):
+    try:
+        return f.url if f else ""
+    except ValueError:
+        return ""
+
+
+def other_party(convo, user):
+    return convo.seller if convo.buyer_id == user.pk else convo.buyer
+
+
+def type_and_title(convo):
+    if convo.report_id:
+        return "report", getattr(convo.report, "title", "") or ""
+    if convo.store_id:
+        return "store", STORE_TITLE
+
+    listing = convo.listing
+    if listing is None:
+        return "ad", ""
+    if getattr(listing, "request", None) is not None:
+        return "request", listing.title or ""
+    return "ad", listing.title or ""
+
+
+def summarize(convo, user):
+    """Plain dict for one row of summaries_qs(); endpoints reshape it for their clients."""
+    other = other_party(convo, user)
+    other_store = getattr(other, "store", None)
+
+    if convo.store_id and convo.store.name:
+        name = convo.store.name
+        img = _file_url(convo.store.logo) or _file_url(other.profile_photo)
+    else:
+        full_name = " ".join(filter(None, [other.first_name, other.last_name]))
+        name = other.username or full_name or "مستخدم"
+        img = _file_url(other.profile_photo) or (_file_url(other_store.logo) if other_store else "")
+
+    ctype, title = type_and_title(convo)
+    return {
+        "id": convo.id,
+        "name": name,
+        "img": img,
+        "type": ctype,
+        "title": title,
+        "unread_count": int(convo.unread_count or 0),
+        "last_text": convo.last_body or NO_MESSAGES_TEXT,
+        "last_time": convo.last_time,
+    }
+
+
+def format_time(value, fmt="%I:%M %p"):
+    return timezone.localtime(value).strftime(fmt) if value else ""
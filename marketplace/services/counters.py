@@ -0,0 +1,84 @@
+"""
+Per-user navbar counters (unread messages, unread notifications, favourites)
+kept in the shared cache.
+
+Writes go through adjust() from the Message / Notification / Favorite signals
+(an atomic INCR on Redis); anything we cannot express as a delta (bulk
+updates, deletes, listings changing visibility) calls reset() instead and the
+next read recomputes from the database. The TTL bounds any remaining drift.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+
+from marketplace.models import Favorite, Message, Notification
+
+UNREAD_MESSAGES = "unread_messages"
+UNREAD_NOTIFICATIONS = "unread_notifications"
+FAVORITE_COUNT = "favorite_count"
+COUNTERS = (UNREAD_MESSAGES, UNREAD_NOTIFICATIONS, FAVORITE_COUNT)
+
+COUNTER_TTL_SECONDS = 60 * 10
+
+
+def _key(user_id, name):
+    return f"counters:{user_id}:{name}"
+
+
+def unread_messages_qs(user_id):
+    return (
+        Message.objects
+        .filter(Q(conversation__buyer_id=user_id) | Q(conversation__seller_id=user_id), is_read=False)
+        .exclude(sender_id=user_id)
+    )
+
+
+def favorites_qs(user_id):
+    return Favorite.objects.filter(user_id=user_id, listing__is_deleted=False, listing__is_active=True)
+
+
+_SOURCES = {
+    UNREAD_MESSAGES: lambda uid: unread_messages_qs(uid).count(),
+    UNREAD_NOTIFICATIONS: lambda uid: Notification.objects.filter(user_id=uid, is_read=False).count(),
+    FAVORITE_COUNT: lambda uid: favorites_qs(uid).count(),
+}
+
+
+def get_counters(user_id):
+    """{counter_name: int} for the user; missing counters are recomputed and cached."""
+    keys = {name: _key(user_id, name) for name in COUNTERS}
+    cached = cache.get_many(keys.values())
+
+    result, missing = {}, {}
+    for name, key in keys.items():
+        if key in cached:
+            result[name] = cached[key]
+        else:
+            result[name] = missing[key] = _SOURCES[name](user_id)
+
+    if missing:
+        cache.set_many(missing, COUNTER_TTL_SECONDS)
+    return result
+
+
+def adjust(user_id, name, delta):
+    """Atomically add `delta` to a cached counter. A cold counter is left for the next read."""
+    if not user_id or not delta:
+        return
+    key = _key(user_id, name)
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        return
+    if value < 0:
+        cache.delete(key)
+
+
+def reset(user_ids, *names):
+    """Drop cached counters so they are recomputed on the next read."""
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    cache.delete_many([
+        _key(uid, name)
+        for uid in user_ids if uid
+        for name in (names or COUNTERS)
+    ])
@@ -0,0 +1,187 @@
+"""
+On-the-fly resizing for images that are not ItemPhotos: avatars, store logos
+and covers, category photos, lost & found photos.
+
+Templates link to /img/<sig>/<w>x<h>/<storage name> (resized_url). The
+signature covers the size and the name, and only the sizes in SIZES are
+served, so the set of files that can ever be rendered is bounded. A rendered
+WebP is kept in a local disk cache (RESIZED_IMAGE_CACHE_DIR) keyed by a hash
+of size + name; hits touch the file's mtime. Evicting the oldest files means
+scanning the whole directory, so a process only does it once it has written
+EVICT_CHECK_FRACTION of RESIZED_IMAGE_CACHE_MAX_BYTES since its last scan
+(and `manage.py evict_resized_images` can run it from a timer); the cache may
+overshoot the limit by that much per process in between.
+Originals are read through default_storage, so this works the same on the
+filesystem and on Cloudinary.
+
+Uploads get a fresh storage name, so a cached rendition never goes stale and
+is served as immutable.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from marketplace.utils.images import render_resized
+
+logger = logging.getLogger(__name__)
+
+# (width, height) -> crop. Cropped sizes fill the box (object-cover spots);
+# the others fit inside it (logos shown with object-contain).
+SIZES = {
+    (64, 64): True,       # avatar chips on cards and in dropdowns
+    (96, 96): True,       # navbar avatar
+    (128, 128): True,     # seller / requester on item & request pages
+    (160, 160): False,    # store logos in grids
+    (224, 224): True,     # profile avatar, store profile logo
+    (400, 320): True,     # lost & found photos
+    (560, 440): True,     # category cards
+    (1920, 1080): False,  # store / profile covers
+}
+
+# bump to re-render everything (changes every cache key and ETag)
+RENDER_VERSION = 1
+
+# after eviction the cache is trimmed to this fraction of the limit, so a full
+# cache doesn't rescan the directory on every miss
+EVICT_TO = 0.9
+# bytes a process writes between two eviction scans, as a fraction of the limit
+EVICT_CHECK_FRACTION = 0.05
+
+_written_lock = threading.Lock()
+_written_since_scan = {"bytes": 0}
+
+_signer = signing.Signer(salt="marketplace.image_resize")
+
+
+def _payload(width, height, name):
+    return f"{width}x{height}/{name}"
+
+
+def _name_of(image):
+    return getattr(image, "name", image) or ""
+
+
+def resized_url(image, width, height, fallback=""):
+    """
+    URL of `image` (a FieldFile or storage name) resized to width x height, or
+    `fallback` when there is no image. Sizes outside SIZES get the original URL.
+    """
+    name = _name_of(image)
+    if not name:
+        return fallback
+    if (width, height) not in SIZES:
+        logger.warning("Image size %sx%s is not in image_resize.SIZES; serving the original", width, height)
+        try:
+            return default_storage.url(name)
+        except ValueError:
+            return fallback
+    sig = _signer.signature(_payload(width, height, name))
+    return reverse("resized_image", kwargs={"sig": sig, "width": width, "height": height, "name": name})
+
+
+def check_signature(sig, width, height, name):
+    expected = _signer.signature(_payload(width, height, name))
+    return (width, height) in SIZES and signing.constant_time_compare(sig, expected)
+
+
+def cache_key(width, height, name):
+    """Also used as the ETag."""
+    return hashlib.sha1(f"{RENDER_VERSION}:{_payload(width, height, name)}".encode("utf-8")).hexdigest()
+
+
+def _cache_dir():
+    return Path(settings.RESIZED_IMAGE_CACHE_DIR)
+
+
+def _cache_path(key):
+    return _cache_dir() / key[:2] / f"{key}.webp"
+
+
+def _read_original(name):
+    with default_storage.open(name, "rb") as f:
+        return f.read()
+
+
+def get_or_render(width, height, name):
+    """
+    Path of the cached rendition, rendering it on a miss. Raises
+    FileNotFoundError for a missing original, ValueError for one Pillow rejects.
+    """
+    key = cache_key(width, height, name)
+    path = _cache_path(key)
+    try:
+        os.utime(path)  # hit: mark as recently used
+        return path
+    except FileNotFoundError:
+        pass
+
+    if not default_storage.exists(name):
+        raise FileNotFoundError(name)
+    try:
+        data = render_resized(_read_original(name), width, height, crop=SIZES[(width, height)])
+    except OSError as exc:  # PIL.UnidentifiedImageError and friends
+        raise ValueError(str(exc)) from exc
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write-then-rename: concurrent requests for the same key never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if _scan_due(len(data), settings.RESIZED_IMAGE_CACHE_MAX_BYTES):
+        evict(settings.RESIZED_IMAGE_CACHE_MAX_BYTES)
+    return path
+
+
+def _scan_due(size, max_bytes):
+    """Count a write; True once enough was written since the last scan that one is due."""
+    with _written_lock:
+        _written_since_scan["bytes"] += size
+        if _written_since_scan["bytes"] < max_bytes * EVICT_CHECK_FRACTION:
+            return False
+        _written_since_scan["bytes"] = 0
+        return True
+
+
+def evict(max_bytes):
+    """Delete least recently used renditions until the cache fits in max_bytes. Returns files removed."""
+    entries = []
+    total = 0
+    for path in _cache_dir().glob("*/*.webp"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    target = max_bytes * EVICT_TO
+    for _mtime, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= target:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass  # another worker got there first
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,209 @@
+import logging
+
+from django.db.models import Count, Prefetch
+
+from marketplace.models import Listing, ListingCard, ItemPhoto
+from marketplace.services import category_closure, image_resize
+from marketplace.utils import arabic
+
+logger = logging.getLogger(__name__)
+
+
+def _category_paths(listings):
+    return category_closure.paths_for({l.category_id for l in listings if l.category_id})
+
+
+def _category_path(category_id, paths):
+    path = paths.get(category_id) or []
+    root_id = path[0][0] if path else None
+    return " › ".join(name for _id, name in path), root_id
+
+
+def _file_url(f):
+    try:
+        return f.url if f else ""
+    except ValueError:
+        return ""
+
+
+def _avatar_url(f):
+    return image_resize.resized_url(f, 64, 64)
+
+
+def _main_photo(item):
+    photos = list(item.photos.all())  # prefetched, ordered by id
+    return next((p for p in photos if p.is_main), None) or (photos[0] if photos else None)
+
+
+def main_photo(item):
+    """(photo_url, renditions) of an Item's main photo; photos should be prefetched ordered by id."""
+    main = _main_photo(item)
+    if main is None:
+        return "", {}
+    return _file_url(main.normalized) or _file_url(main.image), main.renditions or {}
+
+
+def seller_type(user):
+    return ListingCard.SELLER_STORE if getattr(user, "store", None) is not None else ListingCard.SELLER_INDIVIDUAL
+
+
+def _seller_fields(user):
+    store = getattr(user, "store", None)
+    if store is not None:
+        name = store.name or user.username or user.first_name or ""
+        avatar = _avatar_url(store.logo) or _avatar_url(user.profile_photo)
+    else:
+        name = user.username or user.first_name or ""
+        avatar = _avatar_url(user.profile_photo)
+
+    initial_src = user.first_name or user.username or user.phone or "?"
+    return {
+        "seller_type": seller_type(user),
+        "seller_name": name,
+        "seller_avatar_url": avatar,
+        "seller_initial": initial_src[:1].upper(),
+    }
+
+
+def _listings_qs():
+    return (
+        Listing.objects
+        .filter(is_approved=True, is_active=True, is_deleted=False)
+        .select_related("category", "city", "user", "user__store", "item", "request")
+        .prefetch_related(
+            Prefetch("item__photos", queryset=ItemPhoto.objects.order_by("id")),
+            "item__attribute_values",
+            "request__attribute_values",
+        )
+        .annotate(fav_count=Count("favorited_by", distinct=True))
+    )
+
+
+def build_card(listing, category_paths):
+    """
+    Return an unsaved ListingCard for a visible listing, or None if the listing
+    has no Item/Request child yet (e.g. mid-creation).
+    """
+    if listing.type == "item":
+        child = getattr(listing, "item", None)
+    else:
+        child = getattr(listing, "request", None)
+    if child is None:
+        return None
+
+    path, root_id = _category_path(listing.category_id, category_paths)
+
+    card = ListingCard(
+        listing_id=listing.id,
+        type=listing.type,
+        object_id=child.id,
+        user_id=listing.user_id,
+        title=listing.title,
+        category_id=listing.category_id,
+        category_name=listing.category.name if listing.category else "",
+        category_path=path,
+        root_category_id=root_id,
+        city_id=listing.city_id,
+        city_name=listing.city.name if listing.city else "",
+        featured_until=listing.featured_until,
+        favorite_count=getattr(listing, "fav_count", 0) or 0,
+        created_at=listing.created_at,
+        updated_at=listing.updated_at,
+        published_at=listing.published_at,
+        **_seller_fields(listing.user),
+    )
+
+    attribute_values = [av.value_text or av.value for av in child.attribute_values.all() if av.value]
+    card.search_title = arabic.analyzed(listing.title)[:255]
+    card.search_text = arabic.analyzed(" ".join([
+        path, card.city_name, *attribute_values, listing.description or "",
+    ]))
+
+    if listing.type == "item":
+        card.price = child.price
+        card.condition = child.condition or ""
+        card.main_photo_url, card.main_photo_renditions = main_photo(child)
+    else:
+        card.budget = child.budget
+        card.condition = child.condition_preference or ""
+    return card
+
+
+def refresh_listing_cards(listing_ids):
+    """
+    Re-project the given listings: upsert rows for visible ones, drop the rest.
+    """
+    listing_ids = {int(i) for i in listing_ids if i}
+    if not listing_ids:
+        return
+
+    listings = list(_listings_qs().filter(id__in=listing_ids))
+    category_paths = _category_paths(listings)
+    cards = []
+    for listing in listings:
+        card = build_card(listing, category_paths)
+        if card is not None:
+            cards.append(card)
+
+    visible_ids = {c.listing_id for c in cards}
+    ListingCard.objects.filter(listing_id__in=listing_ids - visible_ids).delete()
+    _upsert(cards)
+
+
+def refresh_listing_card(listing_id):
+    refresh_listing_cards([listing_id])
+
+
+def refresh_cards_for_user(user_id):
+    """Seller name/avatar/type live on every card of that seller."""
+    ids = Listing.objects.filter(user_id=user_id).values_list("id", flat=True)
+    refresh_listing_cards(list(ids))
+
+
+def refresh_cards_for_categories(category_ids):
+    """Category names/paths are denormalised onto cards; re-project after a rename or move."""
+    ids = Listing.objects.filter(
+        category_id__in=category_closure.descendants_qs(category_ids)
+    ).values_list("id", flat=True)
+    refresh_listing_cards(list(ids))
+
+
+def _upsert(cards):
+    if not cards:
+        return
+    update_fields = [
+        f.name for f in ListingCard._meta.concrete_fields
+        if not f.primary_key and not f.generated
+    ]
+    ListingCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=["listing"],
+        update_fields=update_fields,
+    )
+
+
+def rebuild_listing_cards(batch_size=500):
+    """
+    Full rebuild: re-project every visible listing in batches and delete cards
+    whose listing is no longer visible.
+    Returns the number of cards written.
+    """
+    written = 0
+    last_id = 0
+
+    while True:
+        batch = list(_listings_qs().filter(id__gt=last_id).order_by("id")[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        category_paths = _category_paths(batch)
+        cards = [c for c in (build_card(l, category_paths) for l in batch) if c is not None]
+        _upsert(cards)
+        written += len(cards)
+
+    visible = Listing.objects.filter(is_approved=True, is_active=True, is_deleted=False)
+    removed, _ = ListingCard.objects.exclude(listing__in=visible).delete()
+    logger.info("Listing cards rebuilt: %s written, %s removed", written, removed)
+    return written
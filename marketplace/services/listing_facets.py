@@ -0,0 +1,156 @@
+"""
+Facet counts for the item / request grid sidebars.
+
+A facet set is
+
+    {
+        "categories": {category_id: n},   # per subtree: a root counts its descendants
+        "cities": {city_id: n},
+        "conditions": {value: n},
+        "seller_types": {value: n},
+        "price": [{"min": lo, "max": hi or None, "count": n}, ...],  # PRICE_EDGES buckets
+    }
+
+for the rows matching the current filters. The ES backend asks for it as
+aggregations on the first page's search request (es_aggregations /
+from_es_response); without ES, card_facets() gets it from ListingCard in one
+GROUPING SETS query, cached per filter signature like the result counts.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection
+
+from marketplace.services import taxonomy_cache
+from marketplace.utils.pagination import COUNT_CACHE_TTL
+
+# lower edges of the price / budget histogram buckets (JOD); the last one is open-ended
+PRICE_EDGES = (0, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+CATEGORY_TERMS = 1000
+CITY_TERMS = 200
+
+
+def rollup_categories(counts):
+    """Per-category counts -> per-subtree counts (each count also goes to every ancestor)."""
+    categories = taxonomy_cache.category_map()
+    totals = defaultdict(int)
+    for category_id, n in counts.items():
+        seen = set()
+        node = categories.get(category_id)
+        while node is not None and node.id not in seen:
+            seen.add(node.id)
+            totals[node.id] += n
+            node = categories.get(node.parent_id)
+    return dict(totals)
+
+
+def price_histogram(bucket_counts):
+    """{bucket index: n} (bucket i = [PRICE_EDGES[i], PRICE_EDGES[i + 1])) -> price facet list."""
+    histogram = []
+    for i, low in enumerate(PRICE_EDGES):
+        high = PRICE_EDGES[i + 1] if i + 1 < len(PRICE_EDGES) else None
+        histogram.append({"min": low, "max": high, "count": bucket_counts.get(i, 0)})
+    return histogram
+
+
+def build(categories=None, cities=None, conditions=None, seller_types=None, price_buckets=None):
+    return {
+        "categories": rollup_categories(categories or {}),
+        "cities": dict(cities or {}),
+        "conditions": {k: v for k, v in (conditions or {}).items() if k},
+        "seller_types": {k: v for k, v in (seller_types or {}).items() if k},
+        "price": price_histogram(price_buckets or {}),
+    }
+
+
+# -------------------------
+# Elasticsearch
+# -------------------------
+
+def es_aggregations(search, price_field="price"):
+    """Add the facet aggregations to an elasticsearch_dsl Search (in place, returns it)."""
+    search.aggs.bucket("categories", "terms", field="category_id", size=CATEGORY_TERMS)
+    search.aggs.bucket("cities", "terms", field="city_id", size=CITY_TERMS)
+    search.aggs.bucket("conditions", "terms", field="condition", size=10)
+    search.aggs.bucket("seller_types", "terms", field="seller_type", size=5)
+    ranges = [
+        {"key": str(i), "from": low, **({"to": PRICE_EDGES[i + 1]} if i + 1 < len(PRICE_EDGES) else {})}
+        for i, low in enumerate(PRICE_EDGES)
+    ]
+    search.aggs.bucket("price", "range", field=price_field, ranges=ranges)
+    return search
+
+
+def from_es_response(response):
+    aggs = response.aggregations
+
+    def terms(name, key=lambda k: k):
+        return {key(b.key): b.doc_count for b in aggs[name].buckets}
+
+    return build(
+        categories=terms("categories", int),
+        cities=terms("cities", int),
+        conditions=terms("conditions"),
+        seller_types=terms("seller_types"),
+        price_buckets={int(b.key): b.doc_count for b in aggs["price"].buckets},
+    )
+
+
+# -------------------------
+# Postgres
+# -------------------------
+
+# GROUPING(category_id, city_id, condition, seller_type, bucket): a 1 bit for
+# every column the row is *not* grouped by, first column is the high bit
+_GROUPING_SETS = {
+    0b01111: ("categories", 0),
+    0b10111: ("cities", 1),
+    0b11011: ("conditions", 2),
+    0b11101: ("seller_types", 3),
+    0b11110: ("price_buckets", 4),
+}
+
+
+def _grouped_counts(cards, price_field):
+    inner = cards.order_by().values("category_id", "city_id", "condition", "seller_type", price_field)
+    inner_sql, inner_params = inner.query.sql_with_params()
+    sql = f"""
+        SELECT category_id, city_id, condition, seller_type, bucket,
+               GROUPING(category_id, city_id, condition, seller_type, bucket), COUNT(*)
+        FROM (
+            SELECT category_id, city_id, condition, seller_type,
+                   width_bucket({price_field}::double precision, %s::double precision[]) - 1 AS bucket
+            FROM ({inner_sql}) AS cards
+        ) AS t
+        GROUP BY GROUPING SETS ((category_id), (city_id), (condition), (seller_type), (bucket))
+    """
+    counts = defaultdict(dict)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(map(float, PRICE_EDGES)), *inner_params])
+        for *values, grouping, n in cursor.fetchall():
+            facet, column = _GROUPING_SETS[grouping]
+            value = values[column]
+            # rows with no value (no city, no price) and prices below the first edge don't count
+            if value is None or (facet == "price_buckets" and value < 0):
+                continue
+            counts[facet][value] = n
+    return counts
+
+
+def card_facets(cards, price_field="price", cache_key=None):
+    """
+    Facet set for a filtered ListingCard queryset; `price_field` is "price"
+    for items, "budget" for requests. Cached for COUNT_CACHE_TTL under
+    cache_key (a filter_signature()) when given.
+    """
+    key = f"facets:{cache_key}" if cache_key else None
+    if key:
+        facets = cache.get(key)
+        if facets is not None:
+            return facets
+
+    facets = build(**_grouped_counts(cards, price_field))
+    if key:
+        cache.set(key, facets, COUNT_CACHE_TTL)
+    return facets
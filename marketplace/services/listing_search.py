@@ -0,0 +1,277 @@
+"""
+Listing search behind one interface, served by Elasticsearch or Postgres.
+
+Both backends answer item_page() (one keyset page of ListingCards for the item
+grid, the total and, on request, the sidebar facet counts) and suggestions() (autocomplete dicts). get_backend()
+picks settings.SEARCH_BACKEND; views call it without caring which one it is
+and fall back to DATABASE if a search raises (cluster down).
+
+ElasticsearchBackend: ListingDocument carries visibility (is_approved /
+is_active / is_deleted), the sort keys, city, category path ids, seller type
+and the card fields, so the grid filters, sorts and paginates in ES and only
+hydrates the page's ListingCard rows in one query, in hit order. Facets are
+aggregations on that same search request. Suggestions need no DB at all.
+
+PostgresBackend: ListingCard keeps search_title / search_text as
+utils.arabic.analyze() terms and a generated, GIN-indexed search_vector; a
+query is analyzed the same way and matches on prefix terms in the vector or
+trigram word similarity on the title (GIN gin_trgm_ops). Facets come from
+services.listing_facets.card_facets() over the matching cards.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.core import signing
+from django.db.models import F, Q
+
+from marketplace.models import ListingCard
+from marketplace.services import attribute_filters, listing_facets, search_index, taxonomy_cache
+from marketplace.utils import arabic
+from marketplace.utils.pagination import CURSOR_SALT, KeysetPage, KeysetPaginator, cached_count
+
+# item_list ?sort= -> ListingCard keyset order; every order ends in listing_id
+CARD_ORDERINGS = {
+    "priceAsc": ("price", "-created_at", "-listing_id"),
+    "priceDesc": ("-price", "-created_at", "-listing_id"),
+    "latest": ("-created_at", "-listing_id"),
+}
+
+# the same orders in ES, so search_after is total too
+SORTS = {
+    "priceAsc": [{"price": {"order": "asc", "missing": "_last"}}, {"created_at": "desc"}, {"listing_id": "desc"}],
+    "priceDesc": [{"price": {"order": "desc", "missing": "_last"}}, {"created_at": "desc"}, {"listing_id": "desc"}],
+    "latest": [{"created_at": "desc"}, {"listing_id": "desc"}],
+}
+
+TEXT_FIELDS = ["title^3", "title.edge_ngram", "category.name", "attributes.name", "city.name", "description"]
+
+
+def _sort_key(sort):
+    return sort if sort in SORTS else "latest"
+
+
+def hydrate_cards(listing_ids, queryset=None):
+    """ListingCards for listing_ids in that order, one query; ids without a card are skipped."""
+    queryset = ListingCard.objects.all() if queryset is None else queryset
+    cards = {card.listing_id: card for card in queryset.filter(listing_id__in=listing_ids)}
+    return [cards[i] for i in listing_ids if i in cards]
+
+
+def _suggestion(listing_type, object_id, title, category, photo_url="", budget=""):
+    entry = {"type": listing_type, "id": object_id, "name": title, "category": category or ""}
+    if listing_type == "request":
+        entry["budget"] = budget
+    else:
+        entry["photo_url"] = photo_url or ""
+    return entry
+
+
+class ElasticsearchBackend:
+    name = "elasticsearch"
+
+    def visible(self, listing_type):
+        """Base search: publicly visible listings of one type."""
+        from marketplace.documents import ListingDocument
+
+        return (
+            ListingDocument.search()
+            .filter("term", type=listing_type)
+            .filter("term", is_approved=True)
+            .filter("term", is_active=True)
+            .filter("term", is_deleted=False)
+        )
+
+    def text_query(self, search, q):
+        # spelling variants are folded by the analyzers, so fuzziness is only
+        # for real typos: none under 4 letters and the first letter must match
+        return search.query("multi_match", query=q, fields=TEXT_FIELDS, fuzziness="AUTO:4,8", prefix_length=1)
+
+    def apply_filters(self, search, category_ids=(), city_id=None, min_price=None, max_price=None,
+                      condition="", seller_type="", since=None, attributes=()):
+        """
+        The item_list filters; category_ids match the category or any descendant,
+        attributes are attribute_filters.AttributeFilter tuples.
+        """
+        if category_ids:
+            search = search.filter("terms", category_path_ids=[int(c) for c in category_ids])
+        if city_id:
+            search = search.filter("term", city_id=int(city_id))
+        price = {}
+        if min_price not in (None, ""):
+            price["gte"] = float(min_price)
+        if max_price not in (None, ""):
+            price["lte"] = float(max_price)
+        if price:
+            search = search.filter("range", price=price)
+        if condition:
+            search = search.filter("term", condition=condition)
+        if seller_type:
+            search = search.filter("term", seller_type=seller_type)
+        if since is not None:
+            search = search.filter("range", created_at={"gte": since})
+        return attribute_filters.es_filter(search, attributes)
+
+    def item_page(self, q, filters, sort, cursor, per_page, cards=None, count_key=None, facets=False):
+        """
+        (KeysetPage of ListingCards, total hits, facets) for the item grid.
+        `filters` are apply_filters() kwargs; `cursor` is the token from the
+        previous page (search_after values, signed like utils.pagination
+        cursors); `cards` is the ListingCard queryset to hydrate from (e.g. with
+        is_favorited annotated). With `facets`, the first page's request also
+        carries the listing_facets aggregations; facets is None otherwise.
+        """
+        order = SORTS[_sort_key(sort)]
+        signature = f"es:{_sort_key(sort)}"
+
+        after, offset = None, 0
+        if cursor:
+            try:
+                data = signing.loads(cursor, salt=CURSOR_SALT)
+                if data.get("o") == signature:
+                    after, offset = data["k"], max(int(data.get("n") or 0), 0)
+            except (signing.BadSignature, AttributeError, KeyError, TypeError, ValueError):
+                pass
+
+        search = self.apply_filters(self.text_query(self.visible("item"), q), **filters).sort(*order)
+        search = search.extra(size=per_page + 1, track_total_hits=True, _source=False)
+        if after is not None:
+            search = search.extra(search_after=after)
+        want_facets = facets and after is None
+        if want_facets:
+            listing_facets.es_aggregations(search)
+        response = search.execute()
+
+        hits = list(response.hits)
+        has_next = len(hits) > per_page
+        hits = hits[:per_page]
+        rows = hydrate_cards([int(hit.meta.id) for hit in hits], cards)
+
+        next_cursor = ""
+        if has_next and hits:
+            next_cursor = signing.dumps(
+                {"o": signature, "k": list(hits[-1].meta.sort), "n": offset + len(hits)},
+                salt=CURSOR_SALT, compress=True,
+            )
+        page_facets = listing_facets.from_es_response(response) if want_facets else None
+        return KeysetPage(rows, next_cursor, offset), response.hits.total.value, page_facets
+
+    def suggestions(self, q, listing_type, size=6):
+        """Suggestion dicts built from the hits alone (no DB round trip)."""
+        search = self.text_query(self.visible(listing_type), q).source(
+            ["object_id", "title", "category.name", "main_photo_url", "budget"]
+        )[:size]
+
+        results = []
+        for hit in search.execute():
+            budget = getattr(hit, "budget", None)
+            results.append(_suggestion(
+                listing_type,
+                hit.object_id,
+                hit.title,
+                getattr(getattr(hit, "category", None), "name", ""),
+                photo_url=getattr(hit, "main_photo_url", ""),
+                budget=f"{budget:.2f}" if budget else "",
+            ))
+        return results
+
+
+class PostgresBackend:
+    name = "postgres"
+
+    def query(self, q):
+        """(SearchQuery, analyzed text) for q, or (None, "") if nothing searchable is left."""
+        words = arabic.analyze(q)
+        if not words:
+            return None, ""
+        # prefix match on every term, so a half-typed word still finds its stem
+        raw = " & ".join(f"{word}:*" for word in words)
+        return SearchQuery(raw, search_type="raw", config="simple"), " ".join(words)
+
+    def match(self, q):
+        """Q on ListingCard for cards matching q; None when q has no searchable words."""
+        query, text = self.query(q)
+        if query is None:
+            return None
+        return Q(search_vector=query) | Q(search_title__trigram_word_similar=text)
+
+    def matching_cards(self, q, listing_type):
+        match = self.match(q)
+        cards = ListingCard.objects.filter(type=listing_type)
+        return cards.filter(match) if match is not None else cards.none()
+
+    def item_page(self, q, filters, sort, cursor, per_page, cards=None, count_key=None, facets=False):
+        """
+        Same result as ElasticsearchBackend.item_page. `cards` must already carry
+        the grid filters (the view builds that queryset for the non-search path
+        anyway), so `filters` is not applied again here. `count_key` caches the
+        total (utils.pagination.cached_count) when there is more than one page,
+        and the facets.
+        """
+        queryset = ListingCard.objects.filter(type="item") if cards is None else cards
+        if q:
+            match = self.match(q)
+            queryset = queryset.filter(match) if match is not None else queryset.none()
+
+        page = KeysetPaginator(queryset, CARD_ORDERINGS[_sort_key(sort)], per_page).get_page(cursor)
+        if page.has_next():
+            total = cached_count(queryset, count_key) if count_key else queryset.order_by().count()
+        else:
+            total = page.end_index()
+        page_facets = None
+        if facets and not cursor:
+            page_facets = listing_facets.card_facets(queryset, cache_key=count_key)
+        return page, total, page_facets
+
+    def suggestions(self, q, listing_type, size=6):
+        """Best matches first: text rank plus title word similarity."""
+        query, text = self.query(q)
+        if query is None:
+            return []
+        cards = (
+            self.matching_cards(q, listing_type)
+            .annotate(rank=SearchRank(F("search_vector"), query) + TrigramWordSimilarity(text, "search_title"))
+            .order_by("-rank", "-created_at")[:size]
+        )
+        return [
+            _suggestion(
+                listing_type,
+                card.object_id,
+                card.title,
+                card.category_name,
+                photo_url=card.main_photo_url,
+                budget=str(card.budget) if card.budget else "",
+            )
+            for card in cards
+        ]
+
+
+def category_suggestions(q, size=8):
+    """Suggestion dicts for categories whose folded name contains the folded q (cached taxonomy, no query)."""
+    needle = arabic.normalize(q)
+    if not needle:
+        return []
+    categories = taxonomy_cache.category_map()
+    results = []
+    for node in categories.values():
+        if needle in arabic.normalize(node.name):
+            parent = categories.get(node.parent_id)
+            results.append({
+                "type": "category",
+                "name": node.name,
+                "parent": parent.name if parent else "",
+                "category_id": node.id,
+                "photo_url": node.photo_url or "",
+            })
+            if len(results) >= size:
+                break
+    return results
+
+
+ELASTICSEARCH = ElasticsearchBackend()
+DATABASE = PostgresBackend()
+
+
+def get_backend():
+    """The configured backend; DATABASE when ES is configured but not available in this process."""
+    if settings.SEARCH_BACKEND == ElasticsearchBackend.name and search_index.search_enabled():
+        return ELASTICSEARCH
+    return DATABASE
@@ -2,40 +2,25 @@
 Matching service for the Lost & Found (ركن البلاغات) feature.
 
 Algorithm (mirrors the mockup's JS logic):
-  1. Normalize text (lowercase, strip Arabic diacritics, remove punctuation).
-  2. Tokenize, drop stop-words and tokens shorter than 3 characters.
+  1. Analyze text with utils.arabic (fold spelling variants, drop
+     punctuation and stop-words, light-stem), the same terms DB search uses.
+  2. Words shorter than 3 characters are ignored (before stemming).
   3. A lost report matches a found report when they share the same category
-     OR have at least 1 overlapping token in title/description.
-  4. Score = number of overlapping tokens (capped at 4 per field).
+     OR have at least 1 overlapping term in title/description.
+  4. Score = number of overlapping terms (capped at 4 per field).
   5. Persists new matches in ReportMatch; skips already-existing pairs.
 """
 
-import re
 import logging
 from django.db import transaction
 
-logger = logging.getLogger(__name__)
-
-# Arabic stop-words to ignore during tokenization
-_STOP_WORDS = {
-    'في', 'من', 'على', 'عند', 'قرب', 'هذا', 'هذه', 'مع', 'الى', 'إلى',
-    'ال', 'و', 'أو', 'لا', 'هو', 'هي', 'أن', 'كان', 'لم', 'قد', 'إن',
-}
-
-_DIACRITICS_RE = re.compile(r'[\u064b-\u065f\u0670]')
-_NON_WORD_RE = re.compile(r'[^\w\s]', re.UNICODE)
+from marketplace.utils import arabic
 
-
-def _normalize(text: str) -> str:
-    text = text.strip().lower()
-    text = _DIACRITICS_RE.sub('', text)
-    text = _NON_WORD_RE.sub(' ', text)
-    return text
+logger = logging.getLogger(__name__)
 
 
 def _tokenize(text: str) -> set:
-    tokens = _normalize(text).split()
-    return {t for t in tokens if len(t) >= 3 and t not in _STOP_WORDS}
+    return {arabic.stem(t) for t in arabic.tokens(text) if len(t) >= 3 and t not in arabic.STOP_WORDS}
 
 
 def _overlap_score(tokens_a: set, tokens_b: set, cap: int = 4) -> int:
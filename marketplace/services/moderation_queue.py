@@ -0,0 +1,143 @@
+"""
+DB-backed queue between item_create and the moderation API.
+
+The auto_moderate_item signal only enqueues a ModerationJob; `manage.py
+moderation_worker` claims due jobs in batches (SELECT ... FOR UPDATE SKIP
+LOCKED, so several workers can run), sends them to the API as one
+multi-input call on a shared client, and applies the same approve / reject /
+manual outcomes the inline signal used to. Failed calls are retried with
+exponential backoff; after MAX_ATTEMPTS the listing falls back to manual review.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from marketplace import moderation
+from marketplace.models import ModerationJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30       # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 60 * 60
+# a PROCESSING job whose worker died is picked up again after this long
+STALE_LOCK = timedelta(minutes=10)
+
+
+def enqueue(listing):
+    return ModerationJob.objects.create(listing=listing)
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+
+def claim_batch(size=None):
+    """Lock up to `size` due jobs for this worker and bump their attempt count."""
+    size = size or settings.MODERATION_BATCH_SIZE
+    now = timezone.now()
+    due = (
+        Q(status=ModerationJob.Status.PENDING, run_after__lte=now)
+        | Q(status=ModerationJob.Status.PROCESSING, locked_at__lt=now - STALE_LOCK)
+    )
+    with transaction.atomic():
+        ids = list(
+            ModerationJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("run_after", "id")
+            .values_list("id", flat=True)[:size]
+        )
+        if not ids:
+            return []
+        ModerationJob.objects.filter(id__in=ids).update(
+            status=ModerationJob.Status.PROCESSING,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(ModerationJob.objects.filter(id__in=ids).select_related("listing").order_by("id"))
+
+
+def _finish(job, status, decision, reason, latency_ms, batch_size, error=""):
+    listing = job.listing
+    with transaction.atomic():
+        # An admin may have approved/rejected the listing while it waited in the queue
+        if not (listing.is_approved or listing.rejected_at):
+            moderation.apply_decision(listing, decision, reason)
+
+        job.status = status
+        job.decision = decision
+        job.reason = reason or ""
+        job.last_error = error
+        job.latency_ms = latency_ms
+        job.batch_size = batch_size
+        job.locked_at = None
+        job.finished_at = timezone.now()
+        job.save(update_fields=[
+            "status", "decision", "reason", "last_error",
+            "latency_ms", "batch_size", "locked_at", "finished_at",
+        ])
+
+
+def _retry(job, error, latency_ms, batch_size):
+    if job.attempts >= MAX_ATTEMPTS:
+        logger.error("Moderation job %s gave up after %s attempts; listing %s goes to manual review",
+                     job.id, job.attempts, job.listing_id)
+        _finish(job, ModerationJob.Status.FAILED, "manual", None, latency_ms, batch_size, error)
+        return
+
+    job.status = ModerationJob.Status.PENDING
+    job.run_after = timezone.now() + backoff(job.attempts)
+    job.locked_at = None
+    job.last_error = error
+    job.latency_ms = latency_ms
+    job.batch_size = batch_size
+    job.save(update_fields=["status", "run_after", "locked_at", "last_error", "latency_ms", "batch_size"])
+
+
+def process_batch(size=None):
+    """Claim and moderate one batch. Returns the number of jobs handled (0 = queue idle)."""
+    jobs = claim_batch(size)
+    if not jobs:
+        return 0
+
+    texts = [moderation.listing_text(job.listing) for job in jobs]
+    started = time.monotonic()
+    try:
+        decisions = moderation.moderate_texts(texts)
+    except Exception as exc:
+        latency_ms = int((time.monotonic() - started) * 1000)
+        logger.warning("Moderation call failed for %s job(s) after %sms: %s", len(jobs), latency_ms, exc)
+        for job in jobs:
+            _retry(job, f"{type(exc).__name__}: {exc}", latency_ms, len(jobs))
+        return len(jobs)
+
+    latency_ms = int((time.monotonic() - started) * 1000)
+    logger.info("Moderated %s listing(s) in one call, %sms", len(jobs), latency_ms)
+    for job, (decision, reason) in zip(jobs, decisions):
+        logger.info("Moderation result for listing %s: %s | %s", job.listing_id, decision, reason)
+        _finish(job, ModerationJob.Status.DONE, decision, reason, latency_ms, len(jobs))
+    return len(jobs)
+
+
+def stats(since=None):
+    """Queue depth and API latency for the worker's --stats output / monitoring."""
+    qs = ModerationJob.objects.all()
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+
+    by_status = dict(qs.values_list("status").annotate(n=Count("id")).order_by())
+    latency = qs.filter(latency_ms__isnull=False).aggregate(
+        avg_latency_ms=Avg("latency_ms"),
+        max_latency_ms=Max("latency_ms"),
+        avg_batch_size=Avg("batch_size"),
+    )
+    return {
+        "by_status": {status: by_status.get(status, 0) for status in ModerationJob.Status.values},
+        **latency,
+    }
@@ -1,7 +1,12 @@
 # marketplace/services/notifications.py
 from __future__ import annotations
 
+from collections import Counter
+
+from django.db import transaction
+
 from marketplace.models import Notification
+from marketplace.services import counters
 
 # -----------------------------
 # KINDS (icon/color family)
@@ -13,6 +18,7 @@ K_FAV = "fav"
 K_SYSTEM = "system"
 K_STORE_FOLLOW = "store_follow"
 K_REPORT = "report"
+K_SAVED_SEARCH = "saved_search"
 
 # -----------------------------
 # STATUSES (badge)
@@ -45,6 +51,9 @@ S_SUBMITTED = "submitted"
 S_RESOLVED = "resolved"
 S_DISMISSED = "dismissed"
 
+# saved_search
+S_MATCHED = "matched"
+
 
 def notify(
     *,
@@ -86,4 +95,36 @@ def notify_many(*, users, **kwargs):
     Usage:
         notify_many(users=reporters_qs, kind=K_REPORT, status=S_RESOLVED, title="...")
     """
-    return [notify(user=user, **kwargs) for user in users]
\ No newline at end of file
+    return [notify(user=user, **kwargs) for user in users]
+
+
+def notify_bulk(entries):
+    """
+    Create many notifications in one INSERT. Each entry takes notify()'s
+    keyword arguments, with user_id (or user). bulk_create skips the
+    Notification post_save counter, so unread counters are bumped here once
+    the transaction commits.
+    """
+    notifications = [
+        Notification(
+            user_id=entry.get("user_id") or entry["user"].pk,
+            kind=entry.get("kind", K_SYSTEM),
+            status=entry.get("status") or "",
+            title=entry["title"],
+            body=entry.get("body") or "",
+            listing=entry.get("listing"),
+            store=entry.get("store"),
+            is_read=entry.get("is_read", False),
+        )
+        for entry in entries
+    ]
+    created = Notification.objects.bulk_create(notifications)
+
+    unread = Counter(n.user_id for n in created if not n.is_read)
+
+    def _bump():
+        for user_id, n in unread.items():
+            counters.adjust(user_id, counters.UNREAD_NOTIFICATIONS, n)
+
+    transaction.on_commit(_bump)
+    return created
@@ -0,0 +1,82 @@
+"""
+Near-duplicate photo lookup over ItemPhoto.phash / ReportPhoto.phash.
+
+Hashes are dHashes (utils.images.dhash) written by the photo worker and the
+lost & found upload; `manage.py backfill_photo_hashes` fills in older rows.
+Lookups go through the per-band expression indexes (utils.phash), so a probe
+touches a few candidate rows instead of scanning every photo.
+"""
+import logging
+
+from marketplace.models import ItemPhoto, ReportPhoto
+from marketplace.utils import phash
+from marketplace.utils.images import image_dhash
+
+logger = logging.getLogger(__name__)
+
+# dHash bits that may differ between "the same photo" (re-encoded, resized,
+# lightly cropped or filtered). Above ~10 unrelated photos start to match.
+MAX_DISTANCE = 6
+
+
+def similar_photos(queryset, value, max_distance=MAX_DISTANCE):
+    """[(photo, distance)] from `queryset` within max_distance of `value`, closest first."""
+    candidates = (
+        queryset
+        .exclude(phash=None)
+        .annotate(**phash.band_annotations())
+        .filter(phash.within(value, max_distance))
+    )
+    matches = [(photo, phash.hamming(photo.phash, value)) for photo in candidates]
+    return sorted((m for m in matches if m[1] <= max_distance), key=lambda m: (m[1], m[0].pk))
+
+
+def similar_item_photos(value, max_distance=MAX_DISTANCE):
+    return similar_photos(ItemPhoto.objects.select_related("item__listing"), value, max_distance)
+
+
+def similar_report_photos(value, max_distance=MAX_DISTANCE):
+    return similar_photos(ReportPhoto.objects.select_related("report"), value, max_distance)
+
+
+def listing_duplicates(listing, max_distance=MAX_DISTANCE, limit=10):
+    """
+    Other listings that share a near-identical photo with `listing`, closest first:
+
+        [{"listing": Listing, "distance": int, "matches": [(own_photo_id, ItemPhoto, distance), ...]}]
+    """
+    own = ItemPhoto.objects.filter(item__listing=listing).exclude(phash=None).values_list("id", "phash")
+    others = ItemPhoto.objects.exclude(item__listing=listing).select_related("item__listing")
+
+    found = {}
+    for photo_id, value in own:
+        for match, distance in similar_photos(others, value, max_distance):
+            other = match.item.listing
+            entry = found.setdefault(other.pk, {"listing": other, "distance": distance, "matches": []})
+            entry["distance"] = min(entry["distance"], distance)
+            entry["matches"].append((photo_id, match, distance))
+
+    return sorted(found.values(), key=lambda e: (e["distance"], -e["listing"].pk))[:limit]
+
+
+def backfill_hashes(model, batch_size=200):
+    """Hash every `model` photo (ItemPhoto / ReportPhoto) that has none yet. Returns (hashed, failed)."""
+    hashed = failed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            model.objects.filter(phash=None, pk__gt=last_id).exclude(image="").order_by("pk")[:batch_size]
+        )
+        if not batch:
+            return hashed, failed
+        for photo in batch:
+            try:
+                with photo.image.open("rb") as f:
+                    photo.phash = image_dhash(f.read())
+            except Exception as exc:
+                logger.warning("Hashing %s %s failed: %s", model.__name__, photo.pk, exc)
+                failed += 1
+                continue
+            photo.save(update_fields=["phash"])
+            hashed += 1
+        last_id = batch[-1].pk
@@ -0,0 +1,125 @@
+"""
+Off-request ItemPhoto normalization.
+
+New photos are saved with normalize_status=pending and the templates show the
+original until the normalized file exists. `manage.py normalize_photos` claims
+due photos (SELECT ... FOR UPDATE SKIP LOCKED), reads the originals, renders
+them in a process pool (utils.images.render_photo_set is Django-free) and
+writes the normalized file plus its WebP/JPEG renditions back. Failures are
+retried with backoff; after MAX_ATTEMPTS a photo is marked failed and keeps
+showing its original.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from marketplace.models import ItemPhoto
+from marketplace.utils.images import render_photo_set
+
+logger = logging.getLogger(__name__)
+
+Status = ItemPhoto.NormalizeStatus
+
+BATCH_SIZE = 16
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 60       # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 60 * 60
+# a PROCESSING photo whose worker died is picked up again after this long
+STALE_LOCK = timedelta(minutes=10)
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+
+def claim_batch(size=BATCH_SIZE):
+    now = timezone.now()
+    due = (
+        Q(normalize_status=Status.PENDING, normalize_after__lte=now)
+        | Q(normalize_status=Status.PROCESSING, normalize_locked_at__lt=now - STALE_LOCK)
+    )
+    with transaction.atomic():
+        ids = list(
+            ItemPhoto.objects
+            .select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("normalize_after", "id")
+            .values_list("id", flat=True)[:size]
+        )
+        if not ids:
+            return []
+        ItemPhoto.objects.filter(id__in=ids).update(
+            normalize_status=Status.PROCESSING,
+            normalize_locked_at=now,
+            normalize_attempts=F("normalize_attempts") + 1,
+        )
+    return list(ItemPhoto.objects.filter(id__in=ids).order_by("id"))
+
+
+def _read_original(photo):
+    photo.image.open("rb")
+    try:
+        return photo.image.read()
+    finally:
+        try:
+            photo.image.close()
+        except OSError:
+            pass
+
+
+def _fail(photo, error):
+    logger.warning("Normalizing photo %s failed (attempt %s): %s", photo.pk, photo.normalize_attempts, error)
+    if photo.normalize_attempts >= MAX_ATTEMPTS:
+        photo.normalize_status = Status.FAILED
+    else:
+        photo.normalize_status = Status.PENDING
+        photo.normalize_after = timezone.now() + backoff(photo.normalize_attempts)
+    photo.normalize_locked_at = None
+    photo.save(update_fields=["normalize_status", "normalize_after", "normalize_locked_at"])
+
+
+def process_batch(pool=None, size=BATCH_SIZE):
+    """
+    Normalize one batch. `pool` is a concurrent.futures executor for the CPU
+    work; None renders inline. Returns the number of photos handled (0 = idle).
+    """
+    photos = claim_batch(size)
+    if not photos:
+        return 0
+
+    pending = []
+    for photo in photos:
+        try:
+            data = _read_original(photo)
+        except Exception as exc:
+            _fail(photo, exc)
+            continue
+        future = pool.submit(render_photo_set, data) if pool is not None else None
+        # the pool has its own copy; don't keep every original in memory here
+        pending.append((photo, future, None if future is not None else data))
+
+    for photo, future, data in pending:
+        try:
+            photo_set = future.result() if future is not None else render_photo_set(data)
+            photo.save_photo_set(photo_set)
+        except Exception as exc:
+            _fail(photo, exc)
+    return len(photos)
+
+
+def requeue_missing():
+    """Backfill: put every photo without a normalized file or renditions back in the queue."""
+    return (
+        ItemPhoto.objects
+        .filter(Q(normalized="") | Q(normalized__isnull=True) | Q(renditions={}))
+        .exclude(image="")
+        .update(
+            normalize_status=Status.PENDING,
+            normalize_attempts=0,
+            normalize_after=timezone.now(),
+            normalize_locked_at=None,
+        )
+    )
@@ -0,0 +1,339 @@
+"""
+Saved searches and their new-listing alerts.
+
+A SavedSearch is item_list's filter set, normalized: the query as
+utils.arabic.analyze() terms, category subtrees, city, price range, condition
+and seller type (the time window and the sort don't mean anything for alerts).
+
+Matching works like a percolator: new listings are the documents, saved
+searches the queries. Each search is filed under the keys of its most
+selective filter (SavedSearch.keys, GIN-indexed):
+
+    t:<prefix>   its longest query term, first ANCHOR_CHARS characters
+    c:<id>       each of its category subtrees
+    l:<id>       its city
+    p:<i>        each listing_facets.PRICE_EDGES band its price range overlaps
+
+and a listing yields every key that can point at a search it satisfies
+(short prefixes of its terms, its category and every ancestor, its city, its
+price band). One `keys && <batch keys>` query fetches the candidates for a
+whole batch, and each candidate is checked against the listing in full. A
+listing only meets the searches filed under one of its own features, never
+the whole table. Searches without any of those filters would match
+everything and are refused.
+
+Listings are queued (SavedSearchQueue) as they become visible and drained by
+`manage.py saved_search_worker`. A match is recorded once per (search,
+listing); "instant" searches are notified at the end of each batch and
+"daily" ones by send_digests(), one notification per search, all in one
+notify_bulk() INSERT.
+"""
+import bisect
+import logging
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from marketplace.models import CategoryClosure, City, ListingCard, SavedSearch, SavedSearchMatch, SavedSearchQueue
+from marketplace.services import search_cache, taxonomy_cache
+from marketplace.services.listing_facets import PRICE_EDGES
+from marketplace.services.notifications import K_SAVED_SEARCH, S_MATCHED, notify_bulk
+from marketplace.utils import arabic
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+ANCHOR_CHARS = 4
+MAX_PER_USER = 20
+DIGEST_EVERY = timedelta(days=1)
+
+
+class InvalidSavedSearch(ValueError):
+    """`code` is "too_broad" (nothing selective to match on) or "limit" (MAX_PER_USER reached)."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+# -------------------------
+# Saving
+# -------------------------
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and number >= 0 else None
+
+
+def _int_ids(values):
+    # isdecimal, not isdigit: int() rejects digits like "²"
+    return {int(v) for v in values if str(v).strip().isdecimal()}
+
+
+def normalize(params):
+    """item_list query parameters (a QueryDict) -> SavedSearch field values."""
+    query = (params.get("q") or "").strip()[:200]
+    wanted = _int_ids([params["category"]] if params.get("category") else params.getlist("categories"))
+    category_ids = sorted(taxonomy_cache.category_map().keys() & wanted)
+
+    city_id = next(iter(_int_ids([params.get("city") or ""])), None)
+    if city_id is not None and not City.objects.filter(pk=city_id).exists():
+        city_id = None
+
+    min_price, max_price = _number(params.get("min_price")), _number(params.get("max_price"))
+    if min_price is not None and max_price is not None and min_price > max_price:
+        min_price, max_price = max_price, min_price
+
+    seller_type = (params.get("seller_type") or "").strip()
+    if seller_type not in (ListingCard.SELLER_STORE, ListingCard.SELLER_INDIVIDUAL):
+        seller_type = ""
+
+    return {
+        "query": query,
+        # item_list doesn't search on fewer than 2 characters either
+        "terms": " ".join(sorted(set(arabic.analyze(query)))) if len(query) >= 2 else "",
+        "category_ids": category_ids,
+        "city_id": city_id,
+        "min_price": min_price,
+        "max_price": max_price,
+        "condition": (params.get("condition") or "").strip()[:20],
+        "seller_type": seller_type,
+    }
+
+
+def _price_band(price):
+    return max(bisect.bisect_right(PRICE_EDGES, price) - 1, 0)
+
+
+def search_keys(search):
+    """Index keys for a SavedSearch: its most selective filter only. [] if it has none."""
+    terms = search.terms.split()
+    if terms:
+        return [f"t:{max(terms, key=len)[:ANCHOR_CHARS]}"]
+    if search.category_ids:
+        return [f"c:{i}" for i in search.category_ids]
+    if search.city_id:
+        return [f"l:{search.city_id}"]
+    if search.min_price is not None or search.max_price is not None:
+        low = _price_band(search.min_price or 0)
+        high = len(PRICE_EDGES) - 1 if search.max_price is None else _price_band(search.max_price)
+        return [f"p:{i}" for i in range(low, high + 1)]
+    return []
+
+
+def _default_name(search):
+    parts = [search.query] if search.terms else []
+    categories = taxonomy_cache.category_map()
+    parts += [categories[i].name for i in search.category_ids if i in categories]
+    if search.city_id:
+        parts.append(City.objects.filter(pk=search.city_id).values_list("name", flat=True).first() or "")
+    if search.min_price is not None or search.max_price is not None:
+        low = f"{search.min_price:g}" if search.min_price is not None else "0"
+        high = f"{search.max_price:g}" if search.max_price is not None else "+"
+        parts.append(f"{low}–{high}")
+    return " · ".join(p for p in parts if p)[:200]
+
+
+def save_search(user, params, notify=SavedSearch.NOTIFY_INSTANT):
+    """
+    The user's SavedSearch for these item_list params, created if new; saving
+    the same filters again only updates `notify`. Returns (search, created).
+    Raises InvalidSavedSearch.
+    """
+    fields = normalize(params)
+    search = SavedSearch(user=user, notify=notify, **fields)
+    search.keys = search_keys(search)
+    if not search.keys:
+        raise InvalidSavedSearch("too_broad")
+    search.signature = search_cache.signature("saved", {
+        "terms": search.terms,
+        "categories": search.category_ids,
+        "city": search.city_id,
+        "min_price": search.min_price,
+        "max_price": search.max_price,
+        "condition": search.condition,
+        "seller_type": search.seller_type,
+    })
+
+    existing = SavedSearch.objects.filter(user=user, signature=search.signature).first()
+    if existing:
+        if existing.notify != notify:
+            existing.notify = notify
+            existing.save(update_fields=["notify"])
+        return existing, False
+    if SavedSearch.objects.filter(user=user).count() >= MAX_PER_USER:
+        raise InvalidSavedSearch("limit")
+
+    search.name = _default_name(search)
+    search.save()
+    return search, True
+
+
+# -------------------------
+# Matching
+# -------------------------
+
+def enqueue(listing_ids):
+    """Queue listings that just became visible for matching."""
+    ids = sorted({i for i in listing_ids if i})
+    if ids:
+        SavedSearchQueue.objects.bulk_create(
+            [SavedSearchQueue(listing_id=i) for i in ids], ignore_conflicts=True,
+        )
+
+
+def listing_keys(card, ancestors, terms):
+    """Every index key a SavedSearch matching this card could be filed under."""
+    keys = {f"c:{i}" for i in ancestors}
+    if card.city_id:
+        keys.add(f"l:{card.city_id}")
+    if card.price is not None:
+        keys.add(f"p:{_price_band(card.price)}")
+    for term in terms:
+        for n in range(1, min(len(term), ANCHOR_CHARS) + 1):
+            keys.add(f"t:{term[:n]}")
+    return keys
+
+
+def matches(search, card, ancestors, terms):
+    """Full check of one candidate. Query terms match as prefixes, like item_list's search."""
+    if search.user_id == card.user_id:
+        return False
+    if search.category_ids and ancestors.isdisjoint(search.category_ids):
+        return False
+    if search.city_id and search.city_id != card.city_id:
+        return False
+    if search.min_price is not None and (card.price is None or card.price < search.min_price):
+        return False
+    if search.max_price is not None and (card.price is None or card.price > search.max_price):
+        return False
+    if search.condition and search.condition != card.condition:
+        return False
+    if search.seller_type and search.seller_type != card.seller_type:
+        return False
+    return all(any(term.startswith(wanted) for term in terms) for wanted in search.terms.split())
+
+
+def match_cards(cards):
+    """{SavedSearch: [ListingCard, ...]} for item cards, with one query for all the candidates."""
+    cards = [card for card in cards if card.type == "item"]
+    ancestors = defaultdict(set)
+    closure = CategoryClosure.objects.filter(
+        descendant_id__in={card.category_id for card in cards if card.category_id}
+    ).values_list("descendant_id", "ancestor_id")
+    for descendant_id, ancestor_id in closure:
+        ancestors[descendant_id].add(ancestor_id)
+
+    features, batch_keys = {}, set()
+    for card in cards:
+        card_ancestors = ancestors.get(card.category_id, set())
+        terms = set(card.search_title.split()) | set(card.search_text.split())
+        keys = listing_keys(card, card_ancestors, terms)
+        features[card.listing_id] = (card_ancestors, terms, keys)
+        batch_keys |= keys
+    if not batch_keys:
+        return {}
+
+    index = defaultdict(list)
+    candidates = SavedSearch.objects.filter(keys__overlap=sorted(batch_keys)).exclude(notify=SavedSearch.NOTIFY_OFF)
+    for search in candidates:
+        for key in search.keys:
+            index[key].append(search)
+
+    results = defaultdict(list)
+    for card in cards:
+        card_ancestors, terms, keys = features[card.listing_id]
+        seen = set()
+        for key in keys:
+            for search in index.get(key, ()):
+                if search.pk not in seen:
+                    seen.add(search.pk)
+                    if matches(search, card, card_ancestors, terms):
+                        results[search].append(card)
+    return dict(results)
+
+
+def _notify_pending(searches, now):
+    """One notification per search for its unnotified matches (listings still visible). Returns the count."""
+    if not searches:
+        return 0
+    pending = defaultdict(list)
+    rows = (
+        SavedSearchMatch.objects
+        .filter(saved_search__in=searches, notified_at__isnull=True, listing__card__isnull=False)
+        .select_related("listing")
+        .order_by("-matched_at", "-listing_id")
+    )
+    for match in rows:
+        pending[match.saved_search_id].append(match)
+
+    by_id = {search.pk: search for search in searches}
+    entries = []
+    for search_id, found in pending.items():
+        search = by_id[search_id]
+        label = search.name or search.query
+        newest = found[0].listing
+        if len(found) == 1:
+            title = "إعلان جديد يطابق بحثك المحفوظ"
+            body = f"«{label}»: {newest.title}"
+        else:
+            title = f"{len(found)} إعلانات جديدة تطابق بحثك المحفوظ"
+            body = f"«{label}»"
+        entries.append({
+            "user_id": search.user_id, "kind": K_SAVED_SEARCH, "status": S_MATCHED,
+            "title": title, "body": body, "listing": newest,
+        })
+
+    notify_bulk(entries)
+    SavedSearchMatch.objects.filter(pk__in=[m.pk for found in pending.values() for m in found]).update(notified_at=now)
+    SavedSearch.objects.filter(pk__in=list(pending)).update(last_notified_at=now)
+    return len(entries)
+
+
+def process_batch(size=BATCH_SIZE):
+    """Match up to `size` queued listings and notify instant searches. Returns the listings taken off the queue."""
+    with transaction.atomic():
+        ids = list(
+            SavedSearchQueue.objects
+            .select_for_update(skip_locked=True)
+            .order_by("queued_at")
+            .values_list("listing_id", flat=True)[:size]
+        )
+        if not ids:
+            return 0
+        # no card: hidden again (or deleted) before we got to it
+        results = match_cards(ListingCard.objects.filter(listing_id__in=ids))
+        now = timezone.now()
+        SavedSearchMatch.objects.bulk_create(
+            [
+                SavedSearchMatch(saved_search=search, listing_id=card.listing_id, matched_at=now)
+                for search, cards in results.items()
+                for card in cards
+            ],
+            ignore_conflicts=True,  # re-published listings were matched before
+        )
+        SavedSearchQueue.objects.filter(listing_id__in=ids).delete()
+        sent = _notify_pending([s for s in results if s.notify == SavedSearch.NOTIFY_INSTANT], now)
+
+    logger.info("Saved searches: %s listing(s) matched, %s notification(s)", len(ids), sent)
+    return len(ids)
+
+
+def send_digests(now=None):
+    """Notify "daily" searches with pending matches that weren't notified within DIGEST_EVERY."""
+    now = now or timezone.now()
+    due = (
+        SavedSearch.objects
+        .filter(notify=SavedSearch.NOTIFY_DAILY, matches__notified_at__isnull=True)
+        .filter(Q(last_notified_at__isnull=True) | Q(last_notified_at__lte=now - DIGEST_EVERY))
+        .distinct()
+    )
+    with transaction.atomic():
+        return _notify_pending(list(due), now)
@@ -0,0 +1,122 @@
+"""
+Short-lived cache of search results, shared by every process.
+
+An entry is what a search found, not how it renders: the page's listing ids
+in order, the total, the next cursor and the sidebar facets. It is keyed on
+a signature of the normalized query (utils.arabic.normalize, so spelling
+variants share one entry), the filters, the sort and the cursor, plus the
+search generation: a counter in the shared cache that the Listing signals
+bump whenever a listing appears or disappears (approved, deactivated,
+deleted, ...). Other edits (a new price, a new title) show up when the entry
+expires, at most RESULT_TTL later.
+
+Nothing per user is cached; views hydrate the ids from their own queryset
+(with is_favorited annotated), so favourites are overlaid after the read.
+
+On a miss one caller computes the entry while holding a lock key; concurrent
+callers for the same signature wait up to LOCK_WAIT for it instead of all
+hitting the search backend at once.
+"""
+import hashlib
+import random
+import time
+
+from django.core.cache import cache
+
+from marketplace.utils import arabic
+from marketplace.utils.pagination import KeysetPage
+
+GENERATION_KEY = "search:generation"
+RESULT_TTL = 30
+TTL_JITTER = 5          # entries built together don't all expire together
+LOCK_TTL = 10           # a computing process that died releases the lock by itself
+LOCK_WAIT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def generation():
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        value = cache.get(GENERATION_KEY) or 1
+    return value
+
+
+def bump_generation():
+    """Invalidate every cached search result."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 2, timeout=None)
+
+
+def signature(kind, params):
+    """
+    Canonical digest of a search: "q" is normalized, empty values are dropped,
+    lists are sorted, everything else is compared as a string.
+    """
+    parts = []
+    for name, value in params.items():
+        if name == "q":
+            value = arabic.normalize(value or "")
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(str(v) for v in value)
+        elif value is not None:
+            value = str(value)
+        if value in (None, "", []):
+            continue
+        parts.append((name, value))
+    digest = hashlib.md5(repr(sorted(parts)).encode("utf-8")).hexdigest()
+    return f"{kind}:{digest}"
+
+
+def get_or_compute(kind, params, compute, ttl=RESULT_TTL):
+    """The cached value for (kind, params), computing and storing it with compute() on a miss."""
+    key = f"search:{generation()}:{signature(kind, params)}"
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock = f"{key}:lock"
+    if not cache.add(lock, 1, LOCK_TTL):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        # the other caller is slow or gone; answer this request ourselves
+        return compute()
+
+    try:
+        value = compute()
+        cache.set(key, value, ttl + random.randint(0, TTL_JITTER))
+    finally:
+        cache.delete(lock)
+    return value
+
+
+def cached_page(kind, params, compute, hydrate):
+    """
+    (page, total, facets) for a grid search through the cache. compute() runs
+    the search and returns that triple (page rows have a listing_id);
+    hydrate(ids) loads the rows for a cached id list, in that order.
+    """
+    computed = []
+
+    def build():
+        page, total, facets = compute()
+        computed.append((page, total, facets))
+        return {
+            "ids": [row.listing_id for row in page.object_list],
+            "total": total,
+            "next_cursor": page.next_cursor,
+            "offset": page.offset,
+            "facets": facets,
+        }
+
+    entry = get_or_compute(kind, params, build)
+    if computed:
+        return computed[0]
+    page = KeysetPage(hydrate(entry["ids"]), entry["next_cursor"], entry["offset"])
+    return page, entry["total"], entry["facets"]
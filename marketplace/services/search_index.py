@@ -0,0 +1,225 @@
+"""
+Coalescing, bulk Elasticsearch indexing for ListingDocument.
+
+django_elasticsearch_dsl autosync is off. Signals call mark_dirty() instead,
+which upserts one SearchIndexQueue row per listing (inside the writer's
+transaction, so the row commits with the change). `manage.py
+search_index_worker` claims due rows (SELECT ... FOR UPDATE SKIP LOCKED),
+loads the listings with everything prepare_*() needs prefetched, and sends one
+helpers.bulk() request per batch: index for listings that exist, delete for
+ones that are gone.
+
+A row is only removed if it wasn't dirtied again after it was claimed; documents ES rejects are retried with backoff. Indexing lag is the age
+of the oldest queued change (stats()).
+
+mark_dirty() also appends to SearchIndexChange, the log `manage.py
+reindex_listings` (services/search_reindex.py) replays onto a new index; the
+worker prunes it after CHANGE_LOG_RETENTION.
+
+Without Elasticsearch (SEARCH_BACKEND=postgres, or ES disabled under RENDER)
+nothing would ever drain either table, so mark_dirty() does nothing there;
+switching to ES means a full `manage.py reindex_listings` anyway.
+"""
+import logging
+import time
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from marketplace.models import SearchIndexChange, SearchIndexQueue
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+BACKOFF_BASE = 30       # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 60 * 60
+# a batch whose worker died is picked up again after this long
+STALE_LOCK = timedelta(minutes=10)
+# long enough to cover the longest reindex_listings run
+CHANGE_LOG_RETENTION = timedelta(days=2)
+
+LAST_FLUSH_KEY = "search_index:last_flush"
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+
+# -------------------------
+# Producers
+# -------------------------
+
+def indexing_enabled():
+    """True when listings are searched in Elasticsearch here, i.e. the queue has a worker."""
+    return settings.SEARCH_BACKEND == "elasticsearch" and search_enabled()
+
+
+def mark_dirty(listing_ids):
+    """Queue listings for re-indexing; already-queued ones just get a newer last_dirtied_at."""
+    if not indexing_enabled():
+        return
+    ids = {i for i in listing_ids if i}
+    if not ids:
+        return
+    now = timezone.now()
+    SearchIndexQueue.objects.bulk_create(
+        [SearchIndexQueue(listing_id=i, first_dirtied_at=now, last_dirtied_at=now) for i in sorted(ids)],
+        update_conflicts=True,
+        unique_fields=["listing_id"],
+        update_fields=["last_dirtied_at"],
+    )
+    SearchIndexChange.objects.bulk_create(
+        [SearchIndexChange(listing_id=i, changed_at=now) for i in sorted(ids)]
+    )
+
+
+def mark_queryset_dirty(listings, chunk_size=2000):
+    """Queue every listing in a Listing queryset (taxonomy renames, backfills). Returns the count."""
+    if not indexing_enabled():
+        return 0
+    total = 0
+    ids = []
+    for listing_id in listings.values_list("id", flat=True).iterator(chunk_size=chunk_size):
+        ids.append(listing_id)
+        if len(ids) >= chunk_size:
+            mark_dirty(ids)
+            total += len(ids)
+            ids = []
+    mark_dirty(ids)
+    return total + len(ids)
+
+
+# -------------------------
+# Worker
+# -------------------------
+
+def search_enabled():
+    from marketplace.documents import ListingDocument
+    return hasattr(ListingDocument, "search")
+
+
+def _document():
+    from marketplace.documents import ListingDocument
+    return ListingDocument()
+
+
+def _bulk(actions, client=None):
+    """(success_count, [error items]); raises if the cluster can't be reached at all."""
+    from elasticsearch import helpers
+    from elasticsearch_dsl.connections import get_connection
+
+    return helpers.bulk(client or get_connection(), actions, raise_on_error=False, ignore_status=(404,))
+
+
+def claim_batch(size=BATCH_SIZE):
+    """Lock up to `size` due rows and return them."""
+    now = timezone.now()
+    due = Q(run_after__lte=now) & (Q(locked_at__isnull=True) | Q(locked_at__lt=now - STALE_LOCK))
+    with transaction.atomic():
+        ids = list(
+            SearchIndexQueue.objects
+            .select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("first_dirtied_at")
+            .values_list("listing_id", flat=True)[:size]
+        )
+        if not ids:
+            return []
+        SearchIndexQueue.objects.filter(listing_id__in=ids).update(locked_at=now)
+    return list(SearchIndexQueue.objects.filter(listing_id__in=ids))
+
+
+def _retry(ids, error):
+    now = timezone.now()
+    for row in SearchIndexQueue.objects.filter(listing_id__in=ids):
+        row.attempts += 1
+        row.run_after = now + backoff(row.attempts)
+        row.locked_at = None
+        row.last_error = str(error)[:2000]
+        row.save(update_fields=["attempts", "run_after", "locked_at", "last_error"])
+
+
+def _actions(document, ids, index_name=None):
+    """Bulk actions for listing ids: index the ones that exist, delete the rest."""
+    index_name = index_name or document._index._name
+    listings = {listing.pk: listing for listing in document.get_queryset().filter(pk__in=ids)}
+    for listing_id in ids:
+        listing = listings.get(listing_id)
+        if listing is None:
+            yield {"_op_type": "delete", "_index": index_name, "_id": listing_id}
+        else:
+            yield {"_op_type": "index", "_index": index_name, "_id": listing_id, "_source": document.prepare(listing)}
+
+
+def flush(size=BATCH_SIZE):
+    """Index one batch. Returns the number of rows handled (0 = idle or ES unreachable)."""
+    rows = claim_batch(size)
+    if not rows:
+        return 0
+    ids = [row.listing_id for row in rows]
+
+    started = time.monotonic()
+    try:
+        indexed, errors = _bulk(list(_actions(_document(), ids)))
+    except Exception as exc:
+        logger.warning("Search indexing batch of %s failed: %s", len(ids), exc)
+        _retry(ids, exc)
+        return 0
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+
+    failed = {}
+    for error in errors:
+        op = next(iter(error.values()))
+        failed[int(op["_id"])] = op.get("error") or op.get("status")
+    for listing_id, error in failed.items():
+        _retry([listing_id], error)
+
+    done = [row for row in rows if row.listing_id not in failed]
+    if done:
+        # only rows still at the version we indexed; a save that landed after
+        # the listings were read bumped last_dirtied_at and stays queued
+        unchanged = reduce(or_, (Q(listing_id=row.listing_id, last_dirtied_at=row.last_dirtied_at) for row in done))
+        with transaction.atomic():
+            SearchIndexQueue.objects.filter(unchanged).delete()
+            SearchIndexQueue.objects.filter(listing_id__in=[row.listing_id for row in done]).update(
+                locked_at=None, attempts=0,
+            )
+
+    now = timezone.now()
+    lag = max((now - row.first_dirtied_at).total_seconds() for row in rows)
+    cache.set(LAST_FLUSH_KEY, {
+        "at": now.isoformat(),
+        "batch": len(ids),
+        "indexed": indexed,
+        "failed": len(failed),
+        "bulk_ms": elapsed_ms,
+        "max_lag_s": round(lag, 1),
+    }, None)
+    logger.info("Search index: %s document(s) in %sms, %s failed, max lag %.1fs",
+                len(ids), elapsed_ms, len(failed), lag)
+    return len(ids)
+
+
+def prune_changes(retention=CHANGE_LOG_RETENTION):
+    """Drop change log rows older than `retention`. Returns the number removed."""
+    removed, _ = SearchIndexChange.objects.filter(changed_at__lt=timezone.now() - retention).delete()
+    return removed
+
+
+def stats():
+    now = timezone.now()
+    queue = SearchIndexQueue.objects
+    oldest = queue.order_by("first_dirtied_at").values_list("first_dirtied_at", flat=True).first()
+    return {
+        "queued": queue.count(),
+        "due": queue.filter(run_after__lte=now).count(),
+        "retrying": queue.filter(attempts__gt=0).count(),
+        "lag_s": (now - oldest).total_seconds() if oldest else 0.0,
+        "last_flush": cache.get(LAST_FLUSH_KEY),
+    }
@@ -0,0 +1,222 @@
+"""
+Zero-downtime rebuilds of the listings index (`manage.py reindex_listings`).
+
+ListingDocument.Index.name ("listings") is an alias; the documents live in
+versioned indices listings_v1, listings_v2, ... reindex():
+
+1. creates listings_v{N+1} from the current ListingDocument mapping and
+   analysis, with refresh and replicas off while it loads;
+2. notes the newest SearchIndexChange id, then loads every listing with
+   `workers` processes, each streaming disjoint id ranges through
+   get_queryset().iterator(chunk_size=queryset_pagination) into bulk requests;
+3. replays the change log written meanwhile onto the new index until what is
+   left is small, restores the index settings and refreshes;
+4. points the alias at the new index in one _aliases call (a legacy concrete
+   "listings" index is dropped in the same call) and replays once more, for
+   changes the worker sent to the old index just before the swap.
+
+Searches and search_index_worker only ever use the alias, so both keep
+working throughout; older versions beyond `keep` are deleted at the end.
+"""
+import logging
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max, Min
+
+from marketplace.models import Listing, SearchIndexChange
+from marketplace.services import search_index
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK = search_index.BATCH_SIZE
+RANGES_PER_WORKER = 4    # smaller ranges even out workers that drew dense ones
+CATCH_UP_PASSES = 5
+CATCH_UP_DONE = 100      # changes left that are fine to replay after the swap
+
+
+def _client():
+    from elasticsearch_dsl.connections import get_connection
+    return get_connection()
+
+
+def alias_name():
+    return search_index._document()._index._name
+
+
+def id_ranges(parts):
+    """Disjoint [lo, hi) Listing id ranges covering every listing, at most `parts` of them."""
+    bounds = Listing.objects.aggregate(lo=Min("id"), hi=Max("id"))
+    if bounds["lo"] is None:
+        return []
+    lo, hi = bounds["lo"], bounds["hi"] + 1
+    step = max(-(-(hi - lo) // parts), 1)
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+
+def next_index_name(client, alias):
+    versions = [0]
+    for name in client.indices.get(index=f"{alias}_v*"):
+        match = re.fullmatch(rf"{re.escape(alias)}_v(\d+)", name)
+        if match:
+            versions.append(int(match.group(1)))
+    return f"{alias}_v{max(versions) + 1}"
+
+
+def create_index(client, name):
+    """Create `name` with ListingDocument's mapping, tuned for loading. Returns the settings to restore."""
+    body = search_index._document()._index.clone(name).to_dict()
+    index_settings = body.setdefault("settings", {})
+    live = {
+        "number_of_replicas": index_settings.get("number_of_replicas", 1),
+        "refresh_interval": index_settings.get("refresh_interval", "1s"),
+    }
+    index_settings.update({"number_of_replicas": 0, "refresh_interval": "-1"})
+    client.indices.create(index=name, settings=index_settings, mappings=body.get("mappings", {}))
+    return live
+
+
+def _init_worker():
+    # the parent closed its DB connections before forking; the ES client has
+    # to be per process too
+    from elasticsearch_dsl.connections import connections as es_connections
+    es_connections.create_connection(alias="default", **settings.ELASTICSEARCH_DSL["default"])
+
+
+def load_range(index_name, lo, hi):
+    """Index listings lo <= id < hi into index_name. Returns (indexed, failed)."""
+    from elasticsearch import helpers
+
+    document = search_index._document()
+    listings = (
+        document.get_queryset()
+        .filter(pk__gte=lo, pk__lt=hi)
+        .order_by("pk")
+        .iterator(chunk_size=document.django.queryset_pagination)
+    )
+    actions = (
+        {"_op_type": "index", "_index": index_name, "_id": listing.pk, "_source": document.prepare(listing)}
+        for listing in listings
+    )
+    indexed = failed = 0
+    for ok, item in helpers.streaming_bulk(
+        _client(), actions, chunk_size=BULK_CHUNK, raise_on_error=False, max_retries=3,
+    ):
+        if ok:
+            indexed += 1
+        else:
+            failed += 1
+            logger.warning("Reindex of %s rejected a document: %s", index_name, item)
+    return indexed, failed
+
+
+def last_change_id():
+    return SearchIndexChange.objects.aggregate(last=Max("id"))["last"] or 0
+
+
+def replay(index_name, after_id, client=None):
+    """
+    Re-send every listing in the change log after `after_id` to index_name.
+    Returns (newest change id seen, listings replayed).
+    """
+    changes = SearchIndexChange.objects.filter(id__gt=after_id).order_by("id").values_list("id", "listing_id")
+    last, ids = after_id, set()
+    for change_id, listing_id in changes.iterator():
+        last = change_id
+        ids.add(listing_id)
+
+    document = search_index._document()
+    ordered = sorted(ids)
+    for start in range(0, len(ordered), BULK_CHUNK):
+        batch = ordered[start:start + BULK_CHUNK]
+        _, errors = search_index._bulk(list(search_index._actions(document, batch, index_name)), client)
+        if errors:
+            logger.warning("Replay into %s: %s document(s) rejected", index_name, len(errors))
+    return last, len(ids)
+
+
+def swap_alias(client, alias, new_index):
+    """Point `alias` at new_index only, atomically. Returns the indices it pointed at before."""
+    actions, previous = [], []
+    if client.indices.exists_alias(name=alias):
+        previous = sorted(client.indices.get_alias(name=alias))
+        actions += [{"remove": {"index": old, "alias": alias}} for old in previous]
+    elif client.indices.exists(index=alias):
+        # first run: "listings" is still the concrete index from before aliases
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    client.indices.update_aliases(actions=actions)
+    return previous
+
+
+def drop_old_versions(client, alias, current, keep):
+    """Delete listings_vN indices other than `current` and the `keep` newest before it."""
+    versions = sorted(
+        (int(m.group(1)), name)
+        for name in client.indices.get(index=f"{alias}_v*")
+        if (m := re.fullmatch(rf"{re.escape(alias)}_v(\d+)", name)) and name != current
+    )
+    doomed = [name for _, name in versions[:max(len(versions) - keep, 0)]]
+    for name in doomed:
+        client.indices.delete(index=name)
+    return doomed
+
+
+def reindex(workers=4, keep=1, log=logger.info):
+    """Build, catch up and swap in a new index version. Returns a stats dict."""
+    client = _client()
+    alias = alias_name()
+    index_name = next_index_name(client, alias)
+    live_settings = create_index(client, index_name)
+    log(f"Created {index_name}")
+
+    mark = last_change_id()
+    ranges = id_ranges(workers * RANGES_PER_WORKER)
+    started = time.monotonic()
+    indexed = failed = 0
+    # children must not share the parent's DB sockets
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork"), initializer=_init_worker,
+    ) as pool:
+        futures = [pool.submit(load_range, index_name, lo, hi) for lo, hi in ranges]
+        for done, future in enumerate(futures, 1):
+            ok, bad = future.result()
+            indexed += ok
+            failed += bad
+            elapsed = time.monotonic() - started
+            log(f"  {done}/{len(futures)} ranges, {indexed} docs, {indexed / max(elapsed, 1e-6):.0f} docs/s")
+    load_seconds = time.monotonic() - started
+
+    replayed = 0
+    for _ in range(CATCH_UP_PASSES):
+        mark, count = replay(index_name, mark, client)
+        replayed += count
+        if count <= CATCH_UP_DONE:
+            break
+
+    client.indices.put_settings(index=index_name, settings=live_settings)
+    client.indices.refresh(index=index_name)
+    previous = swap_alias(client, alias, index_name)
+    mark, count = replay(index_name, mark, client)
+    replayed += count
+    dropped = drop_old_versions(client, alias, index_name, keep)
+
+    stats = {
+        "index": index_name,
+        "previous": previous,
+        "dropped": dropped,
+        "workers": workers,
+        "indexed": indexed,
+        "failed": failed,
+        "replayed": replayed,
+        "load_seconds": round(load_seconds, 1),
+        "docs_per_second": round(indexed / max(load_seconds, 1e-6)),
+        "total_seconds": round(time.monotonic() - started, 1),
+    }
+    logger.info("Reindexed %s: %s", alias, stats)
+    return stats
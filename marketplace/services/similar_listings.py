@@ -0,0 +1,177 @@
+"""
+Precomputed "similar listings" (SimilarListing) for the detail pages.
+
+Every card is a TF-IDF vector over the utils.arabic.analyze() terms ListingCard
+already stores: search_title (counted TITLE_WEIGHT times) and search_text
+(category path, city, attribute values, description). Candidates are cards of
+the same type and category whose price (budget for requests) is within
+PRICE_BAND of each other. IDF (smoothed) is per category as well, so the
+words most listings in a category share weigh least. Scores are
+cosine similarities from sparse dot products over the category's inverted
+index (the card's MAX_QUERY_TERMS heaviest terms against the full vectors);
+the best TOP_K at or above MIN_SCORE are stored, rank 0 first.
+
+refresh() recomputes stale cards (similar_computed_at NULL: new ones, and any
+card re-projected since) plus the cards they now show up next to, loading only
+the categories involved; refresh(full=True) recomputes every category.
+`manage.py refresh_similar_listings` runs it.
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from marketplace.models import ListingCard, Request, SimilarListing
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 24
+MIN_SCORE = 0.1         # about what sharing only the category name scores
+PRICE_BAND = 3.0        # a candidate costs between 1/3 and 3 times as much
+TITLE_WEIGHT = 2
+# in categories of at least COMMON_MIN_CARDS, terms on more than COMMON_DF of
+# the cards are left out of the inverted index: near-zero IDF, longest postings
+COMMON_DF = 0.5
+COMMON_MIN_CARDS = 20
+# a card is matched on its heaviest terms only (more_like_this's max_query_terms)
+MAX_QUERY_TERMS = 25
+BATCH_SIZE = 500
+
+PRICE_FIELDS = {"item": "price", "request": "budget"}
+
+
+class CategoryIndex:
+    """The cards of one (type, category): prices, unit TF-IDF vectors and an inverted index."""
+
+    def __init__(self, rows):
+        """rows: (listing_id, price, search_title, search_text)."""
+        self.prices = {}
+        counts = {}
+        for listing_id, price, title, text in rows:
+            self.prices[listing_id] = float(price) if price else None
+            terms = Counter(title.split())
+            for term in terms:
+                terms[term] *= TITLE_WEIGHT
+            terms.update(text.split())
+            counts[listing_id] = terms
+
+        n = len(counts)
+        df = Counter(term for terms in counts.values() for term in terms)
+        idf = {term: math.log((n + 1) / (d + 1)) + 1 for term, d in df.items()}
+        common = {term for term, d in df.items() if n >= COMMON_MIN_CARDS and d > COMMON_DF * n}
+
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for listing_id, terms in counts.items():
+            vector = {term: (1 + math.log(tf)) * idf[term] for term, tf in terms.items()}
+            norm = math.sqrt(sum(w * w for w in vector.values()))
+            vector = {term: w / norm for term, w in vector.items() if w} if norm else {}
+            self.vectors[listing_id] = vector
+            for term, w in vector.items():
+                if term not in common:
+                    self.postings[term].append((listing_id, w))
+
+    def _in_band(self, a, b):
+        pa, pb = self.prices.get(a), self.prices.get(b)
+        if not pa or not pb:
+            return True
+        return max(pa, pb) / min(pa, pb) <= PRICE_BAND
+
+    def neighbours(self, listing_id, k=TOP_K):
+        """[(listing_id, score)] best first; ties go to the newer listing."""
+        scores = defaultdict(float)
+        vector = self.vectors.get(listing_id, {})
+        for term, w in heapq.nlargest(MAX_QUERY_TERMS, vector.items(), key=lambda pair: pair[1]):
+            for other, other_w in self.postings.get(term, ()):
+                scores[other] += w * other_w
+        scores.pop(listing_id, None)
+        candidates = (
+            (other, score) for other, score in scores.items()
+            if score >= MIN_SCORE and self._in_band(listing_id, other)
+        )
+        return heapq.nlargest(k, candidates, key=lambda pair: (pair[1], pair[0]))
+
+
+def _write(results, versions):
+    """Replace the rows of every listing in results and mark the cards computed."""
+    now = timezone.now()
+    ids = list(results)
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        rows = [
+            SimilarListing(listing_id=listing_id, similar_id=other, rank=rank, score=score)
+            for listing_id in batch
+            for rank, (other, score) in enumerate(results[listing_id])
+        ]
+        # a card re-projected after it was read has a newer updated_at and stays stale
+        unchanged = reduce(or_, (Q(listing_id=i, updated_at=versions[i]) for i in batch))
+        with transaction.atomic():
+            SimilarListing.objects.filter(listing_id__in=batch).delete()
+            SimilarListing.objects.bulk_create(rows)
+            ListingCard.objects.filter(unchanged).update(similar_computed_at=now)
+
+
+def refresh_category(listing_type, category_id, full=False):
+    """Recompute one category's stale cards (all of them with `full`). Returns the number of cards written."""
+    rows = list(
+        ListingCard.objects.filter(type=listing_type, category_id=category_id).values_list(
+            "listing_id", PRICE_FIELDS[listing_type], "search_title", "search_text",
+            "similar_computed_at", "updated_at",
+        )
+    )
+    if not rows:
+        return 0
+    index = CategoryIndex(row[:4] for row in rows)
+    versions = {row[0]: row[5] for row in rows}
+
+    targets = set(versions) if full else {row[0] for row in rows if row[4] is None}
+    results = {listing_id: index.neighbours(listing_id) for listing_id in targets}
+    if not full:
+        # a new or changed card can belong in its neighbours' lists too
+        touched = {other for pairs in results.values() for other, _ in pairs} - targets
+        results.update({listing_id: index.neighbours(listing_id) for listing_id in touched})
+
+    _write(results, versions)
+    return len(results)
+
+
+def refresh(full=False):
+    """Recompute stale cards (every card with `full`), one category at a time. Returns the number written."""
+    cards = ListingCard.objects.all() if full else ListingCard.objects.filter(similar_computed_at__isnull=True)
+    # nothing to compare uncategorised cards with; just take them off the stale list
+    cards.filter(category__isnull=True).update(similar_computed_at=timezone.now())
+
+    written = 0
+    categories = cards.filter(category__isnull=False).values_list("type", "category_id").distinct()
+    for listing_type, category_id in list(categories):
+        written += refresh_category(listing_type, category_id, full=full)
+    logger.info("Similar listings: %s card(s) recomputed", written)
+    return written
+
+
+# -------------------------
+# Read side
+# -------------------------
+
+def similar_cards(listing_id):
+    """ListingCards most like listing_id, best first (one query on similar_listing_rank_idx)."""
+    return ListingCard.objects.filter(similar_of__listing_id=listing_id).order_by("similar_of__rank")
+
+
+def similar_requests(listing_id):
+    """similar_cards() as Request rows, for the request cards."""
+    return (
+        Request.objects.filter(listing__card__similar_of__listing_id=listing_id)
+        .select_related("listing__category", "listing__city", "listing__user")
+        .order_by("listing__card__similar_of__rank")
+    )
+
+
+def has_neighbours(listing_id):
+    return SimilarListing.objects.filter(listing_id=listing_id).exists()
@@ -0,0 +1,278 @@
+"""
+Versioned two-tier cache for the category/city taxonomy.
+
+Tier 1 is a small per-process LRU, tier 2 the shared Django cache (Redis when
+REDIS_URL is set). Every entry is keyed on a single version number stored in
+the shared cache; the Category / CategoryPhoto / City signals call
+bump_version() and every process drops its local copies the next time it
+re-reads the version (at most VERSION_CHECK_SECONDS later).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import cache
+
+from marketplace.models import Category, City
+from marketplace.utils.category_tree import build_category_tree
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "taxonomy:version"
+SHARED_TTL_SECONDS = 60 * 60 * 24
+VERSION_CHECK_SECONDS = 5
+LOCAL_MAX_ENTRIES = 32
+
+
+class TaxonomyNode:
+    """
+    Plain, picklable stand-in for a Category row. `subcategories.all()` keeps
+    the templates that used to walk the ORM relation working unchanged.
+    """
+    __slots__ = (
+        "id", "name", "parent_id", "subtitle", "photo_url",
+        "header_order", "header_icon", "header_question", "header_action",
+        "subcategories",
+    )
+
+    def __init__(self, cat):
+        self.id = cat.id
+        self.name = cat.name
+        self.parent_id = cat.parent_id
+        self.subtitle = cat.subtitle
+        self.photo_url = cat.photo_url
+        self.header_order = cat.header_order
+        self.header_icon = cat.header_icon
+        self.header_question = cat.header_question
+        self.header_action = cat.header_action
+        self.subcategories = _Children()
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def __str__(self):
+        return self.name
+
+
+class _Children(list):
+    def all(self):
+        return self
+
+    def exists(self):
+        return bool(self)
+
+
+class CityNode:
+    __slots__ = ("id", "name", "is_active")
+
+    def __init__(self, id, name, is_active=True):
+        self.id = id
+        self.name = name
+        self.is_active = is_active
+
+    def __getstate__(self):
+        return (self.id, self.name, self.is_active)
+
+    def __setstate__(self, state):
+        self.id, self.name, self.is_active = state
+
+    def __str__(self):
+        return self.name
+
+
+# ------------------------------------------------------------------ #
+# Version + local tier
+# ------------------------------------------------------------------ #
+_lock = threading.Lock()
+_local = OrderedDict()
+_state = {"version": None, "checked_at": 0.0}
+
+
+def _current_version():
+    now = time.monotonic()
+    if _state["version"] is not None and now - _state["checked_at"] < VERSION_CHECK_SECONDS:
+        return _state["version"]
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY) or 1
+
+    with _lock:
+        if version != _state["version"]:
+            _local.clear()
+        _state["version"] = version
+        _state["checked_at"] = now
+    return version
+
+
+def bump_version():
+    """Invalidate every cached taxonomy structure, here and in other processes."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, timeout=None)
+    with _lock:
+        _local.clear()
+        _state["version"] = None
+
+
+def get_or_build(name, builder):
+    version = _current_version()
+    key = f"taxonomy:{version}:{name}"
+
+    with _lock:
+        if key in _local:
+            _local.move_to_end(key)
+            return _local[key]
+
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, SHARED_TTL_SECONDS)
+
+    with _lock:
+        _local[key] = value
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+    return value
+
+
+# ------------------------------------------------------------------ #
+# Builders
+# ------------------------------------------------------------------ #
+def _build_category_map():
+    nodes = {
+        cat.id: TaxonomyNode(cat)
+        for cat in Category.objects.select_related("photo").order_by("id")
+    }
+    for node in nodes.values():
+        parent = nodes.get(node.parent_id)
+        if parent is not None:
+            parent.subcategories.append(node)
+    return nodes
+
+
+def _pick_url(node):
+    return f"/category/{node.id}/"
+
+
+def _build_nav_tree():
+    # Pinned (header_order set) siblings first in their assigned order,
+    # then the rest by id; the header takes the first 6 / 3 / 3 per level.
+    by_parent = defaultdict(list)
+    for node in category_map().values():
+        by_parent[node.parent_id].append(node)
+
+    def _sort_key(c):
+        if c.header_order is not None:
+            return (0, c.header_order)
+        return (1, c.id)
+
+    for group in by_parent.values():
+        group.sort(key=_sort_key)
+
+    tree = []
+    for top in by_parent[None][:6]:
+        children = []
+        for ch in by_parent.get(top.id, [])[:3]:
+            grandchildren = [
+                {"id": gc.id, "name": gc.name, "url": _pick_url(gc)}
+                for gc in by_parent.get(ch.id, [])[:3]
+            ]
+            children.append({
+                "id": ch.id,
+                "name": ch.name,
+                "url": _pick_url(ch),
+                "children": grandchildren,
+            })
+
+        tree.append({
+            "id": top.id,
+            "name": top.name,
+            "url": _pick_url(top),
+            "children": children,
+            "header_icon": top.header_icon or "megaphone",
+            "header_question": top.header_question or "هل تريد نشر إعلان؟",
+            "header_action": top.header_action or "انشر إعلانك الآن مجاناً",
+        })
+    return tree
+
+
+def _build_browse_data():
+    data = []
+    for top in root_categories():
+        subs = []
+        for sub in top.subcategories:
+            levels = [ssc.name for ssc in sub.subcategories] or [sub.name]
+            subs.append({
+                "id": sub.id,
+                "title": sub.name,
+                "photo": sub.photo_url or None,
+                "levels": levels,
+            })
+        data.append({
+            "id": top.id,
+            "title": top.name,
+            "subtitle": top.subtitle,
+            "photo": top.photo_url or None,
+            "subs": subs,
+        })
+    return data
+
+
+# ------------------------------------------------------------------ #
+# Public accessors
+# ------------------------------------------------------------------ #
+def category_map():
+    """{id: TaxonomyNode} for every category; children hang off `subcategories`."""
+    return get_or_build("categories", _build_category_map)
+
+
+def root_categories():
+    return [n for n in category_map().values() if n.parent_id is None]
+
+
+def category_tree(order_by="id"):
+    """Nested JSON tree for the category pickers, roots ordered by `id` or `name`."""
+    def _build():
+        roots = root_categories()
+        if order_by == "name":
+            roots = sorted(roots, key=lambda n: n.name)
+        return build_category_tree(roots)
+
+    return get_or_build(f"tree:{order_by}", _build)
+
+
+def cities(active_only=False):
+    """List of (id, name) City stand-ins ordered by name."""
+    name = "cities:active" if active_only else "cities:all"
+
+    def _build():
+        qs = City.objects.order_by("name")
+        if active_only:
+            qs = qs.filter(is_active=True)
+        return [CityNode(c.id, c.name, c.is_active) for c in qs]
+
+    return get_or_build(name, _build)
+
+
+def city_map():
+    return {c.id: c for c in cities()}
+
+
+def nav_tree():
+    """Header mega-menu tree (see context_processors.navbar_categories)."""
+    return get_or_build("nav_tree", _build_nav_tree)
+
+
+def browse_data():
+    """Payload behind the categories browse page."""
+    return get_or_build("browse", _build_browse_data)
+
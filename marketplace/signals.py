@@ -1,16 +1,20 @@
 import logging
 
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.db.models import Q
 from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
 
-from .models import Item, Listing, Store, Notification, StoreFollow, ItemPhoto
-from .models.requests import Request
+from .models import Item, ItemAttributeValue, Listing, Store, Notification, StoreFollow, ItemPhoto, Favorite, Message, Conversation
+from .models.requests import Request, RequestAttributeValue
 from .models.lost_found import Report
-from . import moderation   # imports the moderation.py you already created
-from django.core.cache import cache
-from .models import Category
+from .services import (
+    category_closure, counters, listing_cards, moderation_queue, saved_searches, search_cache, search_index,
+    taxonomy_cache,
+)
+from .models import Attribute, AttributeOption, Category, CategoryPhoto, City
+from .utils.images import RENDITION_FORMATS
 
 logger = logging.getLogger(__name__)
 
@@ -18,42 +22,16 @@ logger = logging.getLogger(__name__)
 @receiver(post_save, sender=Item)
 def auto_moderate_item(sender, instance: Item, created: bool, **kwargs):
     """
-    Run AI moderation on every newly created Item.
+    Queue AI moderation for every newly created Item.
 
-    Outcomes:
-    - "approve": set is_approved=True so the listing becomes visible.
-    - "reject":  keep is_approved=False (default), flag as auto-rejected.
-    - "manual":  keep is_approved=False; an admin must review.
+    The API call happens in `manage.py moderation_worker` (services/moderation_queue.py),
+    which applies the approve / reject / manual outcome; until then is_approved stays False.
     """
     if not created:
         return
 
-    logger.info("Moderating item %s", instance.id)
-    decision, reason = moderation.moderate_item(instance)
-    logger.info("Moderation result for item %s: %s | %s", instance.id, decision, reason)
-
-    if decision == "approve":
-        instance.listing.is_approved = True
-        instance.listing.save(update_fields=["is_approved"])
-
-    elif decision == "reject":
-        # is_approved is already False (model default); mark as auto-rejected
-        instance.listing.is_active = False
-        instance.listing.auto_rejected = True
-        instance.listing.moderation_reason = reason or "Automatically rejected by AI."
-        instance.listing.rejected_at = timezone.now()
-        instance.listing.rejected_by = None
-        instance.listing.save(
-            update_fields=[
-                "is_active",
-                "auto_rejected",
-                "moderation_reason",
-                "rejected_at",
-                "rejected_by",
-            ]
-        )
-
-    # "manual": is_approved stays False — admin queue will pick it up
+    moderation_queue.enqueue(instance.listing)
+    logger.info("Queued moderation for item %s (listing %s)", instance.id, instance.listing_id)
 
 
 @receiver(pre_save, sender=Listing)
@@ -64,11 +42,13 @@ def listing_store_old_state(sender, instance: Listing, **kwargs):
     if not instance.pk:
         instance._old_is_approved = False
         instance._old_is_active = True
+        instance._old_is_deleted = False
         return
 
-    old = Listing.objects.filter(pk=instance.pk).values("is_approved", "is_active").first() or {}
+    old = Listing.objects.filter(pk=instance.pk).values("is_approved", "is_active", "is_deleted").first() or {}
     instance._old_is_approved = bool(old.get("is_approved", False))
     instance._old_is_active = bool(old.get("is_active", True))
+    instance._old_is_deleted = bool(old.get("is_deleted", False))
 
 
 @receiver(post_save, sender=Listing)
@@ -115,6 +95,8 @@ def notify_followers_on_approval(sender, instance: Listing, created, **kwargs):
                 )
                 for uid in follower_ids
             ])
+            for uid in follower_ids:
+                counters.adjust(uid, counters.UNREAD_NOTIFICATIONS, 1)
 
         # ✅ mark as done so it never sends twice
         Listing.objects.filter(pk=instance.pk).update(followers_notified=True)
@@ -124,14 +106,14 @@ def notify_followers_on_approval(sender, instance: Listing, created, **kwargs):
 
 @receiver(post_delete, sender=ItemPhoto)
 def delete_itemphoto_file(sender, instance, **kwargs):
-    if instance.image:
-        instance.image.delete(save=False)
-
-
-@receiver([post_save, post_delete], sender=Category)
-def clear_navbar_categories_cache(sender, instance, **kwargs):
-    cache.delete("navbar_cats:v1:en")
-    cache.delete("navbar_cats:v1:ar")
+    """The original, the normalized copy and every rendition file of a deleted photo."""
+    for field in (instance.image, instance.normalized):
+        if field:
+            field.delete(save=False)
+    for rendition in (instance.renditions or {}).values():
+        for fmt in RENDITION_FORMATS:
+            if rendition.get(fmt):
+                default_storage.delete(rendition[fmt])
 
 
 @receiver(pre_save, sender=Report)
@@ -167,35 +149,264 @@ def run_matching_on_report_approval(sender, instance: Report, created: bool, **k
     transaction.on_commit(_run)
 
 
+# ------------------------------------------------------------------ #
+# Search index (services/search_index.py): every change to a listing or
+# to something its document embeds queues the listing id; the worker
+# coalesces and bulk-indexes them.
+# ------------------------------------------------------------------ #
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def queue_listing_for_search(sender, instance: Listing, **kwargs):
+    search_index.mark_dirty([instance.pk])
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
 @receiver(post_save, sender=Request)
-def reindex_listing_on_request_save(sender, instance: Request, created: bool, **kwargs):
-    """
-    Re-save the parent Listing whenever a Request is created so that
-    django_elasticsearch_dsl re-indexes the document with the request's
-    budget, condition_preference, and attributes included.
-    Only needed on creation — subsequent listing saves (e.g. approval)
-    already trigger re-indexing automatically.
-    """
-    if created:
-        instance.listing.save()
+@receiver(post_delete, sender=Request)
+def queue_listing_for_search_on_related(sender, instance, **kwargs):
+    search_index.mark_dirty([instance.listing_id])
+
+
+@receiver(post_save, sender=ItemAttributeValue)
+@receiver(post_delete, sender=ItemAttributeValue)
+def queue_listing_for_search_on_item_attribute(sender, instance: ItemAttributeValue, **kwargs):
+    search_index.mark_dirty(Item.objects.filter(pk=instance.item_id).values_list("listing_id", flat=True))
+
+
+@receiver(post_save, sender=RequestAttributeValue)
+@receiver(post_delete, sender=RequestAttributeValue)
+def queue_listing_for_search_on_request_attribute(sender, instance: RequestAttributeValue, **kwargs):
+    search_index.mark_dirty(Request.objects.filter(pk=instance.request_id).values_list("listing_id", flat=True))
+
+
+@receiver(pre_save, sender=City)
+def city_store_old_name(sender, instance: City, **kwargs):
+    instance._old_name = City.objects.filter(pk=instance.pk).values_list("name", flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=City)
+def queue_city_listings_for_search(sender, instance: City, created: bool, **kwargs):
+    if not created and getattr(instance, "_old_name", instance.name) != instance.name:
+        search_index.mark_queryset_dirty(Listing.objects.filter(city_id=instance.pk))
+        # city_name and search_text on the cards
+        listing_cards.refresh_listing_cards(Listing.objects.filter(city_id=instance.pk).values_list("id", flat=True))
 
 
 # ------------------------------------------------------------------ #
-# Invalidate navbar category cache whenever a Category is saved/deleted
+# Cached search results (services/search_cache.py) are id lists; a
+# listing entering or leaving the public grids makes all of them stale.
+# Bumped on commit so nobody re-caches the old rows in between.
 # ------------------------------------------------------------------ #
-def _clear_navbar_cache():
-    from .context_processors import CACHE_VER
-    cache.delete_many([
-        f"navbar_cats:{CACHE_VER}:ar",
-        f"navbar_cats:{CACHE_VER}:en",
-    ])
+def _is_visible(approved, active, deleted):
+    return bool(approved and active and not deleted)
 
 
-@receiver(post_save, sender=Category)
-def invalidate_navbar_cache_on_save(sender, **kwargs):
-    _clear_navbar_cache()
+@receiver(post_save, sender=Listing)
+def bump_search_generation_on_visibility_change(sender, instance: Listing, **kwargs):
+    was_visible = _is_visible(
+        getattr(instance, "_old_is_approved", instance.is_approved),
+        getattr(instance, "_old_is_active", instance.is_active),
+        getattr(instance, "_old_is_deleted", instance.is_deleted),
+    )
+    if was_visible != _is_visible(instance.is_approved, instance.is_active, instance.is_deleted):
+        transaction.on_commit(search_cache.bump_generation)
 
 
+@receiver(post_delete, sender=Listing)
+def bump_search_generation_on_listing_delete(sender, instance: Listing, **kwargs):
+    if _is_visible(instance.is_approved, instance.is_active, instance.is_deleted):
+        transaction.on_commit(search_cache.bump_generation)
+
+
+# Saved search alerts (services/saved_searches.py): an item that just went
+# public is queued and matched in batches by saved_search_worker
+@receiver(post_save, sender=Listing)
+def queue_listing_for_saved_searches(sender, instance: Listing, **kwargs):
+    if instance.type != "item" or not _is_visible(instance.is_approved, instance.is_active, instance.is_deleted):
+        return
+    was_visible = _is_visible(
+        getattr(instance, "_old_is_approved", instance.is_approved),
+        getattr(instance, "_old_is_active", instance.is_active),
+        getattr(instance, "_old_is_deleted", instance.is_deleted),
+    )
+    if not was_visible:
+        saved_searches.enqueue([instance.pk])
+
+
+# ------------------------------------------------------------------ #
+# Any taxonomy edit invalidates the nav tree, browse page, pickers,
+# city lists and the category API in every process (see services/taxonomy_cache.py)
+# ------------------------------------------------------------------ #
+@receiver(post_save, sender=Category)
 @receiver(post_delete, sender=Category)
-def invalidate_navbar_cache_on_delete(sender, **kwargs):
-    _clear_navbar_cache()
+@receiver(post_save, sender=CategoryPhoto)
+@receiver(post_delete, sender=CategoryPhoto)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(post_save, sender=AttributeOption)
+@receiver(post_delete, sender=AttributeOption)
+def bump_taxonomy_version(sender, **kwargs):
+    # after commit: a bump seen before the rows are visible would cache the old taxonomy under the new version
+    transaction.on_commit(taxonomy_cache.bump_version)
+
+
+# ------------------------------------------------------------------ #
+# Keep CategoryClosure (and the card paths built from it) in step with
+# Category.parent and Category.name
+# (deletes need nothing: closure rows cascade with the category)
+# ------------------------------------------------------------------ #
+@receiver(pre_save, sender=Category)
+def category_store_old_state(sender, instance: Category, **kwargs):
+    if not instance.pk:
+        instance._old_parent_id = None
+        instance._old_name = None
+        return
+    old = Category.objects.filter(pk=instance.pk).values("parent_id", "name").first() or {}
+    instance._old_parent_id = old.get("parent_id")
+    instance._old_name = old.get("name")
+
+
+@receiver(post_save, sender=Category)
+def maintain_category_closure(sender, instance: Category, created: bool, **kwargs):
+    if created:
+        category_closure.link_category(instance)
+        return
+
+    moved = getattr(instance, "_old_parent_id", instance.parent_id) != instance.parent_id
+    renamed = getattr(instance, "_old_name", instance.name) != instance.name
+    if moved:
+        category_closure.move_category(instance)
+    if moved or renamed:
+        listing_cards.refresh_cards_for_categories([instance.pk])
+        # documents embed the category and its parent's name
+        search_index.mark_queryset_dirty(
+            Listing.objects.filter(Q(category_id=instance.pk) | Q(category__parent_id=instance.pk))
+        )
+
+
+# ------------------------------------------------------------------ #
+# Keep the ListingCard read model in sync with its sources.
+# Saves re-project immediately; deletes wait for commit so a cascading
+# delete can't re-insert a card for a listing that is about to vanish.
+# ------------------------------------------------------------------ #
+def _refresh_card(listing_id, deleted=False):
+    if not listing_id:
+        return
+    if deleted:
+        transaction.on_commit(lambda: listing_cards.refresh_listing_card(listing_id))
+    else:
+        listing_cards.refresh_listing_card(listing_id)
+
+
+@receiver(post_save, sender=Listing)
+def refresh_card_on_listing_save(sender, instance: Listing, **kwargs):
+    _refresh_card(instance.pk)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Request)
+@receiver(post_save, sender=Favorite)
+def refresh_card_on_related_save(sender, instance, **kwargs):
+    _refresh_card(instance.listing_id)
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Request)
+@receiver(post_delete, sender=Favorite)
+def refresh_card_on_related_delete(sender, instance, **kwargs):
+    _refresh_card(instance.listing_id, deleted=True)
+
+
+@receiver(post_save, sender=ItemPhoto)
+@receiver(post_delete, sender=ItemPhoto)
+def refresh_card_on_photo_change(sender, instance: ItemPhoto, **kwargs):
+    listing_id = Item.objects.filter(pk=instance.item_id).values_list("listing_id", flat=True).first()
+    _refresh_card(listing_id, deleted="created" not in kwargs)
+
+
+@receiver(post_save, sender=ItemAttributeValue)
+@receiver(post_delete, sender=ItemAttributeValue)
+def refresh_card_on_item_attribute_change(sender, instance: ItemAttributeValue, **kwargs):
+    # attribute values are part of the card's search_text
+    listing_id = Item.objects.filter(pk=instance.item_id).values_list("listing_id", flat=True).first()
+    _refresh_card(listing_id, deleted="created" not in kwargs)
+
+
+@receiver(post_save, sender=RequestAttributeValue)
+@receiver(post_delete, sender=RequestAttributeValue)
+def refresh_card_on_request_attribute_change(sender, instance: RequestAttributeValue, **kwargs):
+    listing_id = Request.objects.filter(pk=instance.request_id).values_list("listing_id", flat=True).first()
+    _refresh_card(listing_id, deleted="created" not in kwargs)
+
+
+@receiver(post_save, sender=Store)
+def refresh_cards_on_store_save(sender, instance: Store, **kwargs):
+    listing_cards.refresh_cards_for_user(instance.owner_id)
+
+
+@receiver(post_delete, sender=Store)
+def refresh_cards_on_store_delete(sender, instance: Store, **kwargs):
+    owner_id = instance.owner_id
+    transaction.on_commit(lambda: listing_cards.refresh_cards_for_user(owner_id))
+
+
+# ------------------------------------------------------------------ #
+# Navbar counters (services/counters.py): new rows are counted with an
+# atomic increment, anything else resets the counter for a lazy recount.
+# ------------------------------------------------------------------ #
+@receiver(post_save, sender=Message)
+def count_message(sender, instance: Message, created: bool, **kwargs):
+    conv = instance.conversation
+    if created and not instance.is_read:
+        recipient_id = conv.seller_id if instance.sender_id == conv.buyer_id else conv.buyer_id
+        counters.adjust(recipient_id, counters.UNREAD_MESSAGES, 1)
+    elif not created:
+        counters.reset([conv.buyer_id, conv.seller_id], counters.UNREAD_MESSAGES)
+
+
+@receiver(post_delete, sender=Message)
+def uncount_message(sender, instance: Message, **kwargs):
+    conv = Conversation.objects.filter(pk=instance.conversation_id).values("buyer_id", "seller_id").first()
+    if conv:
+        counters.reset([conv["buyer_id"], conv["seller_id"]], counters.UNREAD_MESSAGES)
+
+
+@receiver(post_save, sender=Notification)
+def count_notification(sender, instance: Notification, created: bool, **kwargs):
+    if created:
+        if not instance.is_read:
+            counters.adjust(instance.user_id, counters.UNREAD_NOTIFICATIONS, 1)
+    else:
+        counters.reset(instance.user_id, counters.UNREAD_NOTIFICATIONS)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_notification(sender, instance: Notification, **kwargs):
+    counters.reset(instance.user_id, counters.UNREAD_NOTIFICATIONS)
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite(sender, instance: Favorite, created: bool, **kwargs):
+    if created:
+        counters.adjust(instance.user_id, counters.FAVORITE_COUNT, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def uncount_favorite(sender, instance: Favorite, **kwargs):
+    counters.reset(instance.user_id, counters.FAVORITE_COUNT)
+
+
+@receiver(post_save, sender=Listing)
+def reset_favorite_counts_on_visibility_change(sender, instance: Listing, created: bool, **kwargs):
+    if created:
+        return
+    was_visible = not getattr(instance, "_old_is_deleted", instance.is_deleted) \
+        and getattr(instance, "_old_is_active", instance.is_active)
+    if was_visible != (instance.is_active and not instance.is_deleted):
+        counters.reset(
+            Favorite.objects.filter(listing=instance).values_list("user_id", flat=True),
+            counters.FAVORITE_COUNT,
+        )
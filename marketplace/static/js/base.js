@@ -661,6 +661,7 @@
     }
     if (kind === 'fav')          return   { icon: 'heart',         bg: '#fdf2f8', border: '#f9a8d4', color: '#db2777' };
     if (kind === 'store_follow') return   { icon: 'user-plus',     bg: '#eef2ff', border: '#a5b4fc', color: '#4338ca' };
+    if (kind === 'saved_search') return   { icon: 'search',        bg: '#fff7ed', border: '#fdba74', color: '#c2410c' };
     return                               { icon: 'bell',           bg: '#f3f4f6', border: '#e5e7eb', color: '#6b7280' };
   }
 
@@ -675,6 +676,7 @@
     if (kind === 'fav') return { text: 'مفضلة', cls: 'status-fav' };
     if (kind === 'store_follow' && status === 'followed') return { text: 'متابعة', cls: 'status-active' };
     if (kind === 'store_follow' && status === 'unfollowed') return { text: 'إلغاء متابعة', cls: 'status-unfollow' };
+    if (kind === 'saved_search') return { text: 'بحث محفوظ', cls: 'status-active' };
     if (kind === 'system') return { text: 'إشعار', cls: 'status-system' };
 
     return { text: '', cls: '' };
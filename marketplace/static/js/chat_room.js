@@ -0,0 +1,165 @@
+/* static/js/chat_room.js
+   Live chat_room page: new messages, read receipts and typing over ChatSocket.
+   If the socket is not connected the form falls back to the normal POST.
+   Only the latest page is server-rendered: older history is fetched from the
+   sync endpoint on scroll-up, and anything missed while the socket was down is
+   fetched with after_id on reconnect.
+*/
+document.addEventListener("DOMContentLoaded", () => {
+  const box  = document.getElementById("chatMessages");
+  const form = document.getElementById("chatForm");
+  if(!box || !form || !window.ChatSocket) return;
+
+  const input    = form.querySelector("textarea[name=body]");
+  const typingEl = document.getElementById("chatTyping");
+  const seenEl   = document.getElementById("chatSeen");
+  const profileUrl = (id) => (box.dataset.profileUrl || "/profile/0/").replace("/0/", `/${id}/`);
+
+  function escapeHtml(s){
+    const d = document.createElement("div");
+    d.textContent = s ?? "";
+    return d.innerHTML;
+  }
+
+  function scrollToEnd(){ box.scrollTop = box.scrollHeight; }
+
+  function messageEl(m){
+    const el = document.createElement("div");
+    el.className = "p-3 rounded-lg border-b bg-[var(--rukn-orange-light)] border-l-4 border-[var(--rukn-orange)]";
+    el.dataset.messageId = String(m.id);
+    el.innerHTML = `
+      <div class="flex justify-between items-center">
+        <strong><a href="${profileUrl(m.sender_id)}" class="text-jordan hover:underline">${escapeHtml(m.sender_name)}</a></strong>
+        <small class="text-gray-500">${escapeHtml(m.time)}</small>
+      </div>
+      <p class="mt-2 text-gray-800">${escapeHtml(m.body)}</p>`;
+    return el;
+  }
+
+  function appendMessage(m){
+    if(box.querySelector(`[data-message-id="${m.id}"]`)) return;
+    box.querySelector("[data-empty]")?.remove();
+    box.appendChild(messageEl(m));
+    scrollToEnd();
+  }
+
+  const messageIds = () => [...box.querySelectorAll("[data-message-id]")].map(el => Number(el.dataset.messageId));
+
+  async function fetchSync(params){
+    const url = new URL(box.dataset.syncUrl, window.location.origin);
+    Object.entries(params).forEach(([k, v]) => url.searchParams.set(k, v));
+    const res = await fetch(url, { credentials: "same-origin", headers: { "Accept": "application/json" } });
+    if(!res.ok) throw new Error(`sync ${res.status}`);
+    return res.json();
+  }
+
+  // History: prepend the page just older than what is on screen, keeping the scroll position.
+  let hasMore = box.dataset.hasMore === "1";
+  let loadingOlder = false;
+  async function loadOlder(){
+    if(!hasMore || loadingOlder || !box.dataset.syncUrl) return;
+    const ids = messageIds();
+    if(!ids.length) return;
+    loadingOlder = true;
+    try{
+      const data = await fetchSync({ before_id: Math.min(...ids) });
+      const prevHeight = box.scrollHeight;
+      const frag = document.createDocumentFragment();
+      (data.messages || []).forEach(m => {
+        if(!box.querySelector(`[data-message-id="${m.id}"]`)) frag.appendChild(messageEl(m));
+      });
+      box.prepend(frag);
+      box.scrollTop += box.scrollHeight - prevHeight;
+      hasMore = !!data.has_more;
+    }catch(err){
+      console.warn(err);
+    }finally{
+      loadingOlder = false;
+    }
+  }
+
+  // Catch-up: only what arrived after the newest message we have.
+  async function catchUp(){
+    if(!box.dataset.syncUrl) return;
+    try{
+      let more = true;
+      while(more){
+        const ids = messageIds();
+        const data = await fetchSync(ids.length ? { after_id: Math.max(...ids) } : {});
+        (data.messages || []).forEach(appendMessage);
+        more = !!data.has_more && (data.messages || []).length > 0;
+      }
+    }catch(err){
+      console.warn(err);
+    }
+  }
+
+  box.addEventListener("scroll", () => {
+    if(box.scrollTop < 40) loadOlder();
+  });
+
+  let typingHideTimer = null;
+
+  const sock = ChatSocket.open(box.dataset.conversationId, {
+    onMessage(m, mine){
+      appendMessage(m);
+      if(mine){
+        seenEl?.classList.add("hidden");
+      } else {
+        typingEl?.classList.add("hidden");
+        if(document.visibilityState === "visible") sock.send({ type: "read" });
+      }
+    },
+    onRead(readerId){
+      if(String(readerId) !== box.dataset.userId) seenEl?.classList.remove("hidden");
+    },
+    onTyping(isTyping){
+      clearTimeout(typingHideTimer);
+      typingEl?.classList.toggle("hidden", !isTyping);
+      if(isTyping) typingHideTimer = setTimeout(() => typingEl?.classList.add("hidden"), 5000);
+    },
+    onStatus(connected){
+      // covers the gap between page render and connect, and any drop since
+      if(connected) catchUp();
+    },
+    onError(error){
+      const msg = error === "empty" ? "الرسالة فارغة" : "ممنوع الروابط أو HTML";
+      box.insertAdjacentHTML("beforeend", `<p class="text-center text-sm text-red-500">${msg}</p>`);
+      scrollToEnd();
+    },
+  });
+
+  // Tell the other side we read what was on screen when the tab comes back.
+  document.addEventListener("visibilitychange", () => {
+    if(document.visibilityState === "visible") sock.send({ type: "read" });
+  });
+
+  let typingSentAt = 0;
+  let typingStopTimer = null;
+  input?.addEventListener("input", () => {
+    const now = Date.now();
+    if(now - typingSentAt > 2000){
+      sock.send({ type: "typing", is_typing: true });
+      typingSentAt = now;
+    }
+    clearTimeout(typingStopTimer);
+    typingStopTimer = setTimeout(() => {
+      sock.send({ type: "typing", is_typing: false });
+      typingSentAt = 0;
+    }, 3000);
+  });
+
+  form.addEventListener("submit", (e) => {
+    const body = (input?.value || "").trim();
+    if(!body) return;
+    if(sock.send({ type: "message", body })){
+      e.preventDefault();
+      input.value = "";
+      clearTimeout(typingStopTimer);
+      sock.send({ type: "typing", is_typing: false });
+      typingSentAt = 0;
+    }
+  });
+
+  scrollToEnd();
+});
@@ -0,0 +1,68 @@
+/* static/js/chat_socket.js
+   Thin client for the ws/chat/<id>/ socket (marketplace/consumers.py) with
+   reconnect + backoff. Used by chat_room.js and my_account/msgs.js.
+
+   const sock = ChatSocket.open(conversationId, { onMessage, onRead, onTyping, onError, onStatus });
+   sock.send({ type: "message", body })   // false when not connected → caller falls back to HTTP
+*/
+(function(){
+  function wsUrl(conversationId){
+    const proto = window.location.protocol === "https:" ? "wss" : "ws";
+    return `${proto}://${window.location.host}/ws/chat/${conversationId}/`;
+  }
+
+  function open(conversationId, handlers){
+    handlers = handlers || {};
+    if(!("WebSocket" in window)){
+      return { send: () => false, close(){}, isOpen: () => false };
+    }
+
+    let ws     = null;
+    let closed = false;
+    let retry  = 0;
+    let timer  = null;
+
+    function connect(){
+      ws = new WebSocket(wsUrl(conversationId));
+
+      ws.onopen = () => {
+        retry = 0;
+        handlers.onStatus?.(true);
+      };
+
+      ws.onmessage = (e) => {
+        let data;
+        try { data = JSON.parse(e.data); } catch { return; }
+        if(data.type === "message")     handlers.onMessage?.(data.message, data.mine);
+        else if(data.type === "read")   handlers.onRead?.(data.reader_id);
+        else if(data.type === "typing") handlers.onTyping?.(data.is_typing, data.user_id);
+        else if(data.type === "error")  handlers.onError?.(data.error);
+      };
+
+      ws.onclose = (e) => {
+        handlers.onStatus?.(false);
+        // 4401 / 4403: not logged in / not a participant — retrying won't help
+        if(closed || e.code === 4401 || e.code === 4403) return;
+        const delay = Math.min(30000, 1000 * Math.pow(2, retry++));
+        timer = setTimeout(connect, delay);
+      };
+    }
+
+    function send(payload){
+      if(!ws || ws.readyState !== WebSocket.OPEN) return false;
+      ws.send(JSON.stringify(payload));
+      return true;
+    }
+
+    function close(){
+      closed = true;
+      clearTimeout(timer);
+      ws?.close();
+    }
+
+    connect();
+    return { send, close, isOpen: () => !!ws && ws.readyState === WebSocket.OPEN };
+  }
+
+  window.ChatSocket = { open };
+})();
@@ -162,12 +162,13 @@
       const noResults = document.getElementById("noResults");
       const clearAfterNoResults = document.getElementById("clearAfterNoResults");
       const resetFiltersBtn = document.getElementById("resetFilters");
-      const pageField = document.getElementById("pageField");
+      const cursorField = document.getElementById("cursorField");
       const resultsTotal = document.getElementById("resultsTotal");
       const resultsVisible = document.getElementById("resultsVisible");
 
       const priceMin = document.getElementById("filterPriceMin");
       const priceMax = document.getElementById("filterPriceMax");
+      const attributeFilters = document.getElementById("attributeFilters");
 
       // ✅ sync UI from URL on first load (supports ?categories=3 while select is name="category")
         (function syncFiltersFromUrl() {
@@ -200,8 +201,8 @@
           if (priceMin?.name && params.has(priceMin.name)) priceMin.value = params.get(priceMin.name) || "";
           if (priceMax?.name && params.has(priceMax.name)) priceMax.value = params.get(priceMax.name) || "";
 
-          // page: intentionally NOT read from URL – the template sets pageField to
-          // page_obj.number (the actual page served after clamping), so we honour that.
+          // cursor: intentionally NOT read from URL – a fresh load always starts at
+          // the first page and "load more" continues from the cursor the server handed out.
         })();
 
 
@@ -224,20 +225,40 @@
         }
 
       function resetToFirstPage() {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
       }
 
       function qsFromForm() {
         const fd = new FormData(form);
         const params = new URLSearchParams();
+        // attribute inputs belong to the category they were rendered for; drop them once it changes
+        const attrsCurrent = (attributeFilters?.dataset.category || "") === (fd.get("category") || "").toString();
         for (const [k, v] of fd.entries()) {
           const val = (v || "").toString().trim();
-          if (val !== "") params.set(k, val);
+          if (val === "") continue;
+          if (!k.startsWith("attr_")) params.set(k, val);
+          else if (attrsCurrent) params.append(k, val);  // checkboxes repeat the name
         }
-        if (!params.get("page")) params.set("page", "1");
         return params;
       }
 
+      // sidebar facet counts from the JSON (first pages only; "load more" keeps the old ones)
+      function renderFacets(facets) {
+        if (!facets) return;
+        form.querySelectorAll("[data-facet][data-key]").forEach(el => {
+          const n = (facets[el.dataset.facet] || {})[el.dataset.key] ?? 0;
+          if (el.tagName === "OPTION") el.textContent = `${el.dataset.label} (${n})`;
+          else el.textContent = String(n);
+        });
+        const priceFacets = document.getElementById("priceFacets");
+        if (priceFacets) {
+          priceFacets.innerHTML = (facets.price || []).filter(b => b.count).map(b => `
+            <button type="button" class="price-facet" data-min="${b.min}" data-max="${b.max ?? ""}">
+              ${b.min}${b.max != null ? `–${b.max}` : "+"} <span class="facet-count">${b.count}</span>
+            </button>`).join("");
+        }
+      }
+
       async function fetchResults({ append = false } = {}) {
         if (isLoading) return;
         isLoading = true;
@@ -259,7 +280,15 @@
           if (noResults) noResults.classList.toggle("hidden", (data.total_count ?? 0) !== 0);
 
           setLoadMoreState(!!data.has_more);
+          if (loadMoreBtn) loadMoreBtn.dataset.nextCursor = data.next_cursor || "";
+          renderFacets(data.facets);
+          if (!append && attributeFilters && data.attribute_filters_html !== undefined) {
+            attributeFilters.innerHTML = data.attribute_filters_html;
+            attributeFilters.dataset.category = params.get("category") || "";
+          }
 
+          // cursors are per-session positions, keep them out of shareable URLs
+          params.delete("cursor");
           const clean = new URL(window.location.href);
           clean.search = params.toString();
           window.history.replaceState({}, "", clean.toString());
@@ -313,6 +342,32 @@
         });
       });
 
+      // attribute filters are re-rendered with each response, so listen on the container
+      let attrTimer = null;
+      attributeFilters?.addEventListener("change", () => {
+        clearTimeout(attrTimer);
+        resetToFirstPage();
+        fetchResults({ append: false });
+      });
+      attributeFilters?.addEventListener("input", (e) => {
+        if (e.target.type === "checkbox") return;
+        clearTimeout(attrTimer);
+        attrTimer = setTimeout(() => {
+          resetToFirstPage();
+          fetchResults({ append: false });
+        }, 450);
+      });
+
+      // price histogram buckets fill the range
+      document.getElementById("priceFacets")?.addEventListener("click", (e) => {
+        const bucket = e.target.closest(".price-facet");
+        if (!bucket) return;
+        if (priceMin) priceMin.value = bucket.dataset.min;
+        if (priceMax) priceMax.value = bucket.dataset.max;
+        resetToFirstPage();
+        fetchResults({ append: false });
+      });
+
       // reset filters (desktop)
       resetFiltersBtn?.addEventListener("click", () => {
         form.querySelectorAll("select").forEach(s => (s.value = ""));
@@ -335,11 +390,39 @@
       // load more
       loadMoreBtn?.addEventListener("click", () => {
           if (loadMoreBtn.disabled) return;
-          const current = parseInt(pageField?.value || "1", 10) || 1;
-          if (pageField) pageField.value = String(current + 1);
+          if (cursorField) cursorField.value = loadMoreBtn.dataset.nextCursor || "";
           fetchResults({ append: true });
         });
 
+      // save the current filters; new matching ads are notified (services/saved_searches.py)
+      const saveSearchBtn = document.getElementById("saveSearchBtn");
+      const SAVE_SEARCH_ERRORS = {
+        too_broad: "اختر كلمة بحث أو فئة أو مدينة أو سعراً أولاً",
+        limit: "وصلت إلى الحد الأقصى من عمليات البحث المحفوظة",
+      };
+      saveSearchBtn?.addEventListener("click", async () => {
+        const params = qsFromForm();
+        params.delete("cursor");
+        const body = new URLSearchParams({
+          query: params.toString(),
+          notify: document.getElementById("saveSearchNotify")?.value || "instant",
+        });
+        saveSearchBtn.disabled = true;
+        try {
+          const res = await fetch(saveSearchBtn.dataset.url, {
+            method: "POST",
+            headers: { "X-CSRFToken": window.RUKN?.csrfToken || "", "X-Requested-With": "XMLHttpRequest" },
+            body,
+          });
+          const data = await res.json();
+          saveSearchBtn.textContent = data.ok ? "تم حفظ البحث ✓" : (SAVE_SEARCH_ERRORS[data.error] || "تعذّر حفظ البحث");
+        } catch (e) {
+          saveSearchBtn.textContent = "تعذّر حفظ البحث";
+        } finally {
+          saveSearchBtn.disabled = false;
+        }
+      });
+
       // ---- Category Dropdown (trigger + collapsible tree panel) ----
 
       (function initCategoryTree() {
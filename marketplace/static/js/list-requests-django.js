@@ -24,7 +24,7 @@
     const filterCity = document.getElementById("filterCity");
     const filterMin = document.getElementById("filterPriceMin");
     const filterMax = document.getElementById("filterPriceMax");
-    const pageField = document.getElementById("pageField");
+    const cursorField = document.getElementById("cursorField");
 
     const listEl = document.getElementById("adsList");
     const totalEl = document.getElementById("resultsTotal");
@@ -33,6 +33,7 @@
     const noResults = document.getElementById("noResults");
 
     const resetBtn = document.getElementById("resetFilters");
+    const attributeFilters = document.getElementById("attributeFilters");
     const clearAfterNoResults = document.getElementById("clearAfterNoResults");
 
 
@@ -103,8 +104,8 @@
       if (params.has("time")) setRadioGroupValue("time", params.get("time") || "");
       if (params.has("sort")) setRadioGroupValue("sort", params.get("sort") || "latest");
 
-      // page: intentionally NOT read from URL – the template sets pageField to
-      // page_obj.number (the actual page served after clamping), so we honour that.
+      // cursor: intentionally NOT read from URL – a fresh load always starts at
+      // the first page and "load more" continues from the cursor the server handed out.
 
       // category (robust + retry)
       if (cat && filterCategory) {
@@ -129,25 +130,45 @@
     const buildQuery = () => {
       const fd = new FormData(form);
 
-      // normalize page
-      if (!fd.get("page")) fd.set("page", pageField?.value || "1");
-
       // remove empty fields
       [...fd.keys()].forEach((k) => {
         const vals = fd.getAll(k);
         if (vals.length === 1 && (vals[0] === "" || vals[0] == null)) fd.delete(k);
       });
 
+      // attribute inputs belong to the category they were rendered for; drop them once it changes
+      const attrsCurrent = (attributeFilters?.dataset.category || "") === (fd.get("category") || "").toString();
       const qs = new URLSearchParams();
-      for (const [k, v] of fd.entries()) qs.append(k, v);
+      for (const [k, v] of fd.entries()) {
+        if (k.startsWith("attr_") && (!attrsCurrent || String(v).trim() === "")) continue;
+        qs.append(k, v);
+      }
       return qs.toString();
     };
 
+    // sidebar facet counts from the JSON (first pages only; "load more" keeps the old ones)
+    function renderFacets(facets) {
+      if (!facets) return;
+      form.querySelectorAll("[data-facet][data-key]").forEach(el => {
+        const n = (facets[el.dataset.facet] || {})[el.dataset.key] ?? 0;
+        if (el.tagName === "OPTION") el.textContent = `${el.dataset.label} (${n})`;
+        else el.textContent = String(n);
+      });
+      const priceFacets = document.getElementById("priceFacets");
+      if (priceFacets) {
+        priceFacets.innerHTML = (facets.price || []).filter(b => b.count).map(b => `
+          <button type="button" class="price-facet" data-min="${b.min}" data-max="${b.max ?? ""}">
+            ${b.min}${b.max != null ? `–${b.max}` : "+"} <span class="facet-count">${b.count}</span>
+          </button>`).join("");
+      }
+    }
+
     const applyFilters = async ({ append = false } = {}) => {
       if (!form || !listEl) return;
 
       const url = new URL(form.action, window.location.origin);
       url.search = buildQuery();
+      const category = url.searchParams.get("category") || "";
 
       const res = await fetch(url.toString(), {
         headers: { "X-Requested-With": "XMLHttpRequest" },
@@ -167,7 +188,12 @@
       if (noResults) noResults.classList.toggle("hidden", total !== 0);
 
       setLoadMoreState(!!data.has_more);
-
+      if (loadMoreBtn) loadMoreBtn.dataset.nextCursor = data.next_cursor || "";
+      renderFacets(data.facets);
+      if (!append && attributeFilters && data.attribute_filters_html !== undefined) {
+        attributeFilters.innerHTML = data.attribute_filters_html;
+        attributeFilters.dataset.category = category;
+      }
 
       if (!append) {
         document.getElementById("allAdsAnchor")?.scrollIntoView({ behavior: "smooth", block: "start" });
@@ -178,35 +204,35 @@
     [filterCategory, filterCity].forEach((el) =>
       el &&
       el.addEventListener("change", () => {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
       })
     );
 
     document.querySelectorAll('input[name="condition"]').forEach((r) =>
       r.addEventListener("change", () => {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
       })
     );
 
     document.querySelectorAll('input[name="seller_type"]').forEach((r) =>
       r.addEventListener("change", () => {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
       })
     );
 
     document.querySelectorAll('input[name="time"]').forEach((r) =>
       r.addEventListener("change", () => {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
       })
     );
 
     document.querySelectorAll('input[name="sort"]').forEach((r) =>
       r.addEventListener("change", () => {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
       })
     );
@@ -215,13 +241,13 @@
     const schedulePriceApply = (ms = 500) => {
       clearTimeout(priceTimer);
       priceTimer = setTimeout(() => {
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
       }, ms);
     };
     const flushPriceApply = () => {
       clearTimeout(priceTimer);
-      if (pageField) pageField.value = "1";
+      if (cursorField) cursorField.value = "";
       applyFilters({ append: false });
     };
 
@@ -231,6 +257,21 @@
       el.addEventListener("change", () => flushPriceApply());
     });
 
+    // attribute filters are re-rendered with each response, so listen on the container
+    attributeFilters?.addEventListener("change", () => flushPriceApply());
+    attributeFilters?.addEventListener("input", (e) => {
+      if (e.target.type !== "checkbox") schedulePriceApply(500);
+    });
+
+    // price histogram buckets fill the range
+    document.getElementById("priceFacets")?.addEventListener("click", (e) => {
+      const bucket = e.target.closest(".price-facet");
+      if (!bucket) return;
+      if (filterMin) filterMin.value = bucket.dataset.min;
+      if (filterMax) filterMax.value = bucket.dataset.max;
+      flushPriceApply();
+    });
+
     resetBtn?.addEventListener("click", () => {
       if (filterCategory) filterCategory.value = "";
       if (filterCity) filterCity.value = "";
@@ -242,7 +283,7 @@
       setRadioGroupValue("sort", "latest");
       setRadioGroupValue("condition", "");
 
-      if (pageField) pageField.value = "1";
+      if (cursorField) cursorField.value = "";
       applyFilters({ append: false });
     });
 
@@ -251,8 +292,7 @@
     loadMoreBtn?.addEventListener("click", () => {
       if (loadMoreBtn.disabled) return;
 
-      const current = parseInt(pageField?.value || "1", 10) || 1;
-      if (pageField) pageField.value = String(current + 1);
+      if (cursorField) cursorField.value = loadMoreBtn.dataset.nextCursor || "";
       applyFilters({ append: true });
     });
 
@@ -315,7 +355,7 @@
         syncVisualSelection();
         closePanel();
 
-        if (pageField) pageField.value = "1";
+        if (cursorField) cursorField.value = "";
         applyFilters({ append: false });
         document.getElementById("allAdsAnchor")?.scrollIntoView({ behavior: "smooth", block: "start" });
       });
@@ -655,7 +695,7 @@
         setRadioGroupValue("sort", r ? (r.value || "latest") : "latest");
       }
 
-      if (pageField) pageField.value = "1";
+      if (cursorField) cursorField.value = "";
       applyFilters({ append: false });
     }
 
@@ -669,7 +709,7 @@
       if (activeKey === "time") setRadioGroupValue("time", "");
       if (activeKey === "sort") setRadioGroupValue("sort", "latest");
 
-      if (pageField) pageField.value = "1";
+      if (cursorField) cursorField.value = "";
       applyFilters({ append: false });
     }
 
@@ -3,12 +3,21 @@
    Back button returns to the list.
    URL updates: ?tab=msgs&c=ID
    Deep-link on page load opens the correct conversation directly.
+   Messages come from the sync endpoint: the latest page on open, older pages
+   (before_id) when scrolling up, and only newer ones (after_id) to catch up.
 */
 
 let currentChatId = null;
 let currentFilter  = "all";
 let conversations  = [];
 let msgsBooted     = false;
+let nextConvCursor = "";
+let loadingConvs   = false;
+let chatSock       = null;
+let oldestMsgId    = null;
+let newestMsgId    = null;
+let hasOlderMsgs   = false;
+let loadingOlder   = false;
 
 function $(id){ return document.getElementById(id); }
 
@@ -129,46 +138,177 @@ function renderConversations(){
   updateCounters();
 }
 
+async function fetchConversationsPage(cursor){
+  const url = new URL(window.MYMSG_ENDPOINTS.conversations, window.location.origin);
+  if(cursor) url.searchParams.set("cursor", cursor);
+  const res = await fetch(url.toString(), { credentials:"same-origin" });
+  return res.json().catch(() => ({}));
+}
+
 async function loadConversations(){
-  const res  = await fetch(window.MYMSG_ENDPOINTS.conversations, { credentials:"same-origin" });
-  const data = await res.json().catch(() => ({}));
-  conversations = data.conversations || [];
+  const data = await fetchConversationsPage("");
+  conversations  = data.conversations || [];
+  nextConvCursor = data.next_cursor || "";
   renderConversations();
 }
 
-/* ─── CHAT PANEL ─────────────────────────────────────────────────────────── */
+// Older conversations are fetched a page at a time as the list scrolls.
+async function loadMoreConversations(){
+  if(!nextConvCursor || loadingConvs) return;
+  loadingConvs = true;
+  try {
+    const data = await fetchConversationsPage(nextConvCursor);
+    const seen = new Set(conversations.map(c => String(c.id)));
+    (data.conversations || []).forEach(c => { if(!seen.has(String(c.id))) conversations.push(c); });
+    nextConvCursor = data.next_cursor || "";
+    renderConversations();
+  } finally {
+    loadingConvs = false;
+  }
+}
 
-function renderChat(messages){
-  const area = $("chatArea");
-  if(!area) return;
+function maybeLoadMoreConversations(){
+  if(!isMsgsTabActive() || currentChatId) return;
+  const list = $("conversationsList");
+  if(!list) return;
+  const nearListEnd = list.scrollHeight - list.scrollTop - list.clientHeight < 200;
+  const nearPageEnd = window.innerHeight + window.scrollY >= document.body.offsetHeight - 300;
+  if(nearListEnd || nearPageEnd) loadMoreConversations();
+}
+
+/* ─── CHAT PANEL ─────────────────────────────────────────────────────────── */
 
-  area.innerHTML = (messages || []).map(m => {
-    if(m.from === "them"){
-      const avatar     = (m.avatar || "").trim();
-      const avatarHtml = avatar ? `<img class="msg-avatar" src="${avatar}" alt="">` : "";
-      return `
-        <div class="msg-row them">
-          ${avatarHtml}
-          <div class="msg-bubble">
-            <p class="msg-text">${m.text}</p>
-            <span class="msg-time">${fmtTime(m.time)}</span>
-          </div>
-        </div>`;
-    }
+function messageRowHtml(m){
+  if(m.from === "them"){
+    const avatar     = (m.avatar || "").trim();
+    const avatarHtml = avatar ? `<img class="msg-avatar" src="${avatar}" alt="">` : "";
     return `
-      <div class="msg-row me">
+      <div class="msg-row them">
+        ${avatarHtml}
         <div class="msg-bubble">
           <p class="msg-text">${m.text}</p>
           <span class="msg-time">${fmtTime(m.time)}</span>
         </div>
       </div>`;
-  }).join("");
+  }
+  return `
+    <div class="msg-row me">
+      <div class="msg-bubble">
+        <p class="msg-text">${m.text}</p>
+        <span class="msg-time">${fmtTime(m.time)}</span>
+      </div>
+    </div>`;
+}
+
+function currentAvatar(){
+  const c = conversations.find(x => String(x.id) === currentChatId);
+  return c?.img || "";
+}
 
+function trackIds(messages){
+  (messages || []).forEach(m => {
+    if(oldestMsgId === null || m.id < oldestMsgId) oldestMsgId = m.id;
+    if(newestMsgId === null || m.id > newestMsgId) newestMsgId = m.id;
+  });
+}
+
+function renderChat(messages){
+  const area = $("chatArea");
+  if(!area) return;
+
+  const avatar = currentAvatar();
+  area.innerHTML = (messages || []).map(m => messageRowHtml({ ...m, avatar })).join("");
+  area.scrollTop = area.scrollHeight;
+}
+
+async function loadOlderMessages(){
+  const chatId = currentChatId;
+  if(!chatId || !hasOlderMsgs || loadingOlder || oldestMsgId === null) return;
+  loadingOlder = true;
+  try{
+    const { res, data } = await loadMessages(chatId, { before_id: oldestMsgId });
+    const area = $("chatArea");
+    if(!res.ok || chatId !== currentChatId || !area) return;
+
+    const msgs   = data.messages || [];
+    const avatar = currentAvatar();
+    const prevHeight = area.scrollHeight;
+    area.insertAdjacentHTML("afterbegin", msgs.map(m => messageRowHtml({ ...m, avatar })).join(""));
+    area.scrollTop += area.scrollHeight - prevHeight;
+    trackIds(msgs);
+    hasOlderMsgs = !!data.has_more;
+  } finally {
+    loadingOlder = false;
+  }
+}
+
+async function catchUpMessages(chatId){
+  if(String(chatId) !== currentChatId || newestMsgId === null) return;
+  const { res, data } = await loadMessages(chatId, { after_id: newestMsgId });
+  const area = $("chatArea");
+  if(!res.ok || String(chatId) !== currentChatId || !area) return;
+
+  const msgs = data.messages || [];
+  if(!msgs.length) return;
+  area.querySelector(".chat-area__empty")?.remove();
+  const avatar = currentAvatar();
+  area.insertAdjacentHTML("beforeend", msgs.map(m => messageRowHtml({ ...m, avatar })).join(""));
   area.scrollTop = area.scrollHeight;
+  trackIds(msgs);
+  if(data.has_more) await catchUpMessages(chatId);
 }
 
-async function loadMessages(chatId){
-  const url = window.MYMSG_ENDPOINTS.messages.replace("__ID__", chatId);
+/* ─── LIVE UPDATES (ChatSocket, see static/js/chat_socket.js) ───────────── */
+
+function closeChatSocket(){
+  chatSock?.close();
+  chatSock = null;
+}
+
+function openChatSocket(chatId){
+  closeChatSocket();
+  if(!window.ChatSocket) return;
+
+  chatSock = ChatSocket.open(chatId, {
+    onMessage(m, mine){
+      if(String(chatId) !== currentChatId) return;
+      if(newestMsgId !== null && m.id <= newestMsgId) return;
+      trackIds([m]);
+      const area = $("chatArea");
+      area?.querySelector(".chat-area__empty")?.remove();
+      const c = conversations.find(x => String(x.id) === String(chatId));
+      area?.insertAdjacentHTML("beforeend", messageRowHtml({
+        from: mine ? "me" : "them",
+        text: m.body,
+        time: m.time,
+        avatar: c?.img || "",
+      }));
+      if(area) area.scrollTop = area.scrollHeight;
+
+      if(c){
+        c.lastText = m.body;
+        c.lastTime = m.time;
+        renderConversations();
+      }
+      if(!mine) chatSock?.send({ type: "read" });
+    },
+    onStatus(connected){
+      // pick up anything sent while the socket was down
+      if(connected) catchUpMessages(chatId);
+    },
+    onError(error){
+      const area = $("chatArea");
+      const msg  = error === "empty" ? "الرسالة فارغة" : "ممنوع الروابط أو HTML";
+      area?.insertAdjacentHTML("beforeend",
+        `<div style="padding:12px;text-align:center;color:#ef4444;">${msg}</div>`);
+      if(area) area.scrollTop = area.scrollHeight;
+    },
+  });
+}
+
+async function loadMessages(chatId, params = {}){
+  const url = new URL(window.MYMSG_ENDPOINTS.messages.replace("__ID__", chatId), window.location.origin);
+  Object.entries(params).forEach(([k, v]) => url.searchParams.set(k, v));
   const res  = await fetch(url, { credentials:"same-origin" });
   const data = await res.json().catch(() => ({}));
   return { res, data };
@@ -177,6 +317,8 @@ async function loadMessages(chatId){
 async function openChat(chatId){
   const strId = String(chatId);
   currentChatId = strId;
+  oldestMsgId = newestMsgId = null;
+  hasOlderMsgs = false;
 
   // Populate header
   const c = conversations.find(x => String(x.id) === strId) || null;
@@ -196,8 +338,9 @@ async function openChat(chatId){
   window.scrollTo({ top: 0, behavior: "smooth" });
   pushUrl(strId);
 
-  // Load messages
+  // Load messages, then follow the conversation live
   const { res, data } = await loadMessages(strId);
+  openChatSocket(strId);
 
   if(!res.ok){
     if(area) area.innerHTML = `<div class="chat-area__error">فشل تحميل المحادثة (${res.status})</div>`;
@@ -205,6 +348,8 @@ async function openChat(chatId){
   }
 
   const msgs = data.messages || [];
+  trackIds(msgs);
+  hasOlderMsgs = !!data.has_more;
   if(!Array.isArray(msgs) || msgs.length === 0){
     if(area) area.innerHTML = `<div class="chat-area__empty">لا توجد رسائل بعد</div>`;
   } else {
@@ -247,6 +392,11 @@ async function sendMessage(){
   const body  = (input?.value || "").trim();
   if(!currentChatId || !body) return;
 
+  if(chatSock?.send({ type: "message", body })){
+    input.value = "";
+    return;
+  }
+
   const url  = window.MYMSG_ENDPOINTS.send.replace("__ID__", currentChatId);
   const csrf = getCookie("csrftoken");
 
@@ -276,13 +426,15 @@ async function sendMessage(){
   }
 
   input.value = "";
-  await openChat(currentChatId);   // reload messages
+  if(newestMsgId === null) await openChat(currentChatId);
+  else                     await catchUpMessages(currentChatId);   // fetch just the new message
   await loadConversations();       // refresh last-message preview
 }
 
 /* ─── RESET (returning to list) ─────────────────────────────────────────── */
 
 function resetMsgsViewToList(){
+  closeChatSocket();
   currentChatId = null;
   showListScreen();
 }
@@ -326,6 +478,11 @@ function bootMessagesUI(){
   wireFiltersOnce();
 
   $("chatSearch")?.addEventListener("input", renderConversations);
+  $("conversationsList")?.addEventListener("scroll", maybeLoadMoreConversations, { passive:true });
+  window.addEventListener("scroll", maybeLoadMoreConversations, { passive:true });
+  $("chatArea")?.addEventListener("scroll", () => {
+    if($("chatArea").scrollTop < 40) loadOlderMessages();
+  }, { passive:true });
 
   // Back button: return to the conversations list
   $("chatBackBtn")?.addEventListener("click", () => {
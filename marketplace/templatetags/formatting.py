@@ -20,3 +20,13 @@ def compact_ar_k(value):
             num = int(num)
         return {"num": num, "is_k": True}
     return {"num": v, "is_k": False}
+
+
+@register.filter
+def facet_count(counts, key):
+    """
+    {{ facets.cities|facet_count:c.id }} -> that facet's count ("" without facets)
+    """
+    if not isinstance(counts, dict):
+        return ""
+    return counts.get(key, 0)
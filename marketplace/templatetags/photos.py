@@ -0,0 +1,49 @@
+from django import template
+from django.utils.html import format_html
+
+from marketplace.services import image_resize
+from marketplace.utils import photo_urls
+
+register = template.Library()
+
+# grid cards: 2 columns on phones, 3-4 on larger screens
+CARD_SIZES = "(max-width: 640px) 50vw, (max-width: 1024px) 33vw, 320px"
+
+
+@register.simple_tag
+def picture(renditions, fallback_url, alt="", sizes=CARD_SIZES, css="", lazy=True):
+    """
+    <picture> with WebP and JPEG srcsets so the browser picks the smallest
+    adequate rendition; a plain <img> of `fallback_url` until renditions exist.
+
+        {% picture card.main_photo_renditions card.main_photo_url alt=card.title css="w-full h-full object-cover" %}
+    """
+    loading = "lazy" if lazy else "eager"
+    webp = photo_urls.srcset(renditions, "webp")
+    jpg = photo_urls.srcset(renditions, "jpg")
+    if not (webp and jpg):
+        return format_html(
+            '<img src="{}" alt="{}" loading="{}" decoding="async" class="{}">',
+            fallback_url, alt, loading, css,
+        )
+
+    return format_html(
+        '<picture class="block w-full h-full">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}" decoding="async" class="{}">'
+        '</picture>',
+        webp, sizes,
+        photo_urls.rendition_url(renditions, "card", "jpg", fallback_url), jpg, sizes, alt, loading, css,
+    )
+
+
+@register.simple_tag
+def rendition_url(renditions, name="thumb", fallback="", fmt="jpg"):
+    """Single rendition URL for fixed-size spots (navbar, lists): {% rendition_url card.main_photo_renditions "thumb" card.main_photo_url %}"""
+    return photo_urls.rendition_url(renditions, name, fmt, fallback)
+
+
+@register.simple_tag
+def resized_url(image, width, height, fallback=""):
+    """Avatars, logos, covers: {% resized_url store.logo 160 160 store.logo_url %} (sizes: image_resize.SIZES)"""
+    return image_resize.resized_url(image, int(width), int(height), fallback)
@@ -1,13 +1,58 @@
-from django.test import TestCase, Client, override_settings
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from importlib import import_module
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from urllib.parse import urlencode
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image as PILImage, ImageDraw
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.template import Context, Template
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.db import IntegrityError
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
 
 from marketplace.models import (
     User, Category, City, Listing, Item, Favorite,
-    ItemPhoto, Attribute, AttributeOption, ItemAttributeValue,
+    ItemPhoto, Attribute, AttributeOption, ItemAttributeValue, Request, RequestAttributeValue, ListingCard,
+    CategoryClosure, Conversation, Message, Notification, ModerationJob, SearchIndexQueue, SearchIndexChange,
+    SimilarListing, SavedSearch, SavedSearchMatch, SavedSearchQueue,
 )
 from marketplace.models.users import normalize_jo_mobile_to_07
+from marketplace import moderation
+from marketplace.context_processors import navbar_counters
+from marketplace.routing import websocket_urlpatterns
+from marketplace.services import (
+    attribute_filters, category_closure, conversations, counters, image_resize, listing_facets, listing_search, lost_found_matching,
+    moderation_queue, photo_duplicates, photo_normalization, saved_searches, search_cache, search_index,
+    search_reindex, similar_listings, taxonomy_cache,
+)
+from marketplace.services import chat as chat_service
+from marketplace.utils import arabic, images, phash, photo_urls
+from marketplace.utils.category_tree import get_selected_category_path
 
 # Use simple static files storage in view tests to avoid manifest/missing-file issues.
 SIMPLE_STORAGES = {
@@ -114,6 +159,81 @@ class CategoryModelTests(TestCase):
         self.assertIsNone(cat.photo_url)
 
 
+class CategoryClosureTests(TestCase):
+
+    def setUp(self):
+        self.root = Category.objects.create(name="Home")
+        self.mid = Category.objects.create(name="Kitchen", parent=self.root)
+        self.leaf = Category.objects.create(name="Ovens", parent=self.mid)
+        self.other = Category.objects.create(name="Garden")
+
+    def test_descendants_ancestors_and_root(self):
+        self.assertCountEqual(
+            category_closure.descendant_ids(self.root),
+            [self.root.id, self.mid.id, self.leaf.id],
+        )
+        self.assertEqual(
+            [c.name for c in category_closure.ancestor_path(self.leaf)],
+            ["Home", "Kitchen", "Ovens"],
+        )
+        self.assertEqual(category_closure.root_id(self.leaf), self.root.id)
+        self.assertEqual(get_selected_category_path(self.leaf), [self.root.id, self.mid.id, self.leaf.id])
+
+    def test_moving_a_subtree_relinks_descendants(self):
+        self.mid.parent = self.other
+        self.mid.save()
+
+        self.assertEqual(category_closure.ancestor_path_ids(self.leaf), [self.other.id, self.mid.id, self.leaf.id])
+        self.assertEqual(category_closure.descendant_ids(self.root), [self.root.id])
+        self.assertEqual(CategoryClosure.objects.get(ancestor=self.other, descendant=self.leaf).depth, 2)
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        before = set(CategoryClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+        category_closure.rebuild_closure()
+        after = set(CategoryClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+        self.assertEqual(before, after)
+
+
+class TaxonomyCacheTests(TestCase):
+
+    def setUp(self):
+        # the version is bumped once the edit commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = Category.objects.create(name="Vehicles")
+            self.child = Category.objects.create(name="Cars", parent=self.root)
+            self.city = City.objects.create(name="Irbid")
+
+    def test_tree_is_served_from_cache_after_first_build(self):
+        nodes = taxonomy_cache.category_map()
+        self.assertEqual([c.name for c in nodes[self.root.id].subcategories.all()], ["Cars"])
+
+        with self.assertNumQueries(0):
+            taxonomy_cache.category_map()
+            taxonomy_cache.nav_tree()
+            taxonomy_cache.browse_data()
+
+    def test_category_save_bumps_version(self):
+        taxonomy_cache.nav_tree()
+        self.child.name = "Used cars"
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.child.save()
+        # not before the commit: other processes would rebuild from the old rows
+        self.assertEqual(taxonomy_cache.nav_tree()[0]["children"][0]["name"], "Cars")
+        for callback in callbacks:
+            callback()
+
+        tree = taxonomy_cache.nav_tree()
+        top = next(t for t in tree if t["id"] == self.root.id)
+        self.assertEqual(top["children"][0]["name"], "Used cars")
+
+    def test_city_changes_invalidate_city_lists(self):
+        self.assertIn("Irbid", [c.name for c in taxonomy_cache.cities(active_only=True)])
+        self.city.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city.save()
+        self.assertNotIn("Irbid", [c.name for c in taxonomy_cache.cities(active_only=True)])
+
+
 class ListingModelTests(TestCase):
 
     def setUp(self):
@@ -280,6 +400,1558 @@ class AttributeModelTests(TestCase):
         self.assertIn(opt, attr.options.all())
 
 
+class ListingCardProjectionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="0791000003", password="pass123", username="seller1")
+        self.parent = Category.objects.create(name="Vehicles")
+        self.category = Category.objects.create(name="Cars", parent=self.parent)
+        self.city = City.objects.create(name="Irbid")
+
+    def _make_item(self, **listing_kwargs):
+        defaults = dict(
+            type="item", user=self.user, category=self.category, city=self.city,
+            title="Sedan", is_approved=True, is_active=True,
+        )
+        defaults.update(listing_kwargs)
+        listing = Listing.objects.create(**defaults)
+        return Item.objects.create(listing=listing, price=7000, condition="used")
+
+    def test_visible_item_gets_flat_card(self):
+        item = self._make_item()
+        card = ListingCard.objects.get(listing=item.listing)
+        self.assertEqual(card.object_id, item.id)
+        self.assertEqual(card.price, 7000)
+        self.assertEqual(card.category_path, "Vehicles › Cars")
+        self.assertEqual(card.root_category_id, self.parent.id)
+        self.assertEqual(card.city_name, "Irbid")
+        self.assertEqual(card.seller_type, ListingCard.SELLER_INDIVIDUAL)
+        self.assertEqual(card.seller_name, "seller1")
+
+    def test_card_follows_visibility_and_favorites(self):
+        item = self._make_item()
+        fan = User.objects.create_user(phone="0791000004", password="pass123")
+        Favorite.objects.create(user=fan, listing=item.listing)
+        self.assertEqual(ListingCard.objects.get(listing=item.listing).favorite_count, 1)
+
+        item.listing.is_active = False
+        item.listing.save()
+        self.assertFalse(ListingCard.objects.filter(listing=item.listing).exists())
+
+    def test_unapproved_item_has_no_card(self):
+        item = self._make_item(is_approved=False)
+        self.assertFalse(ListingCard.objects.filter(listing=item.listing).exists())
+
+    def test_rebuild_restores_missing_cards(self):
+        item = self._make_item()
+        ListingCard.objects.all().delete()
+        call_command("rebuild_listing_cards", stdout=StringIO())
+        self.assertTrue(ListingCard.objects.filter(listing=item.listing).exists())
+
+
+class NavbarCountersTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(phone="0791000030", password="pass123")
+        self.buyer = User.objects.create_user(phone="0791000031", password="pass123")
+        category = Category.objects.create(name="Phones")
+        self.listing = Listing.objects.create(
+            type="item", user=self.seller, category=category, title="Phone",
+            is_approved=True, is_active=True,
+        )
+        Item.objects.create(listing=self.listing, price=100, condition="used")
+        self.conv = Conversation.objects.create(listing=self.listing, buyer=self.buyer, seller=self.seller)
+        counters.reset([self.seller.pk, self.buyer.pk])
+
+    def _context(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        ctx = navbar_counters(request)
+        list(ctx["recent_notifications"])
+        list(ctx["recent_favorites"])
+        return ctx
+
+    def test_counters_follow_writes(self):
+        self.assertEqual(counters.get_counters(self.seller.pk)[counters.UNREAD_MESSAGES], 0)
+        Message.objects.create(conversation=self.conv, sender=self.buyer, body="hi")
+        Message.objects.create(conversation=self.conv, sender=self.buyer, body="still there?")
+        Notification.objects.create(user=self.seller, title="Hello")
+        Favorite.objects.create(user=self.seller, listing=self.listing)
+
+        with self.assertNumQueries(0):
+            counts = counters.get_counters(self.seller.pk)
+        self.assertEqual(counts, {
+            counters.UNREAD_MESSAGES: 2,
+            counters.UNREAD_NOTIFICATIONS: 1,
+            counters.FAVORITE_COUNT: 1,
+        })
+
+        self.client.force_login(self.seller)
+        self.client.get(reverse("api_conversation_messages", args=[self.conv.id]))
+        self.assertEqual(counters.get_counters(self.seller.pk)[counters.UNREAD_MESSAGES], 0)
+
+    def test_context_processor_is_three_queries(self):
+        chat_service.post_message(self.conv, self.buyer, "hi")
+        Favorite.objects.create(user=self.seller, listing=self.listing)
+        counters.get_counters(self.seller.pk)
+
+        with self.assertNumQueries(3):
+            ctx = self._context(self.seller)
+
+        conv = ctx["recent_conversations"][0]
+        self.assertEqual(conv["other_user"], self.buyer)
+        self.assertEqual(conv["latest_msg"]["body"], "hi")
+        self.assertTrue(conv["has_unread"])
+        self.assertEqual(ctx["unread_messages"], 1)
+        self.assertEqual(len(ctx["recent_favorites"]), 1)
+
+
+
+class ConversationSummaryTests(TestCase):
+
+    def setUp(self):
+        self.me = User.objects.create_user(phone="0791000040", password="pass123", username="me")
+        category = Category.objects.create(name="Books")
+        self.convs = []
+        for i in range(3):
+            other = User.objects.create_user(phone=f"079100005{i}", password="pass123", username=f"other{i}")
+            listing = Listing.objects.create(
+                type="item", user=other, category=category, title=f"Book {i}",
+                is_approved=True, is_active=True,
+            )
+            Item.objects.create(listing=listing, price=5, condition="used")
+            conv = Conversation.objects.create(listing=listing, buyer=self.me, seller=other)
+            chat_service.post_message(conv, other, f"msg {i}")
+            self.convs.append(conv)
+
+    def test_summaries_are_ordered_by_last_activity_and_paged(self):
+        chat_service.post_message(self.convs[0], self.me, "bump")
+        self.assertEqual(
+            Conversation.objects.get(pk=self.convs[0].pk).last_message_at,
+            Message.objects.get(body="bump").created_at,
+        )
+
+        first = conversations.summaries_page(self.me, per_page=2)
+        self.assertEqual([c.id for c in first], [self.convs[0].id, self.convs[2].id])
+        second = conversations.summaries_page(self.me, first.next_cursor, per_page=2)
+        self.assertEqual([c.id for c in second], [self.convs[1].id])
+        self.assertFalse(second.has_next())
+
+        row = conversations.summarize(first.object_list[0], self.me)
+        self.assertEqual(row["last_text"], "bump")
+        self.assertEqual(row["unread_count"], 1)
+        self.assertEqual((row["type"], row["title"]), ("ad", "Book 0"))
+
+    def test_list_endpoints_share_one_query(self):
+        self.client.force_login(self.me)
+        self.client.get(reverse("api_my_conversations"))  # warm session/user lookups
+
+        with self.assertNumQueries(3):  # session, user, conversations
+            data = self.client.get(reverse("api_my_conversations")).json()
+        self.assertEqual(len(data["conversations"]), 3)
+        self.assertEqual(data["conversations"][0]["unreadCount"], 1)
+
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse("my_account_conversations_api")).json()
+        self.assertEqual(data["conversations"][0]["last"]["text"], "msg 2")
+
+
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class ChatFixtureMixin:
+
+    def setUp(self):
+        self.seller = User.objects.create_user(phone="0791000060", password="pass123", username="seller60")
+        self.buyer = User.objects.create_user(phone="0791000061", password="pass123", username="buyer61")
+        self.outsider = User.objects.create_user(phone="0791000062", password="pass123")
+        category = Category.objects.create(name="Bikes")
+        listing = Listing.objects.create(
+            type="item", user=self.seller, category=category, title="Bike",
+            is_approved=True, is_active=True,
+        )
+        Item.objects.create(listing=listing, price=50, condition="used")
+        self.conv = Conversation.objects.create(listing=listing, buyer=self.buyer, seller=self.seller)
+
+    def _communicator(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/chat/{self.conv.id}/")
+        communicator.scope["user"] = user
+        return communicator
+
+
+
+@override_settings(STORAGES=SIMPLE_STORAGES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatRealtimeTests(ChatFixtureMixin, TestCase):
+
+    def test_post_message_validates_and_broadcasts_after_commit(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(chat_service.group_name(self.conv.id), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            msg = chat_service.post_message(self.conv, self.buyer, "  hello  ")
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual(event["type"], "chat.message")
+        self.assertEqual(event["message"]["id"], msg.id)
+        self.assertEqual(event["message"]["body"], "hello")
+
+        with self.assertRaises(ValidationError):
+            chat_service.post_message(self.conv, self.buyer, "<b>http://spam.example</b>")
+        self.assertEqual(Message.objects.filter(conversation=self.conv).count(), 1)
+
+    def test_consumer_rejects_non_participants(self):
+        async def run():
+            communicator = self._communicator(AnonymousUser())
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+            communicator = self._communicator(self.outsider)
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4403)
+
+        async_to_sync(run)()
+
+    def test_chat_room_renders_with_socket_hooks(self):
+        Message.objects.create(conversation=self.conv, sender=self.buyer, body="hi")
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse("chat_room", args=[self.conv.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'id="chatMessages"')
+        self.assertTrue(Message.objects.get(conversation=self.conv).is_read)
+
+
+@override_settings(STORAGES=SIMPLE_STORAGES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatSyncTests(ChatFixtureMixin, TestCase):
+
+    def _messages(self, n):
+        return [
+            Message.objects.create(conversation=self.conv, sender=self.buyer, body=f"m{i}")
+            for i in range(n)
+        ]
+
+    def test_sync_pages_by_id_in_both_directions(self):
+        msgs = self._messages(5)
+        latest = chat_service.sync_messages(self.conv, self.seller, limit=2)
+        self.assertEqual([m.id for m in latest["messages"]], [msgs[3].id, msgs[4].id])
+        self.assertTrue(latest["has_more"])
+
+        older = chat_service.sync_messages(self.conv, self.seller, before_id=msgs[3].id, limit=2)
+        self.assertEqual([m.id for m in older["messages"]], [msgs[1].id, msgs[2].id])
+        oldest = chat_service.sync_messages(self.conv, self.seller, before_id=msgs[1].id, limit=2)
+        self.assertEqual([m.id for m in oldest["messages"]], [msgs[0].id])
+        self.assertFalse(oldest["has_more"])
+
+        newer = chat_service.sync_messages(self.conv, self.seller, after_id=msgs[2].id)
+        self.assertEqual([m.id for m in newer["messages"]], [msgs[3].id, msgs[4].id])
+        self.assertFalse(newer["has_more"])
+
+    def test_sync_endpoint_returns_only_new_messages_and_read_marker(self):
+        msgs = self._messages(3)
+        self.client.force_login(self.seller)
+        url = reverse("api_conversation_sync", args=[self.conv.id])
+
+        response = self.client.get(url, {"after_id": msgs[0].id})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([m["id"] for m in data["messages"]], [msgs[1].id, msgs[2].id])
+        self.assertEqual(data["messages"][0]["from"], "them")
+        self.assertFalse(Message.objects.filter(conversation=self.conv, is_read=False).exists())
+
+        self.client.force_login(self.buyer)
+        data = self.client.get(url, {"after_id": msgs[2].id}).json()
+        self.assertEqual(data["messages"], [])
+        self.assertEqual(data["read_up_to"], msgs[2].id)
+
+    def test_sync_endpoint_forbids_outsiders(self):
+        self.client.force_login(self.outsider)
+        response = self.client.get(reverse("api_conversation_sync", args=[self.conv.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+# Broadcasts go out on commit, so the socket round trip needs real transactions.
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatConsumerRoundTripTests(ChatFixtureMixin, TransactionTestCase):
+
+    def test_consumer_round_trip(self):
+        async def run():
+            seller = self._communicator(self.seller)
+            buyer = self._communicator(self.buyer)
+            self.assertTrue((await seller.connect())[0])
+            self.assertTrue((await buyer.connect())[0])
+
+            await buyer.send_json_to({"type": "typing", "is_typing": True})
+            self.assertEqual((await seller.receive_json_from())["type"], "typing")
+
+            await buyer.send_json_to({"type": "message", "body": "is it available?"})
+            received = await seller.receive_json_from()
+            self.assertEqual(received["type"], "message")
+            self.assertFalse(received["mine"])
+            self.assertTrue((await buyer.receive_json_from())["mine"])
+
+            await seller.send_json_to({"type": "read"})
+            self.assertEqual((await buyer.receive_json_from())["reader_id"], self.seller.pk)
+
+            await buyer.send_json_to({"type": "message", "body": "   "})
+            self.assertEqual(await buyer.receive_json_from(), {"type": "error", "error": "empty"})
+
+            await seller.disconnect()
+            await buyer.disconnect()
+
+        async_to_sync(run)()
+        self.assertTrue(Message.objects.get(conversation=self.conv).is_read)
+
+
+class StubModerationServer:
+    """
+    Local stand-in for the moderation endpoint: flags any input containing
+    "forbidden", or answers 500 while `fail` is set. Records every request body.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(body)
+                if stub.fail:
+                    status, payload = 500, {"error": {"message": "boom"}}
+                else:
+                    status, payload = 200, {"id": "modr-test", "model": body["model"], "results": [
+                        {"flagged": "forbidden" in text, "categories": {"violence": "forbidden" in text}}
+                        for text in body["input"]
+                    ]}
+                out = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_item_listing(user, category, title="Item", price=10, condition="used", **listing_fields):
+    """An item Listing (its Item at listing.item); extra keyword arguments go to the Listing."""
+    listing = Listing.objects.create(type="item", user=user, category=category, title=title, **listing_fields)
+    Item.objects.create(listing=listing, price=price, condition=condition)
+    return listing
+
+
+class ModerationQueueTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubModerationServer()
+        cls.settings_override = override_settings(OPENAI_API_KEY="test-key", OPENAI_BASE_URL=cls.stub.url)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.stub.requests.clear()
+        self.stub.fail = False
+        cache.clear()
+        self.user = User.objects.create_user(phone="0791000070", password="pass123")
+        self.category = Category.objects.create(name="Moderated")
+
+    def test_item_create_only_enqueues(self):
+        listing = make_item_listing(self.user, self.category, "Clean lamp")
+        job = ModerationJob.objects.get(listing=listing)
+        self.assertEqual(job.status, ModerationJob.Status.PENDING)
+        self.assertEqual(self.stub.requests, [])
+        self.assertFalse(Listing.objects.get(pk=listing.pk).is_approved)
+
+    def test_batch_is_one_multi_input_call(self):
+        clean = make_item_listing(self.user, self.category, "Clean lamp")
+        bad = make_item_listing(self.user, self.category, "forbidden weapon")
+
+        self.assertEqual(moderation_queue.process_batch(), 2)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(len(self.stub.requests[0]["input"]), 2)
+
+        self.assertTrue(Listing.objects.get(pk=clean.pk).is_approved)
+        rejected = Listing.objects.get(pk=bad.pk)
+        self.assertFalse(rejected.is_active)
+        self.assertTrue(rejected.auto_rejected)
+        self.assertIn("violence", rejected.moderation_reason)
+
+        job = ModerationJob.objects.get(listing=bad)
+        self.assertEqual((job.status, job.decision, job.batch_size), (ModerationJob.Status.DONE, "reject", 2))
+        self.assertIsNotNone(job.latency_ms)
+        self.assertEqual(moderation_queue.process_batch(), 0)
+
+    def test_failed_calls_back_off_then_fall_back_to_manual(self):
+        listing = make_item_listing(self.user, self.category, "Clean lamp")
+        self.stub.fail = True
+
+        self.assertEqual(moderation_queue.process_batch(), 1)
+        job = ModerationJob.objects.get(listing=listing)
+        self.assertEqual((job.status, job.attempts), (ModerationJob.Status.PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("500", job.last_error)
+        self.assertEqual(moderation_queue.process_batch(), 0)  # not due yet
+
+        for _ in range(moderation_queue.MAX_ATTEMPTS - 1):
+            ModerationJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            moderation_queue.process_batch()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.decision), (ModerationJob.Status.FAILED, "manual"))
+        self.assertFalse(Listing.objects.get(pk=listing.pk).is_approved)
+
+    def test_worker_command_drains_queue(self):
+        listing = make_item_listing(self.user, self.category, "Clean lamp")
+        out = StringIO()
+        call_command("moderation_worker", "--once", stdout=out)
+        self.assertIn("Handled 1", out.getvalue())
+        self.assertTrue(Listing.objects.get(pk=listing.pk).is_approved)
+
+    def test_identical_text_reuses_cached_verdict(self):
+        make_item_listing(self.user, self.category, "forbidden weapon")
+        moderation_queue.process_batch()
+        # same text modulo case/whitespace, and a duplicate within one batch
+        make_item_listing(self.user, self.category, "  FORBIDDEN   weapon ")
+        make_item_listing(self.user, self.category, "Clean lamp")
+        make_item_listing(self.user, self.category, "clean lamp")
+        moderation_queue.process_batch()
+
+        self.assertEqual([len(r["input"]) for r in self.stub.requests], [1, 1])
+        self.assertEqual(
+            list(ModerationJob.objects.order_by("id").values_list("decision", flat=True)),
+            ["reject", "reject", "approve", "approve"],
+        )
+
+    def test_policy_version_and_admin_override_change_the_verdict(self):
+        text = "forbidden weapon"
+        self.assertEqual(moderation.moderate_texts([text]), [("reject", "Inappropriate content detected: violence")])
+        self.assertEqual(moderation.cached_verdict(text)["source"], moderation.SOURCE_API)
+
+        moderation.override_verdict(text, "approve")
+        self.assertEqual(moderation.moderate_texts([text]), [("approve", None)])
+        self.assertEqual(len(self.stub.requests), 1)
+
+        with override_settings(MODERATION_POLICY_VERSION="2"):
+            self.assertIsNone(moderation.cached_verdict(text))
+        moderation.forget_verdict(text)
+        self.assertIsNone(moderation.cached_verdict(text))
+
+
+def make_image_upload(name="photo.jpg", size=(800, 600), color=(200, 30, 30)):
+    buf = BytesIO()
+    PILImage.new("RGB", size, color).save(buf, format="JPEG")
+    return SimpleUploadedFile(name, buf.getvalue(), content_type="image/jpeg")
+
+
+class MediaRootMixin:
+    """Point MEDIA_ROOT at a throwaway directory for tests that write files."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_root, STORAGES=SIMPLE_STORAGES)
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+        super().tearDownClass()
+
+
+class LowMemoryDecodeTests(TestCase):
+
+    def _jpeg(self, size, orientation=None):
+        buf = BytesIO()
+        exif = PILImage.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        PILImage.new("RGB", size, (120, 60, 200)).save(buf, format="JPEG", exif=exif.tobytes())
+        return buf.getvalue()
+
+    def test_large_jpeg_is_decoded_near_target_size(self):
+        im = images.decode_for_target(self._jpeg((8000, 4000), orientation=6))
+        # upright portrait, DCT-scaled by 1/2 but still covering the 1600x1000 canvas
+        self.assertEqual((im.mode, im.size), ("RGB", (2000, 4000)))
+
+        canvas = images.render_normalized(self._jpeg((8000, 4000)))
+        with PILImage.open(BytesIO(canvas)) as out:
+            self.assertEqual(out.size, (images.NORMAL_W, images.NORMAL_H))
+
+    def test_pixel_budget_is_checked_before_decoding(self):
+        buf = BytesIO()
+        PILImage.new("RGB", (4000, 2500)).save(buf, format="PNG")
+        with patch.object(images, "MAX_DECODE_PIXELS", 5_000_000):
+            with self.assertRaises(ValueError):
+                images.decode_for_target(buf.getvalue())
+            # a JPEG of the same size decodes at 1/2 scale and fits the budget
+            self.assertEqual(images.decode_for_target(self._jpeg((4000, 2500))).size, (2000, 1250))
+
+
+class ImageResizeTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        override = override_settings(RESIZED_IMAGE_CACHE_DIR=self.cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.name = default_storage.save("stores/logos/logo.jpg", make_image_upload(size=(900, 600)))
+
+    def test_signed_url_serves_cached_webp_with_immutable_headers(self):
+        url = image_resize.resized_url(self.name, 64, 64)
+        self.assertTrue(url.startswith("/img/"))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(PILImage.open(BytesIO(b"".join(response.streaming_content))).size, (64, 64))
+
+        # the second request is a revalidation against the same ETag
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(len(list(Path(self.cache_dir).glob("*/*.webp"))), 1)
+
+        # evicted between the lookup and the open: a 404, not a 500
+        with patch.object(image_resize, "get_or_render", return_value=str(Path(self.cache_dir) / "gone.webp")):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_only_signed_known_sizes_are_served(self):
+        url = image_resize.resized_url(self.name, 64, 64)
+        sig = url.split("/")[2]
+        self.assertEqual(self.client.get(url.replace(sig, sig[:-2] + "xx")).status_code, 404)
+        # a valid signature for a size that is not in SIZES is still refused
+        forged = reverse("resized_image", kwargs={
+            "sig": image_resize._signer.signature(f"65x65/{self.name}"), "width": 65, "height": 65, "name": self.name,
+        })
+        self.assertEqual(self.client.get(forged).status_code, 404)
+        # templates asking for an unknown size get the original; no image gets the fallback
+        self.assertEqual(image_resize.resized_url(self.name, 65, 65), default_storage.url(self.name))
+        html = Template('{% load photos %}{% resized_url logo 224 224 "/static/img/default-store.png" %}').render(
+            Context({"logo": None})
+        )
+        self.assertEqual(html, "/static/img/default-store.png")
+
+    def test_eviction_drops_least_recently_used(self):
+        paths = [image_resize.get_or_render(w, h, self.name) for w, h in ((64, 64), (96, 96), (128, 128))]
+        for age, path in zip((300, 200, 100), paths):
+            os.utime(path, (time.time() - age, time.time() - age))
+        image_resize.get_or_render(64, 64, self.name)  # hit: now the most recent
+
+        total = sum(p.stat().st_size for p in paths)
+        removed = image_resize.evict(total - 1)
+        self.assertEqual(removed, 1)
+        self.assertEqual([p.exists() for p in paths], [True, False, True])
+
+    def test_renders_only_scan_the_cache_once_enough_was_written(self):
+        image_resize._written_since_scan["bytes"] = 0
+        with override_settings(RESIZED_IMAGE_CACHE_MAX_BYTES=10 ** 9), \
+                patch.object(image_resize, "evict") as evict:
+            for w, h in ((64, 64), (96, 96), (128, 128)):
+                image_resize.get_or_render(w, h, self.name)
+            self.assertEqual(evict.call_count, 0)
+
+        with override_settings(RESIZED_IMAGE_CACHE_MAX_BYTES=1), \
+                patch.object(image_resize, "evict") as evict:
+            image_resize.get_or_render(160, 160, self.name)
+            evict.assert_called_once_with(1)
+
+        out = StringIO()
+        call_command("evict_resized_images", "--max-bytes", "0", stdout=out)
+        self.assertIn("Removed 4", out.getvalue())
+        self.assertEqual(list(Path(self.cache_dir).glob("*/*.webp")), [])
+
+
+class PhotoNormalizationTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(phone="0791000080", password="pass123")
+        self.listing = Listing.objects.create(
+            type="item", user=user, category=Category.objects.create(name="Photos"), title="Chair",
+            is_approved=True, is_active=True,
+        )
+        self.item = Item.objects.create(listing=self.listing, price=10, condition="used")
+
+    def test_upload_is_queued_and_shows_original(self):
+        photo = ItemPhoto.objects.create(item=self.item, image=make_image_upload())
+        photo.refresh_from_db()
+        self.assertEqual(photo.normalize_status, ItemPhoto.NormalizeStatus.PENDING)
+        self.assertFalse(photo.normalized)
+        self.assertEqual(photo.display_image, photo.image)
+
+    def test_worker_normalizes_and_refreshes_card(self):
+        photo = ItemPhoto.objects.create(item=self.item, image=make_image_upload(), is_main=True)
+        self.assertEqual(photo_normalization.process_batch(), 1)
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.normalize_status, ItemPhoto.NormalizeStatus.DONE)
+        with PILImage.open(photo.normalized.path) as im:
+            self.assertEqual((im.format, im.size), ("JPEG", (1600, 1000)))
+        self.assertEqual(ListingCard.objects.get(listing=self.listing).main_photo_url, photo.normalized.url)
+        self.assertEqual(photo_normalization.process_batch(), 0)
+
+    def test_worker_writes_webp_and_jpeg_renditions(self):
+        photo = ItemPhoto.objects.create(item=self.item, image=make_image_upload(), is_main=True)
+        photo_normalization.process_batch()
+        photo.refresh_from_db()
+
+        self.assertEqual(set(photo.renditions), {"thumb", "card", "full"})
+        card = photo.renditions["card"]
+        self.assertEqual((card["width"], card["height"]), (640, 400))
+        self.assertEqual(card["webp"], f"items/renditions/{photo.pk}/card-640.webp")
+        with default_storage.open(card["webp"]) as f, PILImage.open(f) as im:
+            self.assertEqual((im.format, im.size), ("WEBP", (640, 400)))
+
+        # regenerating keeps the same names instead of adding suffixed copies
+        photo.generate_normalized()
+        photo.refresh_from_db()
+        self.assertEqual(photo.renditions["card"]["webp"], card["webp"])
+        self.assertEqual(ListingCard.objects.get(listing=self.listing).main_photo_renditions, photo.renditions)
+
+        # deleting the photo removes every file it wrote
+        files = [photo.image.name, photo.normalized.name,
+                 *(r[fmt] for r in photo.renditions.values() for fmt in ("webp", "jpg"))]
+        photo.delete()
+        self.assertEqual([name for name in files if default_storage.exists(name)], [])
+
+    def test_picture_tag_emits_srcset(self):
+        photo = ItemPhoto.objects.create(item=self.item, image=make_image_upload(), is_main=True)
+        tpl = Template('{% load photos %}{% picture p.renditions p.display_image.url alt="x" %}')
+
+        pending = tpl.render(Context({"p": photo}))
+        self.assertNotIn("srcset", pending)
+        self.assertIn(photo.image.url, pending)
+
+        photo_normalization.process_batch()
+        photo.refresh_from_db()
+        html = tpl.render(Context({"p": photo}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("thumb-320.webp 320w", html)
+        self.assertIn("full-1280.jpg 1280w", html)
+
+        absolute = photo_urls.srcset(photo.renditions, "jpg", absolute=lambda url: "https://cdn.test" + url)
+        self.assertTrue(absolute.startswith("https://cdn.test" + default_storage.url(photo.renditions["thumb"]["jpg"])))
+
+    def test_broken_image_is_retried_then_failed(self):
+        broken = SimpleUploadedFile("broken.jpg", b"not an image", content_type="image/jpeg")
+        photo = ItemPhoto.objects.create(item=self.item, image=broken)
+
+        photo_normalization.process_batch()
+        photo.refresh_from_db()
+        self.assertEqual((photo.normalize_status, photo.normalize_attempts), (ItemPhoto.NormalizeStatus.PENDING, 1))
+        self.assertGreater(photo.normalize_after, timezone.now())
+
+        for _ in range(photo_normalization.MAX_ATTEMPTS - 1):
+            ItemPhoto.objects.filter(pk=photo.pk).update(normalize_after=timezone.now())
+            photo_normalization.process_batch()
+        photo.refresh_from_db()
+        self.assertEqual(photo.normalize_status, ItemPhoto.NormalizeStatus.FAILED)
+        self.assertEqual(photo.display_image, photo.image)
+
+    def test_backfill_command_requeues_missing(self):
+        photo = ItemPhoto.objects.create(item=self.item, image=make_image_upload())
+        ItemPhoto.objects.filter(pk=photo.pk).update(normalize_status=ItemPhoto.NormalizeStatus.FAILED)
+
+        out = StringIO()
+        call_command("normalize_photos", "--backfill", "--once", "--workers", "0", stdout=out)
+        self.assertIn("Queued 1", out.getvalue())
+        photo.refresh_from_db()
+        self.assertTrue(photo.normalized)
+
+
+def textured_jpeg(seed=0, size=(800, 600)):
+    """A photo-like JPEG (gradient + random shapes) whose dHash isn't all zeros."""
+    rng = random.Random(seed)
+    im = PILImage.radial_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(im)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        r = rng.randrange(20, 160)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buf = BytesIO()
+    im.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def resaved_jpeg(data, size, quality=40):
+    buf = BytesIO()
+    PILImage.open(BytesIO(data)).resize(size).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+class PhotoDuplicateTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="0791000085", password="pass123")
+        self.category = Category.objects.create(name="Phones")
+
+    def _item(self, title, *hashes):
+        item = make_item_listing(self.user, self.category, title, is_approved=True).item
+        for value in hashes:
+            ItemPhoto.objects.create(item=item, image=make_image_upload(), phash=value)
+        return item
+
+    def test_dhash_survives_reencoding_and_resizing(self):
+        data = textured_jpeg(seed=1)
+        original = images.image_dhash(data)
+        resaved = images.image_dhash(resaved_jpeg(data, (400, 300)))
+        other = images.image_dhash(textured_jpeg(seed=2))
+
+        self.assertLessEqual(phash.hamming(original, resaved), 4)
+        self.assertGreater(phash.hamming(original, other), photo_duplicates.MAX_DISTANCE)
+        # the worker stores the same kind of hash alongside the renditions
+        worker_hash = images.render_photo_set(data)["dhash"]
+        self.assertLessEqual(phash.hamming(original, worker_hash), 4)
+        self.assertTrue(-(1 << 63) <= original < (1 << 63))
+
+    def test_listing_duplicates_within_distance_via_band_lookup(self):
+        value = 0x0123_4567_89AB_CDEF
+        six_bits = value ^ (0b11 << 2) ^ (0b11 << 20) ^ (0b11 << 36)  # no band left untouched only once
+        seven_bits = value ^ (0b11 << 2) ^ (0b11 << 20) ^ (0b11 << 36) ^ (1 << 60)
+        mine = self._item("Original", value)
+        copy = self._item("Repost", six_bits)
+        self._item("Different", seven_bits)
+        self._item("Unhashed", None)
+
+        duplicates = photo_duplicates.listing_duplicates(mine.listing)
+        self.assertEqual([d["listing"].pk for d in duplicates], [copy.listing.pk])
+        self.assertEqual(duplicates[0]["distance"], 6)
+        self.assertEqual(
+            [p.item_id for p, _d in photo_duplicates.similar_item_photos(value, max_distance=7)],
+            [mine.pk, copy.pk, ItemPhoto.objects.get(item__listing__title="Different").item_id],
+        )
+
+    def test_admin_change_page_lists_possible_duplicates(self):
+        mine = self._item("Original", 12345)
+        self._item("Suspicious repost", 12345 ^ 1)
+        admin_user = User.objects.create_superuser(phone="0791000086", password="pass123")
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse("admin:marketplace_item_change", args=[mine.pk]))
+        self.assertContains(response, "Possible duplicates")
+        self.assertContains(response, "Suspicious repost")
+
+
+class FakeListingDocument:
+    """Stands in for ListingDocument, which is a stub when RENDER=true."""
+
+    class _index:
+        _name = "listings"
+
+    def get_queryset(self):
+        return Listing.objects.select_related("category", "item").prefetch_related(
+            "item__attribute_values__attribute",
+        )
+
+    def prepare(self, listing):
+        return {
+            "title": listing.title,
+            "category": listing.category.name,
+            "attributes": [av.attribute.name for av in listing.item.attribute_values.all()],
+        }
+
+
+class SearchIndexQueueTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        indexing = patch.object(search_index, "indexing_enabled", return_value=True)
+        indexing.start()
+        self.addCleanup(indexing.stop)
+        self.user = User.objects.create_user(phone="0791000090", password="pass123")
+        self.category = Category.objects.create(name="Laptops")
+        self.attribute = Attribute.objects.create(name="RAM", category=self.category)
+
+    def _item(self, title):
+        listing = make_item_listing(self.user, self.category, title, price=100)
+        ItemAttributeValue.objects.create(item=listing.item, attribute=self.attribute, value="16GB")
+        return listing
+
+    def test_changes_coalesce_and_requests_do_not_resave_the_listing(self):
+        listing = self._item("ThinkPad")
+        row = SearchIndexQueue.objects.get()
+        self.assertEqual(row.listing_id, listing.pk)
+
+        listing.title = "ThinkPad X1"
+        listing.save()
+        again = SearchIndexQueue.objects.get()
+        self.assertEqual(again.first_dirtied_at, row.first_dirtied_at)
+        self.assertGreater(again.last_dirtied_at, row.last_dirtied_at)
+
+        wanted = Listing.objects.create(type="request", user=self.user, category=self.category, title="Wanted")
+        updated_at = Listing.objects.get(pk=wanted.pk).updated_at
+        Request.objects.create(listing=wanted, budget=50)
+        self.assertEqual(Listing.objects.get(pk=wanted.pk).updated_at, updated_at)
+        self.assertEqual(SearchIndexQueue.objects.count(), 2)
+
+    def test_flush_bulk_indexes_deletes_and_keeps_rows_changed_mid_flight(self):
+        first, second, gone = self._item("A"), self._item("B"), self._item("C")
+        gone_id = gone.pk
+        gone.delete()
+        sent = []
+
+        def bulk(actions):
+            sent.extend(actions)
+            search_index.mark_dirty([second.pk])  # saved again while the batch is in flight
+            return len(actions), []
+
+        with patch.object(search_index, "_document", FakeListingDocument), \
+                patch.object(search_index, "_bulk", side_effect=bulk):
+            # claim, listings + one query per prefetched relation, cleanup (plus the
+            # mid-flight save and its change log row): nothing per listing, whatever the batch size
+            with self.assertNumQueries(15):
+                self.assertEqual(search_index.flush(), 3)
+
+        ops = {a["_id"]: a for a in sent}
+        self.assertEqual(ops[gone_id]["_op_type"], "delete")
+        self.assertEqual(ops[first.pk]["_source"], {"title": "A", "category": "Laptops", "attributes": ["RAM"]})
+        remaining = SearchIndexQueue.objects.get()
+        self.assertEqual((remaining.listing_id, remaining.locked_at), (second.pk, None))
+        self.assertEqual(cache.get(search_index.LAST_FLUSH_KEY)["batch"], 3)
+
+    def test_rejected_documents_are_retried_with_backoff(self):
+        listing = self._item("Broken")
+        error = {"index": {"_id": str(listing.pk), "status": 400, "error": {"type": "mapper_parsing_exception"}}}
+
+        with patch.object(search_index, "_document", FakeListingDocument), \
+                patch.object(search_index, "_bulk", return_value=(0, [error])):
+            search_index.flush()
+
+        row = SearchIndexQueue.objects.get()
+        self.assertEqual(row.attempts, 1)
+        self.assertGreater(row.run_after, timezone.now())
+        self.assertIn("mapper_parsing_exception", row.last_error)
+        self.assertEqual(search_index.flush(), 0)  # not due yet
+        self.assertEqual(search_index.stats()["retrying"], 1)
+
+    def test_nothing_is_queued_without_elasticsearch_and_the_worker_idles(self):
+        SearchIndexChange.objects.create(listing_id=1, changed_at=timezone.now() - timezone.timedelta(days=3))
+        with patch.object(search_index, "indexing_enabled", return_value=False):
+            self._item("Offline")
+            self.assertEqual(search_index.mark_queryset_dirty(Listing.objects.all()), 0)
+            out = StringIO()
+            call_command("search_index_worker", "--once", stdout=out)
+            # without --once it sleeps instead of exiting into a Procfile restart loop
+            with patch("marketplace.management.commands.search_index_worker.time.sleep",
+                       side_effect=KeyboardInterrupt) as sleep:
+                call_command("search_index_worker", stdout=StringIO())
+            self.assertTrue(sleep.called)
+
+        self.assertFalse(SearchIndexQueue.objects.exists())
+        self.assertFalse(SearchIndexChange.objects.exists())
+        self.assertIn("pruned 1 change log row(s)", out.getvalue())
+
+
+class FakeIndicesClient:
+    """client.indices for swap_alias(): a set of concrete indices and their aliases."""
+
+    def __init__(self, indices, aliases=None):
+        self.indices = set(indices)
+        self.aliases = dict(aliases or {})  # alias -> [index]
+        self.actions = None
+
+    def exists_alias(self, name):
+        return name in self.aliases
+
+    def get_alias(self, name):
+        return {index: {"aliases": {name: {}}} for index in self.aliases[name]}
+
+    def exists(self, index):
+        return index in self.indices or index in self.aliases
+
+    def update_aliases(self, actions):
+        self.actions = actions
+
+
+class SearchReindexTests(TestCase):
+
+    def setUp(self):
+        indexing = patch.object(search_index, "indexing_enabled", return_value=True)
+        indexing.start()
+        self.addCleanup(indexing.stop)
+        self.user = User.objects.create_user(phone="0791000095", password="pass123")
+        self.category = Category.objects.create(name="Laptops")
+
+    def test_changes_during_a_build_are_replayed_onto_the_new_index(self):
+        kept, changed, gone = (make_item_listing(self.user, self.category, title) for title in "ABC")
+        mark = search_reindex.last_change_id()
+
+        changed.title = "B2"
+        changed.save()
+        gone_id = gone.pk
+        gone.delete()
+        sent = []
+
+        def bulk(actions, client=None):
+            sent.extend(actions)
+            return len(actions), []
+
+        with patch.object(search_index, "_document", FakeListingDocument), \
+                patch.object(search_index, "_bulk", side_effect=bulk):
+            last, replayed = search_reindex.replay("listings_v2", mark)
+            self.assertEqual(search_reindex.replay("listings_v2", last), (last, 0))
+
+        self.assertEqual(replayed, 2)
+        self.assertEqual(last, SearchIndexChange.objects.latest("id").id)
+        ops = {a["_id"]: (a["_op_type"], a["_index"]) for a in sent}
+        self.assertEqual(ops, {changed.pk: ("index", "listings_v2"), gone_id: ("delete", "listings_v2")})
+        self.assertNotIn(kept.pk, ops)
+
+        old = SearchIndexChange.objects.filter(id__lte=mark)
+        old_count = old.count()
+        old.update(changed_at=timezone.now() - timezone.timedelta(days=3))
+        self.assertEqual(search_index.prune_changes(), old_count)
+        self.assertTrue(SearchIndexChange.objects.filter(id__gt=mark).exists())
+
+    def test_alias_swap_is_one_atomic_call(self):
+        legacy = FakeIndicesClient({"listings", "listings_v1"})
+        search_reindex.swap_alias(type("Client", (), {"indices": legacy})(), "listings", "listings_v1")
+        self.assertEqual(legacy.actions, [
+            {"remove_index": {"index": "listings"}},
+            {"add": {"index": "listings_v1", "alias": "listings"}},
+        ])
+
+        aliased = FakeIndicesClient({"listings_v1", "listings_v2"}, {"listings": ["listings_v1"]})
+        previous = search_reindex.swap_alias(type("Client", (), {"indices": aliased})(), "listings", "listings_v2")
+        self.assertEqual(previous, ["listings_v1"])
+        self.assertEqual(aliased.actions, [
+            {"remove": {"index": "listings_v1", "alias": "listings"}},
+            {"add": {"index": "listings_v2", "alias": "listings"}},
+        ])
+
+    def test_worker_ranges_are_disjoint_and_cover_every_listing(self):
+        ids = [make_item_listing(self.user, self.category, str(n)).pk for n in range(7)]
+        ranges = search_reindex.id_ranges(3)
+        self.assertLessEqual(len(ranges), 3)
+        covered = [i for i in ids for lo, hi in ranges if lo <= i < hi]
+        self.assertEqual(covered, ids)
+
+
+class FakeSearchDocument:
+    """ListingDocument.search() against an index nothing is ever sent to."""
+
+    @staticmethod
+    def search():
+        return Search(index="listings")
+
+
+def es_response(hits, total=None, aggregations=None):
+    """Patch target for Search.execute: records the request body, returns canned hits."""
+    sent = []
+
+    def execute(search, ignore_cache=False):
+        sent.append(search.to_dict())
+        return Response(search, {
+            "hits": {"total": {"value": len(hits) if total is None else total}, "hits": hits},
+            "aggregations": aggregations or {},
+        })
+    return execute, sent
+
+
+class ElasticsearchBackendTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="0791000091", password="pass123")
+        self.category = Category.objects.create(name="Phones")
+        self.city = City.objects.create(name="Zarqa")
+
+    def _hit(self, listing, sort, **source):
+        return {"_index": "listings", "_id": str(listing.pk), "_source": source, "sort": sort}
+
+    def test_item_page_filters_sorts_and_pages_in_es(self):
+        a, b, c = (
+            make_item_listing(self.user, self.category, title, price, city=self.city, is_approved=True)
+            for title, price in (("A", 100), ("B", 200), ("C", 300))
+        )
+        execute, sent = es_response(
+            [self._hit(c, [300.0, 3, c.pk]), self._hit(a, [100.0, 1, a.pk]), self._hit(b, [200.0, 2, b.pk])],
+            total=3,
+        )
+        filters = {"category_ids": [self.category.pk], "city_id": str(self.city.pk), "min_price": "50",
+                   "seller_type": ListingCard.SELLER_INDIVIDUAL}
+
+        with patch("marketplace.documents.ListingDocument", FakeSearchDocument), \
+                patch.object(Search, "execute", execute), self.assertNumQueries(1):
+            page, total, _ = listing_search.ELASTICSEARCH.item_page("phone", filters, "priceDesc", None, 2)
+
+        self.assertEqual(total, 3)
+        self.assertEqual([card.listing_id for card in page], [c.pk, a.pk])  # hit order, not DB order
+        self.assertTrue(page.has_next())
+
+        body = sent[0]
+        self.assertEqual(body["sort"], listing_search.SORTS["priceDesc"])
+        self.assertEqual(body["size"], 3)
+        clauses = body["query"]["bool"]["filter"]
+        for clause in (
+            {"term": {"is_approved": True}}, {"term": {"is_active": True}}, {"term": {"is_deleted": False}},
+            {"terms": {"category_path_ids": [self.category.pk]}}, {"term": {"city_id": self.city.pk}},
+            {"range": {"price": {"gte": 50.0}}}, {"term": {"seller_type": ListingCard.SELLER_INDIVIDUAL}},
+        ):
+            self.assertIn(clause, clauses)
+
+        with patch("marketplace.documents.ListingDocument", FakeSearchDocument), \
+                patch.object(Search, "execute", execute):
+            second, _, _ = listing_search.ELASTICSEARCH.item_page("phone", filters, "priceDesc", page.next_cursor, 2)
+            restarted, _, _ = listing_search.ELASTICSEARCH.item_page("phone", filters, "latest", page.next_cursor, 2)
+        self.assertEqual(sent[1]["search_after"], [100.0, 1, a.pk])
+        self.assertEqual(second.offset, 2)
+        self.assertNotIn("search_after", sent[2])  # cursor from another sort starts over
+        self.assertEqual(restarted.offset, 0)
+
+    def test_suggestions_are_built_from_hits_without_queries(self):
+        listing = make_item_listing(self.user, self.category, "Pixel 8", 400, city=self.city, is_approved=True)
+        execute, sent = es_response([{
+            "_index": "listings", "_id": str(listing.pk),
+            "_source": {"object_id": listing.item.pk, "title": "Pixel 8", "category": {"name": "Phones"},
+                        "main_photo_url": "/media/p.webp"},
+        }])
+
+        with patch("marketplace.documents.ListingDocument", FakeSearchDocument), \
+                patch.object(Search, "execute", execute), self.assertNumQueries(0):
+            results = listing_search.ELASTICSEARCH.suggestions("pixel", "item")
+
+        self.assertEqual(results, [{"type": "item", "id": listing.item.pk, "name": "Pixel 8",
+                                    "category": "Phones", "photo_url": "/media/p.webp"}])
+        self.assertIn({"term": {"type": "item"}}, sent[0]["query"]["bool"]["filter"])
+
+    @override_settings(STORAGES=SIMPLE_STORAGES)
+    @patch.object(search_index, "indexing_enabled", return_value=True)
+    def test_expired_listings_are_queued_for_reindexing(self, _indexing):
+        old = make_item_listing(self.user, self.category, "Old", 10, city=self.city, is_approved=True)
+        Listing.objects.filter(pk=old.pk).update(created_at=timezone.now() - timezone.timedelta(days=1001))
+        SearchIndexQueue.objects.all().delete()
+
+        self.client.get(reverse("item_list"))
+
+        self.assertFalse(Listing.objects.get(pk=old.pk).is_active)
+        self.assertTrue(SearchIndexQueue.objects.filter(listing_id=old.pk).exists())
+
+
+class PostgresSearchBackendTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="0791000092", password="pass123")
+        self.category = Category.objects.create(name="مستعمل")
+        self.attribute = Attribute.objects.create(name="Brand", category=self.category)
+
+    def _listing(self, title, listing_type="item", description="", **child):
+        listing = Listing.objects.create(
+            type=listing_type, user=self.user, category=self.category, title=title,
+            description=description, is_approved=True, is_active=True,
+        )
+        if listing_type == "item":
+            Item.objects.create(listing=listing, price=child.get("price", 100), condition="used")
+        else:
+            Request.objects.create(listing=listing, budget=child.get("budget", 50))
+        return listing
+
+    def _ids(self, q):
+        page, total, _ = listing_search.DATABASE.item_page(q, {}, "latest", None, 16)
+        return [card.listing_id for card in page], total
+
+    def test_arabic_variants_prefixes_and_typos_match(self):
+        car = self._listing("سيّارةُ تويوتا Corolla")
+        lamp = self._listing("إضاءة مكتب", description="لمبة LED")
+        self._listing("Bicycle")
+
+        self.assertEqual(self._ids("سياره"), ([car.pk], 1))     # ta marbuta / shadda folded
+        self.assertEqual(self._ids("سيار")[0], [car.pk])        # prefix while typing
+        self.assertEqual(self._ids("اضاءه")[0], [lamp.pk])      # hamza-seat alef
+        self.assertEqual(self._ids("led")[0], [lamp.pk])        # description, case-folded
+        self.assertEqual(self._ids("corola")[0], [car.pk])      # typo: title trigram similarity
+        self.assertEqual(self._ids("!!")[0], [])
+
+    def test_attribute_values_are_searchable_after_they_change(self):
+        listing = self._listing("Hatchback")
+        value = ItemAttributeValue.objects.create(item=listing.item, attribute=self.attribute, value="Škoda")
+        self.assertEqual(self._ids("škoda")[0], [listing.pk])
+
+        value.value = "Kia"
+        value.save()
+        self.assertEqual(self._ids("kia")[0], [listing.pk])
+        self.assertEqual(self._ids("škoda")[0], [])
+
+    def test_suggestions_and_request_list_use_the_same_index(self):
+        wanted = self._listing("مطلوب ثلاجة", listing_type="request", budget=250)
+        self._listing("ثلاجة سامسونج")
+
+        with self.settings(SEARCH_BACKEND="postgres"), self.assertNumQueries(1):
+            results = listing_search.get_backend().suggestions("ثلاجه", "request")
+        self.assertEqual(results, [{"type": "request", "id": wanted.request.pk, "name": "مطلوب ثلاجة",
+                                    "category": "مستعمل", "budget": "250.00"}])
+
+        with self.settings(SEARCH_BACKEND="postgres"):
+            self.assertEqual(listing_search.get_backend(), listing_search.DATABASE)
+            response = self.client.get(reverse("search_suggestions"), {"q": "ثلاجه"})
+        self.assertEqual([r["name"] for r in response.json()["results"] if r["type"] == "item"], ["ثلاجة سامسونج"])
+
+
+class ArabicTextTests(TestCase):
+
+    def test_normalize_folds_variants_marks_digits_and_punctuation(self):
+        self.assertEqual(arabic.normalize("إضاءةٌ  مكتبـــة، آيفون ١٥ «Pro»!"), "اضاءه مكتبه ايفون 15 pro")
+        self.assertEqual(arabic.normalize("مؤسسة رئيسية إلى"), "موسسه رييسيه الي")
+        self.assertEqual(arabic.normalize(None), "")
+
+    def test_analyze_drops_stop_words_and_light_stems_like_lucene(self):
+        self.assertEqual(arabic.analyze("والسيارات الجديدة في عمّان"), ["سيار", "جديد", "عم"])
+        self.assertEqual(arabic.analyze("بالمدرسة وكتابها المعلمون"), ["مدرس", "كتاب", "معلم"])
+        self.assertEqual(arabic.stem("وقت"), "وقت")  # "و" is only a prefix on 4+ letter words
+        self.assertEqual(arabic.analyze("سيارة"), arabic.analyze("السيارات"))
+
+    def test_lost_found_and_category_suggestions_share_the_folding(self):
+        lost = lost_found_matching._tokenize("فقدت محفظة جلدية سوداء")
+        found = lost_found_matching._tokenize("وجدت المحفظه الجلديه")
+        self.assertEqual(len(lost & found), 2)
+
+        Category.objects.create(name="أثاث منزلي")
+        taxonomy_cache.bump_version()
+        names = [c["name"] for c in listing_search.category_suggestions("اثاث")]
+        self.assertEqual(names, ["أثاث منزلي"])
+
+
+class ListingFacetsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone="0791000093", password="pass123")
+        self.root = Category.objects.create(name="Electronics")
+        self.phones = Category.objects.create(name="Phones", parent=self.root)
+        self.amman = City.objects.create(name="Amman")
+        self.irbid = City.objects.create(name="Irbid")
+        taxonomy_cache.bump_version()
+
+    def test_card_facets_roll_up_categories_in_one_cached_query(self):
+        make_item_listing(self.user, self.phones, "Phone", 20, "new", city=self.amman, is_approved=True)
+        make_item_listing(self.user, self.phones, "Phone", 30, city=self.irbid, is_approved=True)
+        make_item_listing(self.user, self.root, "Phone", 30000, city=self.amman, is_approved=True)
+        taxonomy_cache.category_map()  # warm, as it is in a running process
+
+        cards = ListingCard.objects.filter(type="item")
+        with self.assertNumQueries(1):
+            facets = listing_facets.card_facets(cards, cache_key="items:test")
+
+        self.assertEqual(facets["categories"], {self.root.pk: 3, self.phones.pk: 2})
+        self.assertEqual(facets["cities"], {self.amman.pk: 2, self.irbid.pk: 1})
+        self.assertEqual(facets["conditions"], {"new": 1, "used": 2})
+        self.assertEqual(facets["seller_types"], {ListingCard.SELLER_INDIVIDUAL: 3})
+        counts = {(b["min"], b["max"]): b["count"] for b in facets["price"] if b["count"]}
+        self.assertEqual(counts, {(0, 25): 1, (25, 50): 1, (25000, None): 1})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(listing_facets.card_facets(cards, cache_key="items:test"), facets)
+
+    def test_es_facets_ride_on_the_first_page_request(self):
+        listing = make_item_listing(self.user, self.phones, "Phone", 120, city=self.amman, is_approved=True)
+        aggregations = {
+            "categories": {"buckets": [{"key": self.phones.pk, "doc_count": 4}]},
+            "cities": {"buckets": [{"key": self.amman.pk, "doc_count": 4}]},
+            "conditions": {"buckets": [{"key": "used", "doc_count": 4}]},
+            "seller_types": {"buckets": [{"key": "individual", "doc_count": 4}]},
+            "price": {"buckets": [{"key": "3", "from": 100, "to": 250, "doc_count": 4}]},
+        }
+        execute, sent = es_response(
+            [{"_index": "listings", "_id": str(listing.pk), "_source": {}, "sort": [1, listing.pk]}] * 2,
+            total=4, aggregations=aggregations,
+        )
+        taxonomy_cache.category_map()
+
+        with patch("marketplace.documents.ListingDocument", FakeSearchDocument), \
+                patch.object(Search, "execute", execute):
+            page, _, facets = listing_search.ELASTICSEARCH.item_page("phone", {}, "latest", None, 1, facets=True)
+            _, _, more = listing_search.ELASTICSEARCH.item_page("phone", {}, "latest", page.next_cursor, 1,
+                                                                facets=True)
+
+        self.assertEqual(set(sent[0]["aggs"]), {"categories", "cities", "conditions", "seller_types", "price"})
+        self.assertEqual(facets["categories"], {self.root.pk: 4, self.phones.pk: 4})
+        self.assertEqual(facets["price"][3], {"min": 100, "max": 250, "count": 4})
+        self.assertNotIn("aggs", sent[1])
+        self.assertIsNone(more)
+
+    @override_settings(STORAGES=SIMPLE_STORAGES)
+    def test_list_views_return_facets_with_the_results(self):
+        make_item_listing(self.user, self.phones, "Phone", 40, city=self.amman, is_approved=True)
+        listing = Listing.objects.create(
+            type="request", user=self.user, category=self.phones, city=self.irbid,
+            title="Need a phone", is_approved=True, is_active=True,
+        )
+        Request.objects.create(listing=listing, budget=300, condition_preference="any")
+        xhr = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+        items = self.client.get(reverse("item_list"), {"city": self.amman.pk}, **xhr).json()
+        self.assertEqual(items["facets"]["categories"], {str(self.root.pk): 1, str(self.phones.pk): 1})
+        self.assertEqual(items["facets"]["cities"], {str(self.amman.pk): 1})
+
+        requests = self.client.get(reverse("request_list"), **xhr).json()
+        self.assertEqual(requests["facets"]["conditions"], {"any": 1})
+        self.assertEqual([b for b in requests["facets"]["price"] if b["count"]],
+                         [{"min": 250, "max": 500, "count": 1}])
+
+        response = self.client.get(reverse("item_list"))
+        self.assertContains(response, f'data-key="{self.amman.pk}" data-label="Amman"')
+        self.assertContains(response, "Amman (1)")
+
+
+class SearchCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone="0791000095", password="pass123")
+        self.phones = Category.objects.create(name="Phones")
+
+    def test_signature_folds_spelling_and_waiters_share_one_computation(self):
+        self.assertEqual(
+            search_cache.signature("items", {"q": "آيفون  برو", "city": 3, "categories": [2, 1], "cursor": None}),
+            search_cache.signature("items", {"categories": ["1", "2"], "q": "ايفون برو", "city": "3"}),
+        )
+        self.assertNotEqual(search_cache.signature("items", {"q": "ايفون"}),
+                            search_cache.signature("requests", {"q": "ايفون"}))
+
+        # another process holds the lock and stores the entry while we wait
+        params = {"q": "pixel"}
+        key = f"search:{search_cache.generation()}:{search_cache.signature('items', params)}"
+        cache.add(f"{key}:lock", 1)
+        computed = []
+        with patch("marketplace.services.search_cache.time.sleep", lambda s: cache.set(key, ["theirs"])):
+            value = search_cache.get_or_compute("items", params, lambda: computed.append(1) or ["ours"])
+        self.assertEqual(value, ["theirs"])
+        self.assertEqual(computed, [])
+
+    @override_settings(STORAGES=SIMPLE_STORAGES)
+    def test_cached_item_search_overlays_favourites_per_user(self):
+        pixel = make_item_listing(self.user, self.phones, "Google Pixel 8", 100, is_approved=True)
+        make_item_listing(self.user, self.phones, "Google Pixel 7", 100, is_approved=True)
+        make_item_listing(self.user, self.phones, "Samsung Galaxy", 100, is_approved=True)
+        fan = User.objects.create_user(phone="0791000096", password="pass123")
+        Favorite.objects.create(user=fan, listing=pixel)
+
+        search = patch.object(listing_search.DATABASE, "item_page", wraps=listing_search.DATABASE.item_page)
+        with search as item_page:
+            anonymous = self.client.get(reverse("item_list"), {"q": "pixel"})
+            self.client.force_login(fan)
+            logged_in = self.client.get(reverse("item_list"), {"q": "Pixel "})
+            self.client.get(reverse("item_list"), {"q": "pixel", "sort": "priceAsc"})
+
+        self.assertEqual(item_page.call_count, 2)  # the second request was served from the cache
+        self.assertEqual([c.listing_id for c in logged_in.context["items"]],
+                         [c.listing_id for c in anonymous.context["items"]])
+        self.assertEqual(logged_in.context["total_count"], 2)
+        favourited = {c.listing_id: c.is_favorited for c in logged_in.context["items"]}
+        self.assertTrue(favourited[pixel.pk])
+        self.assertEqual(sum(favourited.values()), 1)
+
+    def test_generation_moves_on_visibility_changes_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = make_item_listing(self.user, self.phones, "Google Pixel 8", 100, is_approved=True)
+        start = search_cache.generation()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.title = "Google Pixel 8 Pro"
+            listing.save()
+        self.assertEqual(search_cache.generation(), start)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.is_active = False
+            listing.save()
+        self.assertEqual(search_cache.generation(), start + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.delete()  # already hidden
+        self.assertEqual(search_cache.generation(), start + 1)
+
+
+class SavedSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(phone="0791000097", password="pass123")
+        self.buyer = User.objects.create_user(phone="0791000098", password="pass123")
+        self.electronics = Category.objects.create(name="Electronics")
+        self.phones = Category.objects.create(name="Phones", parent=self.electronics)
+        self.cars = Category.objects.create(name="Cars")
+        self.amman = City.objects.create(name="Amman")
+        self.irbid = City.objects.create(name="Irbid")
+        taxonomy_cache.bump_version()
+
+    def _save(self, user, notify="instant", **params):
+        return saved_searches.save_search(user, QueryDict(urlencode(params, doseq=True)), notify)[0]
+
+    def test_saving_normalizes_filters_and_files_under_the_most_selective_one(self):
+        self.client.force_login(self.buyer)
+        url = reverse("api_saved_searches")
+        query = urlencode({"q": "Pixel phones", "city": self.amman.pk, "min_price": "500", "max_price": "100",
+                           "category": self.phones.pk, "cursor": "x", "sort": "priceAsc"})
+        first = self.client.post(url, {"query": query})
+        self.assertEqual(first.status_code, 201)
+
+        search = SavedSearch.objects.get()
+        self.assertEqual(search.terms, " ".join(sorted(set(arabic.analyze("Pixel phones")))))
+        self.assertEqual((search.min_price, search.max_price), (100, 500))
+        self.assertEqual(search.category_ids, [self.phones.pk])
+        self.assertEqual(search.keys, [f"t:{max(search.terms.split(), key=len)[:saved_searches.ANCHOR_CHARS]}"])
+
+        # same filters in another order and spelling: the same row, new preference
+        again = urlencode({"categories": self.phones.pk, "q": " pixel  PHONES", "max_price": "500",
+                           "min_price": "100", "city": self.amman.pk})
+        response = self.client.post(url, {"query": again, "notify": "daily"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["created"])
+        self.assertEqual(SavedSearch.objects.get().notify, "daily")
+
+        self.assertEqual(self._save(self.buyer, max_price=300).keys, ["p:0", "p:1", "p:2", "p:3", "p:4"])
+        broad = self.client.post(url, {"query": "condition=used&sort=latest"})
+        self.assertEqual((broad.status_code, broad.json()["error"]), (400, "too_broad"))
+        odd = self.client.post(url, {"query": "category=²"})
+        self.assertEqual((odd.status_code, odd.json()["error"]), (400, "too_broad"))
+
+    def test_new_listing_only_meets_the_searches_sharing_its_keys(self):
+        others = [User.objects.create_user(phone=f"079200000{n}", password="x") for n in range(2)]
+        for n in range(30):
+            self._save(others[n % 2], q=f"tractor{n}")
+        self._save(self.buyer, city=self.irbid.pk)
+        by_term = self._save(self.buyer, q="pix", city=self.amman.pk)
+        by_category = self._save(self.buyer, category=self.electronics.pk, max_price=250)
+
+        listing = make_item_listing(self.seller, self.phones, "Google Pixel 8", 400, city=self.amman,
+                                    is_approved=True)
+        card = ListingCard.objects.get(listing=listing)
+        with patch.object(saved_searches, "matches", wraps=saved_searches.matches) as checked:
+            results = saved_searches.match_cards([card])
+        self.assertEqual(checked.call_count, 2)  # the category search and the "pix" one, nothing else
+        self.assertEqual(results, {by_term: [card]})
+        self.assertIn(by_category, [call.args[0] for call in checked.call_args_list])
+
+    def test_batch_records_matches_and_notifies_in_bulk(self):
+        instant = self._save(self.buyer, q="pixel")
+        daily_user = User.objects.create_user(phone="0791000099", password="pass123")
+        self._save(daily_user, "daily", category=self.electronics.pk)
+        self._save(self.seller, q="pixel")  # own listings never alert
+        self._save(self.buyer, category=self.cars.pk)
+
+        first, second = (
+            make_item_listing(self.seller, self.phones, title, price, city=self.amman, is_approved=True)
+            for title, price in (("Google Pixel 8", 400), ("Pixel 7 Pro", 300))
+        )
+        Listing.objects.create(type="item", user=self.seller, category=self.phones, title="Pixel draft",
+                               is_approved=False, is_active=True)  # not visible: never queued
+        self.assertEqual(SavedSearchQueue.objects.count(), 2)
+
+        self.assertEqual(saved_searches.process_batch(), 2)
+        self.assertFalse(SavedSearchQueue.objects.exists())
+        self.assertEqual(SavedSearchMatch.objects.filter(saved_search=instant).count(), 2)
+        notification = Notification.objects.get(user=self.buyer)
+        self.assertEqual((notification.kind, notification.status), ("saved_search", "matched"))
+        self.assertTrue(notification.title.startswith("2 "))
+        self.assertEqual(notification.listing_id, second.pk)
+        self.assertFalse(Notification.objects.filter(user__in=[daily_user, self.seller]).exists())
+
+        self.assertEqual(saved_searches.send_digests(), 1)
+        self.assertEqual(Notification.objects.filter(user=daily_user).count(), 1)
+        self.assertEqual(saved_searches.send_digests(), 0)
+
+        # hidden and published again: matched before, no second alert
+        first.is_active = False
+        first.save()
+        first.is_active = True
+        first.save()
+        self.assertEqual(saved_searches.process_batch(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.buyer).count(), 1)
+
+
+class AttributeFilterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone="0791000096", password="pass123")
+        self.category = Category.objects.create(name="Cars")
+        self.year = Attribute.objects.create(name="Year", category=self.category, input_type="number")
+        self.color = Attribute.objects.create(name="Color", category=self.category, input_type="select",
+                                              ui_type="dropdown")
+        self.red = AttributeOption.objects.create(attribute=self.color, value="أحمر")
+        self.blue = AttributeOption.objects.create(attribute=self.color, value="Blue")
+        self.extras = Attribute.objects.create(name="Extras", category=self.category, input_type="select",
+                                               ui_type="checkbox")
+        self.abs = AttributeOption.objects.create(attribute=self.extras, value="ABS")
+        self.gps = AttributeOption.objects.create(attribute=self.extras, value="GPS")
+        self.model = Attribute.objects.create(name="Model", category=self.category)
+
+    def _listing(self, values, listing_type="item"):
+        listing = Listing.objects.create(
+            type=listing_type, user=self.user, category=self.category, title="Car",
+            is_approved=True, is_active=True,
+        )
+        if listing_type == "item":
+            child = Item.objects.create(listing=listing, price=5000, condition="used")
+            model, field = ItemAttributeValue, "item"
+        else:
+            child = Request.objects.create(listing=listing, budget=5000)
+            model, field = RequestAttributeValue, "request"
+        for attribute, value in values.items():
+            model.objects.create(**{field: child}, attribute=attribute, value=value)
+        return listing
+
+    def test_values_are_typed_on_save_and_by_the_backfill(self):
+        listing = self._listing({
+            self.year: "٢٠١٨", self.color: str(self.red.pk),
+            self.extras: f"{self.abs.pk}, GPS, Sunroof, ²", self.model: "Corolla",
+        })
+        expected = {
+            self.year.pk: (2018.0, None, [], "2018"),
+            self.color.pk: (None, self.red.pk, [self.red.pk], "احمر"),
+            self.extras.pk: (None, None, sorted([self.abs.pk, self.gps.pk]), "abs gps sunroof ²"),
+            self.model.pk: (None, None, [], "corolla"),
+        }
+        rows = ItemAttributeValue.objects.filter(item=listing.item)
+        typed_columns = ("attribute_id", "value_number", "option_id", "option_ids", "value_text")
+        self.assertEqual({a: tuple(rest) for a, *rest in rows.values_list(*typed_columns)}, expected)
+        self.assertEqual(rows.get(attribute=self.color).display_value, "أحمر")
+
+        card = ListingCard.objects.get(listing=listing)
+        self.assertIn("احمر", card.search_text.split())
+
+        # as before the migration: untyped values, option ids in the card's search text
+        rows.update(value_number=None, option=None, option_ids=[], value_text="")
+        ListingCard.objects.filter(pk=card.pk).update(search_text=f"{self.red.pk} corolla")
+        migration = import_module("marketplace.migrations.0030_typed_attribute_values")
+        migration.backfill_typed_values(django_apps, None)
+        self.assertEqual({a: tuple(rest) for a, *rest in rows.values_list(*typed_columns)}, expected)
+        self.assertEqual(ListingCard.objects.get(pk=card.pk).search_text, card.search_text)
+
+    @override_settings(STORAGES=SIMPLE_STORAGES)
+    def test_list_views_filter_on_options_ranges_and_text(self):
+        old_red = self._listing({self.year: "2012", self.color: str(self.red.pk), self.extras: str(self.abs.pk)})
+        new_blue = self._listing({self.year: "2019", self.color: str(self.blue.pk),
+                                  self.extras: f"{self.abs.pk},{self.gps.pk}", self.model: "Corolla"})
+        self._listing({self.year: "2021"}, listing_type="request")
+        xhr = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+        def item_ids(**params):
+            query = urlencode({"category": self.category.pk, **params}, doseq=True)
+            response = self.client.get(f"{reverse('item_list')}?{query}")
+            return {card.listing_id for card in response.context["items"]}, response
+
+        self.assertEqual(item_ids(**{f"attr_{self.color.pk}": self.red.pk})[0], {old_red.pk})
+        self.assertEqual(item_ids(**{f"attr_{self.extras.pk}": [self.gps.pk, 999]})[0], {new_blue.pk})
+        # junk ids are dropped, not a 500: digits int() can't read, past the integer column, ...
+        junk = {f"attr_{self.extras.pk}": [self.gps.pk, "²", 2**40], "attr_²": "1", f"attr_{2**40}": "1"}
+        self.assertEqual(item_ids(**junk)[0], {new_blue.pk})
+        self.assertEqual(item_ids(**{f"attr_{self.year.pk}_min": "2015"})[0], {new_blue.pk})
+        self.assertEqual(item_ids(**{f"attr_{self.model.pk}": "COROLLA "})[0], {new_blue.pk})
+        ids, response = item_ids(**{f"attr_{self.year.pk}_max": "2020", "attr_999999": "1"})
+        self.assertEqual(ids, {old_red.pk, new_blue.pk})
+        self.assertContains(response, f'name="attr_{self.year.pk}_max" placeholder="إلى" '
+                                      f'class="filter-input w-1/2" value="2020"')
+        self.assertContains(response, f'name="attr_{self.color.pk}" value="{self.red.pk}"')
+
+        requests = self.client.get(reverse("request_list"), {f"attr_{self.year.pk}_min": "2020"}, **xhr).json()
+        self.assertEqual(requests["total_count"], 1)
+        requests = self.client.get(reverse("request_list"), {f"attr_{self.year.pk}_max": "2020"}, **xhr).json()
+        self.assertEqual(requests["total_count"], 0)
+
+    def test_es_filters_each_attribute_on_its_own_nested_value(self):
+        filters = attribute_filters.parse(QueryDict(
+            f"attr_{self.extras.pk}={self.gps.pk}&attr_{self.extras.pk}={self.abs.pk}"
+            f"&attr_{self.year.pk}_min=2020&attr_{self.year.pk}_max=2015"
+        ))
+        execute, sent = es_response([], total=0)
+        with patch("marketplace.documents.ListingDocument", FakeSearchDocument), \
+                patch.object(Search, "execute", execute):
+            listing_search.ELASTICSEARCH.item_page("car", {"attributes": filters}, "latest", None, 16)
+
+        nested = [f["nested"] for f in sent[0]["query"]["bool"]["filter"] if "nested" in f]
+        self.assertEqual(nested, [
+            {"path": "attribute_values", "query": {"bool": {"filter": [
+                {"term": {"attribute_values.attribute_id": self.year.pk}},
+                {"range": {"attribute_values.number": {"gte": 2015.0, "lte": 2020.0}}},
+            ]}}},
+            {"path": "attribute_values", "query": {"bool": {"filter": [
+                {"term": {"attribute_values.attribute_id": self.extras.pk}},
+                {"terms": {"attribute_values.option_ids": sorted([self.abs.pk, self.gps.pk])}},
+            ]}}},
+        ])
+
+
+class SimilarListingsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="0791000094", password="pass123", username="seller94")
+        self.phones = Category.objects.create(name="Phones")
+        self.laptops = Category.objects.create(name="Laptops")
+
+    def _neighbours(self, listing):
+        return list(SimilarListing.objects.filter(listing_id=listing.pk).order_by("rank")
+                    .values_list("similar_id", flat=True))
+
+    def test_neighbours_share_words_category_and_price_band(self):
+        pixel = make_item_listing(self.user, self.phones, "Google Pixel 8 Pro", 400,
+                                  description="unlocked, 256GB", is_approved=True)
+        pixel_7 = make_item_listing(self.user, self.phones, "Google Pixel 7", 300,
+                                    description="unlocked", is_approved=True)
+        galaxy = make_item_listing(self.user, self.phones, "Samsung Galaxy S23", 350,
+                                   description="256GB", is_approved=True)
+        make_item_listing(self.user, self.phones, "Google Pixel 8 Pro case", 5, is_approved=True)  # far outside the price band
+        make_item_listing(self.user, self.laptops, "Google Pixel laptop", 400, is_approved=True)   # other category
+
+        self.assertEqual(similar_listings.refresh(), 5)
+        self.assertEqual(self._neighbours(pixel), [pixel_7.pk, galaxy.pk])
+        self.assertFalse(ListingCard.objects.filter(similar_computed_at__isnull=True).exists())
+        self.assertEqual(similar_listings.refresh(), 0)  # nothing stale left
+
+    def test_changed_listing_is_recomputed_with_its_new_neighbours(self):
+        pixel = make_item_listing(self.user, self.phones, "Google Pixel 8", 400, is_approved=True)
+        galaxy = make_item_listing(self.user, self.phones, "Samsung Galaxy S23", 350, is_approved=True)
+        similar_listings.refresh()
+        self.assertEqual(self._neighbours(galaxy), [])
+
+        pixel_7 = make_item_listing(self.user, self.phones, "Google Pixel 7", 300, is_approved=True)  # new card, stale
+        galaxy.title = "Samsung Galaxy or Google Pixel"
+        galaxy.save()                                # re-projected card, stale again
+
+        self.assertEqual(similar_listings.refresh(), 3)
+        self.assertEqual(set(self._neighbours(galaxy)), {pixel.pk, pixel_7.pk})
+        self.assertIn(pixel_7.pk, self._neighbours(pixel))  # old card picked up the new neighbour
+
+    @override_settings(STORAGES=SIMPLE_STORAGES)
+    def test_detail_pages_read_the_table(self):
+        pixel = make_item_listing(self.user, self.phones, "Google Pixel 8", 400, is_approved=True)
+        others = [make_item_listing(self.user, self.phones, f"Google Pixel {n}", 300 + n, is_approved=True)
+                  for n in range(3, 7)]
+        similar_listings.refresh()
+        expected = self._neighbours(pixel)
+        self.assertEqual(set(expected), {o.pk for o in others})
+
+        response = self.client.get(reverse("item_detail", args=[pixel.item.pk]))
+        self.assertEqual([card.listing_id for card in response.context["similar_items"]], expected)
+
+        url = reverse("item_detail_more_similar", args=[pixel.item.pk])
+        data = self.client.get(url, {"offset": 2, "limit": 1}).json()
+        self.assertTrue(data["has_more"])
+        self.assertIn(f'href="{reverse("item_detail", args=[Item.objects.get(listing_id=expected[2]).pk])}"',
+                      data["html"])
+        self.assertFalse(self.client.get(url, {"offset": 3, "limit": 1}).json()["has_more"])
+
+
 # ---------------------------------------------------------------------------
 # View tests
 # ---------------------------------------------------------------------------
@@ -345,6 +2017,86 @@ class ItemListViewTests(TestCase):
         response = self.client.get(reverse("item_list"), {"q": "Bicycle"})
         self.assertEqual(response.status_code, 200)
 
+    def test_item_list_parent_category_includes_subcategories(self):
+        child = Category.objects.create(name="List Child Cat", parent=self.category)
+        item = self._make_approved_item(title="Nested Item")
+        item.listing.category = child
+        item.listing.save()
+        response = self.client.get(reverse("item_list"), {"category": self.category.id})
+        self.assertContains(response, "Nested Item")
+
+    def _xhr_list(self, **params):
+        return self.client.get(
+            reverse("item_list"), params, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        ).json()
+
+    def test_item_list_cursor_walks_all_pages_without_duplicates(self):
+        for i in range(20):
+            self._make_approved_item(title=f"Paged Item {i:02d}", price=10 + (i % 3))
+
+        for sort in ("latest", "priceAsc", "priceDesc"):
+            first = self._xhr_list(sort=sort)
+            self.assertTrue(first["has_more"])
+            self.assertEqual(first["visible_count"], 16)
+            self.assertEqual(first["total_count"], 20)
+
+            second = self._xhr_list(sort=sort, cursor=first["next_cursor"])
+            self.assertFalse(second["has_more"])
+            self.assertEqual(second["visible_count"], 20)
+            self.assertEqual(second["next_cursor"], "")
+
+            seen = [
+                f"Paged Item {i:02d}" for i in range(20)
+                if f"Paged Item {i:02d}" in first["html"] + second["html"]
+            ]
+            self.assertEqual(len(seen), 20)
+            for i in range(20):
+                title = f"Paged Item {i:02d}"
+                self.assertFalse(title in first["html"] and title in second["html"])
+
+    def test_item_list_tampered_cursor_restarts_at_first_page(self):
+        self._make_approved_item(title="Only Item")
+        data = self._xhr_list(cursor="not-a-real-cursor")
+        self.assertIn("Only Item", data["html"])
+        self.assertEqual(data["visible_count"], 1)
+        self.assertFalse(data["has_more"])
+
+
+@override_settings(STORAGES=SIMPLE_STORAGES)
+class RequestListViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="0791000011", password="pass123")
+        self.category = Category.objects.create(name="Req List Cat")
+
+    def test_budget_sort_cursor_handles_missing_budgets(self):
+        urls = []
+        for i in range(18):
+            listing = Listing.objects.create(
+                type="request",
+                user=self.user,
+                category=self.category,
+                title=f"Wanted {i:02d}",
+                is_approved=True,
+                is_active=True,
+            )
+            req = Request.objects.create(listing=listing, budget=None if i % 4 == 0 else 50 + i)
+            urls.append(reverse("request_detail", args=[req.id]))
+
+        for sort in ("budgetAsc", "budgetDesc"):
+            first = self.client.get(
+                reverse("request_list"), {"sort": sort}, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            ).json()
+            second = self.client.get(
+                reverse("request_list"),
+                {"sort": sort, "cursor": first["next_cursor"]},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            ).json()
+            self.assertEqual(second["visible_count"], 18)
+            for url in urls:
+                # every request lands on exactly one of the two pages
+                self.assertNotEqual(f'"{url}"' in first["html"], f'"{url}"' in second["html"])
+
 
 @override_settings(STORAGES=SIMPLE_STORAGES)
 class ItemDetailViewTests(TestCase):
@@ -6,13 +6,16 @@ from rest_framework.routers import DefaultRouter
 
 from .my_account_messages_api import my_account_conversations_api, my_account_conversation_messages_api, \
     my_account_send_message_api
-from .views.api.conversations import api_my_conversations, api_conversation_messages, api_conversation_send
+from .views.api.conversations import api_my_conversations, api_conversation_messages, api_conversation_send, \
+    api_conversation_sync
 from .views.api.listing import toggle_favorite, feature_listing_api, delete_listing_api, republish_listing_api
+from .views.api.saved_searches import api_saved_searches, api_saved_search_update, api_saved_search_delete
 from .views.api.search import search_suggestions
 from .views.api.wallet import api_wallet_summary
 from .views.auth import user_login, user_logout, register, ajax_send_signup_otp, ajax_verify_signup_otp, \
     complete_signup, forgot_password, verify_reset_code, reset_password
 from .views.chat import start_conversation, chat_room, user_inbox, start_conversation_request, start_store_conversation, start_report_conversation
+from .views.images import resized_image
 from .views.home import home, home_more_items, home_more_requests
 from .views.items import item_list, item_detail, item_create, item_detail_more_similar, item_edit, delete_item, \
     cancel_item, delete_item_photo, my_items, reactivate_item, item_attributes_partial
@@ -38,6 +41,9 @@ urlpatterns = [
     path("privacy/", PrivacyPolicyView.as_view(), name="privacy_policy"),
     path("terms/", TermsView.as_view(), name="terms"),
 
+    # --- Resized images (services/image_resize.py) ---
+    path("img/<str:sig>/<int:width>x<int:height>/<path:name>", resized_image, name="resized_image"),
+
     # --- Auth ---
     path('login/', user_login, name='login'),
     path('logout/', user_logout, name='logout'),
@@ -139,11 +145,18 @@ urlpatterns = [
     path("api/my-account/conversations/", api_my_conversations, name="api_my_conversations"),
     path("api/my-account/conversations/<int:conversation_id>/messages/", api_conversation_messages,
          name="api_conversation_messages"),
+    path("api/my-account/conversations/<int:conversation_id>/sync/", api_conversation_sync,
+         name="api_conversation_sync"),
     path("api/my-account/conversations/<int:conversation_id>/send/", api_conversation_send,
          name="api_conversation_send"),
 
     path("api/wallet/summary/", api_wallet_summary, name="api_wallet_summary"),
 
+    path("api/my-account/saved-searches/", api_saved_searches, name="api_saved_searches"),
+    path("api/my-account/saved-searches/<int:search_id>/", api_saved_search_update, name="api_saved_search_update"),
+    path("api/my-account/saved-searches/<int:search_id>/delete/", api_saved_search_delete,
+         name="api_saved_search_delete"),
+
     path("listing/<int:listing_id>/delete/", delete_listing_api, name="api_delete_listing"),
 
     path('listing/<int:listing_id>/republish/', republish_listing_api, name='republish_listing'),
@@ -0,0 +1,123 @@
+"""
+Arabic-aware text analysis shared by every search path.
+
+normalize() folds text so spelling variants meet: diacritics and tatweel are
+dropped, أ/إ/آ/ٱ -> ا, ة -> ه, ى -> ي, ؤ -> و, ئ -> ي, Arabic-Indic digits
+-> 0-9, Latin is lowercased and punctuation becomes whitespace. It is one
+str.translate() over a table built once at import, applied per word through
+an LRU cache (titles and descriptions reuse a small vocabulary).
+
+analyze() is normalize + stop-word removal + light stemming (the Lucene
+ArabicStemmer rules, one prefix and any of the suffixes), i.e. the tokens
+stored in ListingCard.search_title / search_text and looked up by
+services.listing_search.PostgresBackend and lost & found matching.
+
+documents.py builds its "arabic_text" analyzer from ES_CHAR_MAPPINGS and
+STOP_WORDS, and ES's own arabic_normalization + arabic_stem filters apply the
+same rules, so both engines see the same tokens.
+
+`manage.py benchmark_arabic_normalization` times this against the regex
+chain it replaced.
+"""
+from functools import lru_cache
+
+DIACRITICS = [chr(c) for c in range(0x064B, 0x0660)] + ["ٰ"]  # harakat, shadda, sukun, superscript alef
+TATWEEL = "ـ"
+
+# variants ES's arabic_normalization filter does not fold on its own
+EXTRA_FOLDS = {"ٱ": "ا", "ؤ": "و", "ئ": "ي"}
+
+FOLDS = {
+    "أ": "ا", "إ": "ا", "آ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    **EXTRA_FOLDS,
+}
+
+DIGITS = {
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹ (Persian)
+}
+
+DIGITS_TABLE = str.maketrans(DIGITS)
+
+PUNCTUATION = (
+    "!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~"
+    "،؛؟٪٫٬«»“”‘’–—…•·"
+)
+
+_TABLE = str.maketrans({
+    **FOLDS,
+    **DIGITS,
+    **{c: None for c in DIACRITICS},
+    TATWEEL: None,
+    **{c: " " for c in PUNCTUATION},
+})
+
+# mapping char_filter rules for the ES analyzer: the folds and marks ES's
+# arabic_normalization (fathatan..sukun, tatweel) leaves alone
+ES_CHAR_MAPPINGS = (
+    [f"{src} => {dst}" for src, dst in EXTRA_FOLDS.items()]
+    + [f"{c} => " for c in DIACRITICS if ord(c) > 0x0652]
+)
+
+# already normalized (ى -> ي, ة -> ه, hamza seats folded)
+STOP_WORDS = frozenset("""
+    في من الي علي عن مع عند قرب بين حتي منذ خلال ضد تحت فوق
+    و او ثم بل لا لم لن ما ماذا قد ان اذا كان كانت يكون
+    هذا هذه ذلك تلك هو هي هم هن انا نحن انت الذي التي الذين
+    كل بعض غير ايضا جدا فقط
+    ال
+""".split())
+
+# Lucene ArabicStemmer, over normalized text (ية / ة are already يه / ه)
+PREFIXES = ("ال", "وال", "بال", "كال", "فال", "لل", "و")
+SUFFIXES = ("ها", "ان", "ات", "ون", "ين", "يه", "ه", "ي")
+
+
+@lru_cache(maxsize=50_000)
+def _fold_word(word):
+    return tuple(word.lower().translate(_TABLE).split())
+
+
+@lru_cache(maxsize=50_000)
+def _analyze_word(word):
+    return tuple(stem(t) for t in _fold_word(word) if t not in STOP_WORDS)
+
+
+def tokens(text):
+    """Normalized tokens of text."""
+    if not text:
+        return []
+    # listing text reuses a small vocabulary, so folding whitespace-separated
+    # words through a cache beats translating the whole string every time
+    return [t for word in str(text).split() for t in _fold_word(word)]
+
+
+def normalize(text):
+    return " ".join(tokens(text))
+
+
+@lru_cache(maxsize=50_000)
+def stem(word):
+    for prefix in PREFIXES:
+        # "و" needs a 4+ letter word, the other prefixes leave at least 2 letters
+        needed = 4 if len(prefix) == 1 else len(prefix) + 2
+        if len(word) >= needed and word.startswith(prefix):
+            word = word[len(prefix):]
+            break
+    for suffix in SUFFIXES:
+        if len(word) >= len(suffix) + 2 and word.endswith(suffix):
+            word = word[:-len(suffix)]
+    return word
+
+
+def analyze(text):
+    """Index / query terms for text: normalized, stop words dropped, stemmed."""
+    if not text:
+        return []
+    return [t for word in str(text).split() for t in _analyze_word(word)]
+
+
+def analyzed(text):
+    return " ".join(analyze(text))
@@ -0,0 +1,64 @@
+"""
+Typed columns for ItemAttributeValue / RequestAttributeValue.
+
+The forms keep writing `value` as before: free text, a number, an option id
+(single choice) or comma-separated option ids and "other" text (checkbox /
+tags). typed() derives what filtering and display need from it:
+
+    value_number  the number, for "number" attributes
+    option_id     the picked AttributeOption of a single-choice select
+    option_ids    every picked option, single or multi choice
+    value_text    the text a person reads (option labels, free text), normalize()d
+
+Pure functions of plain values, so the backfill migration can use them with
+historical models.
+"""
+import math
+
+from marketplace.utils import arabic
+
+MULTI_CHOICE_UI = ("checkbox", "tags")
+
+
+def split_values(raw):
+    return [part.strip() for part in str(raw or "").split(",") if part.strip()]
+
+
+def parse_number(raw):
+    try:
+        number = float(str(raw).strip().translate(arabic.DIGITS_TABLE))
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def typed(input_type, ui_type, raw, options):
+    """
+    Typed column values for one stored value. `options` is the attribute's
+    {option_id: label}; a part that is neither an id nor a label is free text.
+    """
+    raw = (raw or "").strip()
+    result = {"value_number": None, "option_id": None, "option_ids": [], "value_text": arabic.normalize(raw)}
+    if not raw:
+        return result
+
+    if input_type == "number":
+        result["value_number"] = parse_number(raw)
+        return result
+
+    if input_type == "select":
+        by_label = {label: option_id for option_id, label in options.items()}
+        parts = split_values(raw) if ui_type in MULTI_CHOICE_UI else [raw]
+        ids, labels = [], []
+        for part in parts:
+            option_id = int(part) if part.isdecimal() and int(part) in options else by_label.get(part)
+            if option_id is not None:
+                ids.append(option_id)
+                labels.append(options[option_id])
+            else:
+                labels.append(part)
+        result["option_ids"] = sorted(set(ids))
+        if ui_type not in MULTI_CHOICE_UI and ids:
+            result["option_id"] = ids[0]
+        result["value_text"] = arabic.normalize(", ".join(labels))
+    return result
@@ -1,3 +1,6 @@
+from marketplace.services.category_closure import ancestor_path_ids
+
+
 def build_category_tree(categories, lang="ar"):
     """
     Recursively build a full JSON-serializable category tree.
@@ -30,13 +33,8 @@ def build_category_tree(categories, lang="ar"):
 
 
 def get_selected_category_path(category):
+    """Root-first list of ids down to `category` (one closure-table query)."""
     if not category:
         return []
 
-    path = []
-    current = category
-    while current:
-        path.append(current.id)
-        current = current.parent
-
-    return list(reversed(path))
\ No newline at end of file
+    return ancestor_path_ids(category)
@@ -0,0 +1,192 @@
+"""
+Pure Pillow helpers for listing photos.
+
+Nothing here touches Django, so these functions can run in worker processes
+(services/photo_normalization.py) and only ever see/return raw bytes.
+"""
+import math
+import warnings
+from io import BytesIO
+
+import PIL.Image as PILImage
+from PIL import ExifTags, ImageFilter, ImageOps
+
+# Pillow >= 10 moved LANCZOS into Image.Resampling; keep backwards compat.
+LANCZOS = getattr(PILImage, "Resampling", PILImage).LANCZOS
+
+# Maximum pixel dimensions accepted before normalization.
+# Images exceeding either limit are rejected to prevent CPU/memory DoS.
+MAX_IMAGE_WIDTH = 20_000
+MAX_IMAGE_HEIGHT = 20_000
+
+# Pixel budget for what is actually decoded, checked from the header before any
+# pixel data is read. JPEGs are DCT-scaled down first (see decode_for_target), so
+# only formats without a reduced decode (PNG, WebP, ...) can hit it in practice.
+MAX_DECODE_PIXELS = 40_000_000
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Single normalized target (16:10)
+NORMAL_W = 1600
+NORMAL_H = 1000
+
+# dHash grid: DHASH_SIZE x DHASH_SIZE comparisons -> a 64-bit hash
+DHASH_SIZE = 8
+
+# Responsive renditions of the normalized canvas, largest first; each is
+# written as WebP and JPEG. Keep widths in sync with the `sizes` hints in templates.
+RENDITIONS = (("full", 1280), ("card", 640), ("thumb", 320))
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 78, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def decode_for_target(data: bytes, target=(NORMAL_W, NORMAL_H), keep_alpha=False):
+    """
+    Decode an upload at (roughly) the smallest size that still covers `target`,
+    upright and in RGB (RGBA if `keep_alpha` and the image has transparency).
+
+    Only the header is read until the size checks pass. JPEGs are then decoded
+    with draft() (libjpeg DCT scaling, 1/2 .. 1/8), so a 12000x9000 photo is read
+    at ~3000x2250 instead of native resolution. Other formats are decoded in full
+    and reduce()d by an integer factor before the RGB copy is made.
+    """
+    with warnings.catch_warnings():
+        # Pillow warns on the native pixel count; what we decode is checked below
+        warnings.simplefilter("ignore", PILImage.DecompressionBombWarning)
+        im = PILImage.open(BytesIO(data))
+    try:
+        # Guard against excessively large images (decompression-bomb / DoS)
+        if im.width > MAX_IMAGE_WIDTH or im.height > MAX_IMAGE_HEIGHT:
+            raise ValueError(
+                f"Image dimensions {im.width}x{im.height} exceed the "
+                f"allowed maximum of {MAX_IMAGE_WIDTH}x{MAX_IMAGE_HEIGHT}."
+            )
+
+        orientation = im.getexif().get(ExifTags.Base.Orientation, 1)
+        upright_w, upright_h = (im.height, im.width) if orientation in _TRANSPOSED_ORIENTATIONS else im.size
+        scale = min(max(target[0] / upright_w, target[1] / upright_h), 1.0)
+        needed = (max(math.ceil(im.width * scale), 1), max(math.ceil(im.height * scale), 1))
+
+        if im.format == "JPEG" and scale < 1:
+            im.draft("RGB", needed)  # updates im.size to the scaled decode size
+
+        if im.width * im.height > MAX_DECODE_PIXELS:
+            raise ValueError(
+                f"Image {im.width}x{im.height} would decode to more than "
+                f"{MAX_DECODE_PIXELS} pixels."
+            )
+
+        im.load()
+        factor = min(im.width // needed[0], im.height // needed[1])
+        if factor >= 2:
+            reduced = im.reduce(factor)
+            reduced.info = im.info  # keep EXIF for the transpose below
+            im.close()
+            im = reduced
+
+        has_alpha = im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info
+        upright = ImageOps.exif_transpose(im)  # fix rotation from phone photos
+        return upright.convert("RGBA" if keep_alpha and has_alpha else "RGB")
+    finally:
+        im.close()
+
+
+def _normalized_canvas(im):
+    """
+    The NORMAL_W x NORMAL_H canvas for an image from decode_for_target:
+    - FULL image visible (no crop)
+    - no empty space (filled with blurred background)
+    """
+    # background: cover then blur (fills full canvas)
+    bg = ImageOps.fit(im, (NORMAL_W, NORMAL_H), method=LANCZOS)
+    bg = bg.filter(ImageFilter.GaussianBlur(28))
+
+    # foreground: contain (no crop)
+    fg = ImageOps.contain(im, (NORMAL_W, NORMAL_H), method=LANCZOS)
+
+    # paste centered
+    x = (NORMAL_W - fg.width) // 2
+    y = (NORMAL_H - fg.height) // 2
+    bg.paste(fg, (x, y))
+    return bg
+
+
+def _encode(im, fmt: str) -> bytes:
+    pil_format, options = RENDITION_FORMATS[fmt]
+    buf = BytesIO()
+    im.save(buf, format=pil_format, **options)
+    return buf.getvalue()
+
+
+def render_normalized(data: bytes) -> bytes:
+    """Single normalized JPEG (NORMAL_W x NORMAL_H) from the original image bytes. Raises on bad input."""
+    buf = BytesIO()
+    _normalized_canvas(decode_for_target(data)).save(buf, format="JPEG", quality=85, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def render_photo_set(data: bytes) -> dict:
+    """
+    Normalized JPEG, every rendition and the perceptual hash, from one decode
+    of the original:
+
+        {"normalized": bytes,
+         "renditions": {"card": {"width": 640, "height": 400, "webp": bytes, "jpg": bytes}, ...},
+         "dhash": int}
+
+    Each rendition is downscaled from the previous (larger) one.
+    """
+    im = decode_for_target(data)
+    canvas = _normalized_canvas(im)
+    buf = BytesIO()
+    canvas.save(buf, format="JPEG", quality=85, optimize=True, progressive=True)
+
+    renditions = {}
+    current = canvas
+    for name, width in RENDITIONS:
+        height = round(NORMAL_H * width / NORMAL_W)
+        current = current.resize((width, height), LANCZOS)
+        renditions[name] = {
+            "width": width,
+            "height": height,
+            **{fmt: _encode(current, fmt) for fmt in RENDITION_FORMATS},
+        }
+    return {"normalized": buf.getvalue(), "renditions": renditions, "dhash": dhash(im)}
+
+
+def render_resized(data: bytes, width: int, height: int, crop=True) -> bytes:
+    """
+    WebP of the image at `width` x `height`: center-cropped to fill the box
+    (`crop`), or scaled to fit inside it. Never upscales; transparency is kept.
+    """
+    im = decode_for_target(data, (width, height), keep_alpha=True)
+    if crop:
+        box = (min(width, im.width), min(height, im.height))
+        im = ImageOps.fit(im, box, method=LANCZOS)
+    elif im.width > width or im.height > height:
+        im = ImageOps.contain(im, (width, height), method=LANCZOS)
+    return _encode(im, "webp")
+
+
+def dhash(im) -> int:
+    """
+    64-bit difference hash of a PIL image: shrink to 9x8 grayscale and record
+    whether each pixel is brighter than its right-hand neighbour. Re-encoded,
+    resized or lightly edited copies of a photo land within a few bits of each
+    other. Returned as a signed int so it fits a BigIntegerField.
+    """
+    small = im.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), LANCZOS)
+    px = small.load()
+    value = 0
+    for y in range(DHASH_SIZE):
+        for x in range(DHASH_SIZE):
+            value = (value << 1) | (px[x, y] > px[x + 1, y])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def image_dhash(data: bytes) -> int:
+    """dhash() of the original image bytes; JPEGs are only decoded at 1/8 scale."""
+    return dhash(decode_for_target(data, (DHASH_SIZE * 8, DHASH_SIZE * 8)))
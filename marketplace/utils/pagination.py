@@ -0,0 +1,190 @@
+import hashlib
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import F, Q
+
+
+CURSOR_SALT = "marketplace.keyset"
+COUNT_CACHE_TTL = 60  # seconds
+
+
+def _resolve_field(queryset, path):
+    """
+    Follow a lookup path like "listing__created_at" and return the final model field.
+    Annotations (e.g. a Subquery "last_time") resolve to their output field.
+    """
+    annotation = queryset.query.annotations.get(path)
+    if annotation is not None:
+        return annotation.output_field
+
+    model = queryset.model
+    field = None
+    for part in path.split("__"):
+        field = model._meta.get_field(part)
+        if field.is_relation:
+            model = field.related_model
+    return field
+
+
+def _value_for(obj, path):
+    for part in path.split("__"):
+        if obj is None:
+            return None
+        obj = getattr(obj, part)
+    return obj
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)  # Decimal and friends round-trip through field.to_python
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated result. Iterates like a Django Page so the
+    existing result partials can keep looping over `page_obj`.
+    """
+
+    def __init__(self, object_list, next_cursor, offset):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.offset = offset
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Seek-method paginator: instead of OFFSET it remembers the sort key of the last
+    row served and asks for rows strictly after it, so page N costs the same as page 1.
+
+    `ordering` is a sequence of lookups or annotation names ("-listing__created_at",
+    "price", ...) that must end in a unique column (e.g. "-listing__id") so the
+    order is total.
+    Cursors are signed, opaque tokens; a tampered or stale cursor restarts at page 1.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.per_page = per_page
+        self.keys = []
+        order_by = []
+        for key in ordering:
+            desc = key.startswith("-")
+            path = key.lstrip("-")
+            field = _resolve_field(queryset, path)
+            self.keys.append((path, desc, field))
+            if field.null:
+                # keep NULLs at the end in both directions so the seek predicate stays simple
+                expr = F(path).desc(nulls_last=True) if desc else F(path).asc(nulls_last=True)
+                order_by.append(expr)
+            else:
+                order_by.append(key)
+        self.signature = ",".join(ordering)
+        self.queryset = queryset.order_by(*order_by)
+
+    def encode_cursor(self, obj, offset):
+        values = []
+        for path, _desc, _field in self.keys:
+            value = _value_for(obj, path)
+            values.append(_jsonable(value))
+        return signing.dumps({"o": self.signature, "k": values, "n": offset}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, token):
+        try:
+            data = signing.loads(token, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None, 0
+        if not isinstance(data, dict) or data.get("o") != self.signature:
+            return None, 0
+
+        raw = data.get("k") or []
+        if len(raw) != len(self.keys):
+            return None, 0
+
+        try:
+            values = [
+                None if value is None else field.to_python(value)
+                for value, (_path, _desc, field) in zip(raw, self.keys)
+            ]
+            offset = max(int(data.get("n") or 0), 0)
+        except Exception:
+            return None, 0
+        return values, offset
+
+    def _after(self, values):
+        """
+        Build (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... honouring each key's direction.
+        """
+        condition = Q()
+        equal_so_far = Q()
+        for (path, desc, field), value in zip(self.keys, values):
+            if value is None:
+                # NULLs sort last: nothing is strictly after a NULL on this key
+                equal_so_far &= Q(**{f"{path}__isnull": True})
+                continue
+
+            op = "lt" if desc else "gt"
+            after = Q(**{f"{path}__{op}": value})
+            if field.null:
+                after |= Q(**{f"{path}__isnull": True})
+            condition |= equal_so_far & after
+            equal_so_far &= Q(**{path: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        qs = self.queryset
+        offset = 0
+        if cursor:
+            values, offset = self.decode_cursor(cursor)
+            if values is not None:
+                after = self._after(values)
+                qs = qs.filter(after) if after else qs.none()
+
+        rows = list(qs[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        next_cursor = ""
+        if has_next and rows:
+            next_cursor = self.encode_cursor(rows[-1], offset + len(rows))
+        return KeysetPage(rows, next_cursor, offset)
+
+
+def filter_signature(prefix, params, ignore=("cursor", "page")):
+    """
+    Stable cache-key fragment for a set of GET filters (order-insensitive).
+    """
+    parts = sorted(
+        (k, v)
+        for k in params.keys() if k not in ignore
+        for v in params.getlist(k) if v != ""
+    )
+    digest = hashlib.md5(repr(parts).encode("utf-8")).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def cached_count(queryset, signature, timeout=COUNT_CACHE_TTL):
+    """
+    COUNT(*) for a filter set, cached for a short while. Counts shown next to
+    "load more" don't need to be exact to the second, the rows themselves are.
+    """
+    key = f"keyset_count:{signature}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, timeout)
+    return count
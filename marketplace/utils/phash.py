@@ -0,0 +1,67 @@
+"""
+Multi-index hashing over the 64-bit `phash` columns (utils.images.dhash).
+
+The hash is split into BANDS 16-bit bands, each with its own expression index
+(band_indexes). If two hashes are within distance d, then by pigeonhole at
+least one band is within d // BANDS bits, so a radius query only looks up
+the few band values near the probe's bands and then checks the exact
+distance on that short candidate list.
+"""
+from itertools import combinations
+
+from django.db import models
+from django.db.models import F, Q
+
+BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+HASH_MASK = (1 << 64) - 1
+
+
+def band_expression(i, field="phash"):
+    expr = F(field)
+    if i:
+        expr = expr.bitrightshift(i * BAND_BITS)
+    return expr.bitand(BAND_MASK)
+
+
+def band_indexes(prefix, field="phash"):
+    """Meta.indexes entries; queries must use band_expression() to hit them."""
+    return [models.Index(band_expression(i, field), name=f"{prefix}_b{i}_idx") for i in range(BANDS)]
+
+
+def bands(value):
+    return [(value >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+
+def hamming(a, b):
+    return ((a ^ b) & HASH_MASK).bit_count()
+
+
+def _near(band, radius):
+    """Every BAND_BITS-bit value within `radius` bit flips of `band`."""
+    values = [band]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+def within(value, max_distance, field="phash"):
+    """
+    Q narrowing rows to candidates that may be within max_distance of value.
+    Apply to a queryset annotated with band_annotations(); then check
+    hamming() on the results.
+    """
+    radius = max_distance // BANDS
+    q = Q()
+    for i, band in enumerate(bands(value)):
+        q |= Q(**{f"_{field}_b{i}__in": _near(band, radius)})
+    return q
+
+
+def band_annotations(field="phash"):
+    return {f"_{field}_b{i}": band_expression(i, field) for i in range(BANDS)}
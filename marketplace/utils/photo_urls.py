@@ -0,0 +1,47 @@
+"""
+URLs for ItemPhoto.renditions (also copied onto ListingCard.main_photo_renditions).
+Shared by the `photos` template tags and the API serializers; pass
+request.build_absolute_uri as `absolute` for absolute URLs.
+"""
+from django.core.files.storage import default_storage
+
+from marketplace.utils.images import RENDITIONS
+
+
+def _url(name, absolute=None):
+    try:
+        url = default_storage.url(name) if name else ""
+    except ValueError:
+        return ""
+    return absolute(url) if (url and absolute) else url
+
+
+def rendition_url(renditions, name="card", fmt="jpg", fallback="", absolute=None):
+    """URL of one rendition, or `fallback` while the photo has none yet."""
+    entry = (renditions or {}).get(name) or {}
+    return _url(entry.get(fmt), absolute) or fallback
+
+
+def srcset(renditions, fmt="webp", absolute=None):
+    """'url 320w, url 640w, url 1280w' (smallest first), or '' when there are no renditions."""
+    renditions = renditions or {}
+    parts = []
+    for name, _width in reversed(RENDITIONS):
+        entry = renditions.get(name) or {}
+        url = _url(entry.get(fmt), absolute)
+        if url:
+            parts.append(f"{url} {entry['width']}w")
+    return ", ".join(parts)
+
+
+def rendition_urls(renditions, absolute=None):
+    """{name: {"width", "height", "webp", "jpg"}} with storage names turned into URLs."""
+    return {
+        name: {
+            "width": entry.get("width"),
+            "height": entry.get("height"),
+            "webp": _url(entry.get("webp"), absolute),
+            "jpg": _url(entry.get("jpg"), absolute),
+        }
+        for name, entry in (renditions or {}).items()
+    }
@@ -1,71 +1,40 @@
 import json
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import OuterRef, Q, Count, Subquery
+from django.core.exceptions import ValidationError
 from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST
 
-from marketplace.models import Message, Conversation
-from marketplace.validators import validate_no_links_or_html
-from marketplace.views.helpers import _other_party, _convo_type_and_title, _user_avatar_url
+from marketplace.models import Conversation
+from marketplace.services import chat as chat_service, conversations
+from marketplace.views.helpers import _other_party, _user_avatar_url
 
 
 @login_required
 @require_GET
 def api_my_conversations(request):
-  me = request.user
-
-  last_msg_qs = (
-    Message.objects
-    .filter(conversation_id=OuterRef("pk"))
-    .order_by("-created_at")
-  )
-
-  qs = (
-    Conversation.objects
-    .filter(Q(buyer=me) | Q(seller=me))
-    .select_related("buyer", "seller", "listing", "store", "report")
-    .annotate(
-      last_body=Subquery(last_msg_qs.values("body")[:1]),
-      last_time=Subquery(last_msg_qs.values("created_at")[:1]),
-      unread_count=Count(
-        "messages",
-        filter=Q(messages__is_read=False) & ~Q(messages__sender=me),
-        distinct=True
-      ),
-    )
-    .order_by("-last_time", "-created_at")
+  page = conversations.summaries_page(
+    request.user,
+    request.GET.get("cursor"),
+    request.GET.get("limit") or conversations.PAGE_SIZE,
   )
 
   out = []
-  for c in qs:
-    other = _other_party(c, me)
-    ctype, title = _convo_type_and_title(c)
-
-    # display name
-    if c.store_id and getattr(c.store, "name", None):
-      name = c.store.name
-      img = getattr(getattr(c.store, "logo", None), "url", None) or _user_avatar_url(other)
-    else:
-      name = getattr(other, "username", None) or (f"{other.first_name} {other.last_name}".strip() or "مستخدم")
-      img = _user_avatar_url(other)
-
-    last_time = c.last_time
-    last_time_str = timezone.localtime(last_time).strftime("%I:%M %p") if last_time else ""
-
+  for c in page:
+    row = conversations.summarize(c, request.user)
     out.append({
-      "id": c.id,
-      "name": name,
-      "type": ctype,
-      "title": title,
-      "img": img,
-      "unreadCount": int(c.unread_count or 0),
-      "lastText": c.last_body or "لا توجد رسائل بعد",
-      "lastTime": last_time_str,
+      "id": row["id"],
+      "name": row["name"],
+      "type": row["type"],
+      "title": row["title"],
+      "img": row["img"],
+      "unreadCount": row["unread_count"],
+      "lastText": row["last_text"],
+      "lastTime": conversations.format_time(row["last_time"]),
     })
 
-  return JsonResponse({"conversations": out})
+  return JsonResponse({"conversations": out, "next_cursor": page.next_cursor})
 
 
 @login_required
@@ -84,7 +53,7 @@ def api_conversation_messages(request, conversation_id):
   other = _other_party(convo, me)
 
   # mark unread as read
-  Message.objects.filter(conversation=convo, is_read=False).exclude(sender=me).update(is_read=True)
+  chat_service.mark_read(convo, me)
 
   msgs = (
     convo.messages
@@ -105,6 +74,45 @@ def api_conversation_messages(request, conversation_id):
   return JsonResponse({"messages": data})
 
 
+@login_required
+@require_GET
+def api_conversation_sync(request, conversation_id):
+  """
+  Incremental message sync: ?after_id= for new messages, ?before_id= for older
+  history, neither for the latest page; &limit= caps the page (see chat.sync_messages).
+  """
+  me = request.user
+
+  convo = Conversation.objects.filter(id=conversation_id).first()
+  if convo is None or not chat_service.is_participant(convo, me):
+    return JsonResponse({"messages": []}, status=403)
+
+  before_id = request.GET.get("before_id")
+  if not before_id:
+    # the client is looking at the newest messages
+    chat_service.mark_read(convo, me)
+
+  result = chat_service.sync_messages(
+    convo, me,
+    after_id=request.GET.get("after_id"),
+    before_id=before_id,
+    limit=request.GET.get("limit") or chat_service.SYNC_PAGE_SIZE,
+  )
+
+  data = []
+  for m in result["messages"]:
+    row = chat_service.serialize_message(m)
+    row["from"] = "me" if m.sender_id == me.pk else "them"
+    row["text"] = m.body
+    data.append(row)
+
+  return JsonResponse({
+    "messages": data,
+    "has_more": result["has_more"],
+    "read_up_to": result["read_up_to"],
+  })
+
+
 @login_required
 @require_POST
 def api_conversation_send(request, conversation_id):
@@ -127,12 +135,8 @@ def api_conversation_send(request, conversation_id):
   if not body:
     return JsonResponse({"ok": False, "error": "empty"}, status=400)
 
-  # keep your validation
-  from django.core.exceptions import ValidationError
   try:
-    validate_no_links_or_html(body)
+    chat_service.post_message(convo, me, body)
   except ValidationError:
     return JsonResponse({"ok": False, "error": "invalid"}, status=400)
-
-  Message.objects.create(conversation=convo, sender=me, body=body)
   return JsonResponse({"ok": True})
\ No newline at end of file
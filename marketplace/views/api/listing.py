@@ -9,6 +9,7 @@ from django.views.decorators.http import require_POST
 from django.contrib import messages
 
 from marketplace.models import Listing, Item, Favorite
+from marketplace.services import counters
 from marketplace.services.notifications import notify, K_WALLET, S_USED, K_FAV, S_ADDED
 from marketplace.views.constants import FEATURE_PACKAGES
 from marketplace.services.promotions import buy_featured_with_points, spend_points, NotEnoughPoints, AlreadyFeatured
@@ -214,18 +215,12 @@ def toggle_favorite(request, item_id):
 
     # AJAX request — return JSON only (NO PAGE REFRESH)
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-        new_count = Favorite.objects.filter(user=request.user, listing__is_deleted=False, listing__is_active=True).count()
+        new_count = counters.get_counters(request.user.pk)[counters.FAVORITE_COUNT]
 
         recent_fav_qs = (
-            Favorite.objects.filter(user=request.user, listing__is_deleted=False, listing__is_active=True)
-            .select_related(
-                "listing",
-                "listing__item",
-                "listing__request",
-                "listing__user",
-                "listing__user__store",
-            )
-            .prefetch_related("listing__item__photos")
+            counters.favorites_qs(request.user.pk)
+            .filter(listing__card__isnull=False)
+            .select_related("listing__card")
             .order_by("-created_at")[:5]
         )
         navbar_html = render_to_string(
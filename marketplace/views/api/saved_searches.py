@@ -0,0 +1,73 @@
+from urllib.parse import urlencode
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, QueryDict
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
+
+from marketplace.models import SavedSearch
+from marketplace.services import saved_searches
+
+NOTIFY_VALUES = {value for value, _ in SavedSearch.NOTIFY_CHOICES}
+
+
+def _serialize(search):
+    params = [("q", search.query)] if search.query else []
+    params += [("categories", i) for i in search.category_ids]
+    for name, value in (
+        ("city", search.city_id),
+        ("min_price", search.min_price),
+        ("max_price", search.max_price),
+        ("condition", search.condition),
+        ("seller_type", search.seller_type),
+    ):
+        if value not in (None, ""):
+            params.append((name, f"{value:g}" if isinstance(value, float) else value))
+    return {
+        "id": search.pk,
+        "name": search.name,
+        "notify": search.notify,
+        "url": f"{reverse('item_list')}?{urlencode(params)}" if params else reverse("item_list"),
+        "created_at": search.created_at.isoformat(),
+    }
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def api_saved_searches(request):
+    """
+    GET: the user's saved searches. POST: save item_list's current filters;
+    `query` is the page's query string, `notify` instant / daily / off.
+    """
+    if request.method == "GET":
+        searches = SavedSearch.objects.filter(user=request.user).order_by("-created_at")
+        return JsonResponse({"results": [_serialize(s) for s in searches]})
+
+    notify = request.POST.get("notify") or SavedSearch.NOTIFY_INSTANT
+    if notify not in NOTIFY_VALUES:
+        return JsonResponse({"ok": False, "error": "invalid_notify"}, status=400)
+    try:
+        search, created = saved_searches.save_search(request.user, QueryDict(request.POST.get("query", "")), notify)
+    except saved_searches.InvalidSavedSearch as e:
+        return JsonResponse({"ok": False, "error": e.code}, status=400)
+    return JsonResponse({"ok": True, "created": created, "search": _serialize(search)}, status=201 if created else 200)
+
+
+@login_required
+@require_POST
+def api_saved_search_update(request, search_id):
+    search = get_object_or_404(SavedSearch, pk=search_id, user=request.user)
+    notify = request.POST.get("notify")
+    if notify not in NOTIFY_VALUES:
+        return JsonResponse({"ok": False, "error": "invalid_notify"}, status=400)
+    search.notify = notify
+    search.save(update_fields=["notify"])
+    return JsonResponse({"ok": True, "search": _serialize(search)})
+
+
+@login_required
+@require_POST
+def api_saved_search_delete(request, search_id):
+    get_object_or_404(SavedSearch, pk=search_id, user=request.user).delete()
+    return JsonResponse({"ok": True})
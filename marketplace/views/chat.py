@@ -3,10 +3,9 @@ from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.core.exceptions import ValidationError
 from django.contrib import messages
-from django.db.models import Q
 
-from marketplace.models import Item, Conversation, Message, Request, Store, Report
-from marketplace.validators import validate_no_links_or_html
+from marketplace.models import Item, Conversation, Request, Store, Report
+from marketplace.services import chat as chat_service, conversations
 
 
 @login_required
@@ -45,12 +44,10 @@ def start_conversation(request, item_id):
         return JsonResponse({"ok": False, "error": "empty"}, status=400)
 
     try:
-        validate_no_links_or_html(body)
+        chat_service.post_message(convo, request.user, body)
     except ValidationError:
         return JsonResponse({"ok": False, "error": "invalid"}, status=400)
 
-    Message.objects.create(conversation=convo, sender=request.user, body=body)
-
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"ok": True})
 
@@ -92,12 +89,10 @@ def start_conversation_request(request, request_id):
         return JsonResponse({"ok": False, "error": "empty"}, status=400)
 
     try:
-        validate_no_links_or_html(body)
+        chat_service.post_message(convo, request.user, body)
     except ValidationError:
         return JsonResponse({"ok": False, "error": "invalid"}, status=400)
 
-    Message.objects.create(conversation=convo, sender=request.user, body=body)
-
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"ok": True})
 
@@ -139,12 +134,10 @@ def start_store_conversation(request, store_id):
         return JsonResponse({"ok": False, "error": "empty"}, status=400)
 
     try:
-        validate_no_links_or_html(body)
+        chat_service.post_message(convo, request.user, body)
     except ValidationError:
         return JsonResponse({"ok": False, "error": "invalid"}, status=400)
 
-    Message.objects.create(conversation=convo, sender=request.user, body=body)
-
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"ok": True, "conversation_id": convo.id})
 
@@ -184,12 +177,10 @@ def start_report_conversation(request, report_id):
         return JsonResponse({"ok": False, "error": "empty"}, status=400)
 
     try:
-        validate_no_links_or_html(body)
+        chat_service.post_message(convo, request.user, body)
     except ValidationError:
         return JsonResponse({"ok": False, "error": "invalid"}, status=400)
 
-    Message.objects.create(conversation=convo, sender=request.user, body=body)
-
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return JsonResponse({"ok": True, "conversation_id": convo.id})
 
@@ -220,10 +211,7 @@ def chat_room(request, conversation_id):
         request_obj = getattr(listing, "request", None)
 
     # Mark unread messages (from the other user) as read
-    Message.objects.filter(
-        conversation=conversation,
-        is_read=False
-    ).exclude(sender=request.user).update(is_read=True)
+    chat_service.mark_read(conversation, request.user)
 
     # SEND MESSAGE
     if request.method == "POST":
@@ -231,25 +219,22 @@ def chat_room(request, conversation_id):
 
         if body:
             try:
-                validate_no_links_or_html(body)
+                chat_service.post_message(conversation, request.user, body)
             except ValidationError:
                 messages.error(request, "Links or HTML are not allowed in messages.")
             else:
-                Message.objects.create(
-                    conversation=conversation,
-                    sender=request.user,
-                    body=body,
-                )
                 return redirect("chat_room", conversation_id=conversation_id)
 
-    messages_qs = conversation.messages.select_related("sender").order_by("created_at")
+    # Latest page only; older history is pulled in by chat_room.js via the sync API
+    page = chat_service.sync_messages(conversation, request.user)
 
     return render(
         request,
         "chat_room.html",
         {
             "conversation": conversation,
-            "messages": messages_qs,
+            "messages": page["messages"],
+            "has_more": page["has_more"],
             "listing": listing,
             "store": store,
             "report": report,
@@ -261,11 +246,6 @@ def chat_room(request, conversation_id):
 
 @login_required
 def user_inbox(request):
-    convos = (
-        Conversation.objects
-        .filter(Q(buyer=request.user) | Q(seller=request.user))
-        .select_related("listing", "store", "buyer", "seller")
-        .order_by("-created_at")
-    )
+    page = conversations.summaries_page(request.user, request.GET.get("cursor"))
 
-    return render(request, "inbox.html", {"convos": convos})
+    return render(request, "inbox.html", {"convos": page, "next_cursor": page.next_cursor})
@@ -1,20 +1,6 @@
-from collections import deque
 import re
 
 
-def _category_descendant_ids(root):
-    """Return [root.id] + all descendant category IDs (BFS)."""
-    ids = []
-    dq = deque([root])
-    while dq:
-        node = dq.popleft()
-        ids.append(node.id)
-        # requires Category(parent=..., related_name="subcategories")
-        for child in node.subcategories.all():
-            dq.append(child)
-    return ids
-
-
 def _digits_only(s: str) -> str:
     return re.sub(r"\D+", "", (s or ""))
 
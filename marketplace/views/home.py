@@ -1,4 +1,4 @@
-from marketplace.models import Item, Favorite, Request, Category, Store
+from marketplace.models import Favorite, Request, Category, Store, ListingCard
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.template.loader import render_to_string
@@ -10,16 +10,9 @@ from django.db.models import Exists, OuterRef
 def home(request):
     limit = int(request.GET.get("limit", 10))
     latest_items = (
-        Item.objects
-        .filter(
-            listing__type="item",
-            listing__is_active=True,
-            listing__is_approved=True,
-            listing__is_deleted=False
-        )
-        .select_related("listing__category", "listing__city", "listing__user")
-        .prefetch_related("photos")
-        .order_by("-listing__published_at")[:limit]
+        ListingCard.objects
+        .filter(type="item")
+        .order_by("-published_at")[:limit]
     )
 
     if request.user.is_authenticated:
@@ -27,7 +20,7 @@ def home(request):
             is_favorited=Exists(
                 Favorite.objects.filter(
                     user=request.user,
-                    listing=OuterRef("listing")
+                    listing=OuterRef("listing_id")
                 )
             )
         )
@@ -89,28 +82,22 @@ def home_more_items(request):
     limit = int(request.GET.get("limit", 12))
 
     qs = (
-        Item.objects
-        .filter(
-            listing__type="item",
-            listing__is_active=True,
-            listing__is_approved=True,
-            listing__is_deleted=False
-        )
-        .select_related("listing__category", "listing__city", "listing__user")
-        .prefetch_related("photos")
-        .order_by("-listing__created_at")
+        ListingCard.objects
+        .filter(type="item")
+        .order_by("-created_at", "-listing_id")
     )
 
     if request.user.is_authenticated:
         qs = qs.annotate(
             is_favorited=Exists(
-                Favorite.objects.filter(user=request.user, listing=OuterRef("listing"))
+                Favorite.objects.filter(user=request.user, listing=OuterRef("listing_id"))
             )
         )
 
-    chunk = list(qs[offset:offset + limit])
-    html = render_to_string("partials/_item_cards_only.html", {"items": chunk}, request=request)
-    has_more = qs.count() > (offset + limit)
+    chunk = list(qs[offset:offset + limit + 1])
+    has_more = len(chunk) > limit
+    chunk = chunk[:limit]
+    html = render_to_string("partials/_listing_cards_only.html", {"cards": chunk}, request=request)
 
     return JsonResponse({"html": html, "has_more": has_more})
 
@@ -0,0 +1,36 @@
+import logging
+
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.views.decorators.http import require_safe
+
+from marketplace.services import image_resize
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@require_safe
+def resized_image(request, sig, width, height, name):
+    """Signed, cached resize of a stored image (see services/image_resize.py)."""
+    if not image_resize.check_signature(sig, width, height, name):
+        raise Http404("Bad image signature")
+
+    etag = f'"{image_resize.cache_key(width, height, name)}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            path = image_resize.get_or_render(width, height, name)
+            # inside the try: an eviction pass can delete the cached file before it is opened
+            image = open(path, "rb")
+        except FileNotFoundError:
+            raise Http404("Image not found")
+        except ValueError as exc:
+            logger.warning("Could not resize %s to %sx%s: %s", name, width, height, exc)
+            raise Http404("Image not found")
+        response = FileResponse(image, content_type="image/webp")
+
+    response["ETag"] = etag
+    response["Cache-Control"] = IMMUTABLE
+    return response
@@ -6,24 +6,24 @@ from django.db import transaction
 from django.http import HttpResponse, Http404, HttpResponseForbidden
 from django.core.paginator import Paginator
 from django.template.loader import render_to_string
-from django.utils import timezone, translation
+from django.utils import timezone
 from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q, Exists, OuterRef
+from django.db.models import Exists, OuterRef
 from django.contrib import messages
 from django.views.decorators.http import require_GET
 
-from elasticsearch import NotFoundError, Elasticsearch
-
-from market_place import settings
-from market_place.settings import IS_RENDER
-from marketplace.documents import ListingDocument
 from marketplace.forms import ItemForm, RequestForm
-from marketplace.models import Listing, Favorite, Item, Category, Store, City, IssuesReport, ItemAttributeValue, \
-    ItemPhoto
+from marketplace.models import Listing, Favorite, Item, Category, IssuesReport, ItemAttributeValue, \
+    ItemPhoto, ListingCard
+from marketplace.services.listing_cards import refresh_listing_card
+from marketplace.services import (
+    attribute_filters, category_closure, listing_search, search_cache, search_index, similar_listings,
+    taxonomy_cache,
+)
 from marketplace.services.notifications import K_AD, S_PENDING, notify
-from marketplace.utils.category_tree import get_selected_category_path, build_category_tree
-from marketplace.views.helpers import _category_descendant_ids
+from marketplace.utils.category_tree import get_selected_category_path
+from marketplace.utils.pagination import filter_signature
 
 from datetime import timedelta
 
@@ -36,11 +36,15 @@ def redirect_my_account_ads():
 
 def item_list(request):
     # ✅ keep your cleanup
-    Listing.objects.filter(
-        created_at__lt=timezone.now() - timedelta(days=1000),
-        type="item",
-        is_active=True
-    ).update(is_active=False)
+    cutoff = timezone.now() - timedelta(days=1000)
+    expired = Listing.objects.filter(created_at__lt=cutoff, type="item", is_active=True)
+    expired_ids = list(expired.values_list("id", flat=True))
+    if expired_ids:
+        # .update() skips the post_save receivers: queue the documents and drop cached searches by hand
+        Listing.objects.filter(id__in=expired_ids).update(is_active=False)
+        search_index.mark_dirty(expired_ids)
+        search_cache.bump_generation()
+    ListingCard.objects.filter(type="item", created_at__lt=cutoff).delete()
 
     now = timezone.now()
     q = request.GET.get("q", "").strip()
@@ -62,60 +66,43 @@ def item_list(request):
         fav_exists = Exists(
             Favorite.objects.filter(
                 user=request.user,
-                listing=OuterRef("listing"),
+                listing=OuterRef("listing_id"),
             )
         )
 
+    # cards come from the ListingCard projection: one indexed table, no joins
     featured_items = (
-        Item.objects.filter(
-            listing__type="item",
-            listing__is_approved=True,
-            listing__is_active=True,
-            listing__is_deleted=False,
-            listing__featured_until__gt=now,
-        )
-        .select_related("listing", "listing__category", "listing__city", "listing__user")
-        .prefetch_related("photos")
-        .order_by("-listing__featured_until", "-listing__created_at")[:12]
+        ListingCard.objects.filter(type="item", featured_until__gt=now)
+        .order_by("-featured_until", "-created_at")[:12]
     )
 
     if fav_exists is not None:
         featured_items = featured_items.annotate(is_favorited=fav_exists)
 
-    base_qs = Item.objects.filter(
-        listing__type="item",
-        listing__is_approved=True,
-        listing__is_active=True,
-        listing__is_deleted=False
-    ).order_by("-listing__featured_until")
+    base_qs = ListingCard.objects.filter(type="item")
 
     # ✅ ADD THIS: annotate base_qs (so every later queryset keeps it)
     if fav_exists is not None:
         base_qs = base_qs.annotate(is_favorited=fav_exists)
 
     selected_category = None
+    filter_category_ids = []
 
     if category_id_single:
         try:
             selected_category = Category.objects.get(id=category_id_single)
-            ids = _category_descendant_ids(selected_category)
-            base_qs = base_qs.filter(listing__category_id__in=ids)
-        except Category.DoesNotExist:
+            filter_category_ids = [selected_category.id]
+            base_qs = base_qs.filter(category_id__in=category_closure.descendants_qs(selected_category))
+        except (Category.DoesNotExist, ValueError):
             selected_category = None
 
     elif category_ids_multi:
-        all_ids = []
-        for cid in category_ids_multi:
-            try:
-                cat = Category.objects.get(id=cid)
-                all_ids += _category_descendant_ids(cat)
-            except Category.DoesNotExist:
-                continue
-        if all_ids:
-            base_qs = base_qs.filter(listing__category_id__in=all_ids)
+        if category_closure.descendants_qs(category_ids_multi).exists():
+            filter_category_ids = category_ids_multi
+            base_qs = base_qs.filter(category_id__in=category_closure.descendants_qs(category_ids_multi))
 
     if city_id:
-        base_qs = base_qs.filter(listing__city_id=city_id)
+        base_qs = base_qs.filter(city_id=city_id)
 
     if min_price:
         base_qs = base_qs.filter(price__gte=min_price)
@@ -125,90 +112,82 @@ def item_list(request):
     if condition:
         base_qs = base_qs.filter(condition=condition)
 
-    if seller_type:
-        if Store is not None:
-            if seller_type == "store":
-                base_qs = base_qs.filter(listing__user__store__isnull=False)
-            elif seller_type == "individual":
-                base_qs = base_qs.filter(listing__user__store__isnull=True)
+    if seller_type not in (ListingCard.SELLER_STORE, ListingCard.SELLER_INDIVIDUAL):
+        seller_type_filter = ""
+    else:
+        seller_type_filter = seller_type
+        base_qs = base_qs.filter(seller_type=seller_type)
 
+    since = None
     if time_hours:
         try:
             hours = int(time_hours)
             since = now - timedelta(hours=hours)
-            base_qs = base_qs.filter(listing__created_at__gte=since)
+            base_qs = base_qs.filter(created_at__gte=since)
         except ValueError:
             pass
 
-    if sort == "priceAsc":
-        queryset = base_qs.order_by("price", "-listing__created_at", "-listing__id")
-    elif sort == "priceDesc":
-        queryset = base_qs.order_by("-price", "-listing__created_at", "-listing__id")
-    else:
-        queryset = base_qs.order_by("-listing__created_at", "-listing__id")
-
-    if len(q) >= 2:
-        if not IS_RENDER and hasattr(ListingDocument, "search"):
-            try:
-                from elasticsearch_dsl.query import Q as ES_Q
-
-                es_query = ES_Q("multi_match", query=q, fields=["title", "description"], fuzziness="AUTO")
-                hits = (
-                    ListingDocument.search()
-                    .query(es_query)
-                    .filter("term", type="item")
-                    [:50]
-                    .execute()
-                    .hits
-                )
-                listing_ids = [hit.meta.id for hit in hits]
-
-                if listing_ids:
-                    qs_list = list(
-                        base_qs.filter(listing_id__in=listing_ids)
-                        .select_related("listing__category", "listing__city", "listing__user")
-                        .prefetch_related("photos")
-                    )
-                    qs_list.sort(key=lambda i: listing_ids.index(i.listing_id))
-                    queryset = qs_list
-                else:
-                    queryset = base_qs.filter(listing__title__icontains=q)
-
-            except Exception as e:
-                print("[WARN] ES DOWN:", e)
-                queryset = base_qs.filter(listing__title__icontains=q)
-        else:
-            queryset = base_qs.filter(
-                Q(listing__title__icontains=q) | Q(listing__description__icontains=q)
-            ).order_by("-listing__created_at")
-
-    if isinstance(queryset, list):
-        ids = [obj.id for obj in queryset]
-        queryset = Item.objects.filter(id__in=ids).order_by("-listing__created_at")
+    attr_filters = attribute_filters.parse(request.GET)
+    base_qs = attribute_filters.apply(base_qs, attr_filters, "item")
 
-        if fav_exists is not None:
-            queryset = queryset.annotate(is_favorited=fav_exists)
+    PAGE_SIZE = 16
+    # the filters above, for backends that filter on their own (ES)
+    search_filters = {
+        "category_ids": filter_category_ids,
+        "city_id": city_id,
+        "min_price": min_price,
+        "max_price": max_price,
+        "condition": condition,
+        "seller_type": seller_type_filter,
+        "since": since,
+        "attributes": attr_filters,
+    }
+    cursor = request.GET.get("cursor")
+    page_args = (sort, cursor, PAGE_SIZE)
+    # "load more" pages keep the sidebar counts of the first page
+    page_kwargs = {"cards": base_qs, "count_key": filter_signature("items", request.GET), "facets": not cursor}
 
-    queryset = queryset.select_related(
-        "listing",
-        "listing__category",
-        "listing__city",
-        "listing__user"
-    ).prefetch_related("photos")
+    search_q = q if len(q) >= 2 else ""
+    backend = listing_search.get_backend() if search_q else listing_search.DATABASE
 
-    PAGE_SIZE = 16
-    paginator = Paginator(queryset, PAGE_SIZE)
-    page_number = request.GET.get("page") or "1"
-    page_obj = paginator.get_page(page_number)
+    def run_search():
+        try:
+            return backend.item_page(search_q, search_filters, *page_args, **page_kwargs)
+        except Exception as e:
+            if backend is listing_search.DATABASE:
+                raise
+            print("[WARN] ES DOWN:", e)
+            return listing_search.DATABASE.item_page(search_q, search_filters, *page_args, **page_kwargs)
+
+    if search_q:
+        # text searches go through the shared result cache; favourites come from base_qs on hydration
+        page_obj, total_count, facets = search_cache.cached_page(
+            "items",
+            {
+                "backend": backend.name,
+                "q": search_q,
+                "categories": filter_category_ids,
+                "city": city_id,
+                "min_price": min_price,
+                "max_price": max_price,
+                "condition": condition,
+                "seller_type": seller_type_filter,
+                "time": time_hours if since else "",
+                "attributes": attr_filters,
+                "sort": sort if sort in listing_search.SORTS else "latest",
+                "cursor": cursor,
+            },
+            run_search,
+            lambda ids: listing_search.hydrate_cards(ids, base_qs),
+        )
+    else:
+        page_obj, total_count, facets = run_search()
 
-    total_count = paginator.count
-    visible_count = page_obj.end_index() if total_count else 0
+    visible_count = page_obj.end_index()
     has_more = page_obj.has_next()
 
-    categories = Category.objects.filter(parent__isnull=True).prefetch_related(
-        "subcategories", "subcategories__subcategories"
-    ).distinct()
-    cities = City.objects.all().order_by("name")
+    categories = taxonomy_cache.root_categories()
+    cities = taxonomy_cache.cities()
 
     context = {
         "page_obj": page_obj,
@@ -222,6 +201,9 @@ def item_list(request):
         "visible_count": visible_count,
         "featured_items": featured_items,
         "has_more": has_more,
+        "next_cursor": page_obj.next_cursor,
+        "facets": facets,
+        "attribute_fields": attribute_filters.sidebar(selected_category, attr_filters),
         "filters": {
             "category": category_id_single or "",
             "city": city_id or "",
@@ -248,6 +230,9 @@ def item_list(request):
             "total_count": total_count,
             "visible_count": visible_count,
             "has_more": has_more,
+            "next_cursor": page_obj.next_cursor,
+            "facets": facets,
+            "attribute_filters_html": render_to_string("partials/attribute_filters.html", context, request=request),
         })
 
     return render(request, "item_list.html", context)
@@ -272,89 +257,25 @@ def item_detail(request, item_id):
         request.session[session_key] = True
         listing.refresh_from_db(fields=["views_count"])
 
-    breadcrumb_categories = []
-    cat = getattr(item.listing, "category", None)
-    while cat:
-        breadcrumb_categories.append(cat)
-        cat = cat.parent
-    breadcrumb_categories.reverse()
-
-    attributes = []
-    for av in item.attribute_values.select_related("attribute").prefetch_related("attribute__options"):
-        attr = av.attribute
-        value = av.value
-
-        if attr.input_type == "select" and value:
-            option = None
-            try:
-                option_id = int(value)
-                option = attr.options.filter(id=option_id).first()
-            except (TypeError, ValueError):
-                option = None
-
-            if option:
-                value = option.value
+    breadcrumb_categories = category_closure.ancestor_path(item.listing.category_id)
 
-        attributes.append({"name": attr.name, "value": value})
+    # option labels come with the values (ItemAttributeValue.option), one query
+    attributes = [
+        {"name": av.attribute.name, "value": av.display_value}
+        for av in item.attribute_values.select_related("attribute", "option")
+    ]
 
     # ----------------------------
-    # Similar items (fallback + ES)
+    # Similar items (precomputed; category's newest until they are)
     # ----------------------------
-    def fallback_similar():
-        return (
-            Item.objects.filter(
-                listing__category=item.listing.category,
-                listing__is_approved=True,
-                listing__is_active=True,
-                listing__is_deleted=False
-            )
-            .exclude(id=item.id)
-            .select_related("listing__category", "listing__city", "listing__user")
-            .order_by("-listing__published_at")[:4]
+    similar_items = list(similar_listings.similar_cards(listing.pk)[:4])
+    if not similar_items:
+        similar_items = list(
+            ListingCard.objects.filter(type="item", category_id=listing.category_id)
+            .exclude(listing_id=listing.pk)
+            .order_by("-published_at")[:4]
         )
 
-    similar_items = fallback_similar()
-
-    if not getattr(settings, "IS_RENDER", False):
-        try:
-            es = Elasticsearch(settings.ELASTICSEARCH_DSL["default"]["hosts"])
-
-            query = {
-                "query": {
-                    "more_like_this": {
-                        "fields": ["title", "description"],
-                        "like": [{"_index": "items", "_id": item.id}],
-                        "min_term_freq": 1,
-                        "max_query_terms": 12,
-                    }
-                },
-                "size": 4,
-            }
-
-            response = es.search(index="items", body=query)
-            hits = response.get("hits", {}).get("hits", [])
-            ids = [hit["_id"] for hit in hits]
-
-            if ids:
-                es_items = (
-                    Item.objects.filter(
-                        id__in=ids,
-                        listing__is_approved=True,
-                        listing__is_active=True,
-                        listing__is_deleted=False
-                    )
-                    .exclude(id=item.id)
-                    .select_related("listing__category", "listing__city", "listing__user")
-                    .order_by("-listing__published_at")[:4]
-                )
-
-                if es_items.exists():
-                    similar_items = es_items
-
-        except (ConnectionError, NotFoundError, Exception) as e:
-            print("[WARN] Elasticsearch error in item_detail:", e)
-
-
     fav_listing_ids = set()
     if request.user.is_authenticated:
         fav_listing_ids = set(
@@ -444,7 +365,6 @@ def item_create(request):
     # =============================
     # 1. Top-level categories
     # =============================
-    lang = translation.get_language()
     order_field = "name"
 
     top_categories = Category.objects.filter(parent__isnull=True).order_by(order_field)
@@ -492,13 +412,13 @@ def item_create(request):
                 photo = ItemPhoto.objects.create(item=item, image=img)
                 if main_index is not None and idx == main_index:
                     photo.is_main = True
-                    photo.save()
+                    photo.save(update_fields=["is_main"])
 
             if images and not item.photos.filter(is_main=True).exists():
                 first = item.photos.first()
                 if first:
                     first.is_main = True
-                    first.save()
+                    first.save(update_fields=["is_main"])
 
 
             for field_name, value in form.cleaned_data.items():
@@ -577,7 +497,7 @@ def item_create(request):
 
     form = ItemForm(category=selected_category)
 
-    category_tree = build_category_tree(top_categories, lang)
+    category_tree = taxonomy_cache.category_tree(order_field)
     category_tree_json = json.dumps(category_tree, ensure_ascii=False)
 
     selected_path = get_selected_category_path(selected_category)
@@ -615,9 +535,7 @@ def item_edit(request, item_id):
     listing = item.listing
     category = listing.category
 
-    lang = translation.get_language()
-    top_categories = Category.objects.filter(parent__isnull=True).order_by("id")
-    category_tree = build_category_tree(top_categories, lang)
+    category_tree = taxonomy_cache.category_tree()
     category_tree_json = json.dumps(category_tree, ensure_ascii=False)
     selected_path = get_selected_category_path(category)
     selected_path_json = json.dumps(selected_path)
@@ -711,13 +629,16 @@ def item_edit(request, item_id):
 
         elif main_index is not None and 0 <= main_index < len(created_photos):
             created_photos[main_index].is_main = True
-            created_photos[main_index].save()
+            created_photos[main_index].save(update_fields=["is_main"])
 
         elif not item.photos.filter(is_main=True).exists():
             first = item.photos.first()
             if first:
                 first.is_main = True
-                first.save()
+                first.save(update_fields=["is_main"])
+
+        # the is_main flips above are queryset updates, which skip signals
+        refresh_listing_card(listing.id)
 
         notify(
             user=request.user,
@@ -784,42 +705,35 @@ def item_detail_more_similar(request, item_id):
     offset = int(request.GET.get("offset", 0))
     limit = int(request.GET.get("limit", 12))
 
-    item = get_object_or_404(Item, id=item_id)
-    cat = getattr(item.listing, "category", None)
+    item = get_object_or_404(Item.objects.select_related("listing"), id=item_id)
+    listing = item.listing
 
-    qs = (
-        Item.objects
-        .filter(
-            listing__type="item",
-            listing__is_active=True,
-            listing__is_approved=True,
-            listing__is_deleted=False
+    if similar_listings.has_neighbours(listing.pk):
+        qs = similar_listings.similar_cards(listing.pk)
+    else:
+        qs = (
+            ListingCard.objects.filter(type="item", category_id=listing.category_id)
+            .exclude(listing_id=listing.pk)
+            .order_by("-created_at", "-listing_id")
         )
-        .exclude(id=item.id)
-        .select_related("listing__category", "listing__city", "listing__user")
-        .prefetch_related("photos")
-        .order_by("-listing__created_at")
-    )
-
-    if cat:
-        qs = qs.filter(listing__category=cat)
 
     if request.user.is_authenticated:
         qs = qs.annotate(
             is_favorited=Exists(
-                Favorite.objects.filter(user=request.user, listing=OuterRef("listing"))
+                Favorite.objects.filter(user=request.user, listing=OuterRef("listing_id"))
             )
         )
 
-    chunk = list(qs[offset:offset + limit])
+    chunk = list(qs[offset:offset + limit + 1])
+    has_more = len(chunk) > limit
+    chunk = chunk[:limit]
 
     html = render_to_string(
-        "partials/_item_cards_only.html",
-        {"items": chunk},
+        "partials/_listing_cards_only.html",
+        {"cards": chunk},
         request=request
     )
 
-    has_more = qs.count() > (offset + limit)
     return JsonResponse({"html": html, "has_more": has_more})
 
 
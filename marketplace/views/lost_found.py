@@ -1,5 +1,6 @@
 import base64
 import json
+import logging
 import uuid
 
 from django.contrib.auth.decorators import login_required
@@ -13,6 +14,10 @@ from django.views.decorators.http import require_POST
 
 from marketplace.models import City
 from marketplace.models.lost_found import Report, ReportPhoto
+from marketplace.services import image_resize
+from marketplace.utils.images import image_dhash
+
+logger = logging.getLogger(__name__)
 
 
 # ─────────────────────────────────────────────
@@ -33,7 +38,7 @@ def _report_to_js(report, is_own=False):
     avatar = ""
     if user.profile_photo:
         try:
-            avatar = user.profile_photo.url
+            avatar = image_resize.resized_url(user.profile_photo, 64, 64)
         except Exception:
             pass
 
@@ -61,6 +66,15 @@ def _report_to_js(report, is_own=False):
     }
 
 
+def _photo_hash(data):
+    """dHash for duplicate lookups (services/photo_duplicates.py); None if Pillow can't read it."""
+    try:
+        return image_dhash(data)
+    except Exception as e:
+        logger.info("Could not hash report photo: %s", e)
+        return None
+
+
 def _save_images(report, images_list, main_image_index, existing_photos=None):
     """Create/keep photos for a report. Deletes removed existing ones on update."""
     existing_url_map = {}
@@ -74,11 +88,11 @@ def _save_images(report, images_list, main_image_index, existing_photos=None):
             try:
                 header, b64data = img_data.split(';base64,', 1)
                 ext = header.split('/')[-1].replace('jpeg', 'jpg').replace('jpg', 'jpg')
-                img_file = ContentFile(
-                    base64.b64decode(b64data),
-                    name=f"{uuid.uuid4()}.{ext}"
+                data = base64.b64decode(b64data)
+                img_file = ContentFile(data, name=f"{uuid.uuid4()}.{ext}")
+                photo = ReportPhoto.objects.create(
+                    report=report, image=img_file, is_main=is_main, phash=_photo_hash(data),
                 )
-                photo = ReportPhoto.objects.create(report=report, image=img_file, is_main=is_main)
                 kept_ids.add(photo.id)
             except Exception:
                 pass
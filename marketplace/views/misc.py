@@ -9,12 +9,12 @@ from django.views.decorators.http import require_http_methods, require_GET, requ
 from django.core.exceptions import ValidationError
 from django.views.generic import TemplateView
 from django.contrib import messages
-from django.utils import translation
 
 from pydantic import validate_email
 
 from marketplace.models import ContactMessage, FAQCategory, PrivacyPolicyPage, TermsPage, Subscriber, Category, \
     IssuesReport, Listing, User, Store
+from marketplace.services import taxonomy_cache
 from marketplace.services.notifications import K_REPORT, notify, S_SUBMITTED
 from marketplace.validators import validate_no_links_or_html
 
@@ -161,48 +161,7 @@ def categories_browse(request):
     تعرض جميع الأقسام بشكل تفاعلي وجميل
     """
 
-    lang = translation.get_language()
-
-    top_categories = (
-        Category.objects
-        .filter(parent__isnull=True)
-        .select_related("parent")
-        .prefetch_related("subcategories__subcategories")
-        .order_by("id")
-    )
-
-    def title_of(cat):
-        return cat.name
-
-    def photo_of(cat):
-        # uses your Category.photo_url property if you added it
-        return getattr(cat, "photo_url", None) or None
-
-    categories_data = []
-
-    for top_cat in top_categories:
-        subcats = top_cat.subcategories.all().order_by("id")
-
-        subs_list = []
-        for sub in subcats:
-            sub_sub_cats = sub.subcategories.all().order_by("id")
-            levels_list = [title_of(ssc) for ssc in sub_sub_cats] if sub_sub_cats.exists() else [title_of(sub)]
-
-            subs_list.append({
-                "id": sub.id,
-                "title": title_of(sub),
-                # ✅ NEW
-                "photo": photo_of(sub),
-                "levels": levels_list,
-            })
-
-        categories_data.append({
-            "id": top_cat.id,  # ✅ keep as int for simpler JS
-            "title": title_of(top_cat),
-            "subtitle": top_cat.subtitle,
-            "photo": photo_of(top_cat),
-            "subs": subs_list,
-        })
+    categories_data = taxonomy_cache.browse_data()
 
     context = {
         "categories_json": json.dumps(categories_data, ensure_ascii=False),
@@ -11,8 +11,10 @@ from django.contrib import messages
 
 from marketplace.forms import UserProfileEditForm, UserPasswordChangeForm
 from marketplace.models import Favorite, Item, Request, Notification
+from marketplace.services import counters
 from marketplace.views.constants import ALLOWED_PAYMENT_METHODS, ALLOWED_DELIVERY, ALLOWED_RETURN
 from marketplace.views.helpers import _fmt_date, _status_from_listing, translate_condition, normalize_optional_url
+from marketplace.utils import photo_urls
 
 
 @require_GET
@@ -55,7 +57,7 @@ def my_account(request: HttpRequest):
         image_url = ""
         p = getattr(it, "main_photo", None)
         if p:
-            image_url = (p.normalized.url if getattr(p, "normalized", None) else p.image.url)
+            image_url = photo_urls.rendition_url(p.renditions, "card", fallback=p.display_image.url)
 
         featured_until = getattr(listing, "featured_until", None)
 
@@ -404,7 +406,7 @@ def my_account_noti_mark_read(request, pk):
         n.is_read = True
         n.save(update_fields=["is_read"])
 
-    unread = Notification.objects.filter(user=request.user, is_read=False).count()
+    unread = counters.get_counters(request.user.pk)[counters.UNREAD_NOTIFICATIONS]
     return JsonResponse({"ok": True, "unread": unread})
 
 
@@ -414,6 +416,7 @@ def my_account_noti_mark_all_read(request):
         return JsonResponse({"ok": False}, status=405)
 
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    counters.reset(request.user.pk, counters.UNREAD_NOTIFICATIONS)
     return JsonResponse({"ok": True, "unread": 0})
 
 
@@ -423,6 +426,7 @@ def notifications(request):
 
     # mark unread as read
     notifications.filter(is_read=False).update(is_read=True)
+    counters.reset(request.user.pk, counters.UNREAD_NOTIFICATIONS)
 
     return render(request, 'notifications.html', {
         'notifications': notifications
@@ -432,6 +436,7 @@ def notifications(request):
 @login_required
 def mark_notifications_read(request):
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    counters.reset(request.user.pk, counters.UNREAD_NOTIFICATIONS)
     return JsonResponse({"success": True})
 
 
@@ -1,19 +1,21 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db import transaction
 from django.http import HttpResponse, JsonResponse, Http404, HttpResponseBadRequest, HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
-from django.db.models import Q
-from django.utils import timezone, translation
+from django.utils import timezone
 from django.contrib import messages
 from django.views.decorators.http import require_GET
 
 from marketplace.forms import RequestForm
-from marketplace.models import Request, Category, City, Listing, IssuesReport, RequestAttributeValue
+from marketplace.models import Request, Category, Listing, IssuesReport, RequestAttributeValue, ListingCard
+from marketplace.services import (
+    attribute_filters, category_closure, listing_facets, listing_search, search_cache, similar_listings,
+    taxonomy_cache,
+)
 from marketplace.services.notifications import notify, K_REQUEST, S_PENDING
-from marketplace.utils.category_tree import build_category_tree, get_selected_category_path
-from marketplace.views.helpers import _category_descendant_ids
+from marketplace.utils.category_tree import get_selected_category_path
+from marketplace.utils.pagination import KeysetPaginator, cached_count, filter_signature
 
 import json
 import uuid
@@ -70,21 +72,13 @@ def request_list(request):
     if category_id_single:
         try:
             selected_category = Category.objects.get(id=category_id_single)
-            ids = _category_descendant_ids(selected_category)
-            base_qs = base_qs.filter(listing__category_id__in=ids)
-        except Category.DoesNotExist:
+            base_qs = base_qs.filter(listing__category_id__in=category_closure.descendants_qs(selected_category))
+        except (Category.DoesNotExist, ValueError):
             selected_category = None
 
     elif category_ids_multi:
-        all_ids = []
-        for cid in category_ids_multi:
-            try:
-                cat = Category.objects.get(id=cid)
-                all_ids += _category_descendant_ids(cat)
-            except Category.DoesNotExist:
-                continue
-        if all_ids:
-            base_qs = base_qs.filter(listing__category_id__in=all_ids)
+        if category_closure.descendants_qs(category_ids_multi).exists():
+            base_qs = base_qs.filter(listing__category_id__in=category_closure.descendants_qs(category_ids_multi))
 
     if city_id:
         base_qs = base_qs.filter(listing__city_id=city_id)
@@ -120,33 +114,72 @@ def request_list(request):
         except ValueError:
             pass
 
-    # search
+    attr_filters = attribute_filters.parse(request.GET)
+    base_qs = attribute_filters.apply(base_qs, attr_filters, "request")
+
+    # search (ListingCard tsvector / trigram indexes; the grid itself stays on Request)
     if len(q) >= 2:
         base_qs = base_qs.filter(
-            Q(listing__title__icontains=q) | Q(listing__description__icontains=q)
+            listing_id__in=listing_search.DATABASE.matching_cards(q, "request").values("listing_id")
         )
 
     # sort
     if sort == "budgetAsc":
-        queryset = base_qs.order_by("budget", "-listing__created_at", "-listing__id")
+        ordering = ("budget", "-listing__created_at", "-listing__id")
     elif sort == "budgetDesc":
-        queryset = base_qs.order_by("-budget", "-listing__created_at", "-listing__id")
+        ordering = ("-budget", "-listing__created_at", "-listing__id")
     else:
-        queryset = base_qs.order_by("-listing__created_at", "-listing__id")
+        ordering = ("-listing__created_at", "-listing__id")
 
     PAGE_SIZE = 16
-    paginator = Paginator(queryset, PAGE_SIZE)
-    page_number = request.GET.get("page") or "1"
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get("cursor")
+    signature = filter_signature("requests", request.GET)
+
+    def run_page():
+        page = KeysetPaginator(base_qs, ordering, PAGE_SIZE).get_page(cursor)
+        total = cached_count(base_qs, signature) if page.has_next() else page.end_index()
+        # sidebar counts from the request cards, first page only ("load more" keeps them)
+        page_facets = None
+        if not cursor:
+            page_facets = listing_facets.card_facets(
+                ListingCard.objects.filter(type="request", listing_id__in=base_qs.values("listing_id")),
+                price_field="budget",
+                cache_key=signature,
+            )
+        return page, total, page_facets
+
+    def hydrate(listing_ids):
+        rows = {r.listing_id: r for r in base_qs.filter(listing_id__in=listing_ids)}
+        return [rows[i] for i in listing_ids if i in rows]
+
+    if len(q) >= 2:
+        page_obj, total_count, facets = search_cache.cached_page(
+            "requests",
+            {
+                "q": q,
+                "category": category_id_single if selected_category else "",
+                "categories": [] if category_id_single else category_ids_multi,
+                "city": city_id,
+                "min_budget": min_budget,
+                "max_budget": max_budget,
+                "condition": condition,
+                "seller_type": seller_type,
+                "time": time_hours,
+                "attributes": attr_filters,
+                "sort": sort if sort in ("budgetAsc", "budgetDesc") else "latest",
+                "cursor": cursor,
+            },
+            run_page,
+            hydrate,
+        )
+    else:
+        page_obj, total_count, facets = run_page()
 
-    total_count = paginator.count
-    visible_count = page_obj.end_index() if total_count else 0
+    visible_count = page_obj.end_index()
     has_more = page_obj.has_next()
 
-    categories = Category.objects.filter(parent__isnull=True).prefetch_related(
-        "subcategories", "subcategories__subcategories"
-    ).distinct()
-    cities = City.objects.all().order_by("name")
+    categories = taxonomy_cache.root_categories()
+    cities = taxonomy_cache.cities()
 
     # banners (same behavior as items; if you already provide banners elsewhere, keep it)
     banners = []
@@ -168,7 +201,10 @@ def request_list(request):
         "visible_count": visible_count,
         "featured_requests": featured_requests,
         "has_more": has_more,
+        "next_cursor": page_obj.next_cursor,
+        "facets": facets,
         "banners": banners,
+        "attribute_fields": attribute_filters.sidebar(selected_category, attr_filters),
         "filters": {
             "category": category_id_single or "",
             "city": city_id or "",
@@ -195,6 +231,9 @@ def request_list(request):
             "total_count": total_count,
             "visible_count": visible_count,
             "has_more": has_more,
+            "next_cursor": page_obj.next_cursor,
+            "facets": facets,
+            "attribute_filters_html": render_to_string("partials/attribute_filters.html", context, request=request),
         })
 
     return render(request, "request_list.html", context)
@@ -219,50 +258,27 @@ def request_detail(request, request_id):
         request.session[session_key] = True
         listing.refresh_from_db(fields=["views_count"])
 
-    breadcrumb_categories = []
-    cat = getattr(request_obj.listing, "category", None)
-
-    while cat:
-        breadcrumb_categories.append(cat)
-        cat = cat.parent
-
-    breadcrumb_categories.reverse()
-
-    attributes = []
-    for av in request_obj.attribute_values.select_related("attribute").prefetch_related("attribute__options"):
-        attr = av.attribute
-        value = av.value
-
-        # Dropdown / select attribute → normally value is an option ID
-        if attr.input_type == "select" and value:
-            option = None
-            try:
-                option_id = int(value)  # ✅ only works if it's a real option id
-                option = attr.options.filter(id=option_id).first()
-            except (TypeError, ValueError):
-                option = None  # ✅ means it's "Other" text like "Test other"
-
-            if option:
-                value = option.value  # or value_en if you want based on language
-            # else: keep value as-is (the typed "Other" text)
-
-        attributes.append({
-            "name": attr.name,
-            "value": value,
-        })
-
-
-    # Similar requests (fallback like items)
-    similar_requests = (
-        Request.objects.filter(
-            listing__category=request_obj.listing.category,
-            listing__is_approved=True,
-            listing__is_active=True,
-            listing__is_deleted=False
+    breadcrumb_categories = category_closure.ancestor_path(request_obj.listing.category_id)
+
+    # option labels come with the values (RequestAttributeValue.option), one query
+    attributes = [
+        {"name": av.attribute.name, "value": av.display_value}
+        for av in request_obj.attribute_values.select_related("attribute", "option")
+    ]
+
+    # Similar requests (precomputed; category's newest until they are)
+    similar_requests = list(similar_listings.similar_requests(request_obj.listing_id)[:4])
+    if not similar_requests:
+        similar_requests = (
+            Request.objects.filter(
+                listing__category=request_obj.listing.category,
+                listing__is_approved=True,
+                listing__is_active=True,
+                listing__is_deleted=False
+            )
+            .exclude(id=request_obj.id)
+            .order_by("-listing__published_at")[:4]
         )
-        .exclude(id=request_obj.id)
-        .order_by("-listing__published_at")[:4]
-    )
 
     requester = request_obj.listing.user
 
@@ -330,7 +346,6 @@ def request_create(request):
     # =============================
     # 1. Top-level categories
     # =============================
-    lang = translation.get_language()
     order_field = "name"
 
     top_categories = Category.objects.filter(parent__isnull=True).order_by(order_field)
@@ -455,7 +470,7 @@ def request_create(request):
     # =============================
     form = RequestForm(category=selected_category)
 
-    category_tree = build_category_tree(top_categories, lang)
+    category_tree = taxonomy_cache.category_tree(order_field)
     category_tree_json = json.dumps(category_tree, ensure_ascii=False)
 
     selected_path = get_selected_category_path(selected_category)
@@ -495,11 +510,7 @@ def request_edit(request, request_id):
     # =============================
     # Category tree (for display only; locked in edit)
     # =============================
-    lang = translation.get_language()
-    order_field = "name"
-    top_categories = Category.objects.filter(parent__isnull=True).order_by(order_field)
-
-    category_tree = build_category_tree(top_categories, lang)
+    category_tree = taxonomy_cache.category_tree("name")
     category_tree_json = json.dumps(category_tree, ensure_ascii=False)
 
     selected_path = get_selected_category_path(category)
@@ -630,26 +641,29 @@ def request_detail_more_similar(request, request_id):
     offset = int(request.GET.get("offset", 0))
     limit = int(request.GET.get("limit", 2))
 
-    request_obj = get_object_or_404(Request, id=request_id)
-    cat = getattr(request_obj.listing, "category", None)
+    request_obj = get_object_or_404(Request.objects.select_related("listing"), id=request_id)
 
-    qs = (
-        Request.objects
-        .filter(
-            listing__type="request",
-            listing__is_active=True,
-            listing__is_approved=True,
-            listing__is_deleted=False
+    if similar_listings.has_neighbours(request_obj.listing_id):
+        qs = similar_listings.similar_requests(request_obj.listing_id)
+    else:
+        qs = (
+            Request.objects
+            .filter(
+                listing__type="request",
+                listing__is_active=True,
+                listing__is_approved=True,
+                listing__is_deleted=False
+            )
+            .exclude(id=request_obj.id)
+            .select_related("listing__category", "listing__city", "listing__user")
+            .order_by("-listing__created_at")
         )
-        .exclude(id=request_obj.id)
-        .select_related("listing__category", "listing__city", "listing__user")
-        .order_by("-listing__created_at")
-    )
-
-    if cat:
-        qs = qs.filter(listing__category=cat)
+        if request_obj.listing.category_id:
+            qs = qs.filter(listing__category_id=request_obj.listing.category_id)
 
-    chunk = list(qs[offset:offset + limit])
+    chunk = list(qs[offset:offset + limit + 1])
+    has_more = len(chunk) > limit
+    chunk = chunk[:limit]
 
     html = render_to_string(
         "partials/_request_cards_only.html",
@@ -657,5 +671,4 @@ def request_detail_more_similar(request, request_id):
         request=request
     )
 
-    has_more = qs.count() > (offset + len(chunk))  # ✅ FIX
     return JsonResponse({"html": html, "has_more": has_more})
\ No newline at end of file
@@ -1,6 +1,6 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q, F, Count, Avg
+from django.db.models import Q, F, Count, Avg, Exists, OuterRef
 from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
@@ -8,7 +8,8 @@ from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_POST
 from django.db import IntegrityError
 
-from marketplace.models import Store, Category, Listing, City, StoreReview, StoreFollow, IssuesReport, Favorite
+from marketplace.models import Store, Category, StoreReview, StoreFollow, IssuesReport, Favorite, ListingCard
+from marketplace.services import taxonomy_cache
 from marketplace.services.notifications import notify, K_STORE_FOLLOW, S_FOLLOWED, S_UNFOLLOWED
 from marketplace.utils.service import recalc_store_rating
 
@@ -115,28 +116,20 @@ def store_profile(request, store_id):
         store.refresh_from_db(fields=["views_count"])
 
     base_qs = (
-        Listing.objects
-        .filter(user=store.owner, is_active=True, is_approved=True, type="item", item__isnull=False)
-        .select_related("category", "city", "user", "item")
+        ListingCard.objects
+        .filter(user=store.owner, type="item")
         .order_by("-published_at")
     )
+    if request.user.is_authenticated:
+        base_qs = base_qs.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=request.user, listing=OuterRef("listing_id"))
+            )
+        )
 
     listings = list(base_qs[:30])
     listings_count = base_qs.count()
 
-    # --------- mark favorited items for the current user ---------
-    if request.user.is_authenticated and listings:
-        listing_ids = [l.id for l in listings]
-        fav_listing_ids = set(
-            Favorite.objects.filter(
-                user=request.user, listing_id__in=listing_ids
-            ).values_list("listing_id", flat=True)
-        )
-        for l in listings:
-            item = getattr(l, "item", None)
-            if item:
-                item.is_favorited = l.id in fav_listing_ids
-
     # --------- build category chips from the actual category on each listing ---------
     cat_ids = list(
         base_qs.exclude(category_id__isnull=True)
@@ -148,17 +141,8 @@ def store_profile(request, store_id):
         Category.objects.filter(id__in=cat_ids).order_by("id")
     )
 
-    # --------- attach filter data to the 30 rendered cards (NO extra DB hits) ---------
-    for l in listings:
-        cat = getattr(l, "category", None)
-        l.root_category_id = cat.id if cat else ""
-
-        # city id (prefer item.city_id if exists, else listing city)
-        city_id = getattr(l.item, "city_id", None) or getattr(l, "city_id", None) or ""
-        l._city_id = city_id
-
-    categories = Category.objects.filter(parent__isnull=True).order_by("id")
-    cities = City.objects.filter(is_active=True).order_by("name")
+    categories = taxonomy_cache.root_categories()
+    cities = taxonomy_cache.cities(active_only=True)
 
     reviews = (
         StoreReview.objects
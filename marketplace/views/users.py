@@ -1,6 +1,8 @@
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404, render
 
-from marketplace.models import User, Listing, Category, City, IssuesReport
+from marketplace.models import User, IssuesReport, Favorite, ListingCard
+from marketplace.services import image_resize, taxonomy_cache
 
 
 def user_profile(request, user_id):
@@ -13,41 +15,26 @@ def user_profile(request, user_id):
         request.session[session_key] = True
         # seller.refresh_from_db(fields=["views_count"])
 
-    # ✅ IMPORTANT:
-    # The template includes the card with `item=l.item`
-    # So we MUST return Listing objects, but only those that actually have a related Item.
+    # Cards come straight from the ListingCard projection; root_category_id and
+    # city_id (used by the client-side filters) are already on each row.
     listings_qs = (
-        Listing.objects
-        .filter(
-            user=seller,
-            is_active=True,
-            is_approved=True,
-            type="item",
-            item__isnull=False,          # ✅ excludes broken listings (no Item)
-        )
-        .select_related("category", "city", "user")
-        .prefetch_related("item")       # ✅ avoid extra queries when template accesses l.item
+        ListingCard.objects
+        .filter(user=seller, type="item")
         .order_by("-published_at")
     )
+    if request.user.is_authenticated:
+        listings_qs = listings_qs.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=request.user, listing=OuterRef("listing_id"))
+            )
+        )
 
     listings = list(listings_qs[:30])
 
     listings_count = listings_qs.count()
 
-    def _root_category(cat):
-        while cat and cat.parent_id:
-            cat = cat.parent
-        return cat
-
-    for l in listings:
-        # ✅ No need to touch l.item.listing/category; Listing already has category/city
-        root = _root_category(getattr(l, "category", None))
-        l.root_category_id = root.id if root else ""
-
-        l._city_id = getattr(l, "city_id", None) or ""
-
-    categories = Category.objects.filter(parent__isnull=True).order_by("id")
-    cities = City.objects.filter(is_active=True).order_by("name")
+    categories = taxonomy_cache.root_categories()
+    cities = taxonomy_cache.cities(active_only=True)
 
     full_phone = seller.phone if getattr(seller, "phone", None) else ""
     masked_phone = "07•• ••• •••"
@@ -63,11 +50,11 @@ def user_profile(request, user_id):
             reported_user=seller,
         ).exists()
 
-    avatar_url = seller.profile_photo.url if getattr(seller, "profile_photo", None) else None
+    avatar_url = image_resize.resized_url(getattr(seller, "profile_photo", None), 224, 224) or None
 
     ctx = {
         "seller": seller,
-        "listings": listings,                 # ✅ still listings (so l.item works in template)
+        "listings": listings,
         "listings_count": listings_count,
         "categories": categories,
         "cities": cities,